@@ -3,16 +3,81 @@
 Perform a vertical operation on a 3D results file to get 2D
 """
 
+from multiprocessing import Pool
 import numpy as np
 import sys
 from tqdm import tqdm
 
+from pyteltools.conf import settings
 from pyteltools.geom.transformation import Transformation
 import pyteltools.slf.misc as operations
 from pyteltools.slf import Serafin
 from pyteltools.utils.cli import logger, PyTelToolsArgParse
 
 
+# Arguments and input header shared by the worker processes (set by `init_worker`)
+_worker_args = {}
+
+
+def vertical_calculator_from_args(args, input_stream, output_header):
+    """!
+    @brief Build the vertical calculator corresponding to the `--aggregation` argument
+    @param args <argparse.Namespace>: parsed arguments
+    @param input_stream <slf.Serafin.Read>: input stream
+    @param output_header <slf.Serafin.SerafinHeader>: 2D output header (before sorting variables)
+    @return <slf.misc.VerticalMaxMinMeanCalculator>: vertical calculator (or None if a layer is extracted)
+    """
+    if args.aggregation is None:
+        return None
+    if args.aggregation == 'max':
+        operation_type = operations.MAX
+    elif args.aggregation == 'min':
+        operation_type = operations.MIN
+    else:  # args.aggregation == 'mean'
+        operation_type = operations.MEAN
+    selected_vars = [var for var in output_header.iter_on_all_variables()]
+    return operations.VerticalMaxMinMeanCalculator(operation_type, input_stream, output_header, selected_vars,
+                                                   args.vars)
+
+
+def frames_3d_to_2d(args, input_stream, vertical_calculator, var_IDs, time_indices):
+    """!
+    @brief Compute the 2D values of several frames
+    @param args <argparse.Namespace>: parsed arguments
+    @param input_stream <slf.Serafin.Read>: input stream
+    @param vertical_calculator <slf.misc.VerticalMaxMinMeanCalculator>: vertical calculator (or None)
+    @param var_IDs <[str]>: output variable IDs (only used to extract a layer)
+    @param time_indices <[int]>: indices of the frames (0-based)
+    @return <numpy 3D-array>: values with shape (number of frames, number of variables, number of 2D nodes)
+    """
+    if vertical_calculator is not None:
+        return vertical_calculator.max_min_mean_in_frames(time_indices)
+    vars_2d = np.empty((len(time_indices), len(var_IDs), input_stream.header.nb_nodes_2d))
+    for k, time_index in enumerate(time_indices):
+        for i, var in enumerate(var_IDs):
+            vars_2d[k, i, :] = input_stream.read_var_in_frame_as_3d(time_index, var)[args.layer - 1, :]
+    return vars_2d
+
+
+def init_worker(args, input_header, var_IDs):
+    _worker_args['args'] = args
+    _worker_args['header'] = input_header
+    _worker_args['var_IDs'] = var_IDs
+
+
+def run_worker(time_indices):
+    """!
+    @brief Compute the 2D values of a range of frames in a worker process
+    @param time_indices <[int]>: indices of the frames (0-based)
+    @return <numpy 3D-array>: values with shape (number of frames, number of variables, number of 2D nodes)
+    """
+    args = _worker_args['args']
+    with Serafin.Read(args.in_slf, args.lang) as resin:
+        resin.header = _worker_args['header']
+        vertical_calculator = vertical_calculator_from_args(args, resin, resin.header.copy_as_2d())
+        return frames_3d_to_2d(args, resin, vertical_calculator, _worker_args['var_IDs'], time_indices)
+
+
 def slf_3d_to_2d(args):
     with Serafin.Read(args.in_slf, args.lang) as resin:
         resin.read_header()
@@ -31,6 +96,10 @@ def slf_3d_to_2d(args):
                 logger.critical('Layer has to be in [1, %i]' % upper_plane)
                 sys.exit(1)
 
+        if args.batch < 1 or args.jobs < 1:
+            logger.critical('Arguments `--batch` and `--jobs` have to be strictly positive.')
+            sys.exit(1)
+
         output_header = resin.header.copy_as_2d()
         # Shift mesh coordinates if necessary
         if args.shift:
@@ -47,33 +116,34 @@ def slf_3d_to_2d(args):
             else:
                 logger.warn('Input file is already single precision! Argument `--to_single_precision` is ignored')
 
-        if args.aggregation is not None:
-            if args.aggregation == 'max':
-                operation_type = operations.MAX
-            elif args.aggregation == 'min':
-                operation_type = operations.MIN
-            else:  # args.aggregation == 'mean'
-                 operation_type = operations.MEAN
-            selected_vars = [var for var in output_header.iter_on_all_variables()]
-            vertical_calculator = operations.VerticalMaxMinMeanCalculator(operation_type, resin, output_header,
-                                                                          selected_vars, args.vars)
+        vertical_calculator = vertical_calculator_from_args(args, resin, output_header)
+        if vertical_calculator is not None:
             output_header.set_variables(vertical_calculator.get_variables())  # sort variables
 
         # Add some elevation variables
         for var_ID in args.vars:
             output_header.add_variable_from_ID(var_ID)
 
+        # Split frames into ranges processed at once
+        time_ranges = [list(range(start, min(start + args.batch, len(resin.time))))
+                       for start in range(0, len(resin.time), args.batch)]
+
         with Serafin.Write(args.out_slf, args.lang, overwrite=args.force) as resout:
             resout.write_header(output_header)
 
-            vars_2d = np.empty((output_header.nb_var, output_header.nb_nodes_2d), dtype=output_header.np_float_type)
-            for time_index, time in enumerate(tqdm(resin.time, unit='frame')):
-                if args.aggregation is not None:
-                    vars_2d = vertical_calculator.max_min_mean_in_frame(time_index)
-                else:
-                    for i, var in enumerate(output_header.var_IDs):
-                        vars_2d[i, :] = resin.read_var_in_frame_as_3d(time_index, var)[args.layer - 1, :]
-                resout.write_entire_frame(output_header, time, vars_2d)
+            if args.jobs > 1:
+                with Pool(args.jobs, initializer=init_worker,
+                          initargs=(args, resin.header, output_header.var_IDs)) as pool:
+                    results = pool.imap(run_worker, time_ranges)
+                    for time_indices, vars_2d in zip(tqdm(time_ranges, unit='batch'), results):
+                        for time_index, values in zip(time_indices, vars_2d):
+                            resout.write_entire_frame(output_header, resin.time[time_index], values)
+            else:
+                for time_indices in tqdm(time_ranges, unit='batch'):
+                    vars_2d = frames_3d_to_2d(args, resin, vertical_calculator, output_header.var_IDs,
+                                              time_indices)
+                    for time_index, values in zip(time_indices, vars_2d):
+                        resout.write_entire_frame(output_header, resin.time[time_index], values)
 
 
 parser = PyTelToolsArgParse(description=__doc__, add_args=['in_slf', 'out_slf', 'shift'])
@@ -81,6 +151,9 @@ group = parser.add_mutually_exclusive_group(required=True)
 group.add_argument('--layer', help='layer number (1=lower, nb_planes=upper)', type=int, metavar=1)
 group.add_argument('--aggregation', help='operation over the vertical', choices=('max', 'min', 'mean'))
 parser.add_argument('--vars', nargs='+', help='variable(s) deduced from Z', default=[], choices=('B', 'S', 'H'))
+parser.add_argument('--batch', type=int, help='number of frames processed at once', default=4)
+parser.add_argument('--jobs', type=int, help='number of processes computing frame ranges in parallel',
+                    default=1, metavar=settings.NCSIZE)
 parser.add_group_general(['force', 'verbose'])
 
 
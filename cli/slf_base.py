@@ -11,7 +11,7 @@ from tqdm import tqdm
 
 from pyteltools.geom.transformation import Transformation
 from pyteltools.slf import Serafin
-from pyteltools.slf.variables import do_calculations_in_frame, get_necessary_equations
+from pyteltools.slf.variables import get_equation_plan
 from pyteltools.slf.variable.variables_2d import FRICTION_LAWS, get_US_equation, STRICKLER_ID
 from pyteltools.utils.cli import logger, PyTelToolsArgParse
 
@@ -53,18 +53,27 @@ def slf_base(args):
                 else:
                     output_header.add_variable_from_ID(var_ID)
 
+        if args.batch < 1:
+            logger.critical('Argument `--batch` has to be strictly positive.')
+            sys.exit(1)
+
         us_equation = get_US_equation(args.friction_law)
-        necessary_equations = get_necessary_equations(resin.header.var_IDs, output_header.var_IDs,
-                                                      is_2d=resin.header.is_2d, us_equation=us_equation)
+        equation_plan = get_equation_plan(resin.header.var_IDs, output_header.var_IDs, resin.header.is_2d,
+                                          output_header.np_float_type, us_equation=us_equation)
+
+        # Split frames into ranges processed at once
+        frames = resin.subset_time(args.start, args.end, args.ech)
+        frame_ranges = [frames[start:start + args.batch] for start in range(0, len(frames), args.batch)]
 
         with Serafin.Write(args.out_slf, args.lang, overwrite=args.force) as resout:
             resout.write_header(output_header)
 
-            for time_index, time in tqdm(resin.subset_time(args.start, args.end, args.ech), unit='frame'):
-                values = do_calculations_in_frame(necessary_equations, resin, time_index, output_header.var_IDs,
-                                                  output_header.np_float_type, is_2d=output_header.is_2d,
-                                                  us_equation=us_equation, ori_values={})
-                resout.write_entire_frame(output_header, time, values)
+            with tqdm(total=len(frames), unit='frame') as pbar:
+                for frame_range in frame_ranges:
+                    values = equation_plan.evaluate_block(resin, [time_index for time_index, _ in frame_range])
+                    for (_, time), frame_values in zip(frame_range, values):
+                        resout.write_entire_frame(output_header, time, frame_values)
+                    pbar.update(len(frame_range))
 
 
 parser = PyTelToolsArgParse(description=__doc__, add_args=['in_slf', 'out_slf', 'shift'])
@@ -81,6 +90,7 @@ group_temp = parser.add_argument_group('Temporal operations (optional)')
 group_temp.add_argument('--ech', type=int, help='frequency sampling of input', default=1)
 group_temp.add_argument('--start', type=float, help='minimum time (in seconds)', default=-float('inf'))
 group_temp.add_argument('--end', type=float, help='maximum time (in seconds)', default=float('inf'))
+group_temp.add_argument('--batch', type=int, help='number of frames processed at once', default=4)
 
 parser.add_group_general(['force', 'verbose'])
 
@@ -10,14 +10,14 @@ Outputs:
 import csv
 import numpy as np
 from shapefile import ShapefileException
-from shapely.geometry import Point
 import sys
 from tqdm import tqdm
 
 from pyteltools.geom import Shapefile
+from pyteltools.geom.geometry import label_points_in_polygons
 from pyteltools.slf import Serafin
-from pyteltools.slf.variables import do_calculations_in_frame, get_necessary_equations
-from pyteltools.slf.variable.variables_2d import FRICTION_LAWS, STRICKLER_ID
+from pyteltools.slf.variables import get_equation_plan
+from pyteltools.slf.variable.variables_2d import FRICTION_LAWS, get_US_equation, STRICKLER_ID
 from pyteltools.slf.volume import VolumeCalculator
 from pyteltools.utils.cli import logger, PyTelToolsArgParse
 
@@ -87,25 +87,21 @@ def slf_bottom_friction(args):
 
             logger.debug('Recomputing friction coefficient values from zones')
             friction_coeff = np.full(resin.header.nb_nodes_2d, 0.0)  # default value for nodes not included in any zone
-            for i, (x, y) in enumerate(zip(tqdm(resin.header.x), tqdm(resin.header.y))):
-                point = Point(x, y)
-                for zone in strickler_zones:
-                    if zone.contains(point):
-                        friction_coeff[i] = zone.attributes()[index_attr]
-                        exit
+            labels = label_points_in_polygons(strickler_zones, resin.header.x, resin.header.y)
+            for index, zone in enumerate(strickler_zones):
+                friction_coeff[labels == index + 1] = zone.attributes()[index_attr]
             in_varIDs.append('W')
             ori_values['W'] = friction_coeff
         else:
-            if 'W' not in resin.header.varIDs:
+            if 'W' not in resin.header.var_IDs:
                 logger.critical('The variable W is missing.')
                 sys.exit(1)
 
-        us_equation = None
-        if args.friction_law:
-            us_equation = get_US_equation(args.friction_law)
+        us_equation = get_US_equation(args.friction_law)
 
         resin.get_time()
-        necessary_equations = get_necessary_equations(in_varIDs, out_varIDs, is_2d=True, us_equation=us_equation)
+        equation_plan = get_equation_plan(in_varIDs, out_varIDs, True, resin.header.np_float_type,
+                                          us_equation=us_equation, constant_var_IDs=ori_values.keys())
 
         calculator = VolumeCalculator(VolumeCalculator.NET, 'TAU', None, resin, names, polygons, 1)
         calculator.construct_triangles(tqdm)
@@ -125,9 +121,7 @@ def slf_bottom_friction(args):
                 csvwriter.writerow(['time'] + names)
 
                 for time_index, time in enumerate(tqdm(resin.time)):
-                    values = do_calculations_in_frame(necessary_equations, resin, time_index, out_varIDs,
-                                                      resin.header.np_float_type, is_2d=True,
-                                                      us_equation=STRICKLER_EQUATION, ori_values=ori_values)
+                    values = equation_plan.evaluate(resin, time_index, ori_values)
                     resout.write_entire_frame(output_header, time, values)
 
                     row = [time]
@@ -144,8 +138,8 @@ parser.add_argument('in_polygons', help='polygons file (*.shp)')
 parser.add_argument('--in_strickler_zones', help='strickler zones file (*.shp)')
 parser.add_argument('--in_strickler_attr', help='attribute to read strickler values `--in_stricker_zone`')
 help_friction_laws = ', '.join(['%i=%s' %(i, law) for i, law in enumerate(FRICTION_LAWS)])
-group_var.add_argument('--friction_law', type=int, help='friction law identifier: %s' % help_friction_laws,
-                       choices=range(len(FRICTION_LAWS)), default=STRICKLER_ID)
+parser.add_argument('--friction_law', type=int, help='friction law identifier: %s' % help_friction_laws,
+                    choices=range(len(FRICTION_LAWS)), default=STRICKLER_ID)
 parser.add_group_general(['force', 'verbose'])
 
 
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+Compare test runs to a reference run (2D Serafin files with identical meshes)
+
+For every frame of every test file, the differences with a frame of the reference file are measured by:
+- MSD (mean signed deviation)
+- MAD (mean absolute deviation)
+- RMSD (root mean square deviation)
+- BSS (Brier skill score, with respect to an initial state of the test file)
+
+Example: slf_compare.py ref.slf test1.slf test2.slf --var H --out_csv errors.csv
+"""
+
+from shapefile import ShapefileException
+import sys
+
+from pyteltools.conf import settings
+from pyteltools.geom import BlueKenue, Shapefile
+from pyteltools.slf import Serafin
+from pyteltools.slf.comparison import compare_files, ERROR_MEASURES
+from pyteltools.utils.cli import logger, PyTelToolsArgParse
+
+
+def slf_compare(args):
+    # Read the comparison region
+    polygon = None
+    if args.in_polygons is not None:
+        polygons = []
+        if args.in_polygons.endswith('.i2s'):
+            with BlueKenue.Read(args.in_polygons) as f:
+                f.read_header()
+                for poly in f.get_polygons():
+                    polygons.append(poly)
+        elif args.in_polygons.endswith('.shp'):
+            try:
+                for poly in Shapefile.get_polygons(args.in_polygons):
+                    polygons.append(poly)
+            except ShapefileException as e:
+                logger.error(e)
+                sys.exit(3)
+        else:
+            logger.error('File "%s" is not a i2s or shp file.' % args.in_polygons)
+            sys.exit(2)
+        if not polygons:
+            logger.error('The file does not contain any polygon.')
+            sys.exit(1)
+        if len(polygons) > 1:
+            logger.warning('The file contains {} polygons, only the first one is used.'.format(len(polygons)))
+        polygon = polygons[0]
+
+    results = compare_files(args.in_slf, args.in_test_slf, args.var, args.ref_frame, args.init_frame, polygon,
+                            args.lang, args.ncsize)
+
+    # Write CSV (one line per test file and frame)
+    mode = 'w' if args.force else 'x'
+    with open(args.out_csv, mode) as out_csv:
+        out_csv.write(args.sep.join(['file', 'time'] + ERROR_MEASURES))
+        out_csv.write('\n')
+        for test_name, (times, measures) in zip(args.in_test_slf, results):
+            for time, frame_measures in zip(times, measures):
+                out_csv.write(args.sep.join([test_name, str(time)] +
+                                            [settings.FMT_FLOAT.format(value) for value in frame_measures]))
+                out_csv.write('\n')
+
+
+parser = PyTelToolsArgParse(description=__doc__, add_args=['in_slf'])
+parser.add_argument('in_test_slf', help='Serafin test filenames', nargs='+')
+parser.add_argument('--var', help='variable to compare', metavar='VAR', required=True)
+parser.add_argument('--ref_frame', type=int, help='index of the reference frame (-1 for the last one)', default=-1)
+parser.add_argument('--init_frame', type=int, help='index of the initial state frame of the test files (for BSS)',
+                    default=0)
+parser.add_argument('--in_polygons', help='comparison region (first polygon of a *.shp or *.i2s file), '
+                                          'entire mesh by default')
+parser.add_argument('--ncsize', type=int, help='number of test files compared at the same time',
+                    default=settings.NCSIZE)
+
+parser.add_known_argument('out_csv', as_option=True)  # the test filenames are variable in number
+parser.add_group_general(['force', 'verbose'])
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+
+    try:
+        slf_compare(args)
+    except (Serafin.SerafinRequestError, Serafin.SerafinValidationError):
+        # Message is already reported by slf logger
+        sys.exit(1)
+    except FileNotFoundError as e:
+        logger.error('Input file %s not found.' % e.filename)
+        sys.exit(3)
+    except FileExistsError as e:
+        logger.error('Output file %s already exists. Remove it or add `--force` argument' % e.filename)
+        sys.exit(3)
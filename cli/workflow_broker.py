@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+"""
+Run a broker distributing the tasks of workflow projects (Multi tab) to remote workers
+"""
+
+from pyteltools.conf import settings
+from pyteltools.utils.cli import PyTelToolsArgParse
+from pyteltools.workflow.broker import parse_address, serve_broker
+
+
+def workflow_broker(args):
+    serve_broker(parse_address(args.address), args.authkey)
+
+
+parser = PyTelToolsArgParse(description=__doc__)
+parser.add_argument('--address', help='address (host:port) to listen to', default='localhost:50000')
+parser.add_argument('--authkey', help='authentication key of the broker (generated and displayed if empty)',
+                    default=settings.MULTI_BROKER_AUTHKEY)
+parser.add_group_general(['verbose'])
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    try:
+        workflow_broker(args)
+    except KeyboardInterrupt:
+        pass
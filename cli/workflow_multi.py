@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""
+Run a workflow project (Multi tab) without graphical interface
+"""
+
+import sys
+
+from pyteltools.conf import settings
+from pyteltools.utils.cli import logger, PyTelToolsArgParse
+from pyteltools.workflow.broker import BrokerExecutor, parse_address
+from pyteltools.workflow.journal import open_journal
+from pyteltools.workflow.multi_headless import HeadlessMultiProject, HeadlessMultiRunner
+from pyteltools.workflow.profiling import new_profiler
+
+
+def workflow_multi(args):
+    project = HeadlessMultiProject()
+    if not project.load(args.in_project):
+        logger.critical('Could not load the project: %s' % args.in_project)
+        sys.exit(1)
+    executor = None
+    if args.broker:
+        address = parse_address(args.broker)
+        executor = lambda: BrokerExecutor(address, args.authkey)
+    profiler = None
+    if args.profile:
+        profiler = new_profiler(args.profile, {node_index: node.name() for node_index, node in project.nodes.items()},
+                                project.job_ids, args.cprofile)
+    journal = None
+    if not args.no_resume:
+        journal = open_journal(args.in_project, project.inputs, project.auxiliary_filenames())
+        if journal is not None and journal.results:
+            logger.info('Resuming previous run: %i tasks already done' % len(journal.results))
+    success = HeadlessMultiRunner(project, args.ncsize, executor=executor, profiler=profiler, journal=journal).run()
+    if journal is not None:
+        journal.close(completed=success)
+    if profiler is not None:
+        profiler.write(args.profile)
+        logger.info('Profiling results written to %s' % args.profile)
+    if not success:
+        logger.error('Some tasks of the project failed.')
+        sys.exit(1)
+
+
+parser = PyTelToolsArgParse(description=__doc__)
+parser.add_argument('in_project', help='workflow project file')
+parser.add_argument('--ncsize', type=int, help='number of tasks running at the same time', default=settings.NCSIZE)
+parser.add_argument('--broker', help='address (host:port) of a broker to run the tasks on remote workers',
+                    default=settings.MULTI_BROKER)
+parser.add_argument('--authkey', help='authentication key of the broker', default=settings.MULTI_BROKER_AUTHKEY)
+parser.add_argument('--profile', help='folder to write the execution timeline (trace.json) and the measures of the '
+                                      'tasks (tasks.csv, nodes.csv)', default='')
+parser.add_argument('--cprofile', help='dump the cProfile statistics of every node (requires --profile)',
+                    action='store_true')
+parser.add_argument('--no_resume', help='run all the tasks even if a previous run was interrupted (ignore the '
+                                         'journal of the completed tasks)', action='store_true')
+parser.add_group_general(['verbose'])
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    if args.ncsize < 1:
+        logger.critical('Number of processes has to be strictly positive')
+        sys.exit(2)
+    if args.broker and not args.authkey:
+        logger.critical('The authentication key of the broker is required (argument `--authkey`)')
+        sys.exit(2)
+    workflow_multi(args)
@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+"""
+Run workers executing the tasks of a workflow broker (input and output files have to be on shared storage)
+"""
+
+import sys
+
+from pyteltools.conf import settings
+from pyteltools.utils.cli import logger, PyTelToolsArgParse
+from pyteltools.workflow.broker import parse_address, run_workers
+
+
+def workflow_worker(args):
+    run_workers(parse_address(args.broker), args.nb_processes, args.authkey)
+
+
+parser = PyTelToolsArgParse(description=__doc__)
+parser.add_argument('broker', help='address (host:port) of the broker')
+parser.add_argument('--nb_processes', type=int, help='number of worker processes', default=settings.NCSIZE)
+parser.add_argument('--authkey', help='authentication key of the broker', default=settings.MULTI_BROKER_AUTHKEY)
+parser.add_group_general(['verbose'])
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    if args.nb_processes < 1:
+        logger.critical('Number of processes has to be strictly positive')
+        sys.exit(2)
+    if not args.authkey:
+        logger.critical('The authentication key of the broker is required (argument `--authkey`)')
+        sys.exit(2)
+    workflow_worker(args)
@@ -1,6 +1,7 @@
 from collections import OrderedDict
 import logging
 from multiprocessing import cpu_count
+import os
 
 
 # ~> GENERAL CONFIGURATION
@@ -19,6 +20,58 @@ COLOR_LOGS = True
 # CPU Cores for parallel computation (workflow multi-folder view)
 NCSIZE = cpu_count()
 
+# Number of nodes running at the same time in background threads (workflow mono view)
+MONO_NB_THREADS = cpu_count()
+
+# Minimum number of nodes per process when a computation on a single mesh is split by node ranges
+# (e.g. arrival/duration on very large meshes in the workflow multi-folder view)
+MIN_NODES_PER_PROCESS = 1000000
+
+# Maximum number of frames cached when several sinks share the same Serafin input and read it in a single pass
+# (workflow multi-folder view)
+FUSED_SINKS_WINDOW = 8
+
+# Memory budget (in bytes) and maximum number of tasks building a mesh index running at the same time
+# (workflow multi-folder view, 0 for half of the physical memory and half of NCSIZE)
+MULTI_MEMORY_BUDGET = 0
+MULTI_MAX_HEAVY_TASKS = 0
+
+# Address ('host:port') of a broker to run the tasks on remote workers (workflow multi-folder view, empty to use
+# local processes) and its authentication key (required by the clients and the workers, the broker generates one for
+# its session if it is empty)
+MULTI_BROKER = ''
+MULTI_BROKER_AUTHKEY = ''
+
+# Interval (in seconds) between the heartbeats of a remote worker running a task and timeout (in seconds, 0 to wait
+# forever) after which a task fails if its remote worker stopped sending them (e.g. the worker died)
+MULTI_BROKER_HEARTBEAT = 5
+MULTI_BROKER_WORKER_TIMEOUT = 60
+# Timeout (in seconds, 0 to wait forever) after which the tasks waiting in the broker fail if no worker picked up any
+# task of the client meanwhile (e.g. no worker is connected)
+MULTI_BROKER_PICKUP_TIMEOUT = 300
+
+# Folder to write the execution timeline and the measures of the tasks of every run (workflow multi-folder view,
+# empty to disable) and dump the cProfile statistics of every node
+MULTI_PROFILE_FOLDER = ''
+MULTI_PROFILE_CPROFILE = False
+
+# Fault tolerance of the workflow multi-folder view: interval (in seconds) between health checks of the workers,
+# timeout of a task (in seconds, 0 for no timeout), maximum number of retries of a failed task and delay before the
+# first retry (in seconds, doubled at every retry)
+MULTI_HEALTH_CHECK_INTERVAL = 1
+MULTI_TASK_TIMEOUT = 0
+MULTI_MAX_RETRIES = 2
+MULTI_RETRY_DELAY = 2
+
+# Resume an interrupted run of the workflow multi-folder view from the journal of its completed tasks (file
+# `<project>.journal`, removed at the end of a run without failures)
+MULTI_RESUME = True
+
+# Folder and maximum size (in bytes) of the cache of workflow node results (disabled by default, set a positive size
+# such as 2 * 1024 ** 3 to enable it)
+RESULT_CACHE_FOLDER = os.path.join(os.path.expanduser('~'), '.pyteltools', 'cache')
+RESULT_CACHE_SIZE = 0
+
 # Path to ArGIS Python executable (for `outil_carto.py`)
 PY_ARCGIS = 'C:\\Python27\\ArcGIS10.5\\python.exe'
 
@@ -47,6 +100,13 @@ CSV_SEPARATOR = ';'
 # Write XYZ header
 WRITE_XYZ_HEADER = True
 
+# Format of the VTK files written by the workflow nodes:
+# 'vtu' (binary XML files indexed by a .pvd time collection) or 'vtk' (legacy ASCII files)
+VTK_FORMAT = 'vtu'
+
+# Number of threads writing the frames of a VTU collection in parallel (1 to write them sequentially)
+VTU_NB_THREADS = min(4, cpu_count())
+
 # ~> VISUALIZATION
 
 # Figure size (in inches)
@@ -67,6 +127,17 @@ SCENE_SIZE = (2400, 1000)
 # Number of color levels to plot
 NB_COLOR_LEVELS = 512
 
+# Maximal number of mesh elements drawn in detail on a map (edges, shaded elements)
+## Beyond, the scalar maps are rasterized at the resolution of the viewport
+## and the edges are only drawn once zoomed in on fewer elements
+MAP_MAX_DETAILED_ELEMENTS = 100000
+
+# Number of frames kept in memory by the scalar and vector map viewers
+MAP_FRAME_CACHE_SIZE = 16
+
+# Number of frames read in advance (before and after the current frame) by the map viewers
+MAP_PREFETCH_FRAMES = 2
+
 # Color style
 ## Discrete color map (loop over the list if more are required)
 DEFAULT_COLORS = OrderedDict([('Blue', '#1f77b4'), ('Orange', '#ff7f0e'), ('Green', '#2ca02c'), ('Red', '#d62728'),
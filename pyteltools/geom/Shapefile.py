@@ -2,6 +2,8 @@
 Read and write .shp files
 """
 
+import datetime
+from itertools import chain
 import numpy as np
 import os
 import shapefile
@@ -124,13 +126,8 @@ def get_points(input_filename, indices=None, with_z=False):
 
 
 def write_bk_points(output_filename, z_name, points):
-    w = shapefile.Writer(shapefile.POINTZ)
-    w.field(z_name, 'N', decimal=6)
-
-    for (x, y, z) in points:
-        w.point(x, y, z, shapeType=shapefile.POINTZ)
-        w.record(z)
-    w.save(output_filename)
+    points = np.array(points, dtype=np.float64).reshape(-1, 3)
+    write_points(output_filename, points[:, 0], points[:, 1], [(z_name, points[:, 2])], z=points[:, 2], decimal=6)
 
 
 def write_bk_lines(output_filename, shape_type, lines, attribute_name, m_array=None):
@@ -152,6 +149,88 @@ def write_bk_lines(output_filename, shape_type, lines, attribute_name, m_array=N
     w.save(output_filename)
 
 
+def _shp_header(shape_type, file_length, bbox, zbox):
+    """!
+    @brief Header of a .shp or a .shx file
+    @param shape_type <int>: shape type
+    @param file_length <int>: file length (in bytes)
+    @param bbox <[float]>: bounding box (xmin, ymin, xmax, ymax)
+    @param zbox <[float]>: elevation extremes (zmin, zmax)
+    @return <bytes>: 100 bytes header
+    """
+    return pack('>6ii', 9994, 0, 0, 0, 0, 0, file_length // 2) + pack('<2i', 1000, shape_type) \
+        + pack('<4d', *bbox) + pack('<4d', zbox[0], zbox[1], 0, 0)
+
+
+def write_points(output_filename, x, y, fields, z=None, decimal=4, size=50, chunk_size=100000):
+    """!
+    @brief Write points and their numeric attributes as a POINT (or POINTZ) shapefile
+    The .shp, .shx and .dbf records are built as packed arrays instead of one Writer call per point.
+    @param output_filename <str>: path to the output shapefile (the .shx and .dbf files are written next to it)
+    @param x <numpy.1D-array>: x coordinates
+    @param y <numpy.1D-array>: y coordinates
+    @param fields <[(str, numpy.1D-array)]>: name and values of every numeric attribute
+    @param z <numpy.1D-array>: z coordinates (the shape type is POINTZ if they are given)
+    @param decimal <int>: number of decimals of the attributes
+    @param size <int>: width of the attributes (in characters)
+    @param chunk_size <int>: number of records formatted at once in the .dbf file
+    """
+    nb_points = len(x)
+    root = os.path.splitext(output_filename)[0]
+
+    # shp and shx files
+    record_dtype = [('number', '>i4'), ('length', '>i4'), ('type', '<i4'), ('x', '<f8'), ('y', '<f8')]
+    if z is None:
+        shape_type = shapefile.POINT
+    else:
+        shape_type = shapefile.POINTZ
+        record_dtype += [('z', '<f8'), ('m', '<f8')]
+    records = np.zeros(nb_points, dtype=record_dtype)
+    record_size = records.dtype.itemsize
+    records['number'] = np.arange(1, nb_points + 1)
+    records['length'] = (record_size - 8) // 2
+    records['type'] = shape_type
+    records['x'], records['y'] = x, y
+    if nb_points > 0:
+        bbox = [records['x'].min(), records['y'].min(), records['x'].max(), records['y'].max()]
+    else:
+        bbox = [0] * 4
+    zbox = [0, 0]
+    if z is not None:
+        records['z'] = z
+        if nb_points > 0:
+            zbox = [records['z'].min(), records['z'].max()]
+
+    index = np.zeros(nb_points, dtype=[('offset', '>i4'), ('length', '>i4')])
+    index['offset'] = (100 + np.arange(nb_points) * record_size) // 2
+    index['length'] = records['length']
+
+    with open(root + '.shp', 'wb') as f:
+        f.write(_shp_header(shape_type, 100 + records.nbytes, bbox, zbox))
+        f.write(records.tobytes())
+    with open(root + '.shx', 'wb') as f:
+        f.write(_shp_header(shape_type, 100 + index.nbytes, bbox, zbox))
+        f.write(index.tobytes())
+
+    # dbf file
+    today = datetime.date.today()
+    header_length = 32 * (len(fields) + 1) + 1
+    with open(root + '.dbf', 'wb') as f:
+        f.write(pack('<4BI2H20x', 3, today.year - 1900, today.month, today.day, nb_points, header_length,
+                     1 + size * len(fields)))
+        for name, _ in fields:
+            name = name.replace(' ', '_').encode('latin-1', 'replace')[:10]
+            f.write(pack('<11sc4xBB14x', name, b'N', size, decimal))
+        f.write(b'\r')
+        record_fmt = ' ' + ('{:>%d.%df}' % (size, decimal)) * len(fields)
+        for start in range(0, nb_points, chunk_size):
+            columns = [values[start:start+chunk_size].tolist() for _, values in fields]
+            nb_records = min(chunk_size, nb_points - start)
+            text = (record_fmt * nb_records).format(*chain.from_iterable(zip(*columns)))
+            f.write(text.encode('latin-1'))
+        f.write(b'\x1a')
+
+
 class MyWriter(shapefile.Writer):
     """!
     This is a reimplementation of Writer class of pyshp 1.2.11
@@ -48,10 +48,10 @@ class PointFileConverter(GeomFileConverter):
         """
         if not self.transformations:
             return shapes
-        transformed_points = shapes[:]
+        transformed_points = np.array(shapes, dtype=np.float64).reshape(-1, 3)
         for t in self.transformations:
-            transformed_points = [t(p) for p in transformed_points]
-        return transformed_points
+            transformed_points = t.apply(transformed_points)
+        return list(transformed_points)
 
 
 class LineFileConverter(GeomFileConverter):
@@ -674,12 +674,12 @@ class ShpMultiPointConverter(GeomFileConverter):
         @param shape <[numpy 2D-array]>: original shapes
         @return transformed_points <[numpy 2D-array]>: transformed shapes
         """
-        if not self.transformations:
+        if not self.transformations or not shapes:
             return shapes
-        transformed_points = shapes[:]
+        transformed_points = np.vstack(shapes)
         for t in self.transformations:
-            transformed_points = [np.reshape([t(p) for p in points], points.shape) for points in transformed_points]
-        return transformed_points
+            transformed_points = t.apply(transformed_points)
+        return np.split(transformed_points, np.cumsum([len(points) for points in shapes[:-1]]))
 
     def read(self):
         self.fields = shp.get_all_fields(self.from_file)
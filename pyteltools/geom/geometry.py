@@ -2,6 +2,7 @@
 Geometrical objects
 """
 
+from matplotlib.path import Path
 import numpy as np
 from shapely.geometry import Point, MultiPolygon, LineString as OpenPolyline, Polygon as ClosedPolyline
 
@@ -92,6 +93,22 @@ class Polyline:
     def contains(self, item):
         return self._polyline.contains(item)
 
+    def contains_points(self, x, y):
+        """!
+        @brief Vectorized point-in-polygon test (only for closed polylines)
+        @param x <numpy.1D-array>: east coordinates of the points
+        @param y <numpy.1D-array>: north coordinates of the points
+        @return <numpy.1D-array>: boolean mask of points strictly inside the polygon
+        """
+        x, y = np.asarray(x), np.asarray(y)
+        inside = np.zeros(x.shape, dtype=bool)
+        xmin, ymin, xmax, ymax = self.bounds()
+        in_bbox = np.flatnonzero((x > xmin) & (x < xmax) & (y > ymin) & (y < ymax))
+        if in_bbox.size > 0:
+            path = Path(np.array(self.coords())[:, :2])
+            inside[in_bbox] = path.contains_points(np.column_stack((x[in_bbox], y[in_bbox])))
+        return inside
+
     def bounds(self):
         return self._polyline.bounds
 
@@ -105,6 +122,8 @@ class Polyline:
         @return <bool, shapely.geometry.Polygon or shapely.geometry.Multipolygon>: The intersection with the triangle
         """
         inter = self._polyline.intersection(triangle)
+        if inter.is_empty:
+            return False, None
         if inter.geom_type == 'Polygon' or inter.geom_type == 'MultiPolygon':
             return True, inter
         elif inter.geom_type == 'GeometryCollection':
@@ -153,7 +172,7 @@ class Polyline:
             new_coords = np.hstack((new_coords, np.zeros((self.nb_points(), 1))))
 
         for t in transformations:
-            new_coords = np.apply_along_axis(t, 1, new_coords)
+            new_coords = t.apply(new_coords)
         if self.is_2d():
             new_coords = new_coords[:, :2]
 
@@ -189,3 +208,17 @@ class Polyline:
             new_coords.append(second_point)
             new_m.append(second_m)
         return Polyline(new_coords, self.attributes(), m_array=new_m)
+
+
+def label_points_in_polygons(polygons, x, y):
+    """!
+    @brief Label each point with the polygon containing it (the last one wins if polygons overlap)
+    @param polygons <[geom.geometry.Polyline]>: list of closed polylines
+    @param x <numpy.1D-array>: east coordinates of the points
+    @param y <numpy.1D-array>: north coordinates of the points
+    @return <numpy.1D-array>: 1-based polygon index for each point (0 if it is outside all polygons)
+    """
+    labels = np.zeros(len(x), dtype=int)
+    for index, poly in enumerate(polygons):
+        labels[poly.contains_points(x, y)] = index + 1
+    return labels
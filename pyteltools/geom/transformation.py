@@ -15,6 +15,8 @@ class Transformation:
         self.rotation = Rotation(angle)
         self.scaling = Scaling(horizontal_factor, vertical_factor)
         self.translation = Translation(dx, dy, dz)
+        ## Linear part of the transformation (scaling of the rotation) <numpy.2D-array>
+        self.matrix = self.scaling.vector[:, np.newaxis] * self.rotation.rotation_matrix
 
     def __repr__(self):
         return ' '.join(map(str, [self.rotation.angle, self.scaling.horizontal_factor, self.scaling.vertical_factor,
@@ -23,6 +25,24 @@ class Transformation:
     def __call__(self, coordinates):
         return self.translation.vector + self.scaling.vector * self.rotation.rotation_matrix.dot(coordinates)
 
+    def apply(self, coordinates):
+        """!
+        @brief Transform a batch of points with a single matrix product
+        @param coordinates <numpy.2D-array>: coordinates of the points (shape = (N, 3))
+        @return <numpy.2D-array>: transformed coordinates (shape = (N, 3))
+        """
+        return np.dot(coordinates, self.matrix.T) + self.translation.vector
+
+    def affine_matrix(self):
+        """!
+        @brief Affine matrix of the transformation in homogeneous coordinates
+        @return <numpy.2D-array>: matrix of shape (4, 4)
+        """
+        affine = np.identity(4)
+        affine[:3, :3] = self.matrix
+        affine[:3, 3] = self.translation.vector
+        return affine
+
     def __str__(self):
         return '\n'.join(['Rotation:\t%.4f (rad)' % self.rotation.angle,
                           'Scaling:\tXY %.4f \tZ %.4f ' %
@@ -93,6 +113,24 @@ class Translation:
 IDENTITY = Transformation(0, 1, 1, 0, 0, 0)
 
 
+def compose(transformations):
+    """!
+    @brief Single transformation equivalent to successive transformations
+    The rotations around z axis commute with the scalings (which have equal factors along x and y),
+    so the composition of transformations is also a transformation
+    @param transformations <[Transformation]>: list of successive transformations
+    @return <Transformation>: the composed transformation
+    """
+    angle, horizontal_factor, vertical_factor = 0, 1, 1
+    translation = np.zeros(3)
+    for transformation in transformations:
+        angle += transformation.rotation.angle
+        horizontal_factor *= transformation.scaling.horizontal_factor
+        vertical_factor *= transformation.scaling.vertical_factor
+        translation = transformation(translation)
+    return Transformation(angle, horizontal_factor, vertical_factor, *translation)
+
+
 class TransformationMap:
     """!
     @brief Transformations between multiple coordinate systems
@@ -142,12 +180,13 @@ class TransformationMap:
         @brief Get the series of transformations needed to transform coordinates in the first system to the second
         @param from_index <int>: the index of the first coordinate system
         @param to_index <int>: the index of the second coordinate system
-        @return <[Transformation]>: the list of transformations from the first system to the second
+        @return <[Transformation]>: the transformations from the first system to the second (the transformations along
+            the path between the two systems are composed in a single one)
         """
         if from_index == to_index:
             return [IDENTITY]
         path = self._path(from_index, to_index)
-        return [self.transformations[i, j] for i, j in path]
+        return [compose(self.transformations[i, j] for i, j in path)]
 
 
 def transformation_optimization(from_points, to_points, ignore_z):
@@ -7,7 +7,7 @@ import sys
 
 from pyteltools.conf import settings
 from pyteltools.slf import Serafin
-from pyteltools.slf.variables import get_available_variables, do_calculations_in_frame, get_necessary_equations, \
+from pyteltools.slf.variables import EquationPlan, get_available_variables, get_necessary_equations, \
     get_US_equation, new_variables_from_US
 
 from .util import DoubleSliderBox, FrictionLawMessage, OutputProgressDialog, OutputThread, ProgressBarIterator, \
@@ -29,13 +29,12 @@ class ExtractVariablesThread(OutputThread):
 
     def run(self):
         iter_pbar = ProgressBarIterator.prepare(self.tick.emit, (5, 100))
+        equation_plan = EquationPlan(self.necessary_equations, self.output_header.var_IDs,
+                                     self.output_header.np_float_type, self.output_header.is_2d, self.us_equation)
         for time_index in iter_pbar(self.time_indices):
             if self.canceled:
                 return
-            values = do_calculations_in_frame(self.necessary_equations, self.input_stream, time_index,
-                                              self.output_header.var_IDs, self.output_header.np_float_type,
-                                              is_2d=self.output_header.is_2d, us_equation=self.us_equation,
-                                              ori_values={})
+            values = equation_plan.evaluate(self.input_stream, time_index)
 
             self.output_stream.write_entire_frame(self.output_header, self.input_stream.time[time_index], values)
 
@@ -49,6 +49,24 @@ class MaxMinMeanThread(OutputThread):
         return values
 
 
+class StatisticsThread(OutputThread):
+    def __init__(self, statistics, input_stream, selected_scalars, selected_vectors,
+                 time_indices, additional_equations):
+        super().__init__()
+        self.calculator = operations.StatisticsCalculator(statistics, input_stream, selected_scalars,
+                                                          selected_vectors, time_indices, additional_equations)
+        self.time_indices = time_indices
+        self.nb_frames = len(time_indices)
+
+    def run(self):
+        iter_pbar = ProgressBarIterator.prepare(self.tick.emit)
+        for time_index in iter_pbar(self.time_indices):
+            if self.canceled:
+                return []
+            self.calculator.statistics_in_frame(time_index)
+        return self.calculator.finishing_up()
+
+
 class ArrivalDurationThread(OutputThread):
     def __init__(self, input_stream, conditions, time_indices):
         super().__init__()
@@ -57,26 +75,16 @@ class ArrivalDurationThread(OutputThread):
         self.conditions = conditions
         self.nb_conditions = len(self.conditions)
         self.nb_frames = len(time_indices)
-        self.calculators = []
-
-        for i, condition in enumerate(self.conditions):
-            self.calculators.append(operations.ArrivalDurationCalculator(self.input_stream, self.time_indices,
-                                                                         condition))
+        self.calculator = operations.ArrivalDurationCalculator(self.input_stream, self.time_indices, self.conditions)
 
     def run(self):
         iter_pbar = ProgressBarIterator.prepare(self.tick.emit)
         for index in iter_pbar(self.time_indices[1:]):
             if self.canceled:
                 return []
+            self.calculator.arrival_duration_in_frame(index)
 
-            for calculator in self.calculators:
-                calculator.arrival_duration_in_frame(index)
-
-        values = np.empty((2*self.nb_conditions, self.input_stream.header.nb_nodes))
-        for i, calculator in enumerate(self.calculators):
-            values[2*i, :] = calculator.arrival
-            values[2*i+1, :] = calculator.duration
-        return values
+        return self.calculator.finishing_up()
 
 
 class SynchMaxThread(OutputThread):
@@ -213,16 +221,35 @@ class MaxMinMeanTab(QWidget):
         self.maxButton = QRadioButton('Max')
         self.minButton = QRadioButton('Min')
         meanButton = QRadioButton('Mean')
+        self.statisticsButton = QRadioButton('Several')
+        self.statisticsButton.setToolTip('Compute several statistics in a single pass')
 
         hlayout.addWidget(self.maxButton)
         hlayout.addWidget(self.minButton)
         hlayout.addWidget(meanButton)
+        hlayout.addWidget(self.statisticsButton)
 
         self.opBox.setLayout(hlayout)
         self.opBox.setMaximumHeight(80)
-        self.opBox.setMaximumWidth(200)
+        self.opBox.setMaximumWidth(280)
         self.maxButton.setChecked(True)
 
+        # create checkboxes for the selection of several statistics
+        self.statisticsBox = QGroupBox('Statistics')
+        hlayout = QHBoxLayout()
+        self.statisticsChecks = {}
+        for statistic in operations.TEMPORAL_STATISTICS:
+            self.statisticsChecks[statistic] = QCheckBox(statistic)
+            hlayout.addWidget(self.statisticsChecks[statistic])
+        hlayout.addWidget(QLabel('Percentiles (%)'))
+        self.percentilesText = QLineEdit()
+        self.percentilesText.setToolTip('Approximate percentiles separated by spaces (e.g. <b>10 50 90</b>)')
+        self.percentilesText.setMaximumWidth(120)
+        hlayout.addWidget(self.percentilesText)
+        self.statisticsBox.setLayout(hlayout)
+        self.statisticsBox.setMaximumHeight(80)
+        self.statisticsBox.setEnabled(False)
+
         # create a slider for time selection
         self.timeSlider = TimeRangeSlider()
         self.timeSlider.setFixedHeight(30)
@@ -293,6 +320,11 @@ class MaxMinMeanTab(QWidget):
         hlayout.addWidget(self.singlePrecisionBox)
         hlayout.addItem(QSpacerItem(50, 10))
         mainLayout.addLayout(hlayout)
+        hlayout = QHBoxLayout()
+        hlayout.addItem(QSpacerItem(50, 10))
+        hlayout.addWidget(self.statisticsBox)
+        hlayout.addItem(QSpacerItem(50, 10))
+        mainLayout.addLayout(hlayout)
         mainLayout.addItem(QSpacerItem(30, 15))
         mainLayout.addWidget(QLabel('   Message logs'))
         mainLayout.addWidget(self.logTextBox.widget)
@@ -300,6 +332,7 @@ class MaxMinMeanTab(QWidget):
 
     def _bindEvents(self):
         self.btnSubmit.clicked.connect(self.btnSubmitEvent)
+        self.statisticsButton.toggled.connect(self.statisticsBox.setEnabled)
         self.timeSelection.startIndex.editingFinished.connect(self.timeSlider.enterIndexEvent)
         self.timeSelection.endIndex.editingFinished.connect(self.timeSlider.enterIndexEvent)
         self.timeSelection.startValue.editingFinished.connect(self.timeSlider.enterValueEvent)
@@ -311,8 +344,17 @@ class MaxMinMeanTab(QWidget):
     def _getSelectedVariables(self):
         return self.secondTable.get_selected_all()
 
+    def _getSelectedStatistics(self):
+        statistics = [statistic for statistic in operations.TEMPORAL_STATISTICS
+                      if self.statisticsChecks[statistic].isChecked()]
+        statistics.extend(operations.parse_percentiles(self.percentilesText.text()))
+        return statistics
+
     def reset(self):
         self.maxButton.setChecked(True)
+        for box in self.statisticsChecks.values():
+            box.setChecked(False)
+        self.percentilesText.clear()
         self.firstTable.setRowCount(0)
         self.secondTable.setRowCount(0)
         self.timeSelection.disable()
@@ -355,6 +397,18 @@ class MaxMinMeanTab(QWidget):
                                  QMessageBox.Ok)
             return
 
+        statistics = []
+        if self.statisticsButton.isChecked():
+            try:
+                statistics = self._getSelectedStatistics()
+            except ValueError:
+                QMessageBox.critical(self, 'Error', 'Percentiles have to be numbers strictly between 0 and 100.',
+                                     QMessageBox.Ok)
+                return
+            if not statistics:
+                QMessageBox.critical(self, 'Error', 'Select at least one statistic.', QMessageBox.Ok)
+                return
+
         canceled, filename = save_dialog('Serafin', self.data.filename)
         if canceled:
             return
@@ -367,6 +421,8 @@ class MaxMinMeanTab(QWidget):
             max_min_type = operations.MAX
         elif self.minButton.isChecked():
             max_min_type = operations.MIN
+        elif self.statisticsButton.isChecked():
+            max_min_type = operations.STATISTICS
         else:
             max_min_type = operations.MEAN
 
@@ -377,9 +433,12 @@ class MaxMinMeanTab(QWidget):
         end_index = int(self.timeSelection.endIndex.text())
         time_indices = list(range(start_index, end_index))
 
+        if max_min_type == operations.STATISTICS:
+            operation_name = ', '.join(statistics)
+        else:
+            operation_name = {operations.MAX: 'Max', operations.MIN: 'Min', operations.MEAN: 'Mean'}[max_min_type]
         output_message = 'Computing %s of variables %s between frame %d and %d.' \
-                          % ('Max' if self.maxButton.isChecked() else ('Min' if self.minButton.isChecked() else 'Mean'),
-                             str(output_header.var_IDs), start_index+1, end_index)
+                          % (operation_name, str(output_header.var_IDs), start_index+1, end_index)
         self.parent.inDialog()
         logging.info(output_message)
         progressBar = OutputProgressDialog()
@@ -394,8 +453,13 @@ class MaxMinMeanTab(QWidget):
                 QApplication.processEvents()
 
                 with Serafin.Write(filename, self.data.language) as output_stream:
-                    process = MaxMinMeanThread(max_min_type, input_stream, scalars, vectors, time_indices,
-                                               additional_equations)
+                    if max_min_type == operations.STATISTICS:
+                        process = StatisticsThread(statistics, input_stream, scalars, vectors, time_indices,
+                                                   additional_equations)
+                        output_header.set_variables(process.calculator.output_variables())
+                    else:
+                        process = MaxMinMeanThread(max_min_type, input_stream, scalars, vectors, time_indices,
+                                                   additional_equations)
                     progressBar.connectToThread(process)
                     values = process.run()
 
@@ -0,0 +1,381 @@
+"""!
+Level-of-detail rendering of 2D meshes and of their scalar fields on matplotlib maps
+
+The rendering structures of a mesh (triangulation, edges, element bounding boxes, last raster grid) are built once and cached
+for every mesh object.
+Meshes with few elements are drawn in detail (edges, Gouraud-shaded fields). On larger meshes:
+- the edges are drawn only for the elements visible in the current viewport, as long as they are not too many
+  (otherwise the mesh is drawn as a raster of the area it covers);
+- the scalar fields are rasterized at the resolution of the current viewport.
+The viewport-dependent artists are refreshed when they are drawn, i.e. after every zoom or pan.
+"""
+
+from matplotlib.collections import LineCollection
+from matplotlib.colors import ListedColormap
+from matplotlib.image import AxesImage
+import matplotlib.tri as mtri
+import numpy as np
+from weakref import WeakKeyDictionary
+
+from pyteltools.conf import settings
+
+
+_RENDERERS = WeakKeyDictionary()
+
+
+def get_renderer(mesh):
+    """!
+    @brief Get the (cached) rendering structures of a mesh
+    @param mesh <slf.mesh2D.Mesh2D>: a 2D mesh (with 0-based `ikle`)
+    @return <MeshRenderer>: the rendering structures of the mesh
+    """
+    try:
+        return _RENDERERS[mesh]
+    except KeyError:
+        renderer = MeshRenderer(mesh.x, mesh.y, mesh.ikle)
+        _RENDERERS[mesh] = renderer
+        return renderer
+
+
+class RasterGrid:
+    """!
+    @brief Pixels of a viewport located in the mesh, with their element and their interpolation weights
+    """
+    def __init__(self, extent, shape, pixels, elements, weights):
+        """!
+        @param extent <tuple>: (xmin, xmax, ymin, ymax) of the viewport
+        @param shape <tuple>: (number of rows, number of columns) of the image
+        @param pixels <numpy.1D-array>: flat indices of the pixels located in the mesh
+        @param elements <numpy.1D-array>: element containing every pixel of `pixels`
+        @param weights <numpy.2D-array>: barycentric coordinates of every pixel of `pixels` in its element
+        """
+        self.extent = extent
+        self.shape = shape
+        self.pixels = pixels
+        self.elements = elements
+        self.weights = weights
+
+
+class MeshRenderer:
+    """!
+    @brief Rendering structures of a 2D mesh, built on demand and kept for the next plots
+    """
+    def __init__(self, x, y, ikle):
+        """!
+        @param x <numpy.1D-array>: x coordinates of the nodes
+        @param y <numpy.1D-array>: y coordinates of the nodes
+        @param ikle <numpy.2D-array>: connectivity table (0-based)
+        """
+        self.x, self.y, self.ikle = x, y, ikle
+        self.nb_triangles = len(ikle)
+        self.bounds = (x.min(), x.max(), y.min(), y.max())
+        self._triangulation = None
+        self._element_bounds = None
+        self._edges = None
+        self._grid = None
+
+    @property
+    def is_large(self):
+        """!
+        @return <bool>: True if the mesh has too many elements to be drawn entirely in detail
+        """
+        return self.nb_triangles > settings.MAP_MAX_DETAILED_ELEMENTS
+
+    @property
+    def triangulation(self):
+        """!
+        @return <matplotlib.tri.Triangulation>: triangulation of the mesh
+        """
+        if self._triangulation is None:
+            self._triangulation = mtri.Triangulation(self.x, self.y, self.ikle)
+        return self._triangulation
+
+    def _build_edges(self):
+        """!
+        @brief Build the unique edges of the mesh and the edges of every element
+        """
+        edges = np.sort(self.ikle[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2), axis=1)
+        keys = edges[:, 0].astype(np.int64) * len(self.x) + edges[:, 1]
+        _, first, element_edges = np.unique(keys, return_index=True, return_inverse=True)
+        self._edges = (edges[first], element_edges.reshape(-1, 3))
+
+    def visible_elements(self, xlim, ylim):
+        """!
+        @brief Find the elements whose bounding box intersects a viewport
+        @param xlim <tuple>: (xmin, xmax) of the viewport
+        @param ylim <tuple>: (ymin, ymax) of the viewport
+        @return <numpy.1D-array>: mask of the visible elements
+        """
+        if self._element_bounds is None:
+            element_x, element_y = self.x[self.ikle], self.y[self.ikle]
+            self._element_bounds = (element_x.min(axis=1), element_x.max(axis=1),
+                                    element_y.min(axis=1), element_y.max(axis=1))
+        xmin, xmax, ymin, ymax = self._element_bounds
+        return (xmax >= min(xlim)) & (xmin <= max(xlim)) & (ymax >= min(ylim)) & (ymin <= max(ylim))
+
+    def edge_segments(self, elements=None):
+        """!
+        @brief Segments of the edges of some elements (every edge is drawn once)
+        @param elements <numpy.1D-array>: mask of the elements (all the elements if None)
+        @return <numpy.3D-array>: the segments (one per edge) as an array of shape (nb_edges, 2, 2)
+        """
+        if self._edges is None:
+            self._build_edges()
+        edges, element_edges = self._edges
+        if elements is not None:
+            selected = np.zeros(len(edges), dtype=bool)
+            selected[element_edges[elements]] = True
+            edges = edges[selected]
+        return np.stack((self.x[edges], self.y[edges]), axis=2)
+
+    def raster_grid(self, extent, shape, chunk_size=2**22):
+        """!
+        @brief Locate the centers of the pixels of a viewport in the mesh (the last grid is kept for the next frames)
+        The pixels in the bounding box of every visible element are tested by chunks of candidates.
+        @param extent <tuple>: (xmin, xmax, ymin, ymax) of the viewport
+        @param shape <tuple>: (number of rows, number of columns) of the image
+        @param chunk_size <int>: maximal number of (pixel, element) candidates tested at once
+        @return <RasterGrid>: the pixels located in the mesh
+        """
+        if self._grid is not None and self._grid.extent == extent and self._grid.shape == shape:
+            return self._grid
+        xmin, xmax, ymin, ymax = extent
+        nb_rows, nb_columns = shape
+        dx, dy = (xmax - xmin) / nb_columns, (ymax - ymin) / nb_rows
+
+        # range of the pixel centers in the bounding box of every visible element
+        visible = np.flatnonzero(self.visible_elements((xmin, xmax), (ymin, ymax)))
+        element_xmin, element_xmax, element_ymin, element_ymax = (bound[visible] for bound in self._element_bounds)
+        first_column = np.maximum(np.ceil((element_xmin - xmin) / dx - 0.5), 0).astype(np.int64)
+        last_column = np.minimum(np.floor((element_xmax - xmin) / dx - 0.5), nb_columns - 1).astype(np.int64)
+        first_row = np.maximum(np.ceil((element_ymin - ymin) / dy - 0.5), 0).astype(np.int64)
+        last_row = np.minimum(np.floor((element_ymax - ymin) / dy - 0.5), nb_rows - 1).astype(np.int64)
+        widths = np.maximum(last_column - first_column + 1, 0)
+        counts = widths * np.maximum(last_row - first_row + 1, 0)
+
+        ends = np.cumsum(counts)
+        total = ends[-1] if len(ends) else 0
+        splits = np.searchsorted(ends, np.arange(chunk_size, total, chunk_size))
+        pixels, elements, weights = [], [], []
+        for chunk in np.split(np.arange(len(visible)), splits):
+            chunk = chunk[counts[chunk] > 0]
+            chunk_counts = counts[chunk]
+            offsets = np.arange(chunk_counts.sum()) - np.repeat(np.cumsum(chunk_counts) - chunk_counts, chunk_counts)
+            chunk_widths = np.repeat(widths[chunk], chunk_counts)
+            columns = np.repeat(first_column[chunk], chunk_counts) + offsets % chunk_widths
+            rows = np.repeat(first_row[chunk], chunk_counts) + offsets // chunk_widths
+            candidates = np.repeat(visible[chunk], chunk_counts)
+            px, py = xmin + (columns + 0.5) * dx, ymin + (rows + 0.5) * dy
+
+            x1, x2, x3 = self.x[self.ikle[candidates]].T
+            y1, y2, y3 = self.y[self.ikle[candidates]].T
+            with np.errstate(divide='ignore', invalid='ignore'):
+                det = (y2 - y3) * (x1 - x3) + (x3 - x2) * (y1 - y3)
+                w1 = ((y2 - y3) * (px - x3) + (x3 - x2) * (py - y3)) / det
+                w2 = ((y3 - y1) * (px - x3) + (x1 - x3) * (py - y3)) / det
+            w3 = 1 - w1 - w2
+            inside = (w1 >= -1e-9) & (w2 >= -1e-9) & (w3 >= -1e-9)
+            pixels.append(rows[inside] * nb_columns + columns[inside])
+            elements.append(candidates[inside])
+            weights.append(np.column_stack((w1[inside], w2[inside], w3[inside])))
+
+        if pixels:
+            self._grid = RasterGrid(extent, shape, np.concatenate(pixels), np.concatenate(elements),
+                                    np.concatenate(weights))
+        else:
+            self._grid = RasterGrid(extent, shape, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64),
+                                    np.empty((0, 3)))
+        return self._grid
+
+    def rasterize(self, grid, values, on_elements=False):
+        """!
+        @brief Sample a field on the pixels of a grid (masked outside the mesh)
+        @param grid <RasterGrid>: pixels located in the mesh
+        @param values <numpy.1D-array>: values of the field on the nodes (or on the elements)
+        @param on_elements <bool>: True if the values are given on the elements (constant by element)
+        @return <numpy.ma.MaskedArray>: image of the field
+        """
+        image = np.full(grid.shape[0] * grid.shape[1], np.nan)
+        if on_elements:
+            image[grid.pixels] = values[grid.elements]
+        else:
+            image[grid.pixels] = np.einsum('ij,ij->i', values[self.ikle[grid.elements]], grid.weights)
+        return np.ma.masked_invalid(image.reshape(grid.shape))
+
+    def coverage(self, grid):
+        """!
+        @brief Image of the area covered by the mesh (masked outside the mesh)
+        @param grid <RasterGrid>: pixels located in the mesh
+        @return <numpy.ma.MaskedArray>: image equal to 1 in the mesh
+        """
+        image = np.zeros(grid.shape[0] * grid.shape[1])
+        image[grid.pixels] = 1
+        return np.ma.masked_equal(image.reshape(grid.shape), 0)
+
+
+def viewport(axes, renderer=None):
+    """!
+    @brief Extent and resolution (in pixels) of the current viewport of an axes
+    @param axes <matplotlib.axes.Axes>: the map axes
+    @param renderer <matplotlib.backend_bases.RendererBase>: the renderer (optional)
+    @return <tuple>: extent (xmin, xmax, ymin, ymax) and shape (number of rows, number of columns)
+    """
+    xmin, xmax = sorted(axes.get_xlim())
+    ymin, ymax = sorted(axes.get_ylim())
+    box = axes.get_window_extent(renderer)
+    return (xmin, xmax, ymin, ymax), (max(1, int(round(box.height))), max(1, int(round(box.width))))
+
+
+class _ViewportImage(AxesImage):
+    """!
+    @brief Image covering the viewport of its axes, recomputed by its layer before being drawn
+    """
+    def __init__(self, axes, layer, **kwargs):
+        super().__init__(axes, origin='lower', interpolation='nearest', **kwargs)
+        self.layer = layer
+
+    def get_extent(self):
+        return self.layer.extent
+
+    def draw(self, renderer):
+        self.layer.refresh(renderer)
+        super().draw(renderer)
+
+
+class _ViewportLines(LineCollection):
+    """!
+    @brief Segments of the visible edges of a mesh, updated by its layer before being drawn
+    """
+    def __init__(self, layer, segments, **kwargs):
+        super().__init__(segments, **kwargs)
+        self.layer = layer
+
+    def draw(self, renderer):
+        self.layer.refresh(renderer)
+        super().draw(renderer)
+
+
+def _init_limits(axes, renderer):
+    """!
+    @brief Extend the data limits of an axes to the mesh and update its view if it is autoscaled
+    """
+    xmin, xmax, ymin, ymax = renderer.bounds
+    axes.update_datalim([(xmin, ymin), (xmax, ymax)])
+    axes.autoscale_view()
+
+
+class MeshLayer:
+    """!
+    @brief Edges of a mesh drawn on a map, or the area covered by the mesh if too many elements are visible
+    """
+    def __init__(self, axes, renderer, color, alpha=0.5, linestyle='--', linewidth=0.3):
+        """!
+        @param axes <matplotlib.axes.Axes>: the map axes
+        @param renderer <MeshRenderer>: rendering structures of the mesh
+        @param color <str>: color of the edges
+        """
+        self.axes = axes
+        self.renderer = renderer
+        self.extent = None
+        self.shape = None
+        _init_limits(axes, renderer)
+
+        self.lines = _ViewportLines(self, [], colors=color, alpha=alpha, linestyles=linestyle, linewidths=linewidth,
+                                    zorder=2)
+        axes.add_collection(self.lines, autolim=False)
+        self.image = None
+        if renderer.is_large:
+            self.image = _ViewportImage(axes, self, cmap=ListedColormap([color]), alpha=alpha * 0.5)
+            axes.add_image(self.image)
+            self.refresh()
+        else:
+            self.lines.set_segments(renderer.edge_segments())
+
+    def refresh(self, renderer=None):
+        """!
+        @brief Update the artists to the current viewport (nothing is done if the viewport did not change)
+        @param renderer <matplotlib.backend_bases.RendererBase>: the renderer (optional)
+        """
+        if self.image is None:  # all the edges are always drawn
+            return
+        extent, shape = viewport(self.axes, renderer)
+        if extent == self.extent and shape == self.shape:
+            return
+        self.extent, self.shape = extent, shape
+        visible = self.renderer.visible_elements(extent[:2], extent[2:])
+        if np.count_nonzero(visible) <= settings.MAP_MAX_DETAILED_ELEMENTS:
+            self.lines.set_segments(self.renderer.edge_segments(visible))
+            self.image.set_data(np.ma.masked_all((1, 1)))
+        else:
+            self.lines.set_segments([])
+            self.image.set_data(self.renderer.coverage(self.renderer.raster_grid(extent, shape)))
+
+
+class FieldLayer:
+    """!
+    @brief Scalar field drawn on a map: Gouraud-shaded elements (nodal values) or colored elements (element values),
+    rasterized at the resolution of the viewport on large meshes
+
+    The artist is kept between the frames: `set_values` only updates its color array.
+    """
+    def __init__(self, axes, renderer, values, cmap, norm, on_elements=False):
+        """!
+        @param axes <matplotlib.axes.Axes>: the map axes
+        @param renderer <MeshRenderer>: rendering structures of the mesh
+        @param values <numpy.1D-array>: values on the nodes (or on the elements)
+        @param cmap <matplotlib.colors.Colormap or str>: color map
+        @param norm <matplotlib.colors.Normalize>: normalization of the values
+        @param on_elements <bool>: True if the values are given on the elements
+        """
+        self.axes = axes
+        self.renderer = renderer
+        self.values = values
+        self.on_elements = on_elements
+        self.extent = None
+        self.shape = None
+        self.image = None
+
+        if renderer.is_large:
+            _init_limits(axes, renderer)
+            self.image = _ViewportImage(axes, self, cmap=cmap, norm=norm)
+            axes.add_image(self.image)
+            self.artist = self.image
+            self.refresh()
+        elif on_elements:
+            self.artist = axes.tripcolor(renderer.triangulation, facecolors=values, cmap=cmap, norm=norm)
+        else:
+            self.artist = axes.tripcolor(renderer.triangulation, values, cmap=cmap, norm=norm, shading='gouraud')
+
+    def refresh(self, renderer=None):
+        """!
+        @brief Resample the field on the current viewport (nothing is done if the viewport did not change)
+        @param renderer <matplotlib.backend_bases.RendererBase>: the renderer (optional)
+        """
+        extent, shape = viewport(self.axes, renderer)
+        if extent == self.extent and shape == self.shape:
+            return
+        self.extent, self.shape = extent, shape
+        self._resample()
+
+    def _resample(self):
+        grid = self.renderer.raster_grid(self.extent, self.shape)
+        self.image.set_data(self.renderer.rasterize(grid, self.values, self.on_elements))
+
+    def set_values(self, values):
+        """!
+        @brief Replace the values of the field (e.g. with another frame)
+        @param values <numpy.1D-array>: values on the nodes (or on the elements)
+        """
+        self.values = values
+        if self.image is not None:
+            self._resample()
+        else:
+            self.artist.set_array(values)
+
+    def set_clim(self, vmin, vmax):
+        """!
+        @brief Change the limits of the color map
+        @param vmin <float>: value of the lowest color
+        @param vmax <float>: value of the highest color
+        """
+        self.artist.set_clim(vmin, vmax)
@@ -21,6 +21,7 @@ from mpl_toolkits.axes_grid1 import make_axes_locatable
 
 from pyteltools.conf import settings
 from pyteltools.geom import BlueKenue, Shapefile
+from pyteltools.gui.lod import FieldLayer, get_renderer, MeshLayer
 from pyteltools.slf.comparison import ReferenceMesh
 from pyteltools.slf.datatypes import SerafinData
 from pyteltools.slf.flux import TriangularVectorField
@@ -1714,7 +1715,7 @@ class MapCanvas(FigureCanvas):
         self.axes.clear()
         self.axes.set_xlabel(settings.X_AXIS_LABEL)
         self.axes.set_ylabel(settings.Y_AXIS_LABEL)
-        self.axes.triplot(mesh.x, mesh.y, mesh.ikle, '--', color=self.BLACK, alpha=0.5, lw=0.3)
+        MeshLayer(self.axes, get_renderer(mesh), self.BLACK)
         self.axes.set_aspect('equal', adjustable='box')
         self.draw()
 
@@ -1774,7 +1775,7 @@ class ColorMapCanvas(MapCanvas):
         self.axes = self.fig.add_subplot(111)
 
         if limits is None:
-            maxval = max(np.abs(list(values.values())))
+            maxval = np.max(np.abs(values))
             xmin, xmax = -maxval, maxval
         else:
             xmin, xmax = limits
@@ -1782,7 +1783,8 @@ class ColorMapCanvas(MapCanvas):
         self.axes.set_xlabel(settings.X_AXIS_LABEL)
         self.axes.set_ylabel(settings.Y_AXIS_LABEL)
         self.axes.set_aspect('equal', adjustable='box')
-        self.axes.triplot(mesh.x, mesh.y, mesh.ikle, '--', color=self.BLACK, alpha=0.5, lw=0.3)
+        renderer = get_renderer(mesh)
+        MeshLayer(self.axes, renderer, self.BLACK)
 
         if polygon is not None:
             # show only the zone in the polygon
@@ -1793,19 +1795,9 @@ class ColorMapCanvas(MapCanvas):
             self.axes.set_xlim(minx - 0.05 * w, maxx + 0.05 * w)
             self.axes.set_ylim(miny - 0.05 * h, maxy + 0.05 * h)
 
-            # the color value for each triangles inside the polygon
-            colors = []
-            for i, j, k in mesh.triangles:
-                if (i, j, k) in values:
-                    colors.append(values[i, j, k])
-                else:
-                    colors.append(0)
-            colors = np.array(colors)
-        else:
-            colors = np.array([values[i, j, k] for i, j, k in mesh.triangles])
-
-        self.axes.tripcolor(mesh.x, mesh.y, mesh.ikle, facecolors=colors, cmap=settings.DEFAULT_COLOR_STYLE,
-                            vmin=xmin, vmax=xmax, norm=Normalize(xmin, xmax))
+        # the color value for each triangle (0 outside the polygon)
+        FieldLayer(self.axes, renderer, values, settings.DEFAULT_COLOR_STYLE, Normalize(xmin, xmax),
+                   on_elements=True)
 
         if polygon is not None:  # add the contour of the polygon
             patches = [PolygonPatch(polygon.polyline().buffer(0), fc=self.TRANSPARENT, ec='black', zorder=1)]
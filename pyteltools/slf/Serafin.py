@@ -512,14 +512,8 @@ class SerafinHeader:
         @param transformations <[geom.transformation.Transformation]>: list of successive transformations
         @return: modified copy of original header with transformed mesh nodes
         """
-        if not transformations:
-            return self.copy()
-        points = [np.array([x, y, 0]) for x, y in zip(self.x, self.y)]
-        for t in transformations:
-            points = [t(p) for p in points]
         new_header = self.copy()
-        new_header.x = np.array([p[0] for p in points])
-        new_header.y = np.array([p[1] for p in points])
+        new_header.transform_mesh(transformations)
         return new_header
 
     def transform_mesh(self, transformations):
@@ -529,11 +523,11 @@ class SerafinHeader:
         """
         if not transformations:
             return
-        points = [np.array([x, y, 0]) for x, y in zip(self.x, self.y)]
+        points = np.column_stack((self.x, self.y, np.zeros_like(self.x)))
         for t in transformations:
-            points = [t(p) for p in points]
-        self.x = np.array([p[0] for p in points])
-        self.y = np.array([p[1] for p in points])
+            points = t.apply(points)
+        self.x = points[:, 0].copy()
+        self.y = points[:, 1].copy()
 
 
 class Serafin:
@@ -622,11 +616,12 @@ class Read(Serafin):
             raise SerafinRequestError('Variable ID %s not found' % var_ID)
         return index
 
-    def read_var_in_frame(self, time_index, var_ID):
+    def read_var_in_frame(self, time_index, var_ID, out=None):
         """!
         @brief Read a single variable in a frame
         @param time_index <int>: the index of the frame (0-based)
         @param var_ID <str>: variable ID
+        @param out <numpy 1D-array>: optional buffer (of length equal to the number of nodes) to fill in place
         @return <numpy 1D-array>: values of the variables, of length equal to the number of nodes
         """
         if time_index < 0:
@@ -636,8 +631,87 @@ class Read(Serafin):
         self.file.seek(self.header.header_size + time_index * self.header.frame_size
                        + 8 + self.header.float_size + pos_var * (8 + self.header.float_size * self.header.nb_nodes), 0)
         self.file.read(4)
-        return np.array(self.header.unpack_float(self.file.read(self.header.float_size * self.header.nb_nodes),
-                                                 self.header.nb_nodes), dtype=self.header.np_float_type)
+        values = np.frombuffer(self.file.read(self.header.float_size * self.header.nb_nodes),
+                               dtype=self.header.endian + self.header.float_type)
+        if out is None:
+            return values.astype(self.header.np_float_type)
+        np.copyto(out, values)
+        return out
+
+    def read_frame(self, time_index):
+        """!
+        @brief Read all the variables of a frame at once
+        @param time_index <int>: the index of the frame (0-based)
+        @return <numpy 2D-array>: values of the variables with shape (number of variables, number of nodes)
+        """
+        if time_index < 0:
+            raise SerafinRequestError('Impossible to read a negative time index!')
+        if self.header is None:
+            raise SerafinRequestError('Cannot read a frame without any header (forgot read_header ?)')
+        logger.debug('Reading frame %i' % time_index)
+        var_size = 8 + self.header.float_size * self.header.nb_nodes
+        self.file.seek(self.header.header_size + time_index * self.header.frame_size + 8 + self.header.float_size, 0)
+        raw = self.file.read(var_size * self.header.nb_var)
+        values = np.ndarray((self.header.nb_var, self.header.nb_nodes),
+                            dtype=self.header.endian + self.header.float_type, buffer=raw, offset=4,
+                            strides=(var_size, self.header.float_size))
+        return values.astype(self.header.np_float_type)
+
+    def read_var_in_frame_in_range(self, time_index, var_ID, start, stop):
+        """!
+        @brief Read a single variable in a frame on a range of nodes
+        @param time_index <int>: the index of the frame (0-based)
+        @param var_ID <str>: variable ID
+        @param start <int>: index of the first node of the range (0-based)
+        @param stop <int>: index following the last node of the range
+        @return <numpy 1D-array>: values of the variables, of length equal to `stop - start`
+        """
+        if time_index < 0:
+            raise SerafinRequestError('Impossible to read a negative time index!')
+        if start < 0 or stop > self.header.nb_nodes or start > stop:
+            raise SerafinRequestError('Node range [%i, %i) is not inside [0, %i)' % (start, stop, self.header.nb_nodes))
+        pos_var = self._get_var_index(var_ID)
+        self.file.seek(self.header.header_size + time_index * self.header.frame_size
+                       + 8 + self.header.float_size + pos_var * (8 + self.header.float_size * self.header.nb_nodes)
+                       + 4 + start * self.header.float_size, 0)
+        values = np.frombuffer(self.file.read(self.header.float_size * (stop - start)),
+                               dtype=self.header.endian + self.header.float_type)
+        return values.astype(self.header.np_float_type)
+
+    def read_var_at_nodes(self, var_ID, nodes, time_indices=None):
+        """!
+        @brief Read the time series of a single variable at some nodes, without reading the whole frames
+        @param var_ID <str>: variable ID
+        @param nodes <numpy 1D-array>: indices of the nodes (0-based, preferably sorted)
+        @param time_indices <[int]>: indices of the frames (0-based), every frame if None
+        @return <numpy 2D-array>: values of the variable with shape (number of frames, number of nodes)
+        """
+        if self.header is None:
+            raise SerafinRequestError('Cannot read values without any header (forgot read_header ?)')
+        pos_var = self._get_var_index(var_ID)
+        nodes = np.asarray(nodes, dtype=np.int64)
+        if time_indices is None:
+            time_indices = np.arange(self.header.nb_frames)
+        time_indices = np.asarray(time_indices, dtype=np.int64)
+        if time_indices.size == 0 or nodes.size == 0:
+            return np.empty((time_indices.size, nodes.size), dtype=self.header.np_float_type)
+        if time_indices.min() < 0 or time_indices.max() >= self.header.nb_frames:
+            raise SerafinRequestError('Frame indices are not inside [0, %i)' % self.header.nb_frames)
+        if nodes.min() < 0 or nodes.max() >= self.header.nb_nodes:
+            raise SerafinRequestError('Node indices are not inside [0, %i)' % self.header.nb_nodes)
+        logger.debug('Reading variable %s at %i nodes in %i frames' % (var_ID, nodes.size, time_indices.size))
+
+        # strided view of the variable in every frame, only the requested values are actually read
+        raw = np.memmap(self.file, dtype=np.uint8, mode='r', offset=self.header.header_size,
+                        shape=(self.header.nb_frames * self.header.frame_size,))
+        values = np.ndarray((self.header.nb_frames, self.header.nb_nodes),
+                            dtype=self.header.endian + self.header.float_type, buffer=raw,
+                            offset=8 + self.header.float_size + pos_var * (8 + self.header.float_size
+                                                                           * self.header.nb_nodes) + 4,
+                            strides=(self.header.frame_size, self.header.float_size))
+        selected_values = values[np.ix_(time_indices, nodes)].astype(self.header.np_float_type)
+        del values, raw
+        return selected_values
 
     def read_var_in_frame_as_3d(self, time_index, var_ID):
         """!
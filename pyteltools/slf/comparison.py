@@ -1,13 +1,20 @@
 """!
-Comparison between two Serafin files with identical meshes
+Comparison between Serafin files with identical meshes
 """
 
+from multiprocessing import Pool
 import numpy as np
 
+from pyteltools.conf import settings
+from pyteltools.slf import Serafin
 from pyteltools.slf.interpolation import Interpolator
 from pyteltools.slf.volume import TruncatedTriangularPrisms
 
 
+# Error measures computed for every frame of the test runs (columns of the arrays returned by `compare_runs`)
+ERROR_MEASURES = ['MSD', 'MAD', 'RMSD', 'BSS']
+
+
 class ReferenceMesh(TruncatedTriangularPrisms):
     """!
     @brief Wrapper for computing error measures when comparing a test mesh to a reference mesh
@@ -17,61 +24,82 @@ class ReferenceMesh(TruncatedTriangularPrisms):
     """
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.area = {}
-        self.point_weight = []
+        x, y = self.x[self.ikle], self.y[self.ikle]
+        ## Area of every triangle
+        self.element_area = 0.5 * np.abs((x[:, 1] - x[:, 0]) * (y[:, 2] - y[:, 0])
+                                         - (x[:, 2] - x[:, 0]) * (y[:, 1] - y[:, 0]))
+        ## Area of every triangle entirely inside the comparison region (0 for the others)
+        self.area = np.zeros((self.nb_triangles,), dtype=np.float64)
+        ## True for every triangle inside or intersecting the comparison region
+        self.elements_inside = np.zeros((self.nb_triangles,), dtype=bool)
+        ## Weight of the three nodes of every triangle in its signed deviation (aligned with `ikle`)
+        self.element_weight = np.zeros((self.nb_triangles, 3), dtype=np.float64)
+        self.point_weight = np.zeros((self.nb_points,), dtype=np.float64)
         self.inverse_total_area = 1
 
         self.nb_triangles_inside = 0
         self.inside_polygon = False
         self.polygon = None
-        self.triangle_polygon_intersection = {}
+        self._element_indices = None
+
+    def _intersect_elements(self, polygon, elements):
+        """!
+        @brief Intersect the triangles with a polygon
+        @param polygon <geom.geometry.Polygon>: A polygon
+        @param elements <[tuple]>: The triangles (i,j,k) to intersect
+        @return <[int], [tuple]>: The indices of the triangles entirely contained in the polygon,
+            and the tuple (index, intersection area, interpolator at the intersection centroid) for boundary triangles
+        """
+        if self._element_indices is None:
+            self._element_indices = {tuple(element): index for index, element in enumerate(self.ikle.tolist())}
+        inside, boundary = [], []
+        for i, j, k in elements:
+            t = self.triangles[i, j, k]
+            if polygon.contains(t):
+                inside.append(self._element_indices[i, j, k])
+            else:
+                is_intersected, intersection = polygon.polygon_intersection(t)
+                if is_intersected:
+                    centroid = intersection.centroid
+                    interpolator = Interpolator(t).get_interpolator_at(centroid.x, centroid.y)
+                    boundary.append((self._element_indices[i, j, k], intersection.area, interpolator))
+        return inside, boundary
 
     def add_polygon(self, polygon):
         """!
         @brief Initialize the weight on all points of the mesh depending on the comparison region
+        The triangles crossing the polygon boundary contribute to the weights with their intersection area and
+        the barycentric coordinates of its centroid, so that every measure is a weighted sum of the nodal values.
         @param polygon <geom.geometry.Polygon>: A polygon defining the comparison region or None if it is the whole mesh
         """
-        self.area = {}
-        self.point_weight = np.zeros((self.nb_points,), dtype=np.float64)
+        self.area = np.zeros((self.nb_triangles,), dtype=np.float64)
+        self.element_weight = np.zeros((self.nb_triangles, 3), dtype=np.float64)
+        self.elements_inside = np.zeros((self.nb_triangles,), dtype=bool)
 
         if polygon is None:  # entire mesh
             self.inside_polygon = False
-            self.triangle_polygon_intersection = {}
-            self.nb_triangles_inside = self.nb_triangles
-            total_area = 0
-            for (i, j, k), t in self.triangles.items():
-                area = t.area
-                self.area[i, j, k] = area
-                total_area += area
-                self.point_weight[[i, j, k]] += area
+            self.polygon = None
+            self.area[:] = self.element_area
+            self.element_weight[:] = self.element_area[:, np.newaxis] / 3.0
+            self.elements_inside[:] = True
         else:
             self.inside_polygon = True
             self.polygon = polygon
-            self.nb_triangles_inside = 0
-
-            potential_elements = self.get_intersecting_elements(polygon.bounds())
-            self.point_weight = np.zeros((self.nb_points,), dtype=np.float64)
-            self.triangle_polygon_intersection = {}
-            total_area = 0
-            for i, j, k in potential_elements:
-                t = self.triangles[i, j, k]
-                if polygon.contains(t):
-                    self.nb_triangles_inside += 1
-                    area = t.area
-                    total_area += area
-                    self.point_weight[[i, j, k]] += area
-                    self.area[i, j, k] = area
-                else:
-                    is_intersected, intersection = polygon.polygon_intersection(t)
-                    if is_intersected:
-                        self.nb_triangles_inside += 1
-                        area = intersection.area
-                        total_area += area
-                        centroid = intersection.centroid
-                        interpolator = Interpolator(t).get_interpolator_at(centroid.x, centroid.y)
-                        self.triangle_polygon_intersection[i, j, k] = (area, interpolator)
-        self.point_weight /= 3.0
-        self.inverse_total_area = 1 / total_area
+            inside, boundary = self._intersect_elements(polygon, self.get_intersecting_elements(polygon.bounds()))
+            inside = np.array(inside, dtype=np.int64)
+            self.area[inside] = self.element_area[inside]
+            self.element_weight[inside] = self.element_area[inside, np.newaxis] / 3.0
+            self.elements_inside[inside] = True
+            if boundary:
+                indices, areas, interpolators = zip(*boundary)
+                indices = np.array(indices, dtype=np.int64)
+                self.element_weight[indices] = np.array(areas)[:, np.newaxis] * np.array(interpolators)
+                self.elements_inside[indices] = True
+
+        self.nb_triangles_inside = int(self.elements_inside.sum())
+        self.point_weight = np.bincount(self.ikle.ravel(), weights=self.element_weight.ravel(),
+                                        minlength=self.nb_points)
+        self.inverse_total_area = 1 / float(self.element_weight.sum())
 
     def mean_signed_deviation(self, values):
         """!
@@ -79,12 +107,7 @@ class ReferenceMesh(TruncatedTriangularPrisms):
         @param values <numpy.1D-array>: The difference between the test mesh and the reference mesh
         @return <float>: The value of the mean signed deviation
         """
-        if not self.inside_polygon:
-            return self.point_weight.dot(values) * self.inverse_total_area
-        else:
-            volume_boundary = TruncatedTriangularPrisms.boundary_volume_in_polygon(self.triangle_polygon_intersection,
-                                                                                   values)
-            return (volume_boundary + self.point_weight.dot(values)) * self.inverse_total_area
+        return self.point_weight.dot(values) * self.inverse_total_area
 
     def mean_absolute_deviation(self, values):
         """!
@@ -92,13 +115,7 @@ class ReferenceMesh(TruncatedTriangularPrisms):
         @param values <numpy.1D-array>: The difference between the test mesh and the reference mesh
         @return <float>: The value of the mean absolute deviation
         """
-        if not self.inside_polygon:
-            return self.point_weight.dot(np.abs(values)) * self.inverse_total_area
-        else:
-            abs_values = np.abs(values)
-            volume_boundary = TruncatedTriangularPrisms.boundary_volume_in_polygon(self.triangle_polygon_intersection,
-                                                                                   abs_values)
-            return (volume_boundary + self.point_weight.dot(abs_values)) * self.inverse_total_area
+        return self.point_weight.dot(np.abs(values)) * self.inverse_total_area
 
     def root_mean_square_deviation(self, values):
         """!
@@ -106,30 +123,17 @@ class ReferenceMesh(TruncatedTriangularPrisms):
         @param values <numpy.1D-array>: The difference between the test mesh and the reference mesh
         @return <float>: The value of the root mean square deviation
         """
-        if not self.inside_polygon:
-            return np.sqrt(self.point_weight.dot(np.square(values)) * self.inverse_total_area)
-        else:
-            squared_values = np.square(values)
-            volume_boundary = TruncatedTriangularPrisms.boundary_volume_in_polygon(self.triangle_polygon_intersection,
-                                                                                   squared_values)
-            return np.sqrt((volume_boundary + self.point_weight.dot(squared_values)) * self.inverse_total_area)
+        return np.sqrt(self.point_weight.dot(np.square(values)) * self.inverse_total_area)
 
     def element_wise_signed_deviation(self, values):
         """!
         @brief Compute the element wise signed deviation (signed deviation distribution) between two meshes
         @param values <numpy.1D-array>: The difference between the test mesh and the reference mesh
-        @return <dict>: The value of the signed deviation for every triangles in the comparison area
+        @return <numpy.1D-array>: The value of the signed deviation for every triangle (aligned with `ikle`,
+            0 outside the comparison area, see `elements_inside`)
         """
-        ewsd = {}
-        for i, j, k in self.area:
-            ewsd[i, j, k] = sum(values[[i, j, k]]) * self.area[i, j, k] / 3.0 * self.nb_triangles_inside \
-                            * self.inverse_total_area
-        if self.inside_polygon:
-            for i, j, k in self.triangle_polygon_intersection:
-                area, interpolator = self.triangle_polygon_intersection[i, j, k]
-                ewsd[i, j, k] = interpolator.dot(values[[i, j, k]]) * area * self.nb_triangles_inside \
-                                * self.inverse_total_area
-        return ewsd
+        return np.einsum('ij,ij->i', self.element_weight, values[self.ikle]) \
+            * (self.nb_triangles_inside * self.inverse_total_area)
 
     def quadratic_volume(self, values):
         """!
@@ -137,11 +141,116 @@ class ReferenceMesh(TruncatedTriangularPrisms):
         @param values <numpy.1D-array>: The difference between the test mesh and the reference mesh
         @return <float>: The value of the quadratic volume
         """
-        if not self.inside_polygon:
-            return self.point_weight.dot(np.square(values))
-        else:
-            squared_values = np.square(values)
-            volume_boundary = TruncatedTriangularPrisms.boundary_volume_in_polygon(self.triangle_polygon_intersection,
-                                                                                   squared_values)
-            return self.point_weight.dot(squared_values) + volume_boundary
+        return self.point_weight.dot(np.square(values))
+
+
+def error_measures(point_weight, inverse_total_area, differences, ref_volume):
+    """!
+    @brief Compute the error measures of a batch of frames
+    @param point_weight <numpy.1D-array>: weight of every node (see `ReferenceMesh.point_weight`)
+    @param inverse_total_area <float>: inverse of the area of the comparison region
+    @param differences <numpy.2D-array>: test minus reference values (one row per frame)
+    @param ref_volume <float>: quadratic volume between the reference and the initial state (for the BSS)
+    @return <numpy.2D-array>: the error measures (one row per frame, one column per measure of `ERROR_MEASURES`)
+    """
+    quadratic_volume = np.square(differences).dot(point_weight)
+    measures = np.empty((len(differences), len(ERROR_MEASURES)), dtype=np.float64)
+    measures[:, 0] = differences.dot(point_weight) * inverse_total_area
+    measures[:, 1] = np.abs(differences).dot(point_weight) * inverse_total_area
+    measures[:, 2] = np.sqrt(quadratic_volume * inverse_total_area)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        measures[:, 3] = 1 - quadratic_volume / ref_volume
+    if ref_volume == 0:
+        measures[quadratic_volume == 0, 3] = 1
+    return measures
+
+
+def _compare_run(test_name, language, var_ID, mesh_geometry, ref_values, init_time_index, point_weight,
+                 inverse_total_area, batch_size):
+    """!
+    @brief Compute the error measures of all the frames of a test run (see `compare_runs`)
+    """
+    x, y, ikle = mesh_geometry
+    with Serafin.Read(test_name, language) as input_stream:
+        input_stream.read_header()
+        input_stream.get_time()
+        header = input_stream.header
+        if not header.is_2d or not np.array_equal(header.x, x) or not np.array_equal(header.y, y) \
+                or not np.array_equal(header.ikle_2d - 1, ikle):
+            raise Serafin.SerafinRequestError('The mesh of %s is not identical to the reference.' % test_name)
+        if var_ID not in header.var_IDs:
+            raise Serafin.SerafinRequestError('The variable %s is not in %s.' % (var_ID, test_name))
+        if init_time_index < 0:
+            init_time_index += header.nb_frames
+
+        init_values = input_stream.read_var_in_frame(init_time_index, var_ID)
+        ref_volume = np.square(ref_values - init_values).dot(point_weight)
+
+        measures = np.empty((header.nb_frames, len(ERROR_MEASURES)), dtype=np.float64)
+        buffer = np.empty((min(batch_size, header.nb_frames), header.nb_nodes), dtype=np.float64)
+        for start in range(0, header.nb_frames, batch_size):
+            stop = min(start + batch_size, header.nb_frames)
+            differences = buffer[:stop - start]
+            for k, time_index in enumerate(range(start, stop)):
+                input_stream.read_var_in_frame(time_index, var_ID, out=differences[k])
+            differences -= ref_values
+            measures[start:stop] = error_measures(point_weight, inverse_total_area, differences, ref_volume)
+        return np.array(input_stream.time), measures
+
+
+def compare_runs(mesh, ref_values, test_names, var_ID, init_time_index=0, language=settings.LANG,
+                 nb_processes=settings.NCSIZE, batch_size=64):
+    """!
+    @brief Compare test runs to a reference state over all their frames
+    Every test file is read once, by batches of frames, and the test files are handled by parallel processes.
+    @param mesh <slf.comparison.ReferenceMesh>: reference mesh (with its comparison region, see `add_polygon`)
+    @param ref_values <numpy.1D-array>: reference values
+    @param test_names <[str]>: paths to the test Serafin files (with the same mesh as the reference)
+    @param var_ID <str>: variable to compare
+    @param init_time_index <int>: index of the initial state frame in the test files for the BSS
+        (negative values count from the last frame)
+    @param language <str>: language for variables detection
+    @param nb_processes <int>: maximum number of processes (the test files are handled sequentially if 1)
+    @param batch_size <int>: number of frames processed at once
+    @return <[tuple]>: for every test file, the times of its frames <numpy.1D-array> and the error measures
+        <numpy.2D-array> (one row per frame, one column per measure of `ERROR_MEASURES`)
+    """
+    tasks = [(test_name, language, var_ID, (mesh.x, mesh.y, mesh.ikle), ref_values, init_time_index,
+              mesh.point_weight, mesh.inverse_total_area, batch_size) for test_name in test_names]
+    nb_processes = min(nb_processes, len(tasks))
+    if nb_processes <= 1:
+        return [_compare_run(*task) for task in tasks]
+    with Pool(nb_processes) as pool:
+        return pool.starmap(_compare_run, tasks)
+
+
+def compare_files(ref_name, test_names, var_ID, ref_time_index=-1, init_time_index=0, polygon=None,
+                  language=settings.LANG, nb_processes=settings.NCSIZE, batch_size=64):
+    """!
+    @brief Compare test runs to a frame of a reference run over all their frames (see `compare_runs`)
+    @param ref_name <str>: path to the reference Serafin file (2D)
+    @param test_names <[str]>: paths to the test Serafin files (with the same mesh as the reference)
+    @param var_ID <str>: variable to compare
+    @param ref_time_index <int>: index of the reference frame (negative values count from the last frame)
+    @param init_time_index <int>: index of the initial state frame in the test files for the BSS
+    @param polygon <geom.geometry.Polyline>: comparison region (None for the entire mesh)
+    @param language <str>: language for variables detection
+    @param nb_processes <int>: maximum number of processes
+    @param batch_size <int>: number of frames processed at once
+    @return <[tuple]>: for every test file, the times of its frames and the error measures
+    """
+    with Serafin.Read(ref_name, language) as input_stream:
+        input_stream.read_header()
+        input_stream.get_time()
+        header = input_stream.header
+        if not header.is_2d:
+            raise Serafin.SerafinRequestError('The reference file %s is not 2D.' % ref_name)
+        if var_ID not in header.var_IDs:
+            raise Serafin.SerafinRequestError('The variable %s is not in %s.' % (var_ID, ref_name))
+        if ref_time_index < 0:
+            ref_time_index += header.nb_frames
+        ref_values = input_stream.read_var_in_frame(ref_time_index, var_ID)
 
+    mesh = ReferenceMesh(header, polygon is not None, iter_pbar=lambda iterable, **kwargs: iterable)
+    mesh.add_polygon(polygon)
+    return compare_runs(mesh, ref_values, test_names, var_ID, init_time_index, language, nb_processes, batch_size)
@@ -1,6 +1,7 @@
 import numpy as np
 from shapely.geometry import Point
 
+from pyteltools.geom.geometry import label_points_in_polygons
 from pyteltools.slf.misc import infix_to_postfix, is_valid_expression, is_valid_postfix, to_infix
 from pyteltools.slf.Serafin import SLF_EIT
 
@@ -176,11 +177,7 @@ class ComplexExpressionPool:
         new_id = 'POLY%d' % self.nb_masks
         self.id_pool.append(new_id)
         self.dependency_graph[new_id] = set()
-        mask = np.zeros_like(self.x)
-        for index, poly in enumerate(polygons):
-            for i, point in self.points():
-                if poly.contains(point):
-                    mask[i] = index+1
+        mask = label_points_in_polygons(polygons, self.x, self.y)
         masked_values = np.zeros_like(self.x)
         for index, poly in enumerate(polygons):
             masked_values[mask == index+1] = poly.attributes()[attribute_index]
@@ -3,6 +3,7 @@ Barycentric interpolation in triangles
 """
 
 import numpy as np
+from scipy.sparse import csr_matrix
 
 from .mesh2D import Mesh2D
 
@@ -210,3 +211,106 @@ class MeshInterpolator(Mesh2D):
                 yield u, row
 
 
+class VerticalCrossSection:
+    """!
+    @brief Interpolation of 3D values on the vertical plane below a line
+
+    The 2D interpolation weights of the points along the line are stored once in a sparse matrix, which is applied to
+    all the planes (and frames) at once. The section points are numbered point by point, then plane by plane.
+    """
+    def __init__(self, line_interpolator, distances, nb_nodes_2d, nb_planes):
+        """!
+        @param line_interpolator <[tuple]>: points along the line (see `MeshInterpolator.get_line_interpolators`)
+        @param distances <[float]>: distance of every point along the line
+        @param nb_nodes_2d <int>: number of 2D nodes
+        @param nb_planes <int>: number of planes
+        """
+        self.nb_points = len(line_interpolator)
+        self.nb_nodes_2d = nb_nodes_2d
+        self.nb_planes = nb_planes
+
+        indices = np.array([element for _, _, element, _ in line_interpolator], dtype=np.int64).reshape(-1, 3)
+        weights = np.array([interpolator for _, _, _, interpolator in line_interpolator]).reshape(-1, 3)
+        self.weights = csr_matrix((weights.ravel(), indices.ravel(), np.arange(0, 3 * self.nb_points + 1, 3)),
+                                  shape=(self.nb_points, nb_nodes_2d))
+
+        self.x = np.repeat(np.array(distances, dtype=np.float64), nb_planes)
+        self.triangles = self._build_triangles()
+
+    def _build_triangles(self):
+        first = (np.arange(self.nb_points - 1)[:, np.newaxis] * self.nb_planes
+                 + np.arange(self.nb_planes - 1)).ravel()
+        return np.vstack((np.column_stack((first, first + 1, first + self.nb_planes)),
+                          np.column_stack((first + 1, first + self.nb_planes, first + self.nb_planes + 1))))
+
+    def interpolate(self, values):
+        """!
+        @brief Interpolate 3D values at the section points
+        @param values <numpy.ndarray>: values with shape (..., number of planes, number of 2D nodes)
+        @return <numpy.ndarray>: values with shape (..., number of section points)
+        """
+        values = np.asarray(values)
+        leading_shape = values.shape[:-2]
+        planes = values.reshape(-1, self.nb_nodes_2d)
+        section_values = np.asarray(self.weights.dot(planes.T)).T  # one row per plane (of every frame)
+        section_values = section_values.reshape(-1, self.nb_planes, self.nb_points).swapaxes(-1, -2)
+        return section_values.reshape(leading_shape + (self.nb_points * self.nb_planes,))
+
+    def read_frames(self, input_stream, time_indices, var_ID):
+        """!
+        @brief Interpolate a variable at the section points in some frames
+        @param input_stream <slf.Serafin.Read>: input stream
+        @param time_indices <[int]>: indices of the frames (0-based)
+        @param var_ID <str>: variable ID
+        @return <numpy.ndarray>: values with shape (number of frames, number of section points)
+        """
+        return self.interpolate(np.array([input_stream.read_var_in_frame_as_3d(time_index, var_ID)
+                                          for time_index in time_indices]))
+
+
+class VerticalTemporalProfiles:
+    """!
+    @brief Interpolation of 3D values on the vertical below some points, in every frame
+
+    Only the values of the 3 nodes around every point, on every plane, are read from the file.
+    """
+    def __init__(self, point_interpolators, nb_nodes_2d, nb_planes):
+        """!
+        @param point_interpolators <[tuple]>: element and barycentric coordinates of every point
+                                              (see `MeshInterpolator.get_point_interpolators`)
+        @param nb_nodes_2d <int>: number of 2D nodes
+        @param nb_planes <int>: number of planes
+        """
+        self.nb_points = len(point_interpolators)
+        self.nb_planes = nb_planes
+
+        elements = np.array([element for element, _ in point_interpolators], dtype=np.int64).reshape(-1, 3)
+        self.nodes_2d, positions = np.unique(elements, return_inverse=True)
+        self.weights = np.zeros((self.nb_points, len(self.nodes_2d)))
+        np.add.at(self.weights, (np.repeat(np.arange(self.nb_points), 3), positions.ravel()),
+                  np.array([interpolator for _, interpolator in point_interpolators]).ravel())
+
+        # the 3D nodes below the points, sorted in the plane-major order of the file
+        self.nodes = (np.arange(nb_planes)[:, np.newaxis] * nb_nodes_2d + self.nodes_2d).ravel()
+
+    def read(self, input_stream, var_ID, time_indices=None):
+        """!
+        @brief Interpolate a variable below every point
+        @param input_stream <slf.Serafin.Read>: input stream
+        @param var_ID <str>: variable ID
+        @param time_indices <[int]>: indices of the frames (0-based), every frame if None
+        @return <numpy.ndarray>: values with shape (number of points, number of frames, number of planes)
+        """
+        values = input_stream.read_var_at_nodes(var_ID, self.nodes, time_indices)
+        values = values.reshape(values.shape[0], self.nb_planes, len(self.nodes_2d))
+        return np.moveaxis(values.dot(self.weights.T), -1, 0)
+
+    def triangles(self, nb_frames):
+        """!
+        @brief Triangulation of the (time, Z) plane, the profile points being numbered frame by frame
+        @param nb_frames <int>: number of frames
+        @return <numpy.ndarray>: triangles with shape (number of triangles, 3)
+        """
+        first = (np.arange(1, nb_frames)[:, np.newaxis] * self.nb_planes + np.arange(self.nb_planes - 1)).ravel()
+        return np.vstack((np.column_stack((first, first + 1, first + 1 - self.nb_planes)),
+                          np.column_stack((first, first - self.nb_planes, first + 1 - self.nb_planes))))
@@ -2,11 +2,13 @@
 Simple computation/evaluation of variable values in Serafin
 """
 
+from itertools import chain
+from multiprocessing import Pool
 import numpy as np
 import re
-import shapefile
 
 from pyteltools.conf import settings
+from pyteltools.geom import Shapefile
 
 from . import Serafin
 from .util import logger
@@ -16,7 +18,11 @@ from .variables import do_calculation, get_available_variables, get_necessary_eq
 # constants
 OPERATORS = ['+', '-', '*', '/', '^', 'sqrt', 'sin', 'cos', 'atan']
 MAX, MIN, MEAN, ARRIVAL_DURATION, PROJECT, DIFF, REV_DIFF, \
-    MAX_BETWEEN, MIN_BETWEEN, SYNCH_MAX, SELECT_LAYER, VERTICAL_AGGREGATION = 0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11
+    MAX_BETWEEN, MIN_BETWEEN, SYNCH_MAX, SELECT_LAYER, VERTICAL_AGGREGATION, \
+    STATISTICS = 0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12
+
+# Temporal statistics (percentiles are identified by 'P' followed by the percentage, e.g. 'P90')
+TEMPORAL_STATISTICS = ['Max', 'Min', 'Mean', 'Var', 'Std']
 
 OPERATIONS = {'+': np.add, '-': np.subtract, '*': np.multiply, '/': np.divide, '^': np.power,
               'sqrt': np.sqrt, 'sin': np.sin, 'cos': np.cos, 'atan': np.arctan}
@@ -206,12 +212,13 @@ def is_valid_postfix(expression):
         return False
 
 
-def evaluate_expression(input_stream, time_index, expression):
+def evaluate_expression(input_stream, time_index, expression, values=None):
     """!
     @brief Evaluate a postfix expression on the input stream for a single frame
     @param input_stream <slf.Serafin.Read>: the input Serafin
     @param time_index <int>: the index of the frame
     @param expression <list>: the expression to evaluate in postfix format
+    @param values <{str: numpy.1D-array}>: values of the variables already read in this frame (optional)
     @return <numpy.1D-array>: the value of the expression
     """
     stack = []
@@ -227,7 +234,10 @@ def evaluate_expression(input_stream, time_index, expression):
                 stack.append(OPERATIONS[symbol](first_operand, second_operand))
         else:
             if symbol[0] == '[':  # variable ID
-                stack.append(input_stream.read_var_in_frame(time_index, symbol[1:-1]))
+                if values is not None and symbol[1:-1] in values:
+                    stack.append(values[symbol[1:-1]])
+                else:
+                    stack.append(input_stream.read_var_in_frame(time_index, symbol[1:-1]))
             else:  # constant
                 stack.append(float(symbol))
 
@@ -309,18 +319,21 @@ def slf_to_shp(slf_name, slf_header, shp_name, variables, time_index):
     key_order = coupled + non_coupled + [mother for mother, _, _ in mothers] \
                         + ['Angle(%s,%s)' % (brother, sister) for brother, sister in angles]
 
-    w = shapefile.Writer(shapefile.POINT)
-    for name in key_order:
-        w.field(name, 'N', decimal=4)
+    Shapefile.write_points(shp_name, slf_header.x, slf_header.y, [(name, values[name]) for name in key_order])
 
-    for i, (x, y) in enumerate(zip(slf_header.x, slf_header.y)):
-        w.point(x, y, shapeType=shapefile.POINT)
 
-        val = []
-        for var in key_order:
-            val.append(values[var][i])
-        w.record(*val)
-    w.save(shp_name)
+def format_rows(fmt, columns, chunk_size=100000):
+    """!
+    @brief Format rows of values by blocks of lines (one `str.format` call per block instead of one per row)
+    @param fmt <str>: format of a row (with one automatically numbered field per column)
+    @param columns <[numpy.1D-array]>: values of every column (same length)
+    @param chunk_size <int>: number of rows per block
+    @return <generator>: text blocks
+    """
+    nb_rows = len(columns[0])
+    for start in range(0, nb_rows, chunk_size):
+        values = [column[start:start+chunk_size].tolist() for column in columns]
+        yield (fmt * len(values[0])).format(*chain.from_iterable(zip(*values)))
 
 
 def slf_to_xml(slf_name, slf_header, xml_name, scalar, time_index):
@@ -350,13 +363,16 @@ def slf_to_xml(slf_name, slf_header, xml_name, scalar, time_index):
         xml.write('    <Surface name="%s at frame %i/%i">\n' % (scalar, time_index+1, slf_header.nb_frames))
         xml.write('      <Definition surfType="TIN">\n')
         xml.write('        <Pnts>\n')
-        for i, (x, y, z) in enumerate(zip(slf_header.x, slf_header.y, scalar_values)):
-            fmt_values = settings.FMT_COORD + ' ' + settings.FMT_COORD + ' ' + settings.FMT_FLOAT
-            xml.write(('          <P id="{}">' + fmt_values + '</P>\n').format(i+1, y, x, z))
+        fmt_values = settings.FMT_COORD + ' ' + settings.FMT_COORD + ' ' + settings.FMT_FLOAT
+        for block in format_rows('          <P id="{}">' + fmt_values + '</P>\n',
+                                 [np.arange(1, slf_header.nb_nodes + 1), slf_header.y, slf_header.x, scalar_values]):
+            xml.write(block)
         xml.write('        </Pnts>\n')
         xml.write('        <Faces>\n')
-        for i, (a, b, c) in enumerate(slf_header.ikle_2d):
-            xml.write('          <F id="%d">%d %d %d</F>\n' % (i+1, a, b, c))
+        ikle = slf_header.ikle_2d
+        for block in format_rows('          <F id="{}">{} {} {}</F>\n',
+                                 [np.arange(1, len(ikle) + 1), ikle[:, 0], ikle[:, 1], ikle[:, 2]]):
+            xml.write(block)
         xml.write('        </Faces>\n')
         xml.write('      </Definition>\n')
         xml.write('    </Surface>\n')
@@ -364,7 +380,8 @@ def slf_to_xml(slf_name, slf_header, xml_name, scalar, time_index):
         xml.write('</LandXML>\n')
 
 
-def slf_to_vtk(is_2d, slf_name, slf_header, vtk_name, scalars, vectors, variable_names, time_index):
+def slf_to_vtk(is_2d, slf_name, slf_header, vtk_name, scalars, vectors, variable_names, time_index,
+               input_stream=None):
     """!
     @brief Write vtk file from a scalar variable of a Serafin file
     @param is_2d <bool>: True if the input file is 2D
@@ -374,119 +391,128 @@ def slf_to_vtk(is_2d, slf_name, slf_header, vtk_name, scalars, vectors, variable
     @param scalars <str>: scalar variables
     @param vectors <tuple of str>: vector variables
     @param time_index <int>: the index of the frame (0-based)
+    @param input_stream <slf.Serafin.Read>: already opened input stream (optional, avoids reopening the file)
     """
     if is_2d:
-        slf_to_vtk_2d(slf_name, slf_header, vtk_name, scalars, vectors, variable_names, time_index)
+        slf_to_vtk_2d(slf_name, slf_header, vtk_name, scalars, vectors, variable_names, time_index, input_stream)
     else:
-        slf_to_vtk_3d(slf_name, slf_header, vtk_name, scalars, vectors, variable_names, time_index)
-
-
-def slf_to_vtk_2d(slf_name, slf_header, vtk_name, scalars, vectors, variable_names, time_index):
-    with Serafin.Read(slf_name, slf_header.language) as input_stream:
-        input_stream.header = slf_header
-
-        with open(vtk_name, 'w') as output_stream:
-            # write header
-            header = '# vtk DataFile Version 2.0\nMesh export\nASCII\nDATASET UNSTRUCTURED_GRID\n\n'
-            output_stream.write(header)
-
-            # write vertices
-            output_stream.write('POINTS %d float\n' % slf_header.nb_nodes)
-            for ix, iy in zip(slf_header.x, slf_header.y):
-                output_stream.write('%s %s 0.\n' % (settings.FMT_COORD.format(ix), settings.FMT_COORD.format(iy)))
+        slf_to_vtk_3d(slf_name, slf_header, vtk_name, scalars, vectors, variable_names, time_index, input_stream)
+
+
+def slf_to_vtk_2d(slf_name, slf_header, vtk_name, scalars, vectors, variable_names, time_index, input_stream=None):
+    if input_stream is None:
+        with Serafin.Read(slf_name, slf_header.language) as input_stream:
+            input_stream.header = slf_header
+            slf_to_vtk_2d(slf_name, slf_header, vtk_name, scalars, vectors, variable_names, time_index,
+                          input_stream)
+        return
+
+    with open(vtk_name, 'w') as output_stream:
+        # write header
+        header = '# vtk DataFile Version 2.0\nMesh export\nASCII\nDATASET UNSTRUCTURED_GRID\n\n'
+        output_stream.write(header)
+
+        # write vertices
+        output_stream.write('POINTS %d float\n' % slf_header.nb_nodes)
+        for ix, iy in zip(slf_header.x, slf_header.y):
+            output_stream.write('%s %s 0.\n' % (settings.FMT_COORD.format(ix), settings.FMT_COORD.format(iy)))
+        output_stream.write('\n')
+
+        # write cells
+        output_stream.write('CELLS %d %d\n' % (slf_header.nb_elements, slf_header.nb_elements * 4))
+
+        ikle = slf_header.ikle_2d - 1
+        for k1, k2, k3 in ikle:
+            output_stream.write('3 %d %d %d\n' % (k1, k2, k3))
+        output_stream.write('\n')
+
+        output_stream.write('CELL_TYPES %d\n' % slf_header.nb_elements)
+        for _ in range(slf_header.nb_elements):
+            output_stream.write('5\n')
+        output_stream.write('\n')
+
+        # write scalar and vector data
+        output_stream.write('POINT_DATA %d\n' % slf_header.nb_nodes)
+
+        for scalar in scalars:
+            values = input_stream.read_var_in_frame(time_index, scalar)
+            name = variable_names[scalar]
+
+            output_stream.write('SCALARS %s float\nLOOKUP_TABLE default\n' % name)
+            for v in values:
+                output_stream.write(settings.FMT_FLOAT.format(v) + '\n')
             output_stream.write('\n')
 
-            # write cells
-            output_stream.write('CELLS %d %d\n' % (slf_header.nb_elements, slf_header.nb_elements * 4))
+        for triple in vectors:
+            u_values = input_stream.read_var_in_frame(time_index, triple[0])
+            v_values = input_stream.read_var_in_frame(time_index, triple[1])
+            name = variable_names[triple]
 
-            ikle = slf_header.ikle_2d - 1
-            for k1, k2, k3 in ikle:
-                output_stream.write('3 %d %d %d\n' % (k1, k2, k3))
+            output_stream.write('VECTORS %s float\n' % name)
+            for u, v in zip(u_values, v_values):
+                output_stream.write('%s %s 0.\n' % (settings.FMT_FLOAT.format(u), settings.FMT_FLOAT.format(v)))
             output_stream.write('\n')
 
-            output_stream.write('CELL_TYPES %d\n' % slf_header.nb_elements)
-            for _ in range(slf_header.nb_elements):
-                output_stream.write('5\n')
-            output_stream.write('\n')
-
-            # write scalar and vector data
-            output_stream.write('POINT_DATA %d\n' % slf_header.nb_nodes)
-
-            for scalar in scalars:
-                values = input_stream.read_var_in_frame(time_index, scalar)
-                name = variable_names[scalar]
-
-                output_stream.write('SCALARS %s float\nLOOKUP_TABLE default\n' % name)
-                for v in values:
-                    output_stream.write(settings.FMT_FLOAT.format(v) + '\n')
-                output_stream.write('\n')
-
-            for triple in vectors:
-                u_values = input_stream.read_var_in_frame(time_index, triple[0])
-                v_values = input_stream.read_var_in_frame(time_index, triple[1])
-                name = variable_names[triple]
-
-                output_stream.write('VECTORS %s float\n' % name)
-                for u, v in zip(u_values, v_values):
-                    output_stream.write('%s %s 0.\n' % (settings.FMT_FLOAT.format(u), settings.FMT_FLOAT.format(v)))
-                output_stream.write('\n')
-
-
-def slf_to_vtk_3d(slf_name, slf_header, vtk_name, scalars, vectors, variable_names, time_index):
-    with Serafin.Read(slf_name, slf_header.language) as input_stream:
-        input_stream.header = slf_header
-
-        with open(vtk_name, 'w') as output_stream:
-            # write header
-            header = '# vtk DataFile Version 2.0\nMesh export\nASCII\nDATASET UNSTRUCTURED_GRID\n\n'
-            output_stream.write(header)
 
-            # read z values
-            z = input_stream.read_var_in_frame(time_index, 'Z')
-
-            # write vertices
-            output_stream.write('POINTS %d float\n' % slf_header.nb_nodes)
-            for ix, iy, iz in zip(slf_header.x, slf_header.y, z):
-                output_stream.write((settings.FMT_COORD + ' ' + settings.FMT_COORD + ' ' + settings.FMT_FLOAT +
-                                     '\n').format(ix, iy, iz))
+def slf_to_vtk_3d(slf_name, slf_header, vtk_name, scalars, vectors, variable_names, time_index, input_stream=None):
+    if input_stream is None:
+        with Serafin.Read(slf_name, slf_header.language) as input_stream:
+            input_stream.header = slf_header
+            slf_to_vtk_3d(slf_name, slf_header, vtk_name, scalars, vectors, variable_names, time_index,
+                          input_stream)
+        return
+
+    with open(vtk_name, 'w') as output_stream:
+        # write header
+        header = '# vtk DataFile Version 2.0\nMesh export\nASCII\nDATASET UNSTRUCTURED_GRID\n\n'
+        output_stream.write(header)
+
+        # read z values
+        z = input_stream.read_var_in_frame(time_index, 'Z')
+
+        # write vertices
+        output_stream.write('POINTS %d float\n' % slf_header.nb_nodes)
+        for ix, iy, iz in zip(slf_header.x, slf_header.y, z):
+            output_stream.write((settings.FMT_COORD + ' ' + settings.FMT_COORD + ' ' + settings.FMT_FLOAT +
+                                 '\n').format(ix, iy, iz))
+        output_stream.write('\n')
+
+        # write cells
+        output_stream.write('CELLS %d %d\n' % (slf_header.nb_elements, slf_header.nb_elements * 7))
+
+        ikle = slf_header.ikle.reshape(slf_header.nb_elements, 6) - 1
+        for k1, k2, k3, k4, k5, k6 in ikle:
+            output_stream.write('6 %d %d %d %d %d %d\n' % (k1, k2, k3, k4, k5, k6))
+        output_stream.write('\n')
+
+        output_stream.write('CELL_TYPES %d\n' % slf_header.nb_elements)
+        for _ in range(slf_header.nb_elements):
+            output_stream.write('13\n')
+        output_stream.write('\n')
+
+        # write scalar and vector data
+        output_stream.write('POINT_DATA %d\n' % slf_header.nb_nodes)
+
+        for scalar in scalars:
+            values = input_stream.read_var_in_frame(time_index, scalar)
+            name = variable_names[scalar]
+
+            output_stream.write('SCALARS %s float\nLOOKUP_TABLE default\n' % name)
+            for v in values:
+                output_stream.write(settings.FMT_FLOAT.format(v) + '\n')
             output_stream.write('\n')
 
-            # write cells
-            output_stream.write('CELLS %d %d\n' % (slf_header.nb_elements, slf_header.nb_elements * 7))
-
-            ikle = slf_header.ikle.reshape(slf_header.nb_elements, 6) - 1
-            for k1, k2, k3, k4, k5, k6 in ikle:
-                output_stream.write('6 %d %d %d %d %d %d\n' % (k1, k2, k3, k4, k5, k6))
-            output_stream.write('\n')
+        for triple in vectors:
+            u_values = input_stream.read_var_in_frame(time_index, triple[0])
+            v_values = input_stream.read_var_in_frame(time_index, triple[1])
+            w_values = input_stream.read_var_in_frame(time_index, triple[2])
+            name = variable_names[triple]
 
-            output_stream.write('CELL_TYPES %d\n' % slf_header.nb_elements)
-            for _ in range(slf_header.nb_elements):
-                output_stream.write('13\n')
+            output_stream.write('VECTORS %s float\n' % name)
+            for u, v, w in zip(u_values, v_values, w_values):
+                output_stream.write(' '.join([settings.FMT_FLOAT.format(x) for x in (u, v, w)]) + '\n')
             output_stream.write('\n')
 
-            # write scalar and vector data
-            output_stream.write('POINT_DATA %d\n' % slf_header.nb_nodes)
-
-            for scalar in scalars:
-                values = input_stream.read_var_in_frame(time_index, scalar)
-                name = variable_names[scalar]
-
-                output_stream.write('SCALARS %s float\nLOOKUP_TABLE default\n' % name)
-                for v in values:
-                    output_stream.write(settings.FMT_FLOAT.format(v) + '\n')
-                output_stream.write('\n')
-
-            for triple in vectors:
-                u_values = input_stream.read_var_in_frame(time_index, triple[0])
-                v_values = input_stream.read_var_in_frame(time_index, triple[1])
-                w_values = input_stream.read_var_in_frame(time_index, triple[2])
-                name = variable_names[triple]
-
-                output_stream.write('VECTORS %s float\n' % name)
-                for u, v, w in zip(u_values, v_values, w_values):
-                    output_stream.write(' '.join([settings.FMT_FLOAT.format(x) for x in (u, v, w)]) + '\n')
-                output_stream.write('\n')
-
 
 class ScalarMaxMinMeanCalculator:
     """!
@@ -503,12 +529,15 @@ class ScalarMaxMinMeanCalculator:
         self.additional_equations = additional_equations
 
         if self.maxmin == MAX:
-            self.current_values = np.ones((self.nb_var, self.nb_nodes)) * (-float('Inf'))
+            self.current_values = np.full((self.nb_var, self.nb_nodes), -float('Inf'))
         elif self.maxmin == MIN:
-            self.current_values = np.ones((self.nb_var, self.nb_nodes)) * float('Inf')
+            self.current_values = np.full((self.nb_var, self.nb_nodes), float('Inf'))
         else:
             self.current_values = np.zeros((self.nb_var, self.nb_nodes))
 
+        # frame buffer, filled in place at every frame
+        self.values = np.empty((self.nb_var, self.nb_nodes))
+
     def additional_computation_in_frame(self, time_index):
         computed_values = {}
         for equation in self.additional_equations:
@@ -529,19 +558,19 @@ class ScalarMaxMinMeanCalculator:
         else:
             computed_values = {}
 
-        values = np.empty((self.nb_var, self.nb_nodes))
         for i, (var, name, unit) in enumerate(self.selected_scalars):
-            if var not in computed_values:
-                computed_values[var] = self.input_stream.read_var_in_frame(time_index, var)
-            values[i, :] = computed_values[var]
+            if var in computed_values:
+                self.values[i, :] = computed_values[var]
+            else:
+                computed_values[var] = self.input_stream.read_var_in_frame(time_index, var, out=self.values[i])
 
         with np.errstate(invalid='ignore'):
             if self.maxmin == MAX:
-                self.current_values = np.maximum(self.current_values, values)
+                np.maximum(self.current_values, self.values, out=self.current_values)
             elif self.maxmin == MIN:
-                self.current_values = np.minimum(self.current_values, values)
+                np.minimum(self.current_values, self.values, out=self.current_values)
             else:
-                self.current_values += values
+                self.current_values += self.values
 
     def finishing_up(self):
         if self.maxmin == MEAN:
@@ -557,6 +586,7 @@ class VerticalMaxMinMeanCalculator:
     """!
     Compute max/min/mean of 3D scalar variables from a Serafin input stream
     Variable Z has to be present in the input Serafin
+    Frames can be processed by batches: all the buffers have a leading frame axis and are reused between calls
     """
     def __init__(self, operation, input_stream, output_header, selected_vars, add_vars=[]):
         if operation not in (MIN, MAX, MEAN):
@@ -568,91 +598,131 @@ class VerticalMaxMinMeanCalculator:
         scalars, vectors, additional_equations = scalars_vectors_3d(output_header.var_IDs,  selected_vars)
         self.selected_scalars = scalars
         self.selected_vectors = vectors
+        if operation == MEAN:  # magnitudes are only needed to select the vector components
+            additional_equations = get_necessary_equations(output_header.var_IDs,
+                                                           list(map(lambda x: x[0], selected_vars)),
+                                                           is_2d=False, us_equation=None)
         self.additional_equations = additional_equations
 
         self.nb_var = len(scalars) + len(vectors) + len(add_vars)
         self.nb_nodes_2d = input_stream.header.nb_nodes_2d
         self.nb_planes = input_stream.header.nb_planes
 
+        # variables read from the input stream, the others are computed by the additional equations
+        needed_vars = []
+        for equation in self.additional_equations:
+            needed_vars.extend(map(lambda x: x.ID(), equation.input))
+        needed_vars.extend(map(lambda x: x[0], scalars + vectors))
+        if operation != MEAN:
+            needed_vars.extend(map(lambda x: _VECTORS_3D[x[0]][2], vectors))
+        needed_vars.append('Z')
+        computed_vars = list(map(lambda x: x.output.ID(), self.additional_equations))
+        self.read_vars = []
+        for var_ID in needed_vars:
+            if var_ID not in computed_vars and var_ID not in self.read_vars:
+                self.read_vars.append(var_ID)
+
+        self.batch_size = 0
+        self._allocate(1)
+
+    def _allocate(self, batch_size):
+        """!
+        @brief (Re)allocate the buffers to process up to `batch_size` frames at once
+        @param batch_size <int>: number of frames
+        """
+        self.batch_size = batch_size
+        shape_3d = (batch_size, self.nb_planes, self.nb_nodes_2d)
+        self.values = {var_ID: np.empty(shape_3d) for var_ID in self.read_vars}
+        self.vars_2d = np.empty((batch_size, self.nb_var, self.nb_nodes_2d))
+        if self.operation == MEAN:
+            self.diff = np.empty((batch_size, self.nb_planes - 1, self.nb_nodes_2d))
+            self.weight = np.empty(shape_3d)
+            self.height = np.empty((batch_size, 1, self.nb_nodes_2d))
+
     def get_variables(self):
         return self.selected_scalars + self.selected_vectors
 
-    def _additional_computation_in_frame(self, time_index):
-        computed_values = {}
+    def _read_frames(self, time_indices):
+        nb_frames = len(time_indices)
+        values = {}
+        for var_ID in self.read_vars:
+            buffer = self.values[var_ID][:nb_frames]
+            for k, time_index in enumerate(time_indices):
+                self.input_stream.read_var_in_frame(time_index, var_ID, out=buffer[k].reshape(-1))
+            values[var_ID] = buffer
         for equation in self.additional_equations:
-            input_var_IDs = list(map(lambda x: x.ID(), equation.input))
-
-            # read (if needed) input variables values
-            for input_var_ID in input_var_IDs:
-                if input_var_ID not in computed_values:
-                    computed_values[input_var_ID] = self.input_stream.read_var_in_frame_as_3d(time_index, input_var_ID)
-            # compute additional variables
-            output_values = do_calculation(equation, [computed_values[var_ID] for var_ID in input_var_IDs])
-            computed_values[equation.output.ID()] = output_values.reshape((self.nb_planes, self.nb_nodes_2d))
-            print(equation.output.ID())
-        return computed_values
+            values[equation.output.ID()] = do_calculation(equation, [values[var.ID()] for var in equation.input])
+        return values
 
-    def max_min_mean_in_frame(self, time_index, add_vars=[]):
+    def _compute_weight(self, Z):
         """!
-
+        @brief Compute dimensionless layer ponderations for mean operation
+        @param Z <numpy 3D-array>: elevations with shape (number of frames, planes number, number of 2D nodes)
+        @return <numpy 3D-array>: weights of the planes (with the same shape as Z), summing to 1 over the vertical
         """
-        if self.additional_equations is not None:
-            computed_values = self._additional_computation_in_frame(time_index)
-        else:
-            computed_values = {}
+        nb_frames = Z.shape[0]
+        diff = np.subtract(Z[:, 1:], Z[:, :-1], out=self.diff[:nb_frames])
+        weight = self.weight[:nb_frames]
+        weight[:, :-1] = diff
+        weight[:, -1] = 0.0
+        weight[:, 1:] += diff
+        height = np.subtract(Z[:, -1:], Z[:, :1], out=self.height[:nb_frames])
+        height *= 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weight /= height
+        return weight
 
-        for i, (var, name, unit) in enumerate(self.selected_scalars + self.selected_vectors):
-            if var not in computed_values:
-                computed_values[var] = self.input_stream.read_var_in_frame_as_3d(time_index, var)
-        Z = computed_values['Z']
+    def max_min_mean_in_frames(self, time_indices):
+        """!
+        @brief Compute the vertical operation on several frames at once
+        @param time_indices <[int]>: indices of the frames (0-based)
+        @return <numpy 3D-array>: values with shape (number of frames, number of variables, number of 2D nodes),
+            stored in a buffer which is overwritten by the next call
+        """
+        nb_frames = len(time_indices)
+        if nb_frames > self.batch_size:
+            self._allocate(nb_frames)
+        values = self._read_frames(time_indices)
+        Z = values['Z']
+        vars_2d = self.vars_2d[:nb_frames]
 
-        # Compute dimensionless layer ponderations for mean operation
-        weight = None
         if self.operation == MEAN:
-            diff_upper = Z - np.roll(Z, 1, axis=0)
-            diff_upper[0, :] = 0.0
-            diff_lower = np.roll(Z, -1, axis=0) - Z
-            diff_lower[-1, :] = 0.0
-            diff = (diff_upper + diff_lower) / 2
-            diff_sum = diff.sum(axis=0)
-            with np.errstate(divide='ignore', invalid='ignore'):
-                weight = diff / diff_sum
-            # weight.shape = (nb_planes, nb_nodes_2d)
-            # weight.sum(axis=0) = array([ 1.,  1.,  1., ...,  1.,  1.,  1.], dtype=float32)
-
-        vars_2d = np.empty((self.nb_var, self.nb_nodes_2d))
-        magnitude_index = {}
-        i = 0
-        for i, (var, name, unit) in enumerate(self.selected_scalars + self.selected_vectors):
-            if self.operation == MEAN:
-                var_3d = weight * computed_values[var]
-                vars_2d[i, :] = var_3d.sum(axis=0)
-            else:
-                if var in [v for v, _, _ in self.selected_scalars]:
+            weight = self._compute_weight(Z)
+            for i, (var, name, unit) in enumerate(self.selected_scalars + self.selected_vectors):
+                np.einsum('kpn,kpn->kn', weight, values[var], out=vars_2d[:, i])
+        else:
+            reduce = np.amax if self.operation == MAX else np.amin
+            for i, (var, name, unit) in enumerate(self.selected_scalars):
+                reduce(values[var], axis=1, out=vars_2d[:, i])
+            magnitude_index = {}
+            for i, (var, name, unit) in enumerate(self.selected_vectors, len(self.selected_scalars)):
+                mother = _VECTORS_3D[var][2]
+                if mother not in magnitude_index:
                     if self.operation == MAX:
-                        vars_2d[i, :] = np.amax(computed_values[var], axis=0)
-                    else:  # self.operation == MIN
-                        vars_2d[i, :] = np.amin(computed_values[var], axis=0)
-                else:  # var in self.selected_vectors
-                    _, _, mother = _VECTORS_3D[var]
-                    if mother not in magnitude_index:
-                        if self.operation == MAX:
-                            magnitude_index[mother] = np.argmax(computed_values[mother], axis=0)
-                        else:  # self.operation == MIN
-                            magnitude_index[mother] = np.argmin(computed_values[mother], axis=0)
-                    vars_2d[i, :] = np.choose(magnitude_index[mother], computed_values[var])
+                        magnitude_index[mother] = np.argmax(values[mother], axis=1)[:, np.newaxis, :]
+                    else:
+                        magnitude_index[mother] = np.argmin(values[mother], axis=1)[:, np.newaxis, :]
+                vars_2d[:, i] = np.take_along_axis(values[var], magnitude_index[mother], axis=1)[:, 0, :]
 
+        offset = len(self.selected_scalars) + len(self.selected_vectors)
         for j, var_ID in enumerate(self.add_vars):
-            pos = i + j + 1
+            pos = offset + j
             if var_ID == 'B':
-                vars_2d[pos, :] = Z[0, :]
+                vars_2d[:, pos] = Z[:, 0]
             elif var_ID == 'S':
-                vars_2d[pos, :] = Z[-1, :]
+                vars_2d[:, pos] = Z[:, -1]
             else:  # var_ID == 'H'
-                vars_2d[pos, :] = Z[-1, :] - Z[0, :]
-
+                np.subtract(Z[:, -1], Z[:, 0], out=vars_2d[:, pos])
         return vars_2d
 
+    def max_min_mean_in_frame(self, time_index):
+        """!
+        @brief Compute the vertical operation on a single frame
+        @param time_index <int>: the index of the frame (0-based)
+        @return <numpy 2D-array>: values with shape (number of variables, number of 2D nodes)
+        """
+        return self.max_min_mean_in_frames([time_index])[0]
+
 
 class VectorMaxMinMeanCalculator:
     """!
@@ -667,17 +737,29 @@ class VectorMaxMinMeanCalculator:
 
         self.nb_nodes = input_stream.header.nb_nodes
 
+        # magnitudes driving the max/min selection, shared by the components of a same vector
+        self.mothers = []
+        if self.maxmin != MEAN:
+            for var, _, _ in selected_vectors:
+                mother = _VECTORS_2D[var][1]
+                if mother not in self.mothers:
+                    self.mothers.append(mother)
+
+        if self.maxmin == MAX:
+            init_value = -float('Inf')
+        elif self.maxmin == MIN:
+            init_value = float('Inf')
+        else:
+            init_value = 0
         self.current_values = {}
         for var, _, _ in selected_vectors:
-            mother = _VECTORS_2D[var][1]
-            if self.maxmin == MAX:
-                self.current_values[var] = np.ones((self.nb_nodes,)) * (-float('Inf'))
-                self.current_values[mother] = np.ones((self.nb_nodes,)) * (-float('Inf'))
-            elif self.maxmin == MIN:
-                self.current_values[var] = np.ones((self.nb_nodes,)) * float('Inf')
-                self.current_values[mother] = np.ones((self.nb_nodes,)) * float('Inf')
-            else:
-                self.current_values[var] = np.zeros((self.nb_nodes,))
+            self.current_values[var] = np.full((self.nb_nodes,), init_value, dtype=np.float64)
+        for mother in self.mothers:
+            self.current_values[mother] = np.full((self.nb_nodes,), init_value, dtype=np.float64)
+
+        # frame buffers, filled in place at every frame
+        self.values = {var: np.empty((self.nb_nodes,)) for var in self.current_values}
+        self.flags = {mother: np.empty((self.nb_nodes,), dtype=bool) for mother in self.mothers}
 
     def additional_computation_in_frame(self, time_index):
         computed_values = {}
@@ -695,26 +777,23 @@ class VectorMaxMinMeanCalculator:
 
     def max_min_mean_in_frame(self, time_index):
         computed_values = self.additional_computation_in_frame(time_index)
+        for var in self.current_values:
+            if var not in computed_values:
+                computed_values[var] = self.input_stream.read_var_in_frame(time_index, var, out=self.values[var])
 
         if self.maxmin == MEAN:
             for var, _, _ in self.selected_vectors:
                 self.current_values[var] += computed_values[var]
             return
 
+        compare = np.greater if self.maxmin == MAX else np.less
+        with np.errstate(invalid='ignore'):
+            for mother in self.mothers:
+                compare(computed_values[mother], self.current_values[mother], out=self.flags[mother])
         for var, _, _ in self.selected_vectors:
-            mother = _VECTORS_2D[var][1]
-
-            if mother not in computed_values:
-                computed_values[mother] = self.input_stream.read_var_in_frame(time_index, mother)
-            if var not in computed_values:
-                computed_values[var] = self.input_stream.read_var_in_frame(time_index, var)
-
-            if self.maxmin == MAX:
-                self.current_values[var] = np.where(computed_values[mother] > self.current_values[mother],
-                                                    computed_values[var], self.current_values[var])
-            else:
-                self.current_values[var] = np.where(computed_values[mother] < self.current_values[mother],
-                                                    computed_values[var], self.current_values[var])
+            np.copyto(self.current_values[var], computed_values[var], where=self.flags[_VECTORS_2D[var][1]])
+        for mother in self.mothers:
+            np.copyto(self.current_values[mother], computed_values[mother], where=self.flags[mother])
 
     def finishing_up(self):
         values = np.empty((len(self.selected_vectors), self.nb_nodes))
@@ -730,57 +809,396 @@ class VectorMaxMinMeanCalculator:
             self.max_min_mean_in_frame(time_index)
 
 
+def is_valid_statistic(statistic):
+    """!
+    @brief Check if a temporal statistic identifier is valid
+    @param statistic <str>: statistic identifier (among `TEMPORAL_STATISTICS` or a percentile such as 'P90')
+    @return <bool>: True if the statistic is valid
+    """
+    if statistic in TEMPORAL_STATISTICS:
+        return True
+    if statistic[:1] != 'P':
+        return False
+    try:
+        percentage = float(statistic[1:])
+    except ValueError:
+        return False
+    return 0 < percentage < 100
+
+
+def parse_percentiles(text):
+    """!
+    @brief Convert percentages (separated by spaces or commas) to percentile statistic identifiers
+    @param text <str>: percentages, e.g. '10 50 90'
+    @return <[str]>: percentile statistics, e.g. ['P10', 'P50', 'P90']
+    """
+    statistics = []
+    for item in text.replace(',', ' ').split():
+        statistic = 'P%g' % float(item)
+        if not is_valid_statistic(statistic):
+            raise ValueError('Percentile %s is not strictly between 0 and 100' % item)
+        if statistic not in statistics:
+            statistics.append(statistic)
+    return statistics
+
+
+class PercentileEstimator:
+    """!
+    Streaming approximation of a percentile with the P-square algorithm (Jain & Chlamtac, 1985)
+    Each column of the observations (e.g. each node) has its own five markers, updated at once with array operations
+    """
+    def __init__(self, percentage, shape):
+        """!
+        @param percentage <float>: percentile to estimate (strictly between 0 and 100)
+        @param shape <tuple>: shape of the observation arrays
+        """
+        self.p = percentage / 100
+        self.shape = shape
+        self.nb_values = int(np.prod(shape))
+        self.nb_observations = 0
+
+        self.heights = np.empty((5, self.nb_values))
+        self.positions = np.tile(np.arange(1, 6, dtype=float).reshape(5, 1), (1, self.nb_values))
+        self.desired_positions = np.array([1, 1 + 2*self.p, 1 + 4*self.p, 3 + 2*self.p, 5])
+        self.increments = np.array([0, self.p/2, self.p, (1 + self.p)/2, 1])
+        self.marker_indices = np.arange(1, 5).reshape(4, 1)
+
+    def add(self, values):
+        """!
+        @brief Add a new observation
+        @param values <numpy.ndarray>: observed values (of shape `shape`)
+        """
+        x = values.reshape(self.nb_values)
+        if self.nb_observations < 5:
+            self.heights[self.nb_observations] = x
+            self.nb_observations += 1
+            if self.nb_observations == 5:
+                self.heights.sort(axis=0)
+            return
+        self.nb_observations += 1
+
+        q, n = self.heights, self.positions
+        np.minimum(q[0], x, out=q[0])
+        np.maximum(q[4], x, out=q[4])
+        cell = (x >= q[1]).astype(int)
+        cell += x >= q[2]
+        cell += x >= q[3]
+        n[1:] += self.marker_indices > cell
+        self.desired_positions += self.increments
+
+        for i in (1, 2, 3):
+            d = self.desired_positions[i] - n[i]
+            to_adjust = np.flatnonzero(((d >= 1) & (n[i+1] - n[i] > 1)) | ((d <= -1) & (n[i-1] - n[i] < -1)))
+            if to_adjust.size == 0:
+                continue
+            ds = np.sign(d[to_adjust])
+            q_prev, q_cur, q_next = q[i-1, to_adjust], q[i, to_adjust], q[i+1, to_adjust]
+            n_prev, n_cur, n_next = n[i-1, to_adjust], n[i, to_adjust], n[i+1, to_adjust]
+
+            # piecewise-parabolic prediction, replaced by a linear one if it is not monotonic
+            parabolic = q_cur + ds / (n_next - n_prev) * ((n_cur - n_prev + ds) * (q_next - q_cur) / (n_next - n_cur)
+                                                          + (n_next - n_cur - ds) * (q_cur - q_prev) / (n_cur - n_prev))
+            linear = np.where(ds > 0, q_cur + (q_next - q_cur) / (n_next - n_cur),
+                              q_cur - (q_prev - q_cur) / (n_prev - n_cur))
+            q[i, to_adjust] = np.where((q_prev < parabolic) & (parabolic < q_next), parabolic, linear)
+            n[i, to_adjust] += ds
+
+    def result(self):
+        """!
+        @brief Current estimation (exact percentile if less than five observations were added)
+        @return <numpy.ndarray>: estimated percentile (of shape `shape`)
+        """
+        if self.nb_observations == 0:
+            return np.full(self.shape, np.nan)
+        if self.nb_observations < 5:
+            return np.percentile(self.heights[:self.nb_observations], self.p * 100, axis=0).reshape(self.shape)
+        return self.heights[2].reshape(self.shape).copy()
+
+
+class StatisticsCalculator:
+    """!
+    Compute several temporal statistics of 2D variables in a single pass over a Serafin input stream
+    Available statistics are max, min, mean, variance (Welford algorithm), standard deviation and approximate percentiles.
+    For vectors, max and min values are taken when the magnitude reaches its extremum (as in VectorMaxMinMeanCalculator),
+    other statistics are computed on each component.
+    """
+    def __init__(self, statistics, input_stream, selected_scalars, selected_vectors, time_indices,
+                 additional_equations=None):
+        """!
+        @param statistics <[str]>: statistics to compute (among `TEMPORAL_STATISTICS` or percentiles such as 'P90')
+        @param input_stream <slf.Serafin.Read>: input Serafin stream
+        @param selected_scalars <[(str, bytes, bytes)]>: selected scalar variables (ID, name, unit)
+        @param selected_vectors <[(str, bytes, bytes)]>: selected vector variables (ID, name, unit)
+        @param time_indices <[int]>: list of frame indices
+        @param additional_equations <[slf.variables.Equation]>: equations to compute additional variables
+        """
+        for statistic in statistics:
+            if not is_valid_statistic(statistic):
+                raise NotImplementedError('Statistic %s is not supported' % statistic)
+        self.statistics = statistics
+        self.input_stream = input_stream
+        self.selected_scalars = selected_scalars
+        self.selected_vectors = selected_vectors
+        self.time_indices = time_indices
+        self.additional_equations = additional_equations
+
+        self.nb_scalars = len(selected_scalars)
+        self.nb_var = self.nb_scalars + len(selected_vectors)
+        self.nb_nodes = input_stream.header.nb_nodes
+        self.nb_frames = 0
+
+        shape = (self.nb_var, self.nb_nodes)
+        self.values = np.empty(shape)  # frame buffer (scalars first, then vectors)
+        self.buffer = np.empty(shape)
+        self.max_values, self.min_values, self.mean_values, self.m2_values, self.delta = None, None, None, None, None
+        if 'Max' in statistics:
+            self.max_values = np.full(shape, -float('Inf'))
+        if 'Min' in statistics:
+            self.min_values = np.full(shape, float('Inf'))
+        if any(stat in statistics for stat in ('Mean', 'Var', 'Std')):
+            self.mean_values = np.zeros(shape)
+        if 'Var' in statistics or 'Std' in statistics:
+            self.m2_values = np.zeros(shape)
+            self.delta = np.empty(shape)
+
+        self.percentiles = {stat: PercentileEstimator(float(stat[1:]), shape)
+                            for stat in statistics if stat not in TEMPORAL_STATISTICS}
+
+        # magnitudes of vectors to synchronize max and min components
+        self.mothers = [_VECTORS_2D[var][1] for var, _, _ in selected_vectors]
+        nb_vectors = len(selected_vectors)
+        self.mother_values = np.empty((nb_vectors, self.nb_nodes))
+        self.flags = np.empty((nb_vectors, self.nb_nodes), dtype=bool)
+        self.max_mothers, self.min_mothers = None, None
+        if selected_vectors:
+            if 'Max' in statistics:
+                self.max_mothers = np.full((nb_vectors, self.nb_nodes), -float('Inf'))
+            if 'Min' in statistics:
+                self.min_mothers = np.full((nb_vectors, self.nb_nodes), float('Inf'))
+
+    def output_variables(self):
+        """!
+        @brief Output variables (ID, name and unit) in the same order as the rows of `finishing_up`
+        @return <[(str, bytes, bytes)]>: list of output variables
+        """
+        variables = []
+        for statistic in self.statistics:
+            prefix = statistic.upper()
+            for var, name, unit in self.selected_scalars + self.selected_vectors:
+                new_name = bytes(prefix + ' ', Serafin.SLF_EIT) + name.strip()
+                new_unit = unit.strip() + b'^2' if statistic == 'Var' else unit
+                variables.append(('%s_%s' % (prefix, var), new_name[:16].ljust(16), new_unit[:16].ljust(16)))
+        return variables
+
+    def additional_computation_in_frame(self, time_index):
+        computed_values = {}
+        if self.additional_equations is None:
+            return computed_values
+        for equation in self.additional_equations:
+            input_var_IDs = list(map(lambda x: x.ID(), equation.input))
+
+            # read (if needed) input variables values
+            for input_var_ID in input_var_IDs:
+                if input_var_ID not in computed_values:
+                    computed_values[input_var_ID] = self.input_stream.read_var_in_frame(time_index, input_var_ID)
+            # compute additional variables
+            output_values = do_calculation(equation, [computed_values[var_ID] for var_ID in input_var_IDs])
+            computed_values[equation.output.ID()] = output_values
+        return computed_values
+
+    def statistics_in_frame(self, time_index):
+        computed_values = self.additional_computation_in_frame(time_index)
+        for i, (var, _, _) in enumerate(self.selected_scalars + self.selected_vectors):
+            if var not in computed_values:
+                computed_values[var] = self.input_stream.read_var_in_frame(time_index, var)
+            self.values[i, :] = computed_values[var]
+        for i, mother in enumerate(self.mothers):
+            if mother not in computed_values:
+                computed_values[mother] = self.input_stream.read_var_in_frame(time_index, mother)
+            self.mother_values[i, :] = computed_values[mother]
+        self.nb_frames += 1
+
+        scalars, vectors = slice(0, self.nb_scalars), slice(self.nb_scalars, self.nb_var)
+        with np.errstate(invalid='ignore'):
+            if self.max_values is not None:
+                np.maximum(self.max_values[scalars], self.values[scalars], out=self.max_values[scalars])
+                if self.max_mothers is not None:
+                    np.greater(self.mother_values, self.max_mothers, out=self.flags)
+                    np.copyto(self.max_values[vectors], self.values[vectors], where=self.flags)
+                    np.copyto(self.max_mothers, self.mother_values, where=self.flags)
+            if self.min_values is not None:
+                np.minimum(self.min_values[scalars], self.values[scalars], out=self.min_values[scalars])
+                if self.min_mothers is not None:
+                    np.less(self.mother_values, self.min_mothers, out=self.flags)
+                    np.copyto(self.min_values[vectors], self.values[vectors], where=self.flags)
+                    np.copyto(self.min_mothers, self.mother_values, where=self.flags)
+            if self.m2_values is not None:  # Welford update
+                np.subtract(self.values, self.mean_values, out=self.delta)
+                np.divide(self.delta, self.nb_frames, out=self.buffer)
+                self.mean_values += self.buffer
+                np.subtract(self.values, self.mean_values, out=self.buffer)
+                self.buffer *= self.delta
+                self.m2_values += self.buffer
+            elif self.mean_values is not None:
+                self.mean_values += self.values
+
+        for estimator in self.percentiles.values():
+            estimator.add(self.values)
+
+    def finishing_up(self):
+        """!
+        @brief Gather the requested statistics
+        @return <numpy.2D-array>: values of shape (number of statistics * number of variables, number of nodes)
+        """
+        values = np.empty((len(self.statistics) * self.nb_var, self.nb_nodes))
+        for i, statistic in enumerate(self.statistics):
+            rows = slice(i * self.nb_var, (i+1) * self.nb_var)
+            if statistic == 'Max':
+                values[rows] = self.max_values
+            elif statistic == 'Min':
+                values[rows] = self.min_values
+            elif statistic == 'Mean':
+                if self.m2_values is not None:
+                    values[rows] = self.mean_values
+                else:
+                    values[rows] = self.mean_values / self.nb_frames
+            elif statistic == 'Var':
+                values[rows] = self.m2_values / self.nb_frames
+            elif statistic == 'Std':
+                values[rows] = np.sqrt(self.m2_values / self.nb_frames)
+            else:
+                values[rows] = self.percentiles[statistic].result()
+        return values
+
+    def run(self):
+        for time_index in self.time_indices:
+            self.statistics_in_frame(time_index)
+
+
 class ArrivalDurationCalculator:
     """!
-    Compute arrival/duration of conditions from a Serafin input stream
+    Compute arrival/duration of several conditions from a Serafin input stream in a single pass
+    Variables shared by the conditions are read only once per frame.
+    Nodes are independent, so the computation can be restricted to a range of nodes.
     """
-    def __init__(self, input_stream, time_indices, condition):
+    def __init__(self, input_stream, time_indices, conditions, node_range=None):
         self.input_stream = input_stream
         self.time_indices = time_indices
-        self.expression = condition.expression
-        self.test_condition = condition.test_condition
+        self.conditions = conditions
+        if node_range is None:
+            node_range = (0, input_stream.header.nb_nodes)
+        self.node_range = node_range
+        self.is_full_range = node_range == (0, input_stream.header.nb_nodes)
+
+        self.var_IDs = []
+        for condition in conditions:
+            for symbol in condition.expression:
+                if symbol not in OPERATORS and symbol[0] == '[' and symbol[1:-1] not in self.var_IDs:
+                    self.var_IDs.append(symbol[1:-1])
+
+        shape = (len(conditions), node_range[1] - node_range[0])
+        self.previous_value = np.empty(shape)
+        self.current_value = np.empty(shape)
+        self.previous_flag = np.empty(shape, dtype=bool)
+        self.current_flag = np.empty(shape, dtype=bool)
+        self.flips = np.empty(shape, dtype=bool)
+        self.t_star = np.empty(shape)
+        self.buffer = np.empty(shape)
 
         # first
         self.previous_time = self.input_stream.time[self.time_indices[0]]
-        self.previous_value = evaluate_expression(self.input_stream, self.time_indices[0], self.expression)
-        self.previous_flag = self.test_condition(self.previous_value)
+        self._evaluate_conditions(self.time_indices[0], self.previous_value, self.previous_flag)
 
-        self.duration = np.zeros((self.input_stream.header.nb_nodes,))
+        self.duration = np.zeros(shape)
         self.arrival = np.where(self.previous_flag, self.previous_time, float('Inf'))
-        self.previous_flip = np.ones((input_stream.header.nb_nodes,)) * self.previous_time
+        self.previous_flip = np.full(shape, self.previous_time)
+
+    def _read_var(self, time_index, var_ID):
+        if self.is_full_range:
+            return self.input_stream.read_var_in_frame(time_index, var_ID)
+        return self.input_stream.read_var_in_frame_in_range(time_index, var_ID, *self.node_range)
+
+    def _evaluate_conditions(self, time_index, values, flags):
+        var_values = {var_ID: self._read_var(time_index, var_ID) for var_ID in self.var_IDs}
+        for i, condition in enumerate(self.conditions):
+            values[i, :] = evaluate_expression(self.input_stream, time_index, condition.expression, var_values)
+            flags[i, :] = condition.test_condition(values[i])
 
     def arrival_duration_in_frame(self, index):
         current_time = self.input_stream.time[index]
-        current_value = evaluate_expression(self.input_stream, index, self.expression)
+        self._evaluate_conditions(index, self.current_value, self.current_flag)
         with np.errstate(divide='ignore', invalid='ignore'):
-            t_star = (current_value * self.previous_time - self.previous_value * current_time) \
-                     / (current_value - self.previous_value)
-            new_arrival = np.minimum(self.arrival, t_star)
-
-        current_flag = self.test_condition(current_value)
-        flip_forward = np.logical_and(current_flag, np.logical_not(self.previous_flag))
-        flip_backward = np.logical_and(self.previous_flag, np.logical_not(current_flag))
-
+            np.multiply(self.current_value, self.previous_time, out=self.t_star)
+            np.multiply(self.previous_value, current_time, out=self.buffer)
+            self.t_star -= self.buffer
+            np.subtract(self.current_value, self.previous_value, out=self.buffer)
+            self.t_star /= self.buffer
+
+        # duration increment for the conditions which stop being verified
+        np.subtract(self.t_star, self.previous_flip, out=self.buffer)
         if index == self.time_indices[-1]:  # last
-            self.duration = np.where(np.logical_and(self.previous_flag, current_flag),
-                                     self. duration + self.input_stream.time[index] - self.previous_flip,
-                                     np.where(self.previous_flag, self.duration + t_star - self.previous_flip,
-                                              self.duration))
+            # conditions still verified last until the end
+            np.logical_and(self.previous_flag, self.current_flag, out=self.flips)
+            np.subtract(current_time, self.previous_flip, out=self.buffer, where=self.flips)
+            np.add(self.duration, self.buffer, out=self.duration, where=self.previous_flag)
         else:
-            self.duration = np.where(flip_backward, self.duration + t_star - self.previous_flip, self.duration)
+            np.greater(self.previous_flag, self.current_flag, out=self.flips)  # flip backward
+            np.add(self.duration, self.buffer, out=self.duration, where=self.flips)
 
-        self.arrival = np.where(flip_forward, new_arrival, self.arrival)
+        np.greater(self.current_flag, self.previous_flag, out=self.flips)  # flip forward
+        with np.errstate(invalid='ignore'):
+            np.minimum(self.arrival, self.t_star, out=self.buffer)
+        np.copyto(self.arrival, self.buffer, where=self.flips)
+        np.copyto(self.previous_flip, self.t_star, where=self.flips)
 
-        self.previous_flip = np.where(flip_forward, t_star, self.previous_flip)
-        self.previous_flag = current_flag
-        self.previous_value = current_value
+        self.previous_flag, self.current_flag = self.current_flag, self.previous_flag
+        self.previous_value, self.current_value = self.current_value, self.previous_value
         self.previous_time = current_time
 
+    def finishing_up(self):
+        """!
+        @brief Gather the arrival and duration of every condition
+        @return <numpy 2D-array>: values with shape (2 * number of conditions, number of nodes in range)
+        """
+        values = np.empty((2 * len(self.conditions), self.arrival.shape[1]))
+        values[0::2, :] = self.arrival
+        values[1::2, :] = self.duration
+        return values
+
     def run(self):
         for index in self.time_indices[1:]:
             self.arrival_duration_in_frame(index)
 
 
+def _arrival_duration_in_node_range(filename, language, header, time, time_indices, conditions, node_range):
+    with Serafin.Read(filename, language) as input_stream:
+        input_stream.header = header
+        input_stream.time = time
+        calculator = ArrivalDurationCalculator(input_stream, time_indices, conditions, node_range)
+        calculator.run()
+        return calculator.finishing_up()
+
+
+def arrival_duration_in_parallel(filename, language, header, time, time_indices, conditions, nb_processes):
+    """!
+    @brief Compute arrival/duration of conditions, splitting the nodes in ranges handled by separate processes
+    @param filename <str>: path to the input Serafin file
+    @param language <str>: language for variables detection
+    @param header <slf.Serafin.SerafinHeader>: input header
+    @param time <[float]>: input time series
+    @param time_indices <[int]>: indices of the frames (0-based)
+    @param conditions <[Condition]>: conditions
+    @param nb_processes <int>: number of processes (and node ranges)
+    @return <numpy 2D-array>: values with shape (2 * number of conditions, number of nodes)
+    """
+    bounds = np.linspace(0, header.nb_nodes, nb_processes + 1).astype(int)
+    tasks = [(filename, language, header, time, time_indices, conditions, (int(start), int(stop)))
+             for start, stop in zip(bounds[:-1], bounds[1:])]
+    with Pool(nb_processes) as pool:
+        results = pool.starmap(_arrival_duration_in_node_range, tasks)
+    return np.hstack(results)
+
+
 class Condition:
     """!
     Condition to compare a variable with a threshold for arrival/duration
@@ -800,6 +1218,10 @@ class Condition:
         else:
             self.test_condition = lambda value: value <= self.threshold
 
+    def __reduce__(self):
+        # `test_condition` can not be pickled, it is rebuilt from the constructor arguments
+        return Condition, (self.expression, self.literal_expression, self.comparator, self.threshold)
+
     def __repr__(self):
         return ' '.join(self.expression) + ' %s %s' % (self.comparator, str(self.threshold))
 
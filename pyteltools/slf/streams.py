@@ -0,0 +1,310 @@
+"""!
+Composable streams of Serafin frames
+
+A frame stream is an output header with an iterable of frames `(time, values)`, where `values` is an array of shape
+(number of variables, number of nodes) matching the header. Operators are stages: functions taking a stream and
+returning a new stream whose frames are produced by a generator. A chain of stages thus reads, transforms and writes
+one frame at a time (the temporal reductions only keep their accumulators in memory):
+
+    stream = read_frames(input_stream, selected_vars, time_indices, equations)
+    stream = stream.pipe(select_layer(1), temporal_reduction(MAX), single_precision())
+    write_frames(stream, output_stream)
+
+The values of a frame may be stored in a buffer reused for the next frame: stages keeping values between frames
+have to copy them.
+"""
+
+import numpy as np
+
+from .misc import _VECTORS_2D, MAX, MEAN, MIN, scalars_vectors, SELECT_LAYER, SYNCH_MAX, VERTICAL_AGGREGATION, \
+    VerticalMaxMinMeanCalculator
+from .variables import EquationPlan
+
+
+TEMPORAL_OPERATORS = (MAX, MIN, MEAN, SYNCH_MAX)
+STREAM_OPERATORS = (None, SELECT_LAYER, VERTICAL_AGGREGATION) + TEMPORAL_OPERATORS
+VERTICAL_OPERATORS = {'Max': MAX, 'Min': MIN, 'Mean': MEAN}
+
+
+class FrameStream:
+    """!
+    @brief Serafin header and iterable of the frames (time, values) matching this header
+    """
+    def __init__(self, header, frames):
+        """!
+        @param header <slf.Serafin.SerafinHeader>: header of the frames
+        @param frames <iterable>: frames as tuples (time, values)
+        """
+        self.header = header
+        self.frames = frames
+
+    def __iter__(self):
+        return iter(self.frames)
+
+    def pipe(self, *stages):
+        """!
+        @brief Apply successive stages
+        @param stages <[function]>: functions taking a stream and returning a new stream
+        @return <FrameStream>: output stream of the last stage
+        """
+        stream = self
+        for stage in stages:
+            stream = stage(stream)
+        return stream
+
+
+def read_frames(input_stream, selected_vars, time_indices, equations, us_equation=None, batch_size=1):
+    """!
+    @brief Source stream computing the selected variables in the selected frames
+    @param input_stream <slf.Serafin.Read>: opened input stream
+    @param selected_vars <[(str, bytes, bytes)]>: ID, name and unit of the variables
+    @param time_indices <[int]>: indices of the frames (0-based)
+    @param equations <[slf.variables_utils.Equation]>: equations to compute the variables which are not in the input
+    @param us_equation <slf.variables_utils.Equation>: user-specified friction law equation
+    @param batch_size <int>: number of frames computed at once
+    @return <FrameStream>: stream of the frames
+    """
+    header = input_stream.header.copy()
+    header.set_variables(selected_vars)
+    equation_plan = EquationPlan(equations, [var for var, _, _ in selected_vars], header.np_float_type,
+                                 header.is_2d, us_equation)
+    time_indices = list(time_indices)
+
+    def frames():
+        for start in range(0, len(time_indices), batch_size):
+            batch = time_indices[start:start + batch_size]
+            for time_index, values in zip(batch, equation_plan.evaluate_block(input_stream, batch)):
+                yield input_stream.time[time_index], values
+    return FrameStream(header, frames())
+
+
+def aggregate_vertically(input_stream, selected_vars, time_indices, operation):
+    """!
+    @brief Source stream of the vertical max/min/mean of 3D variables (the variable Z has to be in the input)
+    @param input_stream <slf.Serafin.Read>: opened 3D input stream
+    @param selected_vars <[(str, bytes, bytes)]>: ID, name and unit of the variables
+    @param time_indices <[int]>: indices of the frames (0-based)
+    @param operation <int>: MAX, MIN or MEAN
+    @return <FrameStream>: stream of the 2D frames (scalars first, then vectors)
+    """
+    header = input_stream.header.copy_as_2d()
+    calculator = VerticalMaxMinMeanCalculator(operation, input_stream, header, selected_vars)
+    header.set_variables(calculator.get_variables())
+
+    def frames():
+        for time_index in time_indices:
+            yield input_stream.time[time_index], calculator.max_min_mean_in_frame(time_index)
+    return FrameStream(header, frames())
+
+
+def _output_rows(header, output_vars):
+    """!
+    @brief Header and row indices of the variables kept in the output of a stage (all if `output_vars` is None)
+    """
+    if output_vars is None:
+        rows = list(range(len(header.var_IDs)))
+    else:
+        rows = [header.var_IDs.index(var) for var in output_vars]
+    output_header = header.copy()
+    output_header.set_variables([(header.var_IDs[i], header.var_names[i], header.var_units[i]) for i in rows])
+    return output_header, rows
+
+
+def select_layer(layer):
+    """!
+    @brief Stage extracting a single layer of 3D frames
+    @param layer <int>: layer index (1-based, from the bottom)
+    """
+    def stage(stream):
+        nb_planes = stream.header.nb_planes
+
+        def frames():
+            for time, values in stream:
+                yield time, values.reshape(values.shape[0], nb_planes, -1)[:, layer - 1, :]
+        return FrameStream(stream.header.copy_as_2d(), frames())
+    return stage
+
+
+def temporal_reduction(operation, output_vars=None, time=None):
+    """!
+    @brief Stage reducing the frames to a single one with the max, min or mean over time. For max and min, the
+        components of the 2D vectors whose magnitude is in the stream are taken where their magnitude is max/min.
+    @param operation <int>: MAX, MIN or MEAN
+    @param output_vars <[str]>: variables kept in the output (default: all), e.g. to drop the magnitudes which are only
+        needed to select the vector components
+    @param time <float>: time of the output frame (default: time of the first frame)
+    """
+    def stage(stream):
+        var_IDs = stream.header.var_IDs
+        output_header, rows = _output_rows(stream.header, output_vars)
+        vectors = []
+        if operation != MEAN:
+            for i, var in enumerate(var_IDs):
+                if var in _VECTORS_2D and _VECTORS_2D[var][1] in var_IDs:
+                    vectors.append((i, var_IDs.index(_VECTORS_2D[var][1])))
+        scalars = [i for i in range(len(var_IDs)) if i not in dict(vectors)]
+        magnitudes = sorted(set(magnitude for _, magnitude in vectors))
+
+        def frames():
+            current, current_magnitudes, flags = None, {}, {}
+            first_time, nb_frames = None, 0
+            if operation == MAX:
+                init_value, compare = -float('Inf'), np.greater
+            elif operation == MIN:
+                init_value, compare = float('Inf'), np.less
+            else:
+                init_value, compare = 0, None
+            for frame_time, values in stream:
+                if current is None:
+                    first_time = frame_time
+                    current = np.full(values.shape, init_value, dtype=np.float64)
+                    for magnitude in magnitudes:
+                        current_magnitudes[magnitude] = np.full(values.shape[1], init_value, dtype=np.float64)
+                        flags[magnitude] = np.empty(values.shape[1], dtype=bool)
+                nb_frames += 1
+
+                with np.errstate(invalid='ignore'):
+                    for i in scalars:
+                        if operation == MAX:
+                            np.maximum(current[i], values[i], out=current[i])
+                        elif operation == MIN:
+                            np.minimum(current[i], values[i], out=current[i])
+                        else:
+                            current[i] += values[i]
+                    for magnitude in magnitudes:
+                        compare(values[magnitude], current_magnitudes[magnitude], out=flags[magnitude])
+                for i, magnitude in vectors:
+                    np.copyto(current[i], values[i], where=flags[magnitude])
+                for magnitude in magnitudes:
+                    np.copyto(current_magnitudes[magnitude], values[magnitude], where=flags[magnitude])
+
+            if current is None:
+                return
+            if operation == MEAN:
+                current /= nb_frames
+            yield (first_time if time is None else time), current[rows]
+        return FrameStream(output_header, frames())
+    return stage
+
+
+def synchronized_max(ref_var, output_vars=None, time=None):
+    """!
+    @brief Stage reducing the frames to a single one with the values at the time of the max of a reference variable.
+        The time of the max is added as the first variable ('MAX TIME').
+    @param ref_var <str>: ID of the reference variable (in the stream)
+    @param output_vars <[str]>: variables kept in the output (default: all)
+    @param time <float>: time of the output frame (default: time of the first frame)
+    """
+    def stage(stream):
+        ref_row = stream.header.var_IDs.index(ref_var)
+        output_header, rows = _output_rows(stream.header, output_vars)
+        output_header.empty_variables()
+        output_header.add_variable_str('MAX TIME', 'MAX TIME', 'S')
+        for i in rows:
+            output_header.add_variable(stream.header.var_IDs[i], stream.header.var_names[i],
+                                       stream.header.var_units[i])
+
+        def frames():
+            current, max_time, first_time = None, None, None
+            for frame_time, values in stream:
+                if current is None:
+                    first_time = frame_time
+                    current = values.astype(np.float64)
+                    max_time = np.full(values.shape[1], frame_time, dtype=np.float64)
+                    continue
+                flags = values[ref_row] > current[ref_row]
+                np.copyto(current, values, where=flags)
+                max_time[flags] = frame_time
+            if current is None:
+                return
+            yield (first_time if time is None else time), np.vstack((max_time, current[rows]))
+        return FrameStream(output_header, frames())
+    return stage
+
+
+def single_precision():
+    """!
+    @brief Stage converting the frames to single precision
+    """
+    def stage(stream):
+        header = stream.header.copy()
+        header.to_single_precision()
+        return FrameStream(header, ((time, values.astype(np.float32)) for time, values in stream))
+    return stage
+
+
+def monitor(callback):
+    """!
+    @brief Stage calling a function with the number of frames already passed (e.g. to update a progress bar)
+    @param callback <function>: function called after every frame with the number of frames
+    """
+    def stage(stream):
+        def frames():
+            for i, frame in enumerate(stream, 1):
+                yield frame
+                callback(i)
+        return FrameStream(stream.header, frames())
+    return stage
+
+
+def write_frames(stream, output_stream):
+    """!
+    @brief Write the header and all the frames of a stream
+    @param stream <FrameStream>: stream to write
+    @param output_stream <slf.Serafin.Write>: opened output stream
+    """
+    output_stream.write_header(stream.header)
+    for time, values in stream:
+        output_stream.write_entire_frame(stream.header, time, values)
+
+
+def data_stream(input_data, input_stream, stages=()):
+    """!
+    @brief Stream of the output frames of a workflow Serafin data: its vertical operator (if any), then its temporal
+        operator (if any) and its conversion to single precision
+    @param input_data <slf.datatypes.SerafinData>: Serafin data with its operators
+    @param input_stream <slf.Serafin.Read>: opened input stream (with the header and the time of the data)
+    @param stages <[function]>: stages applied to the input frames (e.g. `monitor`)
+    @return <FrameStream>: stream of the output frames
+    """
+    operator, metadata = input_data.operator, input_data.metadata
+    if operator not in STREAM_OPERATORS:
+        raise NotImplementedError('Operator "%s" cannot be streamed' % operator)
+    selected = [(var,) + tuple(input_data.selected_vars_names[var]) for var in input_data.selected_vars]
+    time_indices = input_data.selected_time_indices
+    after_vertical = operator in TEMPORAL_OPERATORS and 'vertical_operator' in metadata
+    output_vars = None
+
+    if operator == SELECT_LAYER or (after_vertical and metadata['vertical_operator'] == 'Layer'):
+        stream = read_frames(input_stream, selected, time_indices, input_data.equations, input_data.us_equation)
+        stream = stream.pipe(*stages, select_layer(metadata['layer_selection']))
+    elif operator == VERTICAL_AGGREGATION or after_vertical:
+        stream = aggregate_vertically(input_stream, selected, time_indices,
+                                      VERTICAL_OPERATORS[metadata['vertical_operator']]).pipe(*stages)
+    elif operator in (MAX, MIN, MEAN):
+        scalars, vectors, equations = scalars_vectors(input_data.header.var_IDs, selected, input_data.us_equation)
+        output_vars = [var for var, _, _ in scalars + vectors]
+        magnitudes = []
+        for var, _, _ in vectors:
+            magnitude = _VECTORS_2D[var][1]
+            if magnitude not in output_vars and magnitude not in magnitudes:
+                magnitudes.append(magnitude)
+        stream = read_frames(input_stream, scalars + vectors + [(var, b'', b'') for var in magnitudes],
+                             time_indices, equations, input_data.us_equation).pipe(*stages)
+    elif operator == SYNCH_MAX:
+        selected = [(var, name, unit) for var, name, unit in selected if var in input_data.header.var_IDs]
+        output_vars = [var for var, _, _ in selected]
+        if metadata['var'] not in output_vars:
+            selected.append((metadata['var'], b'', b''))
+        stream = read_frames(input_stream, selected, time_indices, []).pipe(*stages)
+    else:
+        stream = read_frames(input_stream, selected, time_indices, input_data.equations,
+                             input_data.us_equation).pipe(*stages)
+
+    if operator in (MAX, MIN, MEAN):
+        stream = stream.pipe(temporal_reduction(operator, output_vars, input_data.time[0]))
+    elif operator == SYNCH_MAX:
+        stream = stream.pipe(synchronized_max(metadata['var'], output_vars, input_data.time[0]))
+    if input_data.to_single:
+        stream = stream.pipe(single_precision())
+    return stream
@@ -114,6 +114,45 @@ OPERATIONS = {
 }
 
 
+def _norm_in_place(out, tmp, *components):
+    np.square(components[0], out=out)
+    for component in components[1:]:
+        out += np.square(component, out=tmp)
+    return np.sqrt(out, out=out)
+
+
+# same operations writing into preallocated output and temporary arrays, the others are computed then copied
+IN_PLACE_OPERATIONS = {
+    PLUS: lambda out, tmp, a, b: np.add(a, b, out=out),
+    MINUS: lambda out, tmp, a, b: np.subtract(a, b, out=out),
+    TIMES: lambda out, tmp, a, b: np.multiply(a, b, out=out),
+    NORM2: _norm_in_place,
+    NORM2_3D: _norm_in_place,
+    COMPUTE_TAU: lambda out, tmp, x: np.multiply(np.square(x, out=out), RHO_WATER, out=out),
+    COMPUTE_CHEZY: lambda out, tmp, w, h, m: np.multiply(np.absolute(np.divide(m, w, out=out), out=out),
+                                                         np.sqrt(GRAVITY), out=out),
+    COMPUTE_C: lambda out, tmp, h: np.sqrt(np.multiply(h, GRAVITY, out=out), out=out),
+    COMPUTE_F: lambda out, tmp, m, c: np.divide(m, c, out=out)
+}
+
+
+def do_calculation_in_place(operator, input_values, out, tmp):
+    """!
+    @brief Apply an operator on input values and write the result into an existing array (floating-point errors
+           have to be handled by the caller)
+    @param operator <int/function>: an operator of OPERATIONS or a function of the input values
+    @param input_values <[numpy.ndarray]>: the values of the input variables
+    @param out <numpy.ndarray>: the output array
+    @param tmp <numpy.ndarray>: a temporary array of the same shape
+    @return <numpy.ndarray>: the output array
+    """
+    if operator in IN_PLACE_OPERATIONS:
+        return IN_PLACE_OPERATIONS[operator](out, tmp, *input_values)
+    operation = OPERATIONS[operator] if operator in OPERATIONS else operator
+    np.copyto(out, operation(*input_values))
+    return out
+
+
 def do_calculation(equation, input_values):
     """!
     @brief Apply an equation on input values
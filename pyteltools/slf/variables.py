@@ -3,12 +3,17 @@ API for computing additional variables
 """
 
 import numpy as np
+import threading
 
 from .variable.variables_2d import get_available_2d_variables, get_necessary_2d_equations, \
     get_US_equation, new_variables_from_US
 # Beware: `get_US_equation` and `new_variables_from_US` are imported indirectly
 from .variable.variables_3d import get_available_3d_variables, get_necessary_3d_equations
-from .variable.variables_utils import do_calculation
+from .variable.variables_utils import do_calculation, do_calculation_in_place
+
+
+READ, COMPUTE, FRICTION_VELOCITY = 0, 1, 2
+_plans = threading.local()  # plans used by `do_calculations_in_frame`, per thread since they own scratch buffers
 
 
 def get_available_variables(input_variables, is_2d):
@@ -23,8 +28,141 @@ def get_necessary_equations(known_var_IDs, needed_var_IDs, is_2d, us_equation=No
     return get_necessary_3d_equations(known_var_IDs, needed_var_IDs)
 
 
+class EquationPlan:
+    """!
+    @brief Precompiled evaluation of the equations computing the selected variables, frame by frame or by blocks
+
+    The steps (reading or computing every needed variable) are resolved once. The values of the variables are stored
+    in scratch buffers kept from one call to the next, and the elementary operations write into them.
+    """
+    def __init__(self, equations, selected_output_IDs, output_float_type, is_2d, us_equation=None,
+                 constant_var_IDs=()):
+        """!
+        @param equations <[slf.variables_utils.Equation]>: list of all equations necessary to compute selected variables
+        @param selected_output_IDs <[str]>: the short names of the selected output variables
+        @param output_float_type <numpy.dtype>: float32 or float64 according to the output file type
+        @param is_2d <bool>: True if input data is 2D
+        @param us_equation <slf.variables_utils.Equation>: user-specified friction law equation
+        @param constant_var_IDs <[str]>: variables whose values are given for every frame (see `evaluate`)
+        """
+        self.equations = list(equations)
+        self.selected_output_IDs = list(selected_output_IDs)
+        self.output_float_type = output_float_type
+        self.us_equation = us_equation
+        self.constant_var_IDs = set(constant_var_IDs)
+        self.steps = []  # (step type, output variable ID, input variable IDs, operator)
+
+        available = set(constant_var_IDs)
+        for equation in self.equations:
+            input_var_IDs = [var.ID() for var in equation.input]
+            for input_var_ID in input_var_IDs:
+                if input_var_ID not in available and input_var_ID[:5] != 'ROUSE':
+                    self.steps.append((READ, input_var_ID, (), None))
+                    available.add(input_var_ID)
+
+            output_ID = equation.output.ID()
+            if is_2d:
+                # handle the special case for US (user-specified equation)
+                if output_ID == 'US':
+                    self.steps.append((FRICTION_VELOCITY, 'US', ('W', 'H', 'M'), us_equation.operator))
+                    available.add('US')
+
+                # handle the very special case for ROUSE (equation depending on user-specified value)
+                elif output_ID == 'ROUSE':
+                    self.steps.append((COMPUTE, input_var_IDs[0], ('US',), equation.operator))
+                    available.add(input_var_IDs[0])
+                    continue
+
+            # handle the normal case (if not already done)
+            if output_ID not in available:
+                self.steps.append((COMPUTE, output_ID, tuple(input_var_IDs), equation.operator))
+                available.add(output_ID)
+        self.computed_var_IDs = available
+
+        self.buffers = {}
+        self.tmp, self.mask = None, None
+        self.nb_nodes, self.capacity, self.float_type = None, 0, None
+
+    def _allocate(self, nb_frames, nb_nodes, float_type):
+        if nb_nodes != self.nb_nodes or nb_frames > self.capacity or float_type != self.float_type:
+            self.nb_nodes, self.capacity, self.float_type = nb_nodes, max(nb_frames, self.capacity), float_type
+            self.buffers = {var_ID: np.empty((self.capacity, nb_nodes), dtype=float_type)
+                            for _, var_ID, _, _ in self.steps}
+            self.tmp = np.empty((self.capacity, nb_nodes), dtype=float_type)
+            self.mask = np.empty((self.capacity, nb_nodes), dtype=bool)
+        return {var_ID: buffer[:nb_frames] for var_ID, buffer in self.buffers.items()}
+
+    def evaluate_block(self, input_serafin, time_indices, constant_values=None, out=None):
+        """!
+        @brief Compute the selected variables in a block of frames
+        @param input_serafin <Serafin.Read>: input stream for reading necessary variables
+        @param time_indices <[int]>: the indices of the frames (0-based)
+        @param constant_values <{str: numpy.ndarray}>: values of the constant variables (for every node)
+        @param out <numpy.ndarray>: optional output array
+        @return <numpy.ndarray>: the values with shape (number of frames, number of selected variables, number of nodes)
+        """
+        nb_frames, nb_nodes = len(time_indices), input_serafin.header.nb_nodes
+        buffers = self._allocate(nb_frames, nb_nodes, input_serafin.header.np_float_type)
+        values = dict(constant_values) if constant_values is not None else {}
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for step_type, var_ID, input_var_IDs, operator in self.steps:
+                buffer = buffers[var_ID]
+                if step_type == READ:
+                    for i, time_index in enumerate(time_indices):
+                        input_serafin.read_var_in_frame(time_index, var_ID, out=buffer[i])
+                else:
+                    do_calculation_in_place(operator, [values[input_var_ID] for input_var_ID in input_var_IDs],
+                                            buffer, self.tmp[:nb_frames])
+                    if step_type == FRICTION_VELOCITY:
+                        # Clean US values in case of negative or null water depth
+                        mask = self.mask[:nb_frames]
+                        np.logical_not(np.greater(values['H'], 0, out=mask), out=mask)
+                        np.copyto(buffer, 0, where=mask)
+                values[var_ID] = buffer
+
+        # reconstruct the output values array in the order of the selected IDs
+        if out is None:
+            out = np.empty((nb_frames, len(self.selected_output_IDs), nb_nodes), dtype=self.output_float_type)
+        for i, var_ID in enumerate(self.selected_output_IDs):
+            if var_ID in values:
+                out[:, i, :] = values[var_ID]
+            else:
+                for j, time_index in enumerate(time_indices):
+                    out[j, i, :] = input_serafin.read_var_in_frame(time_index, var_ID)
+        return out
+
+    def evaluate(self, input_serafin, time_index, constant_values=None, out=None):
+        """!
+        @brief Compute the selected variables in a single frame
+        @param input_serafin <Serafin.Read>: input stream for reading necessary variables
+        @param time_index <int>: the index of the frame (0-based)
+        @param constant_values <{str: numpy.ndarray}>: values of the constant variables (for every node)
+        @param out <numpy.ndarray>: optional output array
+        @return <numpy.ndarray>: the values of the selected output variables
+        """
+        block_out = out[np.newaxis] if out is not None else None
+        return self.evaluate_block(input_serafin, [time_index], constant_values, block_out)[0]
+
+
+def get_equation_plan(known_var_IDs, needed_var_IDs, is_2d, output_float_type, us_equation=None,
+                      constant_var_IDs=()):
+    """!
+    @brief Build the plan computing the needed variables from the known variables
+    @param known_var_IDs <[str]>: the list of variable IDs contained in the input file
+    @param needed_var_IDs <[str]>: the list of variable IDs selected by the user
+    @param is_2d <bool>: True if input data is 2D
+    @param output_float_type <numpy.dtype>: float32 or float64 according to the output file type
+    @param us_equation <slf.variables_utils.Equation>: user-specified friction law equation
+    @param constant_var_IDs <[str]>: variables whose values are given for every frame
+    @return <EquationPlan>: the equation plan
+    """
+    equations = get_necessary_equations(known_var_IDs, needed_var_IDs, is_2d, us_equation)
+    return EquationPlan(equations, needed_var_IDs, output_float_type, is_2d, us_equation, constant_var_IDs)
+
+
 def do_calculations_in_frame(equations, input_serafin, time_index, selected_output_IDs,
-                             output_float_type, is_2d, us_equation, ori_values = {}):
+                             output_float_type, is_2d, us_equation, ori_values=None):
     """!
     @brief Return the selected 2D variables values in a single time frame
     @param equations <[slf.variables_utils.Equation]>: list of all equations necessary to compute selected variables
@@ -37,45 +175,15 @@ def do_calculations_in_frame(equations, input_serafin, time_index, selected_outp
     @param ori_values <{numpy.ndarray}>: known values before calculations
     @return <numpy.ndarray>: the values of the selected output variables
     """
-    computed_values = ori_values
-    for equation in equations:
-        input_var_IDs = list(map(lambda x: x.ID(), equation.input))
-
-        # read (if needed) input variables values
-        for input_var_ID in input_var_IDs:
-            if input_var_ID not in computed_values and input_var_ID[:5] != 'ROUSE':
-                computed_values[input_var_ID] = input_serafin.read_var_in_frame(time_index, input_var_ID)
-
-        if is_2d:
-            # handle the special case for US (user-specified equation)
-            if equation.output.ID() == 'US':
-                computed_values['US'] = do_calculation(us_equation, [computed_values['W'],
-                                                                     computed_values['H'],
-                                                                     computed_values['M']])
-                # Clean US values in case of negative or null water depth
-                computed_values['US'] = np.where(computed_values['H'] > 0, computed_values['US'],
-                                                 np.zeros(input_serafin.header.nb_nodes, dtype=output_float_type))
-
-            # handle the very special case for ROUSE (equation depending on user-specified value)
-            elif equation.output.ID() == 'ROUSE':
-                computed_values[equation.input[0].ID()] = equation.operator(computed_values['US'])
-                continue
-
-        # handle the normal case (if not already done)
-        if equation.output.ID() not in computed_values.keys():
-            computed_values[equation.output.ID()] = do_calculation(equation,
-                                                                [computed_values[var_ID] for var_ID in input_var_IDs])
-
-    # reconstruct the output values array in the order of the selected IDs
-    nb_selected_vars = len(selected_output_IDs)
-
-    output_values = np.empty((nb_selected_vars, input_serafin.header.nb_nodes),
-                             dtype=output_float_type)
-    for i in range(nb_selected_vars):
-        var_ID = selected_output_IDs[i]
-        if var_ID not in computed_values:
-            output_values[i, :] = input_serafin.read_var_in_frame(time_index, var_ID)
-        else:
-            output_values[i, :] = computed_values[var_ID]
-    return output_values
-
+    ori_values = ori_values if ori_values is not None else {}
+    # the plan keeps references to the equations, so that their identities are not reused while it is cached
+    key = (tuple(map(id, equations)), id(us_equation), tuple(selected_output_IDs), np.dtype(output_float_type),
+           is_2d, tuple(sorted(ori_values)))
+    if not hasattr(_plans, 'cache'):
+        _plans.cache = {}
+    if key not in _plans.cache:
+        if len(_plans.cache) >= 8:
+            _plans.cache.clear()
+        _plans.cache[key] = EquationPlan(equations, selected_output_IDs, output_float_type, is_2d, us_equation,
+                                         ori_values.keys())
+    return _plans.cache[key].evaluate(input_serafin, time_index, ori_values)
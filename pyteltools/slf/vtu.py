@@ -0,0 +1,207 @@
+"""!
+Binary VTK XML unstructured grid files (.vtu) and their time collections (.pvd)
+
+Every frame is written in its own VTU file, whose arrays are stored as raw little-endian bytes in the appended data
+section. The mesh arrays (connectivity, offsets, cell types and the points of a 2D mesh) and the XML description of
+the file are encoded once for the whole collection: writing a frame only encodes its values.
+The frames are indexed with their time by a ParaView collection file (.pvd).
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import os
+from xml.sax.saxutils import quoteattr
+
+from pyteltools.conf import settings
+
+
+VTK_TRIANGLE, VTK_WEDGE = 5, 13
+
+_VTK_TYPES = {np.dtype('<f4'): 'Float32', np.dtype('<f8'): 'Float64', np.dtype('<i4'): 'Int32',
+              np.dtype('<u1'): 'UInt8'}
+
+_HEADER_DTYPE = np.dtype('<u8')
+
+
+class VtuCollection:
+    """!
+    @brief Writer of the frames of a Serafin file as binary VTU files sharing the same mesh
+    """
+    def __init__(self, header, scalars, vectors, variable_names):
+        """!
+        @param header <slf.Serafin.SerafinHeader>: input Serafin header (2D or 3D with the variable Z)
+        @param scalars <[str]>: scalar variables
+        @param vectors <[tuple of str]>: vector variables (two components in 2D, three in 3D)
+        @param variable_names <dict>: VTK array name for every scalar and every vector
+        """
+        self.is_2d = header.is_2d
+        self.nb_nodes = header.nb_nodes
+        self.scalars = scalars
+        self.vectors = vectors
+        self.dtype = np.dtype('<f8') if header.float_type == 'd' else np.dtype('<f4')
+        self.point_dtype = np.dtype('<f8')
+
+        if self.is_2d:
+            ikle, cell_type = header.ikle_2d, VTK_TRIANGLE
+            points = np.zeros((self.nb_nodes, 3), dtype=self.point_dtype)
+            points[:, 0], points[:, 1] = header.x, header.y
+            self.points = self._encode(points)
+        else:
+            ikle, cell_type = header.ikle.reshape(header.nb_elements, 6), VTK_WEDGE
+            self.points = None
+            self.xy = np.column_stack((header.x, header.y)).astype(self.point_dtype)
+        nb_elements, nb_nodes_per_element = ikle.shape
+        self.cells = b''.join([
+            self._encode((ikle - 1).astype('<i4')),
+            self._encode(np.arange(1, nb_elements + 1, dtype='<i4') * nb_nodes_per_element),
+            self._encode(np.full(nb_elements, cell_type, dtype='<u1'))
+        ])
+
+        # array descriptions in the order of the appended data: points, point data and cells
+        arrays = [('Points', self.point_dtype, 3, self.nb_nodes)]
+        arrays.extend((variable_names[scalar], self.dtype, 1, self.nb_nodes) for scalar in scalars)
+        arrays.extend((variable_names[vector], self.dtype, 3, self.nb_nodes) for vector in vectors)
+        arrays.extend([('connectivity', np.dtype('<i4'), 1, nb_elements * nb_nodes_per_element),
+                       ('offsets', np.dtype('<i4'), 1, nb_elements),
+                       ('types', np.dtype('<u1'), 1, nb_elements)])
+        offsets = []
+        offset = 0
+        for _, dtype, nb_components, nb_values in arrays:
+            offsets.append(offset)
+            offset += _HEADER_DTYPE.itemsize + dtype.itemsize * nb_components * nb_values
+
+        def data_array(index, with_name=True):
+            name, dtype, nb_components, _ = arrays[index]
+            return '<DataArray type="%s"%s NumberOfComponents="%d" format="appended" offset="%d"/>' \
+                   % (_VTK_TYPES[dtype], ' Name=%s' % quoteattr(name) if with_name else '', nb_components,
+                      offsets[index])
+
+        nb_data = len(scalars) + len(vectors)
+        lines = ['<?xml version="1.0"?>',
+                 '<VTKFile type="UnstructuredGrid" version="1.0" byte_order="LittleEndian" header_type="UInt64">',
+                 '  <UnstructuredGrid>',
+                 '    <Piece NumberOfPoints="%d" NumberOfCells="%d">' % (self.nb_nodes, nb_elements),
+                 '      <Points>',
+                 '        ' + data_array(0, False),
+                 '      </Points>',
+                 '      <PointData>']
+        lines.extend('        ' + data_array(index) for index in range(1, nb_data + 1))
+        lines.extend(['      </PointData>',
+                      '      <Cells>'])
+        lines.extend('        ' + data_array(index) for index in range(nb_data + 1, nb_data + 4))
+        lines.extend(['      </Cells>',
+                      '    </Piece>',
+                      '  </UnstructuredGrid>',
+                      '  <AppendedData encoding="raw">',
+                      '   _'])
+        self.prefix = '\n'.join(lines).encode()
+        self.suffix = b'\n  </AppendedData>\n</VTKFile>\n'
+
+    @staticmethod
+    def _encode(array):
+        """!
+        @brief Raw bytes of an appended data array (size in bytes followed by the values)
+        @param array <numpy.ndarray>: array with its final (little-endian) type
+        @return <bytes>: encoded array
+        """
+        return np.array([array.nbytes], dtype=_HEADER_DTYPE).tobytes() + np.ascontiguousarray(array).tobytes()
+
+    def variables(self):
+        """!
+        @return <[str]>: variables to read for every frame
+        """
+        variables = [] if self.is_2d else ['Z']
+        variables.extend(self.scalars)
+        for vector in self.vectors:
+            variables.extend(vector)
+        return variables
+
+    def read_values(self, input_stream, time_index):
+        """!
+        @brief Read the values of a frame
+        @param input_stream <slf.Serafin.Read>: input stream
+        @param time_index <int>: the index of the frame (0-based)
+        @return <dict>: values of every variable to write
+        """
+        return {var: input_stream.read_var_in_frame(time_index, var) for var in self.variables()}
+
+    def write_frame(self, vtu_name, values):
+        """!
+        @brief Write a frame in a VTU file
+        @param vtu_name <str>: output VTU filename
+        @param values <dict>: values of every variable to write (see `read_values`)
+        """
+        if self.is_2d:
+            points = self.points
+        else:
+            points = np.empty((self.nb_nodes, 3), dtype=self.point_dtype)
+            points[:, :2] = self.xy
+            points[:, 2] = values['Z']
+            points = self._encode(points)
+        with open(vtu_name, 'wb') as output_stream:
+            output_stream.write(self.prefix)
+            output_stream.write(points)
+            for scalar in self.scalars:
+                output_stream.write(self._encode(values[scalar].astype(self.dtype)))
+            for vector in self.vectors:
+                vector_values = np.zeros((self.nb_nodes, 3), dtype=self.dtype)
+                for i, var in enumerate(vector):
+                    vector_values[:, i] = values[var]
+                output_stream.write(self._encode(vector_values))
+            output_stream.write(self.cells)
+            output_stream.write(self.suffix)
+
+    def write(self, input_stream, time_indices, vtu_names, nb_threads=settings.VTU_NB_THREADS, callback=None):
+        """!
+        @brief Write frames in VTU files
+        The frames are read sequentially in the calling thread and encoded/written by a pool of threads
+        (with a bounded number of frames waiting to be written).
+        @param input_stream <slf.Serafin.Read>: input stream
+        @param time_indices <[int]>: indices of the frames to write (0-based)
+        @param vtu_names <[str]>: output VTU filename for every frame
+        @param nb_threads <int>: number of writing threads (frames are written in the calling thread if 1)
+        @param callback <callable>: called with the number of frames read after every frame (optional)
+        """
+        if nb_threads <= 1 or len(time_indices) <= 1:
+            for i, (time_index, vtu_name) in enumerate(zip(time_indices, vtu_names)):
+                self.write_frame(vtu_name, self.read_values(input_stream, time_index))
+                if callback is not None:
+                    callback(i + 1)
+            return
+
+        with ThreadPoolExecutor(max_workers=nb_threads) as executor:
+            pending = deque()
+            try:
+                for i, (time_index, vtu_name) in enumerate(zip(time_indices, vtu_names)):
+                    pending.append(executor.submit(self.write_frame, vtu_name,
+                                                   self.read_values(input_stream, time_index)))
+                    while len(pending) > 2 * nb_threads:
+                        pending.popleft().result()
+                    if callback is not None:
+                        callback(i + 1)
+                while pending:
+                    pending.popleft().result()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+
+def write_pvd(pvd_name, times, vtu_names):
+    """!
+    @brief Write a ParaView collection file indexing VTU files with their time
+    @param pvd_name <str>: output PVD filename
+    @param times <[float]>: time of every frame (in seconds)
+    @param vtu_names <[str]>: VTU filename of every frame (written relatively to the collection file)
+    """
+    folder = os.path.dirname(os.path.abspath(pvd_name))
+    with open(pvd_name, 'w') as pvd:
+        pvd.write('<?xml version="1.0"?>\n')
+        pvd.write('<VTKFile type="Collection" version="0.1" byte_order="LittleEndian">\n')
+        pvd.write('  <Collection>\n')
+        for time, vtu_name in zip(times, vtu_names):
+            path = os.path.relpath(os.path.abspath(vtu_name), folder).replace(os.sep, '/')
+            pvd.write('    <DataSet timestep="%s" group="" part="0" file=%s/>\n' % (repr(float(time)),
+                                                                                     quoteattr(path)))
+        pvd.write('  </Collection>\n')
+        pvd.write('</VTKFile>\n')
@@ -0,0 +1,80 @@
+"""!
+Unittest for the single-pass and node-range-split arrival/duration computation (slf.misc and slf.Serafin modules)
+"""
+
+import numpy as np
+import os
+import tempfile
+import unittest
+
+from pyteltools.slf import Serafin
+import pyteltools.slf.misc as operations
+from pyteltools.tests.utils import StripHeader, write_serafin
+
+
+class ArrivalDurationTestCase(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'arrival.slf')
+        self.nb_frames = 12
+        header = StripHeader(50)
+        np.random.seed(0)
+        self.values = np.random.rand(self.nb_frames, 2, header.nb_nodes).astype(np.float32)
+        write_serafin(self.path, header, self.values)
+        self.time_indices = list(range(1, self.nb_frames))
+        self.conditions = [operations.Condition(['[H]'], '[H]', '>', 0.5),
+                           operations.Condition(['[U]'], '[U]', '<=', 0.3),
+                           operations.Condition(['[H]', '[U]', '*'], '[H]*[U]', '>=', 0.2)]
+
+    def tearDown(self):
+        os.remove(self.path)
+        os.rmdir(self.folder)
+
+    def compute(self, conditions, node_range=None):
+        with Serafin.Read(self.path, 'fr') as f:
+            f.read_header()
+            f.get_time()
+            calculator = operations.ArrivalDurationCalculator(f, self.time_indices, conditions, node_range)
+            calculator.run()
+            return calculator.finishing_up()
+
+    def test_single_pass(self):
+        values = self.compute(self.conditions)
+        self.assertEqual(values.shape, (2 * len(self.conditions), 100))
+        expected = np.vstack([self.compute([condition]) for condition in self.conditions])
+        self.assertTrue(np.array_equal(values, expected))
+
+    def test_node_ranges(self):
+        expected = self.compute(self.conditions)
+        for node_range in ((0, 37), (37, 100), (10, 11)):
+            values = self.compute(self.conditions, node_range)
+            self.assertTrue(np.array_equal(values, expected[:, node_range[0]:node_range[1]]))
+
+    def test_parallel(self):
+        with Serafin.Read(self.path, 'fr') as f:
+            f.read_header()
+            f.get_time()
+            header, time = f.header, f.time
+        expected = np.vstack([self.compute([condition]) for condition in self.conditions])
+        for nb_processes in (1, 3):
+            values = operations.arrival_duration_in_parallel(self.path, 'fr', header, time, self.time_indices,
+                                                             self.conditions, nb_processes)
+            self.assertTrue(np.array_equal(values, expected))
+
+    def test_read_var_in_frame_in_range(self):
+        with Serafin.Read(self.path, 'fr') as f:
+            f.read_header()
+            nb_nodes = f.header.nb_nodes
+            for time_index in (0, self.nb_frames - 1):
+                values = f.read_var_in_frame_in_range(time_index, 'U', 0, nb_nodes)
+                self.assertTrue(np.array_equal(values, f.read_var_in_frame(time_index, 'U')))
+                self.assertTrue(np.array_equal(values, self.values[time_index, 1]))
+            values = f.read_var_in_frame_in_range(3, 'H', 0, 7)
+            self.assertTrue(np.array_equal(values, self.values[3, 0, :7]))
+            values = f.read_var_in_frame_in_range(3, 'H', 90, nb_nodes)
+            self.assertTrue(np.array_equal(values, self.values[3, 0, 90:]))
+            for start in (0, 42, nb_nodes):
+                self.assertEqual(f.read_var_in_frame_in_range(2, 'U', start, start).shape, (0,))
+            self.assertRaises(Serafin.SerafinRequestError, f.read_var_in_frame_in_range, 0, 'U', -1, 5)
+            self.assertRaises(Serafin.SerafinRequestError, f.read_var_in_frame_in_range, 0, 'U', 0, nb_nodes + 1)
+            self.assertRaises(Serafin.SerafinRequestError, f.read_var_in_frame_in_range, 0, 'U', 6, 5)
@@ -0,0 +1,84 @@
+"""!
+Unittest for the off-screen rendering of the multi-save figures (workflow.batch_render module)
+"""
+
+from matplotlib.image import imread
+import numpy as np
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from pyteltools.workflow import batch_render
+from pyteltools.workflow.batch_render import BatchRenderer, FigureTask
+
+
+def line_task(png_name):
+    task = FigureTask(png_name)
+    task.axes.plot([0, 1, 2], [1, 0, 1], color='k', label='H')
+    task.axes.set_xlabel('X (m)')
+    task.axes.legend()
+    return task
+
+
+def field_task(png_name):
+    task = FigureTask(png_name)
+    task.axes.tricontourf([0, 1, 0, 1], [0, 0, 1, 1], [[0, 1, 3], [0, 3, 2]], [0., 1., 2., 3.],
+                          levels=[0., 1., 2., 3.], cmap='coolwarm')
+    task.add_colorbar('coolwarm', 0., 3., 'H')
+    return task
+
+
+def rotated_ticks_task(png_name):
+    task = field_task(png_name)
+    task.axes.tick_params(labelrotation=45, labelsize=8)
+    task.axes.set_aspect('equal')
+    return task
+
+
+class BatchRenderTestCase(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_pickle(self):
+        task = pickle.loads(pickle.dumps(field_task('a.png')))
+        self.assertEqual(task.png_name, 'a.png')
+        self.assertEqual([name for name, _, _ in task.calls], ['tricontourf'])
+        self.assertEqual(task.colorbar, ('coolwarm', 0., 3., 'H'))
+        task.axes.set_title('title')
+        self.assertEqual(len(task.calls), 2)
+
+    def test_render(self):
+        for i in range(2):
+            for make_task in (line_task, field_task):
+                png_name = os.path.join(self.folder, '%s_%d.png' % (make_task.__name__, i))
+                self.assertEqual(batch_render.render(make_task(png_name)), png_name)
+                self.assertTrue(os.path.exists(png_name))
+        # one figure with and one without color bar are reused
+        self.assertEqual(set(batch_render._figures), {False, True})
+
+    def test_sequence(self):
+        for make_task in (line_task, field_task):
+            fresh_name = os.path.join(self.folder, 'fresh.png')
+            batch_render._figures.clear()
+            batch_render.render(make_task(fresh_name))
+
+            png_name = os.path.join(self.folder, 'second.png')
+            batch_render._figures.clear()
+            first_task = rotated_ticks_task(os.path.join(self.folder, 'first.png'))
+            first_task.colorbar = make_task(png_name).colorbar
+            batch_render.render(first_task)
+            batch_render.render(make_task(png_name))
+            self.assertTrue(np.array_equal(imread(png_name), imread(fresh_name)))
+
+    def test_batch(self):
+        png_names = [os.path.join(self.folder, '%d.png' % i) for i in range(4)]
+        with BatchRenderer(2) as renderer:
+            futures = [renderer.submit(line_task(png_name) if i % 2 else field_task(png_name))
+                       for i, png_name in enumerate(png_names)]
+        self.assertEqual([future.result() for future in futures], png_names)
+        self.assertTrue(all(map(os.path.exists, png_names)))
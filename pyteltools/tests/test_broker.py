@@ -0,0 +1,92 @@
+"""!
+Unittest for distributed execution with a local broker and local remote workers (workflow.broker module)
+"""
+
+from multiprocessing import Process
+import os
+import socket
+import time
+import unittest
+from unittest import mock
+
+from pyteltools.conf import settings
+from pyteltools.workflow.broker import _ResultQueues, BrokerExecutor, connect_broker, RemoteTaskError, run_workers, \
+    serve_broker
+
+
+def square(x):
+    return x * x
+
+
+def slow_square(x):
+    time.sleep(1.5)
+    return x * x
+
+
+def die():
+    os._exit(1)
+
+
+def free_address():
+    with socket.socket() as s:
+        s.bind(('localhost', 0))
+        return s.getsockname()
+
+
+class BrokerTestCase(unittest.TestCase):
+    def setUp(self):
+        # the workers inherit the settings
+        self.patcher = mock.patch.object(settings, 'MULTI_BROKER_HEARTBEAT', 0.2)
+        self.patcher.start()
+        self.address = free_address()
+        self.broker = Process(target=serve_broker, args=(self.address, 'test'))
+        self.broker.start()
+        time.sleep(0.5)
+        self.workers = Process(target=run_workers, args=(self.address, 2, 'test'))
+        self.workers.start()
+
+    def tearDown(self):
+        self.workers.terminate()
+        self.broker.terminate()
+        self.workers.join()
+        self.broker.join()
+        self.patcher.stop()
+
+    def test_executor(self):
+        with BrokerExecutor(self.address, 'test') as executor:
+            futures = [executor.submit(square, i) for i in range(10)]
+            self.assertEqual([future.result(timeout=10) for future in futures], [i * i for i in range(10)])
+            with self.assertRaises(RemoteTaskError):
+                executor.submit(square, None).result(timeout=10)
+
+    def test_authkey(self):
+        self.assertRaises(ValueError, connect_broker, self.address, '')
+
+    def test_lost_worker(self):
+        with BrokerExecutor(self.address, 'test', worker_timeout=1) as executor:
+            self.assertEqual(executor.submit(slow_square, 3).result(timeout=10), 9)
+            with self.assertRaises(RemoteTaskError):
+                executor.submit(die).result(timeout=10)
+            self.assertEqual(executor.submit(square, 4).result(timeout=10), 16)
+
+    def test_pickup_timeout(self):
+        address = free_address()  # broker without any worker
+        broker = Process(target=serve_broker, args=(address, 'test'))
+        broker.start()
+        time.sleep(0.5)
+        try:
+            with BrokerExecutor(address, 'test', pickup_timeout=1) as executor:
+                with self.assertRaises(RemoteTaskError):
+                    executor.submit(square, 2).result(timeout=10)
+        finally:
+            broker.terminate()
+            broker.join()
+
+    def test_result_queues(self):
+        result_queues = _ResultQueues()
+        result_queues.open('client')
+        result_queues.put('client', 1)
+        self.assertEqual(result_queues.get('client', 1), 1)
+        result_queues.close('client')
+        result_queues.put('client', 2)  # late result after the shutdown of the client
+        self.assertEqual(result_queues.queues, {})
@@ -0,0 +1,67 @@
+"""!
+Unittest for workflow node result cache (workflow.cache module)
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from pyteltools.conf import settings
+from pyteltools.workflow import cache
+from pyteltools.workflow.cache import cache_key, ResultCache
+
+
+class ResultCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.cache = ResultCache(os.path.join(self.folder, 'cache'), 1000)
+        self.output = os.path.join(self.folder, 'out.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def write_output(self, content):
+        with open(self.output, 'w') as f:
+            f.write(content)
+
+    def test_key(self):
+        self.assertEqual(cache_key('Max', ['_max', 1]), cache_key('Max', ['_max', 1]))
+        self.assertNotEqual(cache_key('Max', ['_max', 1]), cache_key('Max', ['_max', 0]))
+        self.assertNotEqual(cache_key('Max', ['_max', 1]), cache_key('Min', ['_max', 1]))
+
+    def test_key_versions(self):
+        key = cache_key('Max', ['_max', 1])
+        with mock.patch.object(settings, 'FMT_FLOAT', '{:.2f}'):
+            self.assertNotEqual(cache_key('Max', ['_max', 1]), key)
+        with mock.patch.object(cache, 'VERSION', 'new'):
+            self.assertNotEqual(cache_key('Max', ['_max', 1]), key)
+        self.assertEqual(cache_key('Max', ['_max', 1]), key)
+
+    def test_restore(self):
+        self.assertFalse(self.cache.restore('a', [self.output]))
+        self.write_output('a' * 100)
+        self.cache.store('a', [self.output])
+        self.assertTrue(self.cache.restore('a', [self.output]))
+
+        os.remove(self.output)
+        self.assertTrue(self.cache.restore('a', [self.output]))
+        with open(self.output) as f:
+            self.assertEqual(f.read(), 'a' * 100)
+        self.assertFalse(self.cache.restore('a', [os.path.join(self.folder, 'other.csv')]))
+
+    def test_eviction(self):
+        for key in 'abc':
+            self.write_output(key * 400)
+            self.cache.store(key, [self.output])
+            self.assertLessEqual(self.cache.size(), 1000)
+        self.assertFalse(self.cache.restore('a', [self.output]))
+        self.assertTrue(self.cache.restore('c', [self.output]))
+
+    def test_disabled(self):
+        cache = ResultCache(os.path.join(self.folder, 'disabled'), 0)
+        self.write_output('a')
+        cache.store('a', [self.output])
+        self.assertFalse(cache.restore('a', [self.output]))
+        self.assertFalse(os.path.exists(cache.folder))
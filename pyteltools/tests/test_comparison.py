@@ -0,0 +1,131 @@
+"""!
+Unittest for slf.comparison module
+"""
+
+import numpy as np
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from pyteltools.conf import settings
+from pyteltools.geom.geometry import Polyline
+from pyteltools.slf import Serafin
+from pyteltools.slf.comparison import compare_files, ERROR_MEASURES, ReferenceMesh
+
+
+class GridHeader:
+    def __init__(self, n):
+        x, y = np.meshgrid(np.arange(n, dtype=np.float64), np.arange(n, dtype=np.float64))
+        self.x, self.y = x.flatten(), y.flatten()
+        self.nb_nodes_2d = self.nb_nodes = n * n
+        ikle = []
+        for j in range(n - 1):
+            for i in range(n - 1):
+                a = j * n + i
+                ikle.extend([[a, a + 1, a + n + 1], [a, a + n + 1, a + n]])
+        self.ikle_2d = np.array(ikle) + 1
+
+        # attributes to write a Serafin file with a single variable
+        self.is_2d = True
+        self.title = bytes('DUMMY SERAFIN', Serafin.SLF_EIT).ljust(72)
+        self.file_type = bytes('SERAFIN', Serafin.SLF_EIT).ljust(8)
+        self.float_type, self.float_size = 'f', 4
+        self.nb_var, self.nb_var_quadratic = 1, 0
+        self.var_names = [bytes('HAUTEUR D\'EAU', Serafin.SLF_EIT).ljust(16)]
+        self.var_units = [bytes('M', Serafin.SLF_EIT).ljust(16)]
+        self.params = [0] * 10
+        self.nb_elements, self.nb_nodes_per_elem = len(ikle), 3
+        self.ikle = self.ikle_2d.flatten()
+        self.ipobo = [0] * self.nb_nodes
+
+    def pack_int(self, *args, nb=1):
+        return struct.pack('>%ii' % nb, *args)
+
+    def pack_float(self, *args, nb=1):
+        return struct.pack('>%if' % nb, *args)
+
+
+class ReferenceMeshTestCase(unittest.TestCase):
+    def setUp(self):
+        self.mesh = ReferenceMesh(GridHeader(11), True, lambda iterable, **kwargs: iterable)
+        self.linear = 2 * self.mesh.x - 3 * self.mesh.y + 1
+
+    def test_entire_mesh(self):
+        self.mesh.add_polygon(None)
+        self.assertEqual(self.mesh.nb_triangles_inside, 200)
+        self.assertTrue(np.allclose(self.mesh.element_area, 0.5))
+        self.assertAlmostEqual(self.mesh.mean_signed_deviation(self.linear), 2 * 5 - 3 * 5 + 1)
+        self.assertAlmostEqual(self.mesh.mean_absolute_deviation(np.ones(121)), 1)
+        ewsd = self.mesh.element_wise_signed_deviation(self.linear)
+        self.assertEqual(ewsd.shape, (200,))
+        self.assertAlmostEqual(ewsd[0], 2 * 2 / 3 - 3 / 3 + 1)
+
+    def test_polygon(self):
+        # the boundary triangles are cut, the mean of a linear field is its value at the centroid of the rectangle
+        polygon = Polyline([(0.5, 1.25), (6.3, 1.25), (6.3, 7.7), (0.5, 7.7), (0.5, 1.25)])
+        self.mesh.add_polygon(polygon)
+        center_x, center_y = (0.5 + 6.3) / 2, (1.25 + 7.7) / 2
+        self.assertAlmostEqual(self.mesh.mean_signed_deviation(self.linear), 2 * center_x - 3 * center_y + 1)
+        self.assertAlmostEqual(self.mesh.quadratic_volume(np.ones(121)), 5.8 * 6.45)
+        self.assertAlmostEqual(self.mesh.root_mean_square_deviation(np.full(121, -3.)), 3)
+
+        ewsd = self.mesh.element_wise_signed_deviation(self.linear)
+        inside = self.mesh.elements_inside
+        self.assertEqual(self.mesh.nb_triangles_inside, inside.sum())
+        self.assertTrue(np.all(ewsd[~inside] == 0))
+        self.assertAlmostEqual(ewsd[inside].mean(), self.mesh.mean_signed_deviation(self.linear))
+
+
+class CompareRunsTestCase(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.folder = tempfile.mkdtemp()
+        self.header = GridHeader(6)
+        self.filenames = []
+        self.values = []
+        for run in range(3):
+            values = np.random.uniform(0, 2, (5, self.header.nb_nodes)).astype(np.float32)
+            filename = os.path.join(self.folder, 'run%d.slf' % run)
+            with Serafin.Write(filename, 'fr') as f:
+                f.write_header(self.header)
+                for time, frame_values in enumerate(values):
+                    f.write_entire_frame(self.header, 10. * time, frame_values.reshape(1, -1))
+            self.filenames.append(filename)
+            self.values.append(values)
+
+    def tearDown(self):
+        for filename in os.listdir(self.folder):
+            os.remove(os.path.join(self.folder, filename))
+        os.rmdir(self.folder)
+
+    def test_compare_files(self):
+        mesh = ReferenceMesh(self.header, False)
+        mesh.add_polygon(None)
+        ref_values = self.values[0][-1]
+        for nb_processes in (1, 2):
+            results = compare_files(self.filenames[0], self.filenames[1:], 'H', init_time_index=1,
+                                    nb_processes=nb_processes, batch_size=2)
+            self.assertEqual(len(results), 2)
+            for values, (times, measures) in zip(self.values[1:], results):
+                self.assertTrue(np.array_equal(times, [0., 10., 20., 30., 40.]))
+                self.assertEqual(measures.shape, (5, len(ERROR_MEASURES)))
+                ref_volume = mesh.quadratic_volume(ref_values - values[1])
+                for frame_values, frame_measures in zip(values, measures):
+                    differences = frame_values - ref_values
+                    expected = [mesh.mean_signed_deviation(differences), mesh.mean_absolute_deviation(differences),
+                                mesh.root_mean_square_deviation(differences),
+                                1 - mesh.quadratic_volume(differences) / ref_volume]
+                    self.assertTrue(np.allclose(frame_measures, expected, atol=1e-6))
+
+    def test_cli(self):
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        out_csv = os.path.join(self.folder, 'errors.csv')
+        subprocess.run([sys.executable, os.path.join(root, 'cli', 'slf_compare.py')] + self.filenames
+                       + ['--var', 'H', '--out_csv', out_csv], check=True, env=dict(os.environ, PYTHONPATH=root))
+        with open(out_csv) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(len(lines), 1 + 2 * 5)  # header and a line per test file and frame
+        self.assertEqual(lines[1].split(settings.CSV_SEPARATOR)[0], self.filenames[1])
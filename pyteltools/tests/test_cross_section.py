@@ -0,0 +1,41 @@
+"""!
+Unittest for the vertical cross-section interpolation (slf.interpolation module)
+"""
+
+import numpy as np
+import unittest
+
+from pyteltools.slf.interpolation import VerticalCrossSection
+
+
+class DummyInput:
+    def __init__(self, frames):
+        self.frames = frames
+
+    def read_var_in_frame_as_3d(self, time_index, var_ID):
+        return self.frames[time_index]
+
+
+class CrossSectionTestCase(unittest.TestCase):
+    def setUp(self):
+        # 4 nodes (0, 0), (1, 0), (0, 1), (1, 1) and a line from (0, 0.5) to (1, 0.5)
+        self.x, self.y = np.array([0., 1., 0., 1.]), np.array([0., 0., 1., 1.])
+        line_interpolator = [(0., 0.5, (0, 1, 2), np.array([0.5, 0., 0.5])),
+                             (0.5, 0.5, (1, 3, 2), np.array([0.5, 0., 0.5])),
+                             (1., 0.5, (1, 3, 2), np.array([0.5, 0.5, 0.]))]
+        self.section = VerticalCrossSection(line_interpolator, [0., 0.5, 1.], 4, 3)
+
+    def test_triangles(self):
+        self.assertEqual(self.section.x.tolist(), [0., 0., 0., 0.5, 0.5, 0.5, 1., 1., 1.])
+        self.assertEqual(self.section.triangles.tolist(), [[0, 1, 3], [1, 2, 4], [3, 4, 6], [4, 5, 7],
+                                                           [1, 3, 4], [2, 4, 5], [4, 6, 7], [5, 7, 8]])
+
+    def test_interpolate(self):
+        planes = np.array([2 * self.x + self.y + plane for plane in range(3)])
+        expected = [2 * x + 0.5 + plane for x in (0., 0.5, 1.) for plane in range(3)]
+        self.assertTrue(np.allclose(self.section.interpolate(planes), expected))
+
+        frames = np.array([planes * factor for factor in (1., -2.)])
+        values = self.section.read_frames(DummyInput(frames), [1, 0], 'U')
+        self.assertEqual(values.shape, (2, 9))
+        self.assertTrue(np.allclose(values, [np.array(expected) * factor for factor in (-2., 1.)]))
@@ -0,0 +1,53 @@
+"""!
+Unittest for the vectorized exporters (geom.Shapefile.write_points and slf.misc.format_rows)
+"""
+
+import numpy as np
+import os
+import shapefile
+import tempfile
+import unittest
+
+from pyteltools.geom.Shapefile import write_bk_points, write_points
+from pyteltools.slf.misc import format_rows
+
+
+class ExportersTestCase(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.folder = tempfile.mkdtemp()
+        self.x = np.random.uniform(150000, 160000, 25)
+        self.y = np.random.uniform(250000, 260000, 25)
+        self.values = np.random.uniform(-10, 10, (2, 25))
+
+    def tearDown(self):
+        for name in os.listdir(self.folder):
+            os.remove(os.path.join(self.folder, name))
+        os.rmdir(self.folder)
+
+    def test_points(self):
+        filename = os.path.join(self.folder, 'points.shp')
+        write_points(filename, self.x, self.y, [('H', self.values[0]), ('Angle(U,V)', self.values[1])],
+                     chunk_size=7)
+        reader = shapefile.Reader(filename)
+        self.assertEqual(reader.shapeType, shapefile.POINT)
+        self.assertEqual([field[0] for field in reader.fields[1:]], ['H', 'Angle(U,V)'])
+        self.assertTrue(np.allclose(reader.bbox, [self.x.min(), self.y.min(), self.x.max(), self.y.max()]))
+        points = np.array([shape.points[0] for shape in reader.shapes()])
+        self.assertTrue(np.array_equal(points, np.column_stack((self.x, self.y))))
+        records = np.array([list(record) for record in reader.records()])
+        self.assertTrue(np.allclose(records, self.values.T, atol=1e-4))
+
+    def test_points_z(self):
+        filename = os.path.join(self.folder, 'points_z.shp')
+        write_bk_points(filename, 'Z', list(zip(self.x, self.y, self.values[0])))
+        reader = shapefile.Reader(filename)
+        self.assertEqual(reader.shapeType, shapefile.POINTZ)
+        self.assertTrue(np.array_equal([shape.z[0] for shape in reader.shapes()], self.values[0]))
+        self.assertTrue(np.allclose([record[0] for record in reader.records()], self.values[0], atol=1e-6))
+
+    def test_format_rows(self):
+        columns = [np.arange(1, 26), self.x, self.values[0]]
+        fmt = '{} {:.4f} {:.5e}\n'
+        expected = ''.join(fmt.format(*row) for row in zip(*columns))
+        self.assertEqual(''.join(format_rows(fmt, columns, chunk_size=10)), expected)
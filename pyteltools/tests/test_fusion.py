@@ -0,0 +1,132 @@
+"""!
+Unittest for grouping of MULTI sinks sharing the same input and for their threaded execution on a shared frame cache
+(workflow.fusion module)
+"""
+
+import numpy as np
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from pyteltools.conf import settings
+from pyteltools.slf import Serafin
+from pyteltools.slf.datatypes import SerafinData
+from pyteltools.tests.utils import StripHeader, write_serafin
+from pyteltools.workflow.fusion import fused_sink_groups, FusedSinkScheduler, open_serafin, SharedFrameCache
+from pyteltools.workflow.multi_func import run_fused_sinks
+
+
+def frame_sums(node_id, fid, data, delay):
+    with open_serafin(data.filename, data.language) as f:
+        f.read_header()
+        f.get_time()
+        sums = []
+        for time_index in range(len(f.time)):
+            sums.append(f.read_var_in_frame(time_index, 'H').sum())
+            time.sleep(delay)
+    return True, node_id, fid, sums, 'done'
+
+
+def node_series(node_id, fid, data, nodes):
+    with open_serafin(data.filename, data.language) as f:
+        f.read_header()
+        f.get_time()
+        return True, node_id, fid, f.read_var_at_nodes('U', nodes), 'done'
+
+
+class FusedSinkTestCase(unittest.TestCase):
+    def setUp(self):
+        # Load -> Max -> Write Serafin, Load -> Select Time -> Compute Volume, Load -> Write vtk, Load -> A Minus B
+        self.node_names = {0: 'Load Serafin 2D', 1: 'Max', 2: 'Write Serafin', 3: 'Select Time',
+                           4: 'Compute Volume', 5: 'Write vtk', 6: 'A Minus B', 7: 'Write Serafin'}
+        self.adj_list = {0: {1, 3, 5, 6}, 1: {2}, 2: set(), 3: {4}, 4: set(), 5: set(), 6: {7}, 7: set()}
+
+    def test_groups(self):
+        groups = fused_sink_groups(self.node_names, self.adj_list)
+        self.assertEqual(list(groups.keys()), [0])
+        self.assertEqual(groups[0], {2: (1, 2), 4: (3, 4), 5: (5,)})
+
+    def test_scheduler(self):
+        scheduler = FusedSinkScheduler(fused_sink_groups(self.node_names, self.adj_list))
+        self.assertEqual(scheduler.add(6, 0, 'minus'), [['minus']])
+        self.assertEqual(scheduler.add(2, 0, 'write'), [])
+        self.assertEqual(scheduler.add(5, 0, 'vtk'), [])
+        self.assertEqual(scheduler.add(5, 1, 'vtk'), [])
+        self.assertEqual(scheduler.add(4, 0, 'volume'), [['write', 'vtk', 'volume']])
+
+        # failure upstream of some sinks for the second file
+        self.assertEqual(scheduler.drop(1, 1), [])
+        self.assertEqual(scheduler.drop(3, 1), [['vtk']])
+        self.assertFalse(scheduler.pending)
+        self.assertFalse(scheduler.dropped)
+
+
+class SharedFrameCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'shared.slf')
+        self.nb_frames = 12
+        header = StripHeader(5)
+        np.random.seed(0)
+        self.values = np.random.rand(self.nb_frames, 2, header.nb_nodes).astype(np.float32)
+        write_serafin(self.path, header, self.values)
+
+    def tearDown(self):
+        os.remove(self.path)
+        os.rmdir(self.folder)
+
+    def test_window(self):
+        window, delays = 3, [0, 0.002, 0.01]
+        lags, cached, frames = [], [], {consumer: [] for consumer in range(len(delays))}
+
+        def consume(cache, consumer):
+            with cache.consumer(consumer):
+                for time_index in range(self.nb_frames):
+                    frames[consumer].append(cache.get_frame(consumer, time_index))
+                    with cache.condition:
+                        lags.append(max(cache.positions.values()) - min(cache.positions.values()))
+                        cached.append(len(cache.frames))
+                    time.sleep(delays[consumer])
+
+        with SharedFrameCache(self.path, 'fr', range(len(delays)), window) as cache:
+            threads = [threading.Thread(target=consume, args=(cache, consumer)) for consumer in range(len(delays))]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(cache.nb_reads, self.nb_frames)  # every frame is read once
+        self.assertLessEqual(max(lags), window)
+        self.assertLessEqual(max(cached), window + 1)  # older frames are evicted
+        for consumer in range(len(delays)):
+            self.assertTrue(np.array_equal(frames[consumer], self.values))
+
+    def test_shared_read(self):
+        with Serafin.Read(self.path, 'fr') as f:
+            f.read_header()
+            expected = f.read_var_at_nodes('U', [1, 6, 7], [0, 5, 11])
+        with SharedFrameCache(self.path, 'fr', [0]) as cache:
+            with cache.consumer(0):
+                with open_serafin(self.path, 'fr') as f:
+                    f.read_header()
+                    f.get_time()
+                    self.assertTrue(np.array_equal(f.read_var_at_nodes('U', [1, 6, 7], [0, 5, 11]), expected))
+                    self.assertTrue(np.array_equal(f.read_var_in_frame_in_range(7, 'H', 2, 5),
+                                                   self.values[7, 0, 2:5]))
+                    self.assertRaises(Serafin.SerafinRequestError, f.read_var_at_nodes, 'U', [10])
+                    self.assertRaises(Serafin.SerafinRequestError, f.read_var_at_nodes, 'U', [0], [12])
+
+    def test_run_fused_sinks(self):
+        data = SerafinData('A', self.path, 'fr')
+        tasks = [(frame_sums, (1, 0, data, 0)), (frame_sums, (2, 0, data, 0.005)), (node_series, (3, 0, data, [0, 9]))]
+        with mock.patch.object(settings, 'FUSED_SINKS_WINDOW', 2), \
+                mock.patch.object(Serafin.Read, 'read_frame', autospec=True, side_effect=Serafin.Read.read_frame) \
+                as read_frame:
+            results = run_fused_sinks(self.path, 'fr', tasks)
+        self.assertEqual(read_frame.call_count, self.nb_frames)
+        self.assertEqual([result[:3] for result in results], [(True, 1, 0), (True, 2, 0), (True, 3, 0)])
+        for result in results[:2]:
+            self.assertTrue(np.allclose(result[3], self.values[:, 0].sum(axis=1)))
+        self.assertTrue(np.array_equal(results[2][3], self.values[:, 1, [0, 9]]))
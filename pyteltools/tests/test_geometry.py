@@ -0,0 +1,34 @@
+"""!
+Unittest for geom.geometry module
+"""
+
+import numpy as np
+from shapely.geometry import Point
+import unittest
+
+from pyteltools.geom.geometry import label_points_in_polygons, Polyline
+
+
+class PointsInPolygonsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.square = Polyline([(0, 0), (4, 0), (4, 4), (0, 4), (0, 0)], [10.0])
+        self.triangle = Polyline([(2, 2), (8, 2), (2, 8), (2, 2)], [20.0])
+        np.random.seed(0)
+        self.x = np.random.uniform(-1, 9, 500)
+        self.y = np.random.uniform(-1, 9, 500)
+
+    def test_contains_points(self):
+        expected = np.array([self.square.contains(Point(x, y)) for x, y in zip(self.x, self.y)])
+        self.assertTrue(np.array_equal(self.square.contains_points(self.x, self.y), expected))
+
+    def test_outside_bbox(self):
+        self.assertFalse(self.square.contains_points(np.array([-5.0, 10.0]), np.array([1.0, 1.0])).any())
+
+    def test_labels(self):
+        expected = np.zeros(len(self.x), dtype=int)
+        for index, poly in enumerate([self.square, self.triangle]):
+            for i, (x, y) in enumerate(zip(self.x, self.y)):
+                if poly.contains(Point(x, y)):
+                    expected[i] = index + 1
+        labels = label_points_in_polygons([self.square, self.triangle], self.x, self.y)
+        self.assertTrue(np.array_equal(labels, expected))
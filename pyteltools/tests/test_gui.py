@@ -0,0 +1,70 @@
+"""!
+Smoke test for the construction of the classic GUI widgets (gui package)
+"""
+
+import logging
+import numpy as np
+import os
+import shutil
+import tempfile
+import unittest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtWidgets import QApplication
+
+from pyteltools.gui.classic_gui import ClassicMainWindow
+from pyteltools.gui.MaxMinMeanGUI import MaxMinMeanGUI
+from pyteltools.tests.utils import StripHeader, TWO_INPUTS_PROJECT, write_serafin
+from pyteltools.workflow.multi_gui import MultiWidget
+
+
+class GUITestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def setUp(self):
+        # the widgets log into text boxes added to the root logger
+        root = logging.getLogger()
+        self.handlers, self.level = list(root.handlers), root.level
+
+    def tearDown(self):
+        root = logging.getLogger()
+        root.handlers, root.level = self.handlers, self.level
+
+    def test_max_min_mean(self):
+        widget = MaxMinMeanGUI()
+        self.assertEqual(widget.tab.count(), 4)
+        self.assertFalse(widget.maxMinTab.statisticsBox.isEnabledTo(widget.maxMinTab))
+        widget.maxMinTab.statisticsButton.setChecked(True)
+        self.assertTrue(widget.maxMinTab.statisticsBox.isEnabledTo(widget.maxMinTab))
+        widget.deleteLater()
+
+    def test_classic_main_window(self):
+        window = ClassicMainWindow()
+        self.assertGreater(window.panel.stackLayout.count(), 1)
+        window.deleteLater()
+
+    def test_multi_widget(self):
+        folder = tempfile.mkdtemp()
+        try:
+            header = StripHeader(10)
+            for job_id in ('A', 'B'):
+                os.mkdir(os.path.join(folder, job_id))
+                for name in ('r', 's'):
+                    write_serafin(os.path.join(folder, job_id, name + '.slf'), header,
+                                  np.random.rand(2, 2, header.nb_nodes).astype(np.float32))
+            project = os.path.join(folder, 'project.txt')
+            with open(project, 'w') as f:
+                f.write(TWO_INPUTS_PROJECT.format(os.path.join(folder, 'A'), os.path.join(folder, 'B')))
+
+            widget = MultiWidget(project_path=project, ncsize=2)  # loaded and run
+            self.assertEqual(widget.table.input_columns, {0: [0, 1], 1: [2, 3]})
+            self.assertEqual((widget.scene.nodes[2].first_ids, widget.scene.nodes[2].second_ids), ([0, 1], [2, 3]))
+            self.assertEqual([node.state for node in widget.scene.nodes.values()], ['Success'] * 4)
+            for job_id in ('A', 'B'):
+                self.assertTrue(os.path.exists(os.path.join(folder, job_id, 'r_diff.slf')))
+            widget.deleteLater()
+        finally:
+            shutil.rmtree(folder)
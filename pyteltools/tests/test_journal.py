@@ -0,0 +1,117 @@
+"""!
+Unittest for resumable MULTI runs (workflow.journal module) and for the retry of tasks whose process died
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from pyteltools.conf import settings
+from pyteltools.workflow.journal import open_journal
+from pyteltools.workflow.multi_func import run_fused_sinks, Workers
+
+
+def write(node_id, fid, data, options):
+    return True, node_id, fid, None, 'done'
+
+
+def crash_once(node_id, fid, marker, options):
+    if not os.path.exists(marker):
+        open(marker, 'w').close()
+        os._exit(1)
+    return True, node_id, fid, None, 'done'
+
+
+def count_runs(node_id, fid, runs, options):
+    with open(runs, 'a') as f:
+        f.write('run\n')
+    return True, node_id, fid, None, 'done'
+
+
+class JournalTestCase(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.project = os.path.join(self.folder, 'project.txt')
+        with open(self.project, 'w') as f:
+            f.write('fr.;\n')
+        self.inputs = {0: [[self.folder], 'project.txt', ['A']]}
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_resume(self):
+        journal = open_journal(self.project, self.inputs, [])
+        journal.record((True, 1, 0, 'data', 'done'))
+        journal.record((True, 2, 0, 'data', 'done'))
+        journal.close()
+        with open(journal.filename, 'ab') as f:
+            f.write(b'\x80\x04truncated')
+
+        journal = open_journal(self.project, self.inputs, [])
+        self.assertEqual(journal.get(1, 0), (True, 1, 0, 'data', 'done'))
+        replayed, task = journal.replay(run_fused_sinks, ('r.slf', 'fr', [(write, (1, 0, None, ())),
+                                                                          (write, (3, 0, None, ()))]))
+        self.assertEqual(replayed, [(True, 1, 0, 'data', 'done')])
+        self.assertEqual(task, (write, (3, 0, None, ())))
+        journal.close(completed=True)
+        self.assertFalse(os.path.exists(journal.filename))
+
+    def test_resume_after_truncated_record(self):
+        journal = open_journal(self.project, self.inputs, [])
+        journal.record((True, 1, 0, 'data', 'done'))
+        journal.record((True, 2, 0, 'data', 'done'))
+        journal.close()
+        with open(journal.filename, 'r+b') as f:  # cut the last record short
+            f.truncate(os.path.getsize(journal.filename) - 5)
+
+        journal = open_journal(self.project, self.inputs, [])
+        self.assertEqual(sorted(journal.results), [(1, 0)])
+        journal.record((True, 3, 0, 'data', 'done'))
+        journal.close()
+
+        journal = open_journal(self.project, self.inputs, [])
+        self.assertEqual(sorted(journal.results), [(1, 0), (3, 0)])
+        journal.close()
+
+    def test_changed_project(self):
+        journal = open_journal(self.project, self.inputs, [])
+        journal.record((True, 1, 0, 'data', 'done'))
+        journal.record((False, 2, 0, None, 'fail'))
+        journal.close(completed=True)
+        self.assertTrue(os.path.exists(journal.filename))
+
+        with open(self.project, 'a') as f:
+            f.write('1 0\n')
+        journal = open_journal(self.project, self.inputs, [])
+        self.assertIsNone(journal.get(1, 0))
+        journal.close()
+
+    def test_retry(self):
+        retry_delay = settings.MULTI_RETRY_DELAY
+        settings.configure(MULTI_RETRY_DELAY=0.1)
+        try:
+            workers = Workers(1)
+            workers.add_tasks([(crash_once, (0, 0, os.path.join(self.folder, 'marker'), ()))])
+            workers.start()
+            self.assertEqual(workers.get_result(), (True, 0, 0, None, 'done'))
+            workers.stop()
+        finally:
+            settings.configure(MULTI_RETRY_DELAY=retry_delay)
+
+    def test_timeout_of_queued_task(self):
+        retry_delay, task_timeout = settings.MULTI_RETRY_DELAY, settings.MULTI_TASK_TIMEOUT
+        settings.configure(MULTI_RETRY_DELAY=0.1, MULTI_TASK_TIMEOUT=1)
+        try:
+            runs = os.path.join(self.folder, 'runs')
+            workers = Workers(1)
+            workers.task_queue.put((-2, time.sleep, (2.5,)))  # keeps the process busy (not a task of the workers)
+            workers.add_tasks([(count_runs, (0, 0, runs, ()))])
+            workers.start()
+            self.assertEqual(workers.get_result(), (True, 0, 0, None, 'done'))
+            workers.stop()
+            with open(runs) as f:
+                self.assertEqual(f.read(), 'run\n')
+        finally:
+            settings.configure(MULTI_RETRY_DELAY=retry_delay, MULTI_TASK_TIMEOUT=task_timeout)
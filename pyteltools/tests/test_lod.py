@@ -0,0 +1,52 @@
+"""!
+Unittest for the level-of-detail map rendering (gui.lod module)
+"""
+
+import numpy as np
+import unittest
+
+from pyteltools.gui.lod import get_renderer
+
+
+class GridMesh:
+    def __init__(self, n):
+        x, y = np.meshgrid(np.arange(n, dtype=np.float64), np.arange(n, dtype=np.float64))
+        self.x, self.y = x.flatten(), y.flatten()
+        first = (np.arange(n - 1)[:, np.newaxis] * n + np.arange(n - 1)).flatten()
+        self.ikle = np.vstack((np.column_stack((first, first + 1, first + n + 1)),
+                               np.column_stack((first, first + n + 1, first + n))))
+
+
+class LodTestCase(unittest.TestCase):
+    def setUp(self):
+        self.mesh = GridMesh(11)
+        self.renderer = get_renderer(self.mesh)
+
+    def test_cache(self):
+        self.assertIs(get_renderer(self.mesh), self.renderer)
+        self.assertIs(self.renderer.triangulation, self.renderer.triangulation)
+
+    def test_edges(self):
+        self.assertEqual(len(self.renderer.edge_segments()), 2 * 10 * 11 + 10 * 10)
+        visible = self.renderer.visible_elements((0.2, 0.8), (0.2, 0.8))
+        self.assertEqual(np.count_nonzero(visible), 2)
+        self.assertEqual(len(self.renderer.edge_segments(visible)), 5)
+
+    def test_rasterize(self):
+        # the mesh covers only the left half of the viewport
+        extent, shape = (0, 20, 2.5, 7.5), (20, 80)
+        grid = self.renderer.raster_grid(extent, shape)
+        self.assertIs(self.renderer.raster_grid(extent, shape), grid)
+
+        linear = 2 * self.mesh.x - 3 * self.mesh.y + 1
+        image = self.renderer.rasterize(grid, linear)
+        px, py = np.meshgrid(np.arange(80) * 0.25 + 0.125, np.arange(20) * 0.25 + 2.625)
+        inside = px <= 10
+        self.assertTrue(np.array_equal(image.mask, ~inside))
+        self.assertTrue(np.allclose(image[inside], (2 * px - 3 * py + 1)[inside]))
+
+        coverage = self.renderer.coverage(grid)
+        self.assertEqual(coverage.count(), np.count_nonzero(inside))
+
+        image = self.renderer.rasterize(grid, np.arange(200, dtype=np.float64), on_elements=True)
+        self.assertTrue(np.all(np.isin(image.compressed(), np.arange(200))))
@@ -0,0 +1,147 @@
+"""!
+Unittest and allocation microbenchmark for max/min/mean calculators in slf.misc module
+"""
+
+import numpy as np
+import tracemalloc
+import unittest
+
+import pyteltools.slf.misc as operations
+
+
+class DummyHeader:
+    def __init__(self, nb_nodes):
+        self.nb_nodes = nb_nodes
+
+
+class DummyInputStream:
+    """Input stream returning values from in-memory arrays of shape (nb_frames, nb_nodes)"""
+    def __init__(self, values):
+        self.values = values
+        self.header = DummyHeader(values['U'].shape[1])
+
+    def read_var_in_frame(self, time_index, var_ID, out=None):
+        if out is None:
+            return self.values[var_ID][time_index].copy()
+        np.copyto(out, self.values[var_ID][time_index])
+        return out
+
+
+def peak_allocation_per_frame(calculator, time_indices):
+    """!
+    @brief Measure the peak memory allocated by the calculator while processing a single frame
+    @param calculator <ScalarMaxMinMeanCalculator/VectorMaxMinMeanCalculator>: calculator to benchmark
+    @param time_indices <[int]>: indices of the frames to process
+    @return <int>: largest peak of traced memory (in bytes) observed over the processed frames
+    """
+    calculator.max_min_mean_in_frame(time_indices[0])  # warm-up
+    peak = 0
+    tracemalloc.start()
+    try:
+        for time_index in time_indices[1:]:
+            tracemalloc.reset_peak()
+            current, _ = tracemalloc.get_traced_memory()
+            calculator.max_min_mean_in_frame(time_index)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+class MaxMinMeanTestCase(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.nb_frames, self.nb_nodes = 50, 20000
+        self.values = {var: np.random.gamma(2, 1, (self.nb_frames, self.nb_nodes)) for var in ('H', 'S', 'U', 'V')}
+        self.values['M'] = np.sqrt(self.values['U'] ** 2 + self.values['V'] ** 2)
+        self.input_stream = DummyInputStream(self.values)
+        self.time_indices = list(range(self.nb_frames))
+        self.frame_size = self.nb_nodes * 8
+
+    def test_scalar(self):
+        for operator, fun in ((operations.MAX, np.max), (operations.MIN, np.min), (operations.MEAN, np.mean)):
+            calculator = operations.ScalarMaxMinMeanCalculator(operator, self.input_stream,
+                                                               [('H', b'H', b'M'), ('S', b'S', b'M')],
+                                                               self.time_indices)
+            calculator.run()
+            values = calculator.finishing_up()
+            self.assertTrue(np.allclose(values[0], fun(self.values['H'], axis=0)))
+            self.assertTrue(np.allclose(values[1], fun(self.values['S'], axis=0)))
+
+    def test_vector(self):
+        for operator, fun in ((operations.MAX, np.argmax), (operations.MIN, np.argmin)):
+            calculator = operations.VectorMaxMinMeanCalculator(operator, self.input_stream,
+                                                               [('U', b'U', b'M/S'), ('V', b'V', b'M/S')],
+                                                               self.time_indices, [])
+            calculator.run()
+            values = calculator.finishing_up()
+            indices = fun(self.values['M'], axis=0)
+            nodes = np.arange(self.nb_nodes)
+            self.assertTrue(np.allclose(values[0], self.values['U'][indices, nodes]))
+            self.assertTrue(np.allclose(values[1], self.values['V'][indices, nodes]))
+
+    def test_scalar_allocations(self):
+        calculator = operations.ScalarMaxMinMeanCalculator(operations.MAX, self.input_stream,
+                                                           [('H', b'H', b'M'), ('S', b'S', b'M')],
+                                                           self.time_indices)
+        self.assertLess(peak_allocation_per_frame(calculator, self.time_indices), self.frame_size // 10)
+
+    def test_vector_allocations(self):
+        calculator = operations.VectorMaxMinMeanCalculator(operations.MAX, self.input_stream,
+                                                           [('U', b'U', b'M/S'), ('V', b'V', b'M/S')],
+                                                           self.time_indices, [])
+        self.assertLess(peak_allocation_per_frame(calculator, self.time_indices), self.frame_size // 10)
+
+
+class DummyHeader3D:
+    def __init__(self, nb_planes, nb_nodes_2d, var_IDs):
+        self.nb_planes = nb_planes
+        self.nb_nodes_2d = nb_nodes_2d
+        self.nb_nodes = nb_planes * nb_nodes_2d
+        self.var_IDs = var_IDs
+
+
+class VerticalMaxMinMeanTestCase(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.nb_frames, self.nb_planes, self.nb_nodes_2d = 3, 40, 100
+        shape = (self.nb_frames, self.nb_planes, self.nb_nodes_2d)
+        self.values = {var: np.random.normal(size=shape) for var in ('U', 'V', 'W')}
+        self.values['Z'] = np.cumsum(np.random.gamma(2, 1, shape), axis=1)
+        header = DummyHeader3D(self.nb_planes, self.nb_nodes_2d, ['Z', 'U', 'V', 'W'])
+        self.input_stream = DummyInputStream({var: values.reshape(self.nb_frames, -1)
+                                              for var, values in self.values.items()})
+        self.input_stream.header = header
+        self.selected_vars = [(var, var.encode(), b'M') for var in header.var_IDs]
+
+    def test_vector_max(self):
+        calculator = operations.VerticalMaxMinMeanCalculator(operations.MAX, self.input_stream,
+                                                             self.input_stream.header, self.selected_vars)
+        values = calculator.max_min_mean_in_frames(list(range(self.nb_frames)))
+        magnitude = np.sqrt(self.values['U'] ** 2 + self.values['V'] ** 2 + self.values['W'] ** 2)
+        indices = np.argmax(magnitude, axis=1)
+        for k in range(self.nb_frames):
+            expected = self.values['U'][k][indices[k], np.arange(self.nb_nodes_2d)]
+            self.assertTrue(np.allclose(values[k][1], expected))
+
+    def test_mean(self):
+        calculator = operations.VerticalMaxMinMeanCalculator(operations.MEAN, self.input_stream,
+                                                             self.input_stream.header, self.selected_vars, ['H'])
+        for k in range(self.nb_frames):
+            values = calculator.max_min_mean_in_frame(k)
+            Z = self.values['Z'][k]
+            U = self.values['U'][k]
+            expected = np.sum((U[1:] + U[:-1]) / 2 * (Z[1:] - Z[:-1]), axis=0) / (Z[-1] - Z[0])
+            self.assertTrue(np.allclose(values[1], expected))
+            self.assertTrue(np.allclose(values[-1], Z[-1] - Z[0]))
+
+    def test_mean_computed_variable(self):
+        selected_vars = [('M', b'M', b'M/S'), ('U', b'U', b'M/S')]
+        calculator = operations.VerticalMaxMinMeanCalculator(operations.MEAN, self.input_stream,
+                                                             self.input_stream.header, selected_vars)
+        values = calculator.max_min_mean_in_frames(list(range(self.nb_frames)))
+        magnitude = np.sqrt(self.values['U'] ** 2 + self.values['V'] ** 2 + self.values['W'] ** 2)
+        for k in range(self.nb_frames):
+            Z = self.values['Z'][k]
+            expected = np.sum((magnitude[k][1:] + magnitude[k][:-1]) / 2 * (Z[1:] - Z[:-1]), axis=0) / (Z[-1] - Z[0])
+            self.assertTrue(np.allclose(values[k][0], expected))
@@ -0,0 +1,76 @@
+"""!
+Unittest for the background execution of the nodes of the workflow mono view (workflow.mono_runner module)
+"""
+
+from PyQt5.QtCore import QCoreApplication
+import threading
+import unittest
+
+from pyteltools.workflow.mono_runner import MonoRunner
+from pyteltools.workflow.Node import Node, NodeCancelled
+
+
+class DummyNode:
+    def __init__(self, name, parents=(), barrier=None, steps=0):
+        self.name = name
+        self.state = Node.READY
+        self.message = ''
+        self._parents = list(parents)
+        self.barrier = barrier
+        self.steps = steps
+        self.cancel_event = None
+
+    def parents(self):
+        return self._parents
+
+    def run_in_gui_thread(self):
+        return False
+
+    def run(self):
+        if self.barrier is not None:
+            self.barrier.wait(timeout=5)  # fails if the branches do not run concurrently
+        for _ in range(self.steps):
+            if self.cancel_event.wait(timeout=0.01):
+                raise NodeCancelled
+        self.state = Node.SUCCESS
+
+    def fail(self, message):
+        self.state = Node.FAIL
+        self.message = message
+
+
+class MonoRunnerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = QCoreApplication.instance() or QCoreApplication([])
+
+    def run_nodes(self, runner, cancel=False):
+        runner.finished.connect(self.app.quit)
+        runner.start()
+        if cancel:
+            runner.cancel()
+        if not runner.is_finished:
+            self.app.exec_()
+
+    def test_branches(self):
+        barrier = threading.Barrier(2)
+        load = DummyNode('load')
+        first, second = DummyNode('first', [load], barrier), DummyNode('second', [load], barrier)
+        both = DummyNode('both', [first, second])
+        self.run_nodes(MonoRunner([both, second, first, load], max_workers=2))
+        self.assertEqual([node.state for node in (load, first, second, both)], [Node.SUCCESS] * 4)
+
+    def test_failed_input(self):
+        load = DummyNode('load')
+        load.run = lambda: load.fail('error')
+        child = DummyNode('child', [load])
+        self.assertEqual(MonoRunner.with_ancestors(child), [child, load])
+        self.run_nodes(MonoRunner(MonoRunner.with_ancestors(child)))
+        self.assertEqual(child.state, Node.FAIL)
+        self.assertEqual(child.message, 'input failed.')
+
+    def test_cancel(self):
+        load = DummyNode('load', steps=500)
+        child = DummyNode('child', [load])
+        self.run_nodes(MonoRunner([load, child]), cancel=True)
+        self.assertEqual(load.message, 'canceled.')
+        self.assertEqual(child.state, Node.READY)
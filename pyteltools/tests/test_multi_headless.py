@@ -0,0 +1,91 @@
+"""!
+Unittest for the headless execution of MULTI workflow projects (workflow.multi_headless module)
+"""
+
+import numpy as np
+import os
+import shutil
+import tempfile
+import unittest
+
+from pyteltools.slf import Serafin
+from pyteltools.tests.utils import StripHeader, TWO_INPUTS_PROJECT, write_serafin
+from pyteltools.workflow.multi_headless import HeadlessMultiProject, HeadlessMultiRunner
+
+
+PROJECT = """fr.;
+3 2
+Input/Output|Load Serafin 2D|0|0|0||r.slf|
+Operators|Max|1|0|0|
+Input/Output|Write Serafin|2|0|0|_max|1||0|1
+0|0|1|0
+1|1|2|0
+1
+0|2|r.slf|{}|{}|A|B
+"""
+
+
+class HeadlessMultiRunnerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.nb_frames = 4
+        header = StripHeader(10)
+        np.random.seed(0)
+        self.values = {}
+        for job_id in ('A', 'B'):
+            os.mkdir(os.path.join(self.folder, job_id))
+            for name in ('r', 's'):
+                self.values[job_id, name] = np.random.rand(self.nb_frames, 2, header.nb_nodes).astype(np.float32)
+                write_serafin(os.path.join(self.folder, job_id, name + '.slf'), header, self.values[job_id, name])
+        self.project = os.path.join(self.folder, 'project.txt')
+
+    def write_project(self, template):
+        with open(self.project, 'w') as f:
+            f.write(template.format(os.path.join(self.folder, 'A'), os.path.join(self.folder, 'B')))
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_run(self):
+        self.write_project(PROJECT)
+        project = HeadlessMultiProject()
+        self.assertTrue(project.load(self.project))
+        self.assertEqual(project.nb_expected_tasks(), 6)
+
+        results = []
+        runner = HeadlessMultiRunner(project, 2, callback=lambda *args: results.append(args))
+        self.assertTrue(runner.run())
+        self.assertEqual(len(results), 6)
+
+        for job_id in ('A', 'B'):
+            with Serafin.Read(os.path.join(self.folder, job_id, 'r_max.slf'), 'fr') as f:
+                f.read_header()
+                f.get_time()
+                self.assertEqual(f.header.var_IDs, ['H', 'U'])
+                expected = self.values[job_id, 'r'].max(axis=0)
+                for i, var_ID in enumerate(f.header.var_IDs):
+                    self.assertTrue(np.allclose(f.read_var_in_frame(0, var_ID), expected[i]))
+
+    def test_two_inputs(self):
+        self.write_project(TWO_INPUTS_PROJECT)
+        project = HeadlessMultiProject()
+        self.assertTrue(project.load(self.project))
+        self.assertEqual(project.input_columns, {0: [0, 1], 1: [2, 3]})
+        self.assertEqual((project.nodes[2].first_ids, project.nodes[2].second_ids), ([0, 1], [2, 3]))
+        self.assertEqual(project.nb_expected_tasks(), 8)
+
+        results = []
+        runner = HeadlessMultiRunner(project, 2, callback=lambda *args: results.append(args))
+        self.assertTrue(runner.run())
+        self.assertEqual(len(results), 8)
+
+        for job_id in ('A', 'B'):
+            with Serafin.Read(os.path.join(self.folder, job_id, 'r_diff.slf'), 'fr') as f:
+                f.read_header()
+                f.get_time()
+                expected = self.values[job_id, 'r'] - self.values[job_id, 's']
+                self.assertEqual(f.header.var_IDs, ['H', 'U'])
+                for time_index in range(self.nb_frames):
+                    for i, var_ID in enumerate(f.header.var_IDs):
+                        self.assertTrue(np.allclose(f.read_var_in_frame(time_index, var_ID),
+                                                    expected[time_index, i]))
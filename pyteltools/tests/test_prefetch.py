@@ -0,0 +1,44 @@
+"""!
+Unittest for the frame prefetching of the map viewers (workflow.prefetch module)
+"""
+
+import threading
+import unittest
+
+from pyteltools.workflow.prefetch import PrefetchFrameCache
+
+
+class CountingCache(PrefetchFrameCache):
+    def __init__(self, *args, **kwargs):
+        super().__init__('dummy.slf', 'fr', None, ['H'], *args, **kwargs)
+        self.reads = []
+        self.lock = threading.Lock()
+
+    def _read(self, time_index):
+        with self.lock:
+            self.reads.append(time_index)
+        return [time_index * 10.]
+
+
+class PrefetchTestCase(unittest.TestCase):
+    def test_neighbors(self):
+        cache = CountingCache(10, capacity=8, nb_neighbors=2)
+        self.assertEqual(cache.neighbors(0), [1, 2])
+        self.assertEqual(cache.neighbors(5), [6, 4, 7, 3])
+        self.assertEqual(cache.neighbors(9), [8, 7])
+        cache.close()
+
+    def test_get(self):
+        cache = CountingCache(10, capacity=6, nb_neighbors=1)
+        for time_index in (4, 5, 6, 5, 4):
+            self.assertEqual(cache.get(time_index), [time_index * 10.])
+            cache.executor.submit(lambda: None).result()  # wait for the prefetched frames
+        self.assertEqual(sorted(cache.reads), [3, 4, 5, 6, 7])
+
+        # the least recently used frames are dropped
+        cache.get(0)
+        self.assertEqual(len(cache.frames), 6)
+        self.assertNotIn(7, cache.frames)
+        self.assertEqual(list(cache.frames)[-1], 0)
+        cache.close()
+        self.assertFalse(cache.frames)
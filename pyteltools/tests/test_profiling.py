@@ -0,0 +1,44 @@
+"""!
+Unittest for profiling of MULTI tasks (workflow.profiling module)
+"""
+
+import csv
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from pyteltools.conf import settings
+from pyteltools.workflow.profiling import new_profiler, profiled_call
+
+
+def load(node_id, fid, filename, language, job_id):
+    return True, node_id, fid, sum(range(10000)), 'done'
+
+
+class ProfilingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_profiler(self):
+        profiler = new_profiler(self.folder, {0: 'Load Serafin 2D'}, {0: 'A', 1: 'B'}, cprofile=True)
+        for fid in (0, 1):
+            args = (0, fid, 'r.slf', 'fr', 'AB'[fid])
+            result, record = profiled_call(*profiler.wrap(load, args)[1])
+            self.assertEqual(result, load(*args))
+            self.assertGreaterEqual(record['run time'], 0)
+            profiler.add(load, args, record['start'], record)
+        profiler.write(self.folder)
+
+        with open(os.path.join(self.folder, 'trace.json')) as f:
+            events = [event for event in json.load(f)['traceEvents'] if event['ph'] == 'X']
+        self.assertEqual(sorted(event['name'] for event in events), ['Load Serafin 2D (A)', 'Load Serafin 2D (B)'])
+
+        with open(os.path.join(self.folder, 'nodes.csv')) as f:
+            rows = list(csv.reader(f, delimiter=settings.CSV_SEPARATOR))
+        self.assertEqual(rows[1][:3], ['Load Serafin 2D', '0', '2'])
+        self.assertEqual(os.listdir(os.path.join(self.folder, 'cprofile')), ['node_0.prof'])
@@ -0,0 +1,49 @@
+"""!
+Unittest for memory- and size-aware scheduling of MULTI tasks (workflow.scheduler module)
+"""
+
+import unittest
+
+from pyteltools.workflow.scheduler import HEAVY, LIGHT, TaskProfile, TaskScheduler
+
+
+def profile(name, args):
+    cost, memory, resource = args
+    return TaskProfile(cost, memory, resource)
+
+
+class TaskSchedulerTestCase(unittest.TestCase):
+    def test_largest_first(self):
+        scheduler = TaskScheduler(2, memory_budget=0, max_heavy=1, profile=profile)
+        for cost in (1, 5, 3):
+            scheduler.push(('task %d' % cost, (cost, 0, LIGHT)))
+        self.assertEqual([task[0] for _, task in scheduler.pop_ready()], ['task 5', 'task 3'])
+        self.assertEqual(scheduler.pop_ready(), [])
+
+        scheduler.release(1)  # task 5
+        self.assertEqual([task[0] for _, task in scheduler.pop_ready()], ['task 1'])
+
+    def test_memory_budget(self):
+        scheduler = TaskScheduler(4, memory_budget=100, max_heavy=4, profile=profile)
+        scheduler.push(('big', (10, 80, LIGHT)))
+        scheduler.push(('big too', (9, 80, LIGHT)))
+        scheduler.push(('small', (1, 20, LIGHT)))
+        self.assertEqual([task[0] for _, task in scheduler.pop_ready()], ['big', 'small'])
+        scheduler.release(0)
+        scheduler.release(2)
+        self.assertEqual([task[0] for _, task in scheduler.pop_ready()], ['big too'])
+
+    def test_oversized_task(self):
+        scheduler = TaskScheduler(4, memory_budget=100, max_heavy=4, profile=profile)
+        scheduler.push(('huge', (10, 500, LIGHT)))
+        self.assertEqual(len(scheduler.pop_ready()), 1)  # always started when nothing else is running
+
+    def test_heavy_cap(self):
+        scheduler = TaskScheduler(4, memory_budget=0, max_heavy=1, profile=profile)
+        scheduler.push(('mesh 1', (10, 0, HEAVY)))
+        scheduler.push(('mesh 2', (9, 0, HEAVY)))
+        scheduler.push(('write', (1, 0, LIGHT)))
+        self.assertEqual([task[0] for _, task in scheduler.pop_ready()], ['mesh 1', 'write'])
+        self.assertEqual(len(scheduler), 1)
+        scheduler.release(0)
+        self.assertEqual([task[0] for _, task in scheduler.pop_ready()], ['mesh 2'])
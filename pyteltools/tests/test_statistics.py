@@ -0,0 +1,63 @@
+"""!
+Unittest for temporal statistics in slf.misc module
+"""
+
+import numpy as np
+import unittest
+
+import pyteltools.slf.misc as operations
+
+
+class DummyHeader:
+    def __init__(self, nb_nodes):
+        self.nb_nodes = nb_nodes
+
+
+class DummyInputStream:
+    """Input stream returning values from in-memory arrays of shape (nb_frames, nb_nodes)"""
+    def __init__(self, values):
+        self.values = values
+        self.header = DummyHeader(values['U'].shape[1])
+
+    def read_var_in_frame(self, time_index, var_ID):
+        return self.values[var_ID][time_index].copy()
+
+
+class StatisticsTestCase(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        nb_frames, nb_nodes = 200, 50
+        self.values = {var: np.random.gamma(2, 1, (nb_frames, nb_nodes)) for var in ('H', 'U', 'M')}
+        self.input_stream = DummyInputStream(self.values)
+        self.time_indices = list(range(nb_frames))
+
+    def test_single_pass(self):
+        statistics = ['Max', 'Min', 'Mean', 'Var', 'Std']
+        calculator = operations.StatisticsCalculator(statistics, self.input_stream, [('H', b'H', b'M')], [],
+                                                     self.time_indices)
+        calculator.run()
+        values = calculator.finishing_up()
+        self.assertEqual(len(calculator.output_variables()), len(statistics))
+        expected = [np.max, np.min, np.mean, np.var, np.std]
+        for row, fun in zip(values, expected):
+            self.assertTrue(np.allclose(row, fun(self.values['H'], axis=0)))
+
+    def test_vector_max(self):
+        calculator = operations.StatisticsCalculator(['Max', 'Mean'], self.input_stream, [], [('U', b'U', b'M/S')],
+                                                     self.time_indices)
+        calculator.run()
+        values = calculator.finishing_up()
+        max_indices = np.argmax(self.values['M'], axis=0)
+        self.assertTrue(np.allclose(values[0], self.values['U'][max_indices, np.arange(max_indices.shape[0])]))
+        self.assertTrue(np.allclose(values[1], np.mean(self.values['U'], axis=0)))
+
+    def test_percentiles(self):
+        self.assertEqual(operations.parse_percentiles('10, 50 90'), ['P10', 'P50', 'P90'])
+        self.assertRaises(ValueError, operations.parse_percentiles, '100')
+        calculator = operations.StatisticsCalculator(['P10', 'P50', 'P90'], self.input_stream, [('H', b'H', b'M')],
+                                                     [], self.time_indices)
+        calculator.run()
+        values = calculator.finishing_up()
+        for row, percentage in zip(values, (10, 50, 90)):
+            expected = np.percentile(self.values['H'], percentage, axis=0)
+            self.assertLess(np.mean(np.abs(row - expected)), 0.1 * np.mean(expected))
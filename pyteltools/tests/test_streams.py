@@ -0,0 +1,93 @@
+"""!
+Unittest for the stages of frame streams (slf.streams module)
+"""
+
+import copy
+import numpy as np
+import unittest
+
+import pyteltools.slf.misc as operations
+from pyteltools.slf.streams import FrameStream, monitor, select_layer, synchronized_max, temporal_reduction
+
+
+class DummyHeader:
+    def __init__(self, var_IDs, nb_planes=1):
+        self.var_IDs, self.var_names, self.var_units = [], [], []
+        self.nb_planes = nb_planes
+        for var_ID in var_IDs:
+            self.add_variable_str(var_ID, var_ID, '')
+
+    def copy(self):
+        return copy.deepcopy(self)
+
+    def copy_as_2d(self):
+        header = self.copy()
+        header.nb_planes = 1
+        return header
+
+    def empty_variables(self):
+        self.var_IDs, self.var_names, self.var_units = [], [], []
+
+    def set_variables(self, selected_vars):
+        self.empty_variables()
+        for var_ID, var_name, var_unit in selected_vars:
+            self.add_variable(var_ID, var_name, var_unit)
+
+    def add_variable(self, var_ID, var_name, var_unit):
+        self.var_IDs.append(var_ID)
+        self.var_names.append(var_name)
+        self.var_units.append(var_unit)
+
+    def add_variable_str(self, var_ID, var_name, var_unit):
+        self.add_variable(var_ID, var_name.encode(), var_unit.encode())
+
+
+class StreamsTestCase(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.nb_frames, self.nb_nodes = 10, 50
+        self.values = {var: np.random.gamma(2, 1, (self.nb_frames, self.nb_nodes)) for var in ('H', 'U', 'V')}
+        self.values['M'] = np.sqrt(self.values['U'] ** 2 + self.values['V'] ** 2)
+        self.times = [10. * i for i in range(self.nb_frames)]
+
+    def stream(self, var_IDs):
+        buffer = np.empty((len(var_IDs), self.nb_nodes))
+
+        def frames():
+            for time, index in zip(self.times, range(self.nb_frames)):
+                for i, var_ID in enumerate(var_IDs):
+                    buffer[i] = self.values[var_ID][index]  # values reused between frames
+                yield time, buffer
+        return FrameStream(DummyHeader(var_IDs), frames())
+
+    def test_temporal_reduction(self):
+        stream = self.stream(['H', 'U', 'V', 'M']).pipe(temporal_reduction(operations.MAX, ['H', 'U', 'V']))
+        self.assertEqual(stream.header.var_IDs, ['H', 'U', 'V'])
+        frames = list(stream)
+        self.assertEqual(len(frames), 1)
+        time, values = frames[0]
+        self.assertEqual(time, 0.)
+        self.assertTrue(np.array_equal(values[0], self.values['H'].max(axis=0)))
+        argmax = self.values['M'].argmax(axis=0)
+        self.assertTrue(np.array_equal(values[1], self.values['U'][argmax, range(self.nb_nodes)]))
+        self.assertTrue(np.array_equal(values[2], self.values['V'][argmax, range(self.nb_nodes)]))
+
+        _, values = next(iter(self.stream(['H', 'U']).pipe(temporal_reduction(operations.MEAN, time=5.))))
+        self.assertTrue(np.allclose(values[1], self.values['U'].mean(axis=0)))
+
+    def test_synchronized_max(self):
+        stream = self.stream(['H', 'U']).pipe(synchronized_max('H', ['U']))
+        self.assertEqual(stream.header.var_IDs, ['MAX TIME', 'U'])
+        _, values = next(iter(stream))
+        argmax = self.values['H'].argmax(axis=0)
+        self.assertTrue(np.array_equal(values[0], np.array(self.times)[argmax]))
+        self.assertTrue(np.array_equal(values[1], self.values['U'][argmax, range(self.nb_nodes)]))
+
+    def test_select_layer(self):
+        stream = self.stream(['H'])
+        stream.header.nb_planes = 5
+        counts = []
+        frames = list(stream.pipe(monitor(counts.append), select_layer(2)))
+        self.assertEqual(counts, list(range(1, self.nb_frames + 1)))
+        self.assertEqual(frames[-1][1].shape, (1, self.nb_nodes // 5))
+        self.assertTrue(np.array_equal(frames[-1][1][0], self.values['H'][-1, 10:20]))
@@ -0,0 +1,43 @@
+"""!
+Unittest for geom.transformation module
+"""
+
+import numpy as np
+import unittest
+
+from pyteltools.geom.geometry import Polyline
+from pyteltools.geom.transformation import compose, Transformation, TransformationMap
+
+
+class TransformationTestCase(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.points = np.random.uniform(-1000, 1000, (200, 3))
+        self.first = Transformation(0.3, 1.2, 0.9, 100.5, -20.25, 3)
+        self.second = Transformation(-1.1, 0.8, 1.5, -7, 42, -0.5)
+
+    def test_apply(self):
+        expected = np.array([self.first(p) for p in self.points])
+        self.assertTrue(np.allclose(self.first.apply(self.points), expected))
+        homogeneous = np.hstack((self.points, np.ones((len(self.points), 1))))
+        self.assertTrue(np.allclose(homogeneous.dot(self.first.affine_matrix().T)[:, :3], expected))
+
+    def test_compose(self):
+        expected = np.array([self.second(self.first(p)) for p in self.points])
+        self.assertTrue(np.allclose(compose([self.first, self.second]).apply(self.points), expected))
+        identity = compose([self.first, self.first.inverse()])
+        self.assertTrue(np.allclose(identity.apply(self.points), self.points))
+
+    def test_map(self):
+        transformations = {(0, 1): self.first, (1, 0): self.first.inverse(),
+                           (1, 2): self.second, (2, 1): self.second.inverse()}
+        transformation_map = TransformationMap(['A', 'B', 'C'], transformations)
+        chain = transformation_map.get_transformation(0, 2)
+        self.assertEqual(len(chain), 1)
+        self.assertTrue(np.allclose(chain[0].apply(self.points), compose([self.first, self.second]).apply(self.points)))
+
+    def test_polyline(self):
+        line = Polyline([tuple(p) for p in self.points[:10, :2]])
+        new_line = line.apply_transformations([self.first, self.second])
+        expected = [self.second(self.first(np.array([x, y, 0])))[:2] for x, y in self.points[:10, :2]]
+        self.assertTrue(np.allclose(np.array(list(new_line.coords())), expected))
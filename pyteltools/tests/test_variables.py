@@ -2,15 +2,37 @@
 Unittest for slf.variables module
 """
 
+import numpy as np
 import unittest
 
-from pyteltools.slf.variables import get_necessary_equations
+from pyteltools.slf.variables import do_calculations_in_frame, get_equation_plan, get_necessary_equations
 from pyteltools.slf.variable.variables_2d import get_US_equation, CHEZY_ID, MANNING_ID, NIKURADSE_ID, STRICKLER_ID
 
 
 eq_name = lambda eqs: list(map(lambda x: x.output.ID(), eqs))
 
 
+class DummyHeader:
+    def __init__(self, nb_nodes):
+        self.nb_nodes = nb_nodes
+        self.np_float_type = np.float64
+
+
+class DummyInput:
+    """Input stream returning values from in-memory arrays of shape (nb_frames, nb_nodes)"""
+    def __init__(self, values):
+        self.values = values
+        self.header = DummyHeader(values['U'].shape[1])
+        self.reads = 0
+
+    def read_var_in_frame(self, time_index, var_ID, out=None):
+        self.reads += 1
+        if out is None:
+            return self.values[var_ID][time_index].copy()
+        np.copyto(out, self.values[var_ID][time_index])
+        return out
+
+
 class VariablesTestCase(unittest.TestCase):
     def test_no_equation(self):
         self.assertEqual(eq_name(get_necessary_equations(['U', 'V'], ['U'], True, None)), [])
@@ -98,3 +120,41 @@ class VariablesTestCase(unittest.TestCase):
         self.assertEqual(eq_name(get_necessary_equations(['QSX', 'EF', 'H', 'DF', 'QSY', 'B'], ['S', 'QS', 'H'], True, None)), ['S', 'QS'])
         self.assertEqual(eq_name(get_necessary_equations(['DMAX', 'US', 'QSX', 'EF', 'Q', 'DF', 'S', 'B'], ['H', 'QS'], True, None)), ['H', 'QS'])
 
+
+class EquationPlanTestCase(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.values = {'U': np.random.randn(4, 50), 'V': np.random.randn(4, 50), 'S': np.random.rand(4, 50),
+                       'B': np.random.rand(4, 50) - 0.5}
+        self.input_stream = DummyInput(self.values)
+
+    def test_plan(self):
+        plan = get_equation_plan(['U', 'V', 'S', 'B'], ['Q', 'U', 'F', 'H'], True, np.float32)
+        values = plan.evaluate_block(self.input_stream, [3, 1])
+        self.assertEqual(values.shape, (2, 4, 50))
+        self.assertEqual(values.dtype, np.float32)
+
+        U, V = self.values['U'][[3, 1]], self.values['V'][[3, 1]]
+        H = self.values['S'][[3, 1]] - self.values['B'][[3, 1]]
+        with np.errstate(invalid='ignore'):
+            expected = [np.sqrt((H * U) ** 2 + (H * V) ** 2), U, np.sqrt(U ** 2 + V ** 2) / np.sqrt(9.80665 * H), H]
+        self.assertTrue(np.allclose(values, np.array(expected).swapaxes(0, 1), rtol=1e-6, equal_nan=True))
+
+        # the buffers are reused and the variables are read once per frame
+        buffers = dict(plan.buffers)
+        self.input_stream.reads = 0
+        self.assertTrue(np.array_equal(plan.evaluate(self.input_stream, 1), values[1], equal_nan=True))
+        self.assertEqual(self.input_stream.reads, 4)
+        self.assertTrue(all(plan.buffers[var_ID] is buffer for var_ID, buffer in buffers.items()))
+
+    def test_friction_velocity(self):
+        us_equation = get_US_equation(CHEZY_ID)
+        W = np.full(50, 40.)
+        equations = get_necessary_equations(['U', 'V', 'S', 'B', 'W'], ['US', 'TAU'], True, us_equation)
+        for time_index in range(4):
+            values = do_calculations_in_frame(equations, self.input_stream, time_index, ['US', 'TAU'], np.float64,
+                                              True, us_equation, {'W': W})
+            U, V = self.values['U'][time_index], self.values['V'][time_index]
+            H = self.values['S'][time_index] - self.values['B'][time_index]
+            US = np.where(H > 0, np.sqrt(U ** 2 + V ** 2) * np.sqrt(9.80665) / W, 0)
+            self.assertTrue(np.allclose(values, [US, 1000 * US ** 2]))
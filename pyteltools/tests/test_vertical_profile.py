@@ -0,0 +1,85 @@
+"""!
+Unittest for the extraction of vertical temporal profiles in 3D results (slf.Serafin and slf.interpolation modules)
+"""
+
+import numpy as np
+import os
+import struct
+import tempfile
+import unittest
+
+from pyteltools.slf import Serafin
+from pyteltools.slf.interpolation import VerticalTemporalProfiles
+
+
+class PrismHeader:
+    """Attributes to write a 3D Serafin file on a square of 2 triangles (4 nodes per plane)"""
+    def __init__(self, nb_planes):
+        self.is_2d = False
+        self.nb_planes = nb_planes
+        self.title = bytes('DUMMY SERAFIN', Serafin.SLF_EIT).ljust(72)
+        self.file_type = bytes('SERAFIN', Serafin.SLF_EIT).ljust(8)
+        self.float_type, self.float_size = 'f', 4
+        self.nb_var, self.nb_var_quadratic = 2, 0
+        self.var_names = [bytes('COTE Z', Serafin.SLF_EIT).ljust(16), bytes('VITESSE U', Serafin.SLF_EIT).ljust(16)]
+        self.var_units = [bytes('M', Serafin.SLF_EIT).ljust(16), bytes('M/S', Serafin.SLF_EIT).ljust(16)]
+        self.params = [1, 0, 0, 0, 0, 0, nb_planes, 0, 0, 0]
+        self.nb_nodes = 4 * nb_planes
+        self.nb_nodes_per_elem = 6
+        ikle = [[a, b, c, a + 4, b + 4, c + 4] for plane in range(nb_planes - 1)
+                for a, b, c in np.array([[1, 2, 4], [1, 4, 3]]) + 4 * plane]
+        self.nb_elements = len(ikle)
+        self.ikle = np.array(ikle).flatten()
+        self.ipobo = [0] * self.nb_nodes
+        self.x = np.tile([0., 1., 0., 1.], nb_planes)
+        self.y = np.tile([0., 0., 1., 1.], nb_planes)
+
+    def pack_int(self, *args, nb=1):
+        return struct.pack('>%ii' % nb, *args)
+
+    def pack_float(self, *args, nb=1):
+        return struct.pack('>%if' % nb, *args)
+
+
+class VerticalProfileTestCase(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'profile.slf')
+        self.nb_frames, self.nb_planes = 5, 3
+        header = PrismHeader(self.nb_planes)
+        np.random.seed(0)
+        self.values = np.random.rand(self.nb_frames, 2, header.nb_nodes).astype(np.float32)
+        with Serafin.Write(self.path, 'fr') as f:
+            f.write_header(header)
+            for time_index in range(self.nb_frames):
+                f.write_entire_frame(header, 10. * time_index, self.values[time_index])
+
+    def tearDown(self):
+        os.remove(self.path)
+        os.rmdir(self.folder)
+
+    def test_read_var_at_nodes(self):
+        with Serafin.Read(self.path, 'fr') as f:
+            f.read_header()
+            values = f.read_var_at_nodes('U', [1, 6, 11])
+            self.assertTrue(np.array_equal(values, self.values[:, 1, [1, 6, 11]]))
+            values = f.read_var_at_nodes('Z', [0, 3], [4, 2])
+            self.assertTrue(np.array_equal(values, self.values[[4, 2], 0][:, [0, 3]]))
+            self.assertRaises(Serafin.SerafinRequestError, f.read_var_at_nodes, 'U', [12])
+            self.assertRaises(Serafin.SerafinRequestError, f.read_var_at_nodes, 'U', [0], [5])
+
+    def test_profiles(self):
+        interpolators = [((0, 1, 3), np.array([0.5, 0.25, 0.25])), ((0, 3, 2), np.array([0., 0.5, 0.5]))]
+        profiles = VerticalTemporalProfiles(interpolators, 4, self.nb_planes)
+        self.assertEqual(profiles.nodes.tolist(), list(range(12)))
+        with Serafin.Read(self.path, 'fr') as f:
+            f.read_header()
+            values = profiles.read(f, 'U')
+        self.assertEqual(values.shape, (2, self.nb_frames, self.nb_planes))
+        planes = self.values[:, 1].reshape(self.nb_frames, self.nb_planes, 4)
+        for (nodes, weights), point_values in zip(interpolators, values):
+            self.assertTrue(np.allclose(point_values, planes[:, :, nodes].dot(weights)))
+
+        triangles = profiles.triangles(self.nb_frames)
+        self.assertEqual(len(triangles), 2 * (self.nb_frames - 1) * (self.nb_planes - 1))
+        self.assertEqual(triangles[0].tolist(), [3, 4, 1])
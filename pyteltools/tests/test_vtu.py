@@ -0,0 +1,102 @@
+"""!
+Unittest for binary VTU collections (slf.vtu module)
+"""
+
+import numpy as np
+import os
+import re
+import tempfile
+import unittest
+from xml.etree import ElementTree
+
+from pyteltools.slf.vtu import VTK_TRIANGLE, VTK_WEDGE, VtuCollection, write_pvd
+
+
+class DummyHeader:
+    def __init__(self, nb_planes):
+        self.is_2d = nb_planes == 1
+        self.float_type = 'f'
+        self.x = np.array([0., 1., 0., 1.]) + 150000.25
+        self.y = np.array([0., 0., 1., 1.]) + 250000.75
+        self.ikle_2d = np.array([[1, 2, 3], [2, 4, 3]])
+        nb_nodes_2d = len(self.x)
+        self.nb_nodes = nb_nodes_2d * nb_planes
+        self.nb_elements = len(self.ikle_2d) * (nb_planes - 1) if nb_planes > 1 else len(self.ikle_2d)
+        if not self.is_2d:
+            self.x, self.y = np.tile(self.x, nb_planes), np.tile(self.y, nb_planes)
+            self.ikle = np.vstack([np.hstack((self.ikle_2d, self.ikle_2d + nb_nodes_2d)) + plane * nb_nodes_2d
+                                   for plane in range(nb_planes - 1)]).flatten()
+
+
+class DummyInput:
+    def __init__(self, values):
+        self.values = values
+
+    def read_var_in_frame(self, time_index, var_ID):
+        return self.values[var_ID][time_index]
+
+
+def read_vtu(vtu_name):
+    """Arrays of a VTU file with raw appended data (by name)"""
+    with open(vtu_name, 'rb') as f:
+        content = f.read()
+    start = content.index(b'_', content.index(b'<AppendedData')) + 1
+    tree = ElementTree.fromstring(re.sub(rb'<AppendedData.*</AppendedData>', b'', content, flags=re.DOTALL))
+    dtypes = {'Float32': '<f4', 'Float64': '<f8', 'Int32': '<i4', 'UInt8': '<u1'}
+    arrays = {}
+    for element in tree.iter('DataArray'):
+        position = start + int(element.get('offset'))
+        nbytes = int(np.frombuffer(content[position:position+8], dtype='<u8')[0])
+        array = np.frombuffer(content[position+8:position+8+nbytes], dtype=dtypes[element.get('type')])
+        arrays[element.get('Name', 'Points')] = array.reshape(-1, int(element.get('NumberOfComponents')))
+    return arrays
+
+
+class VtuTestCase(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        for name in os.listdir(self.folder):
+            os.remove(os.path.join(self.folder, name))
+        os.rmdir(self.folder)
+
+    def collection(self, nb_planes, nb_threads):
+        np.random.seed(0)
+        header = DummyHeader(nb_planes)
+        variables = ['Z', 'H', 'U', 'V', 'W']
+        values = {var: np.random.uniform(-5, 5, (6, header.nb_nodes)).astype(np.float32) for var in variables}
+        vectors = [('U', 'V')] if nb_planes == 1 else [('U', 'V', 'W')]
+        names = {'H': 'DEPTH', vectors[0]: 'VELOCITY'}
+        vtu_names = [os.path.join(self.folder, 'frame_%d.vtu' % i) for i in range(4)]
+        VtuCollection(header, ['H'], vectors, names).write(DummyInput(values), [1, 2, 3, 5], vtu_names, nb_threads)
+        return header, values, vectors, vtu_names
+
+    def test_2d(self):
+        header, values, vectors, vtu_names = self.collection(1, 1)
+        arrays = read_vtu(vtu_names[-1])
+        self.assertTrue(np.array_equal(arrays['Points'], np.column_stack((header.x, header.y, np.zeros(4)))))
+        self.assertTrue(np.array_equal(arrays['DEPTH'][:, 0], values['H'][5]))
+        self.assertTrue(np.array_equal(arrays['VELOCITY'],
+                                       np.column_stack((values['U'][5], values['V'][5], np.zeros(4)))))
+        self.assertTrue(np.array_equal(arrays['connectivity'][:, 0], [0, 1, 2, 1, 3, 2]))
+        self.assertTrue(np.array_equal(arrays['offsets'][:, 0], [3, 6]))
+        self.assertTrue(np.array_equal(arrays['types'][:, 0], [VTK_TRIANGLE] * 2))
+
+    def test_3d(self):
+        header, values, vectors, vtu_names = self.collection(3, 3)
+        for time_index, vtu_name in zip([1, 2, 3, 5], vtu_names):
+            arrays = read_vtu(vtu_name)
+            self.assertTrue(np.array_equal(arrays['Points'][:, 2], values['Z'][time_index]))
+            self.assertTrue(np.array_equal(arrays['VELOCITY'], np.column_stack([values[var][time_index]
+                                                                                for var in vectors[0]])))
+        self.assertTrue(np.array_equal(arrays['connectivity'][:, 0], header.ikle - 1))
+        self.assertTrue(np.array_equal(arrays['types'][:, 0], [VTK_WEDGE] * 4))
+
+    def test_pvd(self):
+        vtu_names = [os.path.join(self.folder, 'frame_%d.vtu' % i) for i in range(3)]
+        pvd_name = os.path.join(self.folder, 'frames.pvd')
+        write_pvd(pvd_name, [0, 0.5, 3600], vtu_names)
+        datasets = ElementTree.parse(pvd_name).getroot().findall('Collection/DataSet')
+        self.assertEqual([float(dataset.get('timestep')) for dataset in datasets], [0, 0.5, 3600])
+        self.assertEqual([dataset.get('file') for dataset in datasets], ['frame_0.vtu', 'frame_1.vtu', 'frame_2.vtu'])
@@ -0,0 +1,65 @@
+"""!
+Helpers shared by the unittests
+"""
+
+import numpy as np
+import struct
+
+from pyteltools.slf import Serafin
+
+
+# MULTI project: the files of the second input node are paired with those of the first one by the two-in-one-out node
+TWO_INPUTS_PROJECT = """fr.;
+4 3
+Input/Output|Load Serafin 2D|0|0|0||r.slf|
+Input/Output|Load Serafin 2D|1|0|0||s.slf|
+Operators|A Minus B|2|0|0|
+Input/Output|Write Serafin|3|0|0|_diff|1||0|1
+0|0|2|0
+1|0|2|1
+2|2|3|0
+2
+0|2|r.slf|{0}|{1}|A|B
+1|2|s.slf|{0}|{1}|A|B
+"""
+
+
+class StripHeader:
+    """Attributes to write a 2D Serafin file with variables H and U on a strip of 2 * (n - 1) triangles"""
+    def __init__(self, n):
+        self.is_2d = True
+        self.title = bytes('DUMMY SERAFIN', Serafin.SLF_EIT).ljust(72)
+        self.file_type = bytes('SERAFIN', Serafin.SLF_EIT).ljust(8)
+        self.float_type, self.float_size = 'f', 4
+        self.nb_var, self.nb_var_quadratic = 2, 0
+        self.var_names = [bytes('HAUTEUR D\'EAU', Serafin.SLF_EIT).ljust(16),
+                          bytes('VITESSE U', Serafin.SLF_EIT).ljust(16)]
+        self.var_units = [bytes('M', Serafin.SLF_EIT).ljust(16), bytes('M/S', Serafin.SLF_EIT).ljust(16)]
+        self.params = [1, 0, 0, 0, 0, 0, 0, 0, 0, 0]
+        self.nb_nodes = 2 * n
+        self.nb_nodes_per_elem = 3
+        ikle = [[a, a + 1, a + n + 1] for a in range(1, n)] + [[a, a + n + 1, a + n] for a in range(1, n)]
+        self.nb_elements = len(ikle)
+        self.ikle = np.array(ikle).flatten()
+        self.ipobo = [0] * self.nb_nodes
+        self.x = np.tile(np.arange(n, dtype=np.float64), 2)
+        self.y = np.repeat([0., 1.], n)
+
+    def pack_int(self, *args, nb=1):
+        return struct.pack('>%ii' % nb, *args)
+
+    def pack_float(self, *args, nb=1):
+        return struct.pack('>%if' % nb, *args)
+
+
+def write_serafin(path, header, values):
+    """!
+    @brief Write a Serafin file with a frame every 10 seconds
+    @param path <str>: path to the file
+    @param header <StripHeader>: header attributes
+    @param values <numpy.ndarray>: values of every frame, variable and node
+    """
+    with Serafin.Write(path, 'fr') as f:
+        f.write_header(header)
+        for time_index in range(values.shape[0]):
+            f.write_entire_frame(header, 10. * time_index, values[time_index])
@@ -38,17 +38,22 @@ class PyTelToolsArgParse(argparse.ArgumentParser):
         for arg_id in add_args:
             self.add_known_argument(arg_id)
 
-    def add_known_argument(self, arg_id):
+    def add_known_argument(self, arg_id, as_option=False):
         """!
         Add pre-defined command line arguments
         @param arg_id <str>: argument identifier
+        @param as_option <bool>: add the output csv file as a compulsory option (`--out_csv`) instead of a positional
+            argument, e.g. after a positional argument with a variable number of values
         """
         if 'in_slf' == arg_id:
             self.add_argument('in_slf', help='Serafin input filename')
         elif 'out_slf' == arg_id:
             self.add_argument('out_slf', help='Serafin output filename')
         elif 'out_csv' == arg_id:
-            self.add_argument('out_csv', help='output csv file')
+            if as_option:
+                self.add_argument('--out_csv', help='output csv file', required=True)
+            else:
+                self.add_argument('out_csv', help='output csv file')
         elif 'shift' == arg_id:
             self.add_argument('--shift', type=float, nargs=2, help='translation (x_distance, y_distance)',
                               metavar=('X', 'Y'))
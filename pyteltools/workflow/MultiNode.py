@@ -3,6 +3,8 @@ from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 
+from .options import load_multi_options
+
 
 class MultiPort(QGraphicsRectItem):
     WIDTH = 20
@@ -131,7 +133,9 @@ class MultiNode(QGraphicsItem):
         return ' '.join(self.label.split())
 
     def load(self, options):
-        pass
+        success, self.options = load_multi_options(self.name(), options)
+        if not success:
+            self.state = MultiNode.NOT_CONFIGURED
 
     def mark(self, node_index):
         self.input_index.add(node_index)
@@ -352,6 +356,10 @@ class MultiTwoInOneOutNode(MultiNode):
     def update_input(self, nb_input):
         self.expected_input = (nb_input, nb_input)
 
+    def parent_index(self, port_index):
+        port = self.first_in_port if port_index == 0 else self.second_in_port
+        return port.mother.parentItem().index()
+
 
 class MultiDoubleInputNode(MultiNode):
     """!
@@ -1,12 +1,30 @@
 import math
+import os
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 from PyQt5.QtWidgets import *
 from shapely.geometry import Polygon
+import threading
 
 from .util import ConfigureDialog
 
 
+class NodeCancelled(Exception):
+    """!
+    @brief Raised in a running node when its run is canceled
+    """
+    pass
+
+
+class NodeSignals(QObject):
+    """!
+    @brief Signals updating the display of a node (emitted from any thread, handled in the GUI thread)
+    """
+    progress = pyqtSignal(int)
+    progress_visible = pyqtSignal(bool)
+    refresh = pyqtSignal()
+
+
 class Port(QGraphicsRectItem):
     """!
     Input/output of a Node
@@ -123,6 +141,13 @@ class Node(QGraphicsItem):
         self.proxy.setWidget(self.progress_bar)
         self.proxy.setGeometry(QRectF(self.boundingRect().topLeft(), self.boundingRect().topRight()+QPointF(0, 30)))
         self.progress_bar.setVisible(False)
+        ## Signals to update the progress bar and the node from the thread running it <NodeSignals>
+        self.signals = NodeSignals()
+        self.signals.progress.connect(self.progress_bar.setValue)
+        self.signals.progress_visible.connect(self.progress_bar.setVisible)
+        self.signals.refresh.connect(self.update)
+        ## Event set to cancel the current run <threading.Event>
+        self.cancel_event = None
 
         self.setAcceptedMouseButtons(Qt.LeftButton)
         self.setFlag(QGraphicsItem.ItemIsMovable)
@@ -260,6 +285,35 @@ class Node(QGraphicsItem):
     def run(self):
         pass
 
+    def run_in_gui_thread(self):
+        """Visualization nodes open windows, so they cannot run in a background thread"""
+        return self.category == 'Visualization'
+
+    def parents(self):
+        """Nodes connected to the input ports"""
+        return [port.mother.parentItem() for port in self.ports if port.type == Port.INPUT and port.has_mother()]
+
+    def show_progress(self):
+        self.signals.progress_visible.emit(True)
+
+    def set_progress(self, value):
+        """!
+        @brief Update the progress bar (and check if the run is canceled)
+        @param value <float>: progress (within range [0, 100])
+        """
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise NodeCancelled
+        self.signals.progress.emit(int(value))
+        if threading.current_thread() is threading.main_thread():
+            QApplication.processEvents()
+
+    def discard_output(self, filename):
+        """Remove an incomplete output file (e.g. when the run is canceled)"""
+        try:
+            os.remove(filename)
+        except OSError:
+            pass
+
     def construct_mesh(self, mesh):
         five_percent = 0.05 * mesh.nb_triangles
         nb_processed = 0
@@ -274,11 +328,9 @@ class Node(QGraphicsItem):
             if nb_processed > five_percent:
                 nb_processed = 0
                 current_percent += 5
-                self.progress_bar.setValue(current_percent)
-                QApplication.processEvents()
+                self.set_progress(current_percent)
 
-        self.progress_bar.setValue(0)
-        QApplication.processEvents()
+        self.set_progress(0)
 
     def save(self):
         return '|'.join([self.category, self.name(), str(self.index()),
@@ -288,15 +340,15 @@ class Node(QGraphicsItem):
         self.state = Node.READY
 
     def success(self, message=''):
-        self.progress_bar.setVisible(False)
+        self.signals.progress_visible.emit(False)
         self.state = Node.SUCCESS
-        self.update()
+        self.signals.refresh.emit()
         self.message = 'Successful. ' + message
 
     def fail(self, message):
-        self.progress_bar.setVisible(False)
+        self.signals.progress_visible.emit(False)
         self.state = Node.FAIL
-        self.update()
+        self.signals.refresh.emit()
         self.message = 'Failed: ' + message
 
 
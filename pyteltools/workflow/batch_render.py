@@ -0,0 +1,141 @@
+"""!
+Off-screen rendering of the figures exported by the multi-save dialogs
+
+A figure is described by a picklable `FigureTask`: the calls made on its `axes` are recorded and replayed by
+a pool of processes drawing with the Agg backend. Every process keeps its figures from one image to the next.
+"""
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from matplotlib import cm
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import Normalize
+from matplotlib.figure import Figure
+from mpl_toolkits.axes_grid1 import make_axes_locatable
+
+from pyteltools.conf import settings
+
+
+_figures = {}  # figures of the current process (with and without colorbar)
+
+
+class _RecordingAxes:
+    """!
+    @brief Stand-in for matplotlib axes recording the method calls
+    """
+    def __init__(self, calls):
+        self._calls = calls
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def record(*args, **kwargs):
+            self._calls.append((name, args, kwargs))
+        return record
+
+
+class FigureTask:
+    """!
+    @brief Picklable description of a figure to save as a PNG file
+    """
+    def __init__(self, png_name):
+        """!
+        @param png_name <str>: output PNG filename
+        """
+        self.png_name = png_name
+        self.calls = []
+        self.axes = _RecordingAxes(self.calls)
+        self.colorbar = None
+
+    def __getstate__(self):
+        return {'png_name': self.png_name, 'calls': self.calls, 'colorbar': self.colorbar}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.axes = _RecordingAxes(self.calls)
+
+    def add_colorbar(self, cmap, vmin, vmax, title=None):
+        """!
+        @brief Add a color bar on the right of the axes
+        @param cmap <str>: color map
+        @param vmin <float>: value of the lowest color
+        @param vmax <float>: value of the highest color
+        @param title <str>: title of the color bar (optional)
+        """
+        self.colorbar = (cmap, vmin, vmax, title)
+
+
+def _get_figure(with_colorbar):
+    """!
+    @brief Get the figure of the current process with new axes (and colorbar axes)
+    @param with_colorbar <bool>: add axes for a color bar on the right
+    @return <tuple>: figure, axes and colorbar axes (None if without color bar)
+    """
+    if with_colorbar not in _figures:
+        fig = Figure(figsize=settings.FIG_SIZE)
+        FigureCanvasAgg(fig)
+        _figures[with_colorbar] = fig
+    fig = _figures[with_colorbar]
+    # the axes are not reused: clearing them keeps some settings (tick parameters, aspect) of the previous task
+    fig.clear()
+    axes = fig.add_subplot(111)
+    cax = make_axes_locatable(axes).append_axes('right', size='5%', pad=0.2) if with_colorbar else None
+    return fig, axes, cax
+
+
+def render(task):
+    """!
+    @brief Draw a figure and save it (on the figure kept by the current process)
+    @param task <FigureTask>: figure description
+    @return <str>: output PNG filename
+    """
+    fig, axes, cax = _get_figure(task.colorbar is not None)
+    for name, args, kwargs in task.calls:
+        getattr(axes, name)(*args, **kwargs)
+    if cax is not None:
+        cmap, vmin, vmax, title = task.colorbar
+        fig.colorbar(cm.ScalarMappable(norm=Normalize(vmin, vmax), cmap=cmap), cax=cax)
+        if title is not None:
+            cax.set_title(title)
+    fig.savefig(task.png_name, dpi=settings.FIG_OUT_DPI)
+    return task.png_name
+
+
+class BatchRenderer:
+    """!
+    @brief Pool of processes saving figures in parallel
+    """
+    def __init__(self, nb_processes=settings.NCSIZE):
+        """!
+        @param nb_processes <int>: number of processes (figures are saved in the calling process if 1)
+        """
+        self.executor = ProcessPoolExecutor(max_workers=nb_processes) if nb_processes > 1 else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def submit(self, task):
+        """!
+        @brief Schedule the rendering of a figure
+        @param task <FigureTask>: figure description
+        @return <concurrent.futures.Future>: future output PNG filename
+        """
+        if self.executor is not None:
+            return self.executor.submit(render, task)
+        future = Future()
+        try:
+            future.set_result(render(task))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def close(self):
+        """!
+        @brief Wait for the scheduled figures and stop the processes
+        """
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
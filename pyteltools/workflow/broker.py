@@ -0,0 +1,323 @@
+"""!
+Distributed execution of the tasks of the workflow multi-folder view
+
+A broker (TCP server based on `multiprocessing.managers`) holds a queue of tasks and one result queue per client
+(the results sent to a client which is gone are dropped).
+Remote workers (any number of processes on any number of machines) take the tasks from the broker and send back the
+results. The tasks are the same as for local processes: the input and output files have to be on shared storage
+(same paths on all the machines) and PyTelTools has to be installed on all the machines.
+
+`BrokerExecutor` is a `concurrent.futures.Executor` submitting the tasks to the broker, it can be used by
+`multi_func.Workers` (Multi tab) and by `multi_headless.HeadlessMultiRunner` in place of local processes.
+A worker running a task sends heartbeats to its client, the task fails if they stop (e.g. the worker died).
+The tasks waiting in the broker fail if no worker picks up any task of the client for too long.
+
+The broker unpickles the tasks sent by its clients: it only accepts connections with its authentication key, which is
+generated for the session (and logged) if none is given.
+
+Testing on a single machine:
+    python cli/workflow_broker.py --address localhost:50000 --authkey <key> &
+    python cli/workflow_worker.py localhost:50000 --nb_processes 4 --authkey <key> &
+    python cli/workflow_multi.py project.txt --broker localhost:50000 --authkey <key>
+"""
+
+from concurrent.futures import Executor, Future, wait as wait_futures
+import itertools
+from multiprocessing import Process
+from multiprocessing.managers import BaseManager
+import queue
+import secrets
+import threading
+from time import time
+import uuid
+
+from pyteltools.conf import settings
+from pyteltools.utils.cli import new_logger
+
+
+logger = new_logger(__name__)
+
+
+class RemoteTaskError(Exception):
+    """!
+    @brief Exception raised by a task on a remote worker
+    """
+    pass
+
+
+class _BrokerServer(BaseManager):
+    pass
+
+
+class _BrokerClient(BaseManager):
+    pass
+
+
+for _name in ('get_task_queue', 'get_result_queues'):
+    _BrokerClient.register(_name)
+
+
+class _ResultQueues:
+    """!
+    @brief Result queue of every client of the broker
+    """
+    def __init__(self):
+        self.queues = {}
+        self.lock = threading.Lock()
+
+    def open(self, client_id):
+        with self.lock:
+            self.queues.setdefault(client_id, queue.Queue())
+
+    def close(self, client_id):
+        with self.lock:
+            self.queues.pop(client_id, None)
+
+    def put(self, client_id, item):
+        """!
+        @brief Send an item to a client (dropped if the client is unknown, e.g. late result after its shutdown)
+        """
+        with self.lock:
+            result_queue = self.queues.get(client_id, None)
+        if result_queue is not None:
+            result_queue.put(item)
+
+    def get(self, client_id, timeout):
+        with self.lock:
+            result_queue = self.queues[client_id]
+        return result_queue.get(timeout=timeout)
+
+
+def parse_address(address):
+    """!
+    @brief Convert a broker address 'host:port' to a tuple (host, port)
+    """
+    host, port = address.rsplit(':', 1)
+    return host, int(port)
+
+
+def _authkey(authkey):
+    if authkey is None:
+        authkey = settings.MULTI_BROKER_AUTHKEY
+    if not authkey:
+        raise ValueError('The authentication key of the broker is required (setting MULTI_BROKER_AUTHKEY)')
+    return authkey.encode()
+
+
+def serve_broker(address, authkey=None):
+    """!
+    @brief Run the broker until the process is interrupted
+    @param address <tuple>: host and port to listen to
+    @param authkey <str>: authentication key shared by the broker, its clients and its workers
+        (generated for the session if not given and if MULTI_BROKER_AUTHKEY is empty)
+    """
+    if authkey is None:
+        authkey = settings.MULTI_BROKER_AUTHKEY
+    if not authkey:
+        authkey = secrets.token_hex(16)
+        logger.info('Authentication key of the broker: %s' % authkey)
+    task_queue = queue.Queue()
+    result_queues = _ResultQueues()
+    _BrokerServer.register('get_task_queue', callable=lambda: task_queue)
+    _BrokerServer.register('get_result_queues', callable=lambda: result_queues)
+    server = _BrokerServer(address=address, authkey=_authkey(authkey)).get_server()
+    logger.info('Broker listening on %s:%i' % address)
+    server.serve_forever()
+
+
+def connect_broker(address, authkey=None):
+    """!
+    @brief Connect to a running broker
+    @param address <tuple>: host and port of the broker
+    @param authkey <str>: authentication key of the broker
+    @return <BaseManager>: connected client
+    """
+    client = _BrokerClient(address=address, authkey=_authkey(authkey))
+    client.connect()
+    return client
+
+
+def _send_heartbeats(address, authkey, current_task, stop):
+    """!
+    @brief Tell the client of the task being run by the worker that it is still alive
+    @param address <tuple>: host and port of the broker
+    @param authkey <str>: authentication key of the broker
+    @param current_task <list>: single item, the client ID and the ticket of the current task (None if idle)
+    @param stop <threading.Event>: set when the worker stops
+    """
+    client = connect_broker(address, authkey)  # proxies are not shared between threads
+    result_queues = client.get_result_queues()
+    while not stop.wait(settings.MULTI_BROKER_HEARTBEAT):
+        task = current_task[0]
+        if task is None:
+            continue
+        client_id, ticket = task
+        try:
+            result_queues.put(client_id, (ticket, None, None))
+        except (EOFError, ConnectionError):  # broker stopped
+            return
+
+
+def remote_worker(address, authkey=None):
+    """!
+    @brief Run the tasks of the broker until it is stopped
+    @param address <tuple>: host and port of the broker
+    @param authkey <str>: authentication key of the broker
+    """
+    client = connect_broker(address, authkey)
+    task_queue = client.get_task_queue()
+    result_queues = client.get_result_queues()
+    current_task = [None]
+    stop = threading.Event()
+    threading.Thread(target=_send_heartbeats, args=(address, authkey, current_task, stop), daemon=True).start()
+    try:
+        while True:
+            try:
+                client_id, ticket, func, args = task_queue.get()
+            except (EOFError, ConnectionError):  # broker stopped
+                return
+            result_queues.put(client_id, (ticket, None, None))  # started
+            current_task[0] = client_id, ticket
+            try:
+                result = True, func(*args)
+            except Exception as e:
+                result = False, '%s: %s' % (type(e).__name__, e)
+            current_task[0] = None
+            result_queues.put(client_id, (ticket,) + result)
+    finally:
+        stop.set()
+
+
+def run_workers(address, nb_processes, authkey=None):
+    """!
+    @brief Run remote worker processes on this machine until they are interrupted or the broker is stopped
+    @param address <tuple>: host and port of the broker
+    @param nb_processes <int>: number of worker processes
+    @param authkey <str>: authentication key of the broker
+    """
+    processes = [Process(target=remote_worker, args=(address, authkey)) for _ in range(nb_processes)]
+    for p in processes:
+        p.start()
+    logger.info('%i workers connected to %s:%i' % ((nb_processes,) + address))
+    try:
+        for p in processes:
+            p.join()
+    except KeyboardInterrupt:
+        for p in processes:
+            p.terminate()
+
+
+class BrokerExecutor(Executor):
+    """!
+    @brief Executor running the submitted functions on the remote workers of a broker
+    """
+    def __init__(self, address, authkey=None, worker_timeout=None, pickup_timeout=None):
+        """!
+        @param address <tuple>: host and port of the broker
+        @param authkey <str>: authentication key of the broker
+        @param worker_timeout <float>: a started task fails if its worker sends nothing during this time (in seconds,
+            0 to wait forever, default: settings.MULTI_BROKER_WORKER_TIMEOUT)
+        @param pickup_timeout <float>: the waiting tasks fail if no task is picked up during this time (in seconds,
+            0 to wait forever, default: settings.MULTI_BROKER_PICKUP_TIMEOUT)
+        """
+        self.worker_timeout = settings.MULTI_BROKER_WORKER_TIMEOUT if worker_timeout is None else worker_timeout
+        self.pickup_timeout = settings.MULTI_BROKER_PICKUP_TIMEOUT if pickup_timeout is None else pickup_timeout
+        self.last_news = {}  # time of the last message of the worker running a task (started tasks only)
+        self.submit_times = {}  # time of submission of every task waiting to be picked up
+        self.last_pickup = time()
+        self.client = connect_broker(address, authkey)
+        self.client_id = uuid.uuid4().hex
+        self.task_queue = self.client.get_task_queue()
+        self.result_queues = self.client.get_result_queues()
+        self.result_queues.open(self.client_id)
+        self.futures = {}
+        self.lock = threading.Lock()
+        self._tickets = itertools.count()
+
+        self.listener = threading.Thread(target=self._listen, daemon=True)
+        self.listener.start()
+
+    def submit(self, fn, *args, **kwargs):
+        if kwargs:
+            raise ValueError('Keyword arguments are not supported by remote workers')
+        future = Future()
+        with self.lock:
+            ticket = next(self._tickets)
+            self.futures[ticket] = future
+            self.submit_times[ticket] = time()
+        self.task_queue.put((self.client_id, ticket, fn, args))
+        return future
+
+    def shutdown(self, wait=True):
+        if wait:
+            with self.lock:
+                pending = list(self.futures.values())
+            wait_futures(pending)
+        self.result_queues.put(self.client_id, None)
+        self.listener.join()
+        self.result_queues.close(self.client_id)
+
+    def _listen(self):
+        result_queues = self.client.get_result_queues()  # proxies are not shared between threads
+        last_check = time()
+        while True:
+            try:
+                item = result_queues.get(self.client_id, settings.MULTI_HEALTH_CHECK_INTERVAL)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                return
+            if item:
+                self._receive(*item)
+            if time() - last_check >= settings.MULTI_HEALTH_CHECK_INTERVAL:
+                self._fail_lost_tasks()
+                self._fail_waiting_tasks()
+                last_check = time()
+
+    def _receive(self, ticket, success, value):
+        with self.lock:
+            if success is None:  # started task or heartbeat of a running task
+                if ticket in self.submit_times:
+                    del self.submit_times[ticket]
+                    self.last_pickup = time()
+                    if not self.futures[ticket].set_running_or_notify_cancel():
+                        del self.futures[ticket]
+                        return
+                if ticket in self.futures:
+                    self.last_news[ticket] = time()
+                return
+            future = self.futures.pop(ticket, None)
+            self.last_news.pop(ticket, None)
+            self.submit_times.pop(ticket, None)
+        if future is None:  # late result of a failed task
+            return
+        if success:
+            future.set_result(value)
+        else:
+            future.set_exception(RemoteTaskError(value))
+
+    def _fail_lost_tasks(self):
+        if self.worker_timeout <= 0:
+            return
+        now = time()
+        with self.lock:
+            lost = [ticket for ticket, last_news in self.last_news.items() if now - last_news > self.worker_timeout]
+            futures = [self.futures.pop(ticket) for ticket in lost]
+            for ticket in lost:
+                del self.last_news[ticket]
+        for future in futures:
+            future.set_exception(RemoteTaskError('No news from the remote worker for %s s' % self.worker_timeout))
+
+    def _fail_waiting_tasks(self):
+        if self.pickup_timeout <= 0:
+            return
+        now = time()
+        with self.lock:
+            waiting = [ticket for ticket, submit_time in self.submit_times.items()
+                       if now - max(submit_time, self.last_pickup) > self.pickup_timeout]
+            futures = [self.futures.pop(ticket) for ticket in waiting]
+            for ticket in waiting:
+                del self.submit_times[ticket]
+        for future in futures:
+            if future.set_running_or_notify_cancel():  # not cancelled
+                future.set_exception(RemoteTaskError('No worker picked up the task for %s s' % self.pickup_timeout))
@@ -0,0 +1,181 @@
+"""!
+Content-addressed cache of workflow node results
+
+The output files of a node are stored under a key computed from everything determining them:
+the node name, its options and its input data (including the identity of the input files and the options of the
+upstream nodes, which are recorded in the input data), the version of PyTelTools and the output formatting settings.
+When a node is run again with the same key, its outputs are reused (restored from the cache if they were modified or
+removed) instead of being computed again.
+
+Every entry is a folder (named after its key) holding a copy of the output files and a description `entry.pkl`.
+Entries are written atomically so the cache can be shared by the processes of the workflow multi-folder view.
+The least recently used entries are evicted when the cache exceeds its maximum size.
+The cache is disabled unless a positive RESULT_CACHE_SIZE is set.
+"""
+
+import hashlib
+import os
+import pickle
+import shutil
+import uuid
+
+from pyteltools import VERSION
+from pyteltools.conf import settings
+from pyteltools.slf.datatypes import PointData, PolylineData, SerafinData
+from pyteltools.utils.cli import new_logger
+
+
+logger = new_logger(__name__)
+
+ENTRY_NAME = 'entry.pkl'
+CACHE_FORMAT_VERSION = 1  # to increment when the keys or the entries change
+
+# settings changing the content of the output files
+OUTPUT_SETTINGS = ('CSV_SEPARATOR', 'FMT_COORD', 'FMT_FLOAT', 'NAN_STR', 'VTK_FORMAT', 'WRITE_XYZ_HEADER')
+
+
+def file_identity(filename):
+    """!
+    @brief Identity of a file (absolute path, size and modification time in nanoseconds)
+    @param filename <str>: path to the file
+    @return <tuple>: file identity
+    """
+    stat = os.stat(filename)
+    return os.path.abspath(filename), stat.st_size, stat.st_mtime_ns
+
+
+def _signature(value):
+    if isinstance(value, SerafinData):
+        return ('SerafinData', value.job_id, value.language, file_identity(value.filename), value.header,
+                value.time, value.selected_vars, value.selected_vars_names, value.selected_time_indices,
+                value.equations, value.us_equation, value.to_single, value.operator, _signature(value.metadata))
+    if isinstance(value, PolylineData):
+        return 'PolylineData', tuple(tuple(map(tuple, line.coords())) for line in value.lines)
+    if isinstance(value, PointData):
+        return 'PointData', tuple(map(tuple, value.points))
+    if isinstance(value, dict):
+        return tuple((key, _signature(item)) for key, item in sorted(value.items(), key=lambda x: str(x[0])))
+    if isinstance(value, (list, tuple)):
+        return tuple(_signature(item) for item in value)
+    return value
+
+
+def cache_key(node_name, options, *inputs):
+    """!
+    @brief Key of a node result
+    @param node_name <str>: name of the node
+    @param options: options of the node (any picklable object)
+    @param inputs: input data of the node (`SerafinData` are identified by their file and their selections)
+    @return <str>: hexadecimal key
+    """
+    output_settings = tuple(_signature(getattr(settings, name)) for name in OUTPUT_SETTINGS)
+    return hashlib.sha1(pickle.dumps((CACHE_FORMAT_VERSION, VERSION, output_settings, node_name, _signature(options),
+                                      _signature(inputs)), protocol=4)).hexdigest()
+
+
+class ResultCache:
+    """!
+    @brief Cache of node output files with a maximum size and least recently used eviction
+    """
+    def __init__(self, folder=settings.RESULT_CACHE_FOLDER, max_size=settings.RESULT_CACHE_SIZE):
+        """!
+        @param folder <str>: path to the cache folder
+        @param max_size <int>: maximum size of the cache (in bytes), the cache is disabled if it is 0
+        """
+        self.folder = folder
+        self.max_size = max_size
+
+    @property
+    def enabled(self):
+        return bool(self.folder) and self.max_size > 0
+
+    def restore(self, key, filenames):
+        """!
+        @brief Make the cached output files available (copy back the files which were modified or removed)
+        @param key <str>: key of the node result
+        @param filenames <[str]>: output files of the node
+        @return <bool>: True if all the output files are available
+        """
+        if not self.enabled:
+            return False
+        entry_folder = os.path.join(self.folder, key)
+        try:
+            with open(os.path.join(entry_folder, ENTRY_NAME), 'rb') as f:
+                entry = pickle.load(f)
+            if not set(entry.keys()) <= {os.path.abspath(filename) for filename in filenames}:
+                return False
+            for path, (size, mtime, blob) in entry.items():
+                if os.path.exists(path) and file_identity(path)[1:] == (size, mtime):
+                    continue
+                shutil.copy2(os.path.join(entry_folder, blob), path)
+            os.utime(os.path.join(entry_folder, ENTRY_NAME))  # mark as recently used
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            return False
+        logger.debug('Reusing cached result %s' % key)
+        return True
+
+    def store(self, key, filenames):
+        """!
+        @brief Copy the output files of a node in the cache
+        @param key <str>: key of the node result
+        @param filenames <[str]>: output files of the node (missing files are ignored)
+        """
+        if not self.enabled:
+            return
+        filenames = [filename for filename in filenames if os.path.isfile(filename)]
+        if not filenames or sum(os.path.getsize(filename) for filename in filenames) > self.max_size:
+            return
+        tmp_folder = os.path.join(self.folder, 'tmp-' + uuid.uuid4().hex)
+        try:
+            os.makedirs(tmp_folder)
+            entry = {}
+            for i, filename in enumerate(filenames):
+                blob = str(i)
+                shutil.copy2(filename, os.path.join(tmp_folder, blob))
+                entry[os.path.abspath(filename)] = file_identity(filename)[1:] + (blob,)
+            with open(os.path.join(tmp_folder, ENTRY_NAME), 'wb') as f:
+                pickle.dump(entry, f)
+            entry_folder = os.path.join(self.folder, key)
+            shutil.rmtree(entry_folder, ignore_errors=True)
+            os.rename(tmp_folder, entry_folder)
+        except OSError as e:
+            logger.warning('Could not store result in cache: %s' % e)
+            shutil.rmtree(tmp_folder, ignore_errors=True)
+            return
+        self.evict()
+
+    def size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _entries(self):
+        entries = []
+        if not os.path.isdir(self.folder):
+            return entries
+        for name in os.listdir(self.folder):
+            entry_folder = os.path.join(self.folder, name)
+            try:
+                last_use = os.path.getmtime(os.path.join(entry_folder, ENTRY_NAME))
+                size = sum(os.path.getsize(os.path.join(entry_folder, blob)) for blob in os.listdir(entry_folder))
+            except OSError:  # entry being written or evicted by another process
+                continue
+            entries.append((last_use, size, entry_folder))
+        return entries
+
+    def evict(self):
+        """!
+        @brief Remove the least recently used entries until the cache size is below its maximum size
+        """
+        entries = sorted(self._entries())
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, entry_folder in entries:
+            if total_size <= self.max_size:
+                break
+            shutil.rmtree(entry_folder, ignore_errors=True)
+            total_size -= size
+
+    def clear(self):
+        for _, _, entry_folder in self._entries():
+            shutil.rmtree(entry_folder, ignore_errors=True)
+
+
+RESULT_CACHE = ResultCache()
@@ -0,0 +1,285 @@
+"""!
+Fused execution of MULTI sinks sharing the same Serafin input
+
+Operator nodes (select variables, select time, max...) only annotate the Serafin data:
+the frames are read by the sinks (write Serafin, compute volume...).
+The sinks fed by the same source node are grouped and run together (one thread per sink) on a single input stream:
+every frame is read once and shared by all the sinks of the group.
+"""
+
+import numpy as np
+import threading
+
+from pyteltools.conf import settings
+from pyteltools.slf import Serafin
+
+
+# Nodes producing a Serafin file read by their descendants
+SOURCE_NODES = ('Load Serafin 2D', 'Load Serafin 3D', 'Write Serafin')
+
+# Nodes only annotating the Serafin data (no reading)
+ANNOTATION_NODES = ('Select Variables', 'Add Rouse', 'Select Time', 'Select Single Frame', 'Select First Frame',
+                    'Select Last Frame', 'Select Single Layer', 'Vertical Aggregation', 'Max', 'Min', 'Mean',
+                    'Statistics', 'SynchMax', 'Convert to Single Precision', 'Compute Arrival Duration',
+                    'Add Transformation')
+
+# Nodes streaming the frames of their input Serafin file
+STREAMING_SINKS = ('Write Serafin', 'Compute Volume', 'Compute Flux', 'Interpolate on Points',
+                   'Interpolate along Lines', 'Write vtk')
+
+
+_local = threading.local()
+
+
+def fused_sink_groups(node_names, adj_list):
+    """!
+    @brief Group the streaming sinks by source node (only groups with at least two sinks are kept)
+    @param node_names <dict>: node name for every node index
+    @param adj_list <dict>: set of child node indices for every node index
+    @return <dict>: for every source node index, the chain of nodes (ending with the sink) for every sink index
+    """
+    groups = {}
+    for source in adj_list:
+        if node_names[source] not in SOURCE_NODES:
+            continue
+        sinks = {}
+        stack = [(u, (u,)) for u in adj_list[source]]
+        while stack:
+            u, chain = stack.pop()
+            if node_names[u] in STREAMING_SINKS:
+                sinks[u] = chain
+            elif node_names[u] in ANNOTATION_NODES:
+                stack.extend((v, chain + (v,)) for v in adj_list[u])
+        if len(sinks) > 1:
+            groups[source] = sinks
+    return groups
+
+
+class FusedSinkScheduler:
+    """!
+    @brief Hold the tasks of grouped sinks until all the sinks of a group (for a given file) are ready
+    """
+    def __init__(self, groups):
+        """!
+        @param groups <dict>: sink groups (see `fused_sink_groups`)
+        """
+        self.groups = groups
+        self.sink_source = {sink: source for source, sinks in groups.items() for sink in sinks}
+        self.pending = {}  # ready tasks for every (source, fid)
+        self.dropped = {}  # sinks which will not receive the file for every (source, fid)
+
+    def add(self, node_id, fid, task):
+        """!
+        @brief Register a ready task
+        @param node_id <int>: index of the node
+        @param fid <int>: file identifier
+        @param task <tuple>: function and arguments
+        @return <[[tuple]]>: groups of tasks to run together (a single task for nodes which are not grouped)
+        """
+        if node_id not in self.sink_source:
+            return [[task]]
+        key = (self.sink_source[node_id], fid)
+        self.pending.setdefault(key, []).append(task)
+        return self._flush(key)
+
+    def drop(self, node_id, fid):
+        """!
+        @brief Notify a failure: the sinks downstream of the failed node will not receive the file
+        @param node_id <int>: index of the failed node
+        @param fid <int>: file identifier
+        @return <[[tuple]]>: groups of tasks which became complete
+        """
+        ready = []
+        for source, sinks in self.groups.items():
+            lost = {sink for sink, chain in sinks.items() if node_id in chain[:-1]}
+            if lost:
+                key = (source, fid)
+                self.dropped.setdefault(key, set()).update(lost)
+                ready.extend(self._flush(key))
+        return ready
+
+    def _flush(self, key):
+        nb_tasks = len(self.pending.get(key, []))
+        if nb_tasks + len(self.dropped.get(key, ())) < len(self.groups[key[0]]):
+            return []
+        self.dropped.pop(key, None)
+        tasks = self.pending.pop(key, [])
+        return [tasks] if tasks else []
+
+
+class SharedFrameCache:
+    """!
+    @brief Frames of a Serafin file read once and shared by several consumer threads
+
+    A frame is read entirely with a single request and kept until all the consumers requested a later frame.
+    A consumer waits while it runs more than `window` frames ahead of the slowest consumer,
+    the slowest consumer never waits.
+    """
+    def __init__(self, filename, language, consumers, window=None):
+        """!
+        @param filename <str>: path to the Serafin file
+        @param language <str>: Serafin variable name language ('fr' or 'en')
+        @param consumers <[int]>: consumer identifiers
+        @param window <int>: maximum number of frames between the slowest and the fastest consumers
+            (default: settings.FUSED_SINKS_WINDOW)
+        """
+        self.filename = filename
+        self.language = language
+        self.window = settings.FUSED_SINKS_WINDOW if window is None else window
+        self.input_stream = Serafin.Read(filename, language)
+        self.positions = {consumer: -1 for consumer in consumers}
+        self.frames = {}
+        self.time = None
+        self.nb_reads = 0
+        self.condition = threading.Condition()
+
+    def __enter__(self):
+        self.input_stream.__enter__()
+        self.input_stream.read_header()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return self.input_stream.__exit__(exc_type, exc_val, exc_tb)
+
+    def consumer(self, consumer):
+        """!
+        @brief Context in which the calling thread reads the shared file through `open_serafin`
+        @param consumer <int>: consumer identifier
+        """
+        return _Consumer(self, consumer)
+
+    def release(self, consumer):
+        with self.condition:
+            del self.positions[consumer]
+            self._evict()
+            self.condition.notify_all()
+
+    def get_time(self):
+        with self.condition:
+            if self.time is None:
+                self.input_stream.get_time()
+                self.time = self.input_stream.time
+            return self.time
+
+    def get_frame(self, consumer, time_index):
+        """!
+        @brief Frame requested by a consumer (read from the file if it is not cached)
+        @param consumer <int>: consumer identifier
+        @param time_index <int>: the index of the frame (0-based)
+        @return <numpy 2D-array>: values of the variables with shape (number of variables, number of nodes)
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self._can_read(consumer, time_index))
+            self.positions[consumer] = time_index
+            if time_index not in self.frames:
+                self.frames[time_index] = self.input_stream.read_frame(time_index)
+                self.nb_reads += 1
+            frame = self.frames[time_index]
+            self._evict()
+            self.condition.notify_all()
+            return frame
+
+    def _can_read(self, consumer, time_index):
+        slowest = min(self.positions.values())
+        return self.positions[consumer] == slowest or time_index - slowest <= self.window
+
+    def _evict(self):
+        if self.positions:
+            slowest = min(self.positions.values())
+            for time_index in [t for t in self.frames if t < slowest]:
+                del self.frames[time_index]
+
+
+class _Consumer:
+    def __init__(self, cache, consumer):
+        self.cache = cache
+        self.consumer = consumer
+
+    def __enter__(self):
+        _local.cache, _local.consumer = self.cache, self.consumer
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _local.cache, _local.consumer = None, None
+        self.cache.release(self.consumer)
+        return False
+
+
+class SharedRead(Serafin.Read):
+    """!
+    @brief Serafin input stream of a consumer reading its frames from a shared frame cache
+
+    The file itself is never opened: every reading method of `Serafin.Read` is served from the cache.
+    """
+    def __init__(self, cache, consumer):
+        """!
+        @param cache <SharedFrameCache>: shared frame cache
+        @param consumer <int>: consumer identifier
+        """
+        Serafin.Serafin.__init__(self, cache.filename, 'rb', cache.language)
+        self.cache = cache
+        self.consumer = consumer
+        self.header = None
+        self.time = []
+        self.file_size = cache.input_stream.file_size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    def read_header(self):
+        self.header = self.cache.input_stream.header.copy()
+
+    def get_time(self):
+        self.time = list(self.cache.get_time())
+
+    def read_var_in_frame(self, time_index, var_ID, out=None):
+        if time_index < 0:
+            raise Serafin.SerafinRequestError('Impossible to read a negative time index!')
+        pos_var = self._get_var_index(var_ID)
+        values = self.cache.get_frame(self.consumer, time_index)[pos_var]
+        if out is None:
+            return values.astype(self.header.np_float_type)
+        np.copyto(out, values)
+        return out
+
+    def read_var_in_frame_in_range(self, time_index, var_ID, start, stop):
+        if start < 0 or stop > self.header.nb_nodes or start > stop:
+            raise Serafin.SerafinRequestError('Node range [%i, %i) is not inside [0, %i)'
+                                              % (start, stop, self.header.nb_nodes))
+        return self.read_var_in_frame(time_index, var_ID)[start:stop]
+
+    def read_frame(self, time_index):
+        if time_index < 0:
+            raise Serafin.SerafinRequestError('Impossible to read a negative time index!')
+        return self.cache.get_frame(self.consumer, time_index).astype(self.header.np_float_type)
+
+    def read_var_at_nodes(self, var_ID, nodes, time_indices=None):
+        pos_var = self._get_var_index(var_ID)
+        nodes = np.asarray(nodes, dtype=np.int64)
+        if time_indices is None:
+            time_indices = range(self.header.nb_frames)
+        time_indices = np.asarray(time_indices, dtype=np.int64)
+        if time_indices.size > 0 and (time_indices.min() < 0 or time_indices.max() >= self.header.nb_frames):
+            raise Serafin.SerafinRequestError('Frame indices are not inside [0, %i)' % self.header.nb_frames)
+        if nodes.size > 0 and (nodes.min() < 0 or nodes.max() >= self.header.nb_nodes):
+            raise Serafin.SerafinRequestError('Node indices are not inside [0, %i)' % self.header.nb_nodes)
+        values = np.empty((time_indices.size, nodes.size), dtype=self.header.np_float_type)
+        for i, time_index in enumerate(time_indices):
+            values[i] = self.cache.get_frame(self.consumer, time_index)[pos_var, nodes]
+        return values
+
+
+def open_serafin(filename, language):
+    """!
+    @brief Open a Serafin input stream (on the shared frame cache if the calling thread runs a fused sink)
+    @param filename <str>: path to the Serafin file
+    @param language <str>: Serafin variable name language ('fr' or 'en')
+    @return <slf.Serafin.Read>: input stream to use in a `with` statement
+    """
+    cache = getattr(_local, 'cache', None)
+    if cache is not None and cache.filename == filename:
+        return SharedRead(cache, _local.consumer)
+    return Serafin.Read(filename, language)
@@ -0,0 +1,157 @@
+"""!
+Persistent journal of the tasks completed by a run of the workflow multi-folder view
+
+The results of the successful tasks are appended to a journal file (next to the project file) as soon as they are
+received. When an interrupted run is started again, the results of the journal are replayed instead of running
+their tasks again (the data are sent to the child nodes as if the tasks had been run).
+
+The journal is only used if the project file and all the input files are unchanged, and it is removed when a run
+ends without any failure.
+"""
+
+import hashlib
+import os
+import pickle
+
+from pyteltools.conf import settings
+
+from .cache import file_identity
+
+
+def project_signature(project_filename, input_filenames):
+    """!
+    @brief Signature of a project and its input files
+    @param project_filename <str>: path to the project file
+    @param input_filenames <[str]>: paths to all the input files
+    @return <str>: hexadecimal signature
+    """
+    signature = hashlib.sha1()
+    with open(project_filename, 'rb') as f:
+        signature.update(f.read())
+    for filename in sorted(input_filenames):
+        try:
+            identity = file_identity(filename)
+        except OSError:
+            identity = (filename, None, None)
+        signature.update(repr(identity).encode())
+    return signature.hexdigest()
+
+
+class TaskJournal:
+    """!
+    @brief Results of the successful tasks of a run, indexed by node index and file identifier
+    """
+    def __init__(self, filename, signature):
+        """!
+        @param filename <str>: path to the journal file
+        @param signature <str>: signature of the project (see `project_signature`)
+        """
+        self.filename = filename
+        self.signature = signature
+        self.results = {}
+        self.stream = None
+        self.failed = False
+
+    def open(self):
+        self.results = {}
+        end = 0  # end of the last complete record
+        if os.path.exists(self.filename):
+            try:
+                with open(self.filename, 'rb') as f:
+                    if pickle.load(f) == self.signature:
+                        end = f.tell()
+                        while True:
+                            result = pickle.load(f)
+                            self.results[result[1], result[2]] = result
+                            end = f.tell()
+            except (EOFError, pickle.UnpicklingError, OSError, AttributeError, ValueError):
+                pass  # the last record was not entirely written
+        if end > 0:
+            # new records are appended after the last complete one (a partly written record would hide them)
+            self.stream = open(self.filename, 'r+b')
+            self.stream.truncate(end)
+            self.stream.seek(end)
+        else:
+            self.stream = open(self.filename, 'wb')
+            self._write(self.signature)
+
+    def close(self, completed=False):
+        """!
+        @brief Close the journal (it is removed if the run is completed without any failure)
+        @param completed <bool>: True if all the tasks of the run were done
+        """
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        if completed and not self.failed:
+            try:
+                os.remove(self.filename)
+            except OSError:
+                pass
+
+    def get(self, node_id, fid):
+        """!
+        @brief Result of a task completed in a previous run
+        @return <tuple>: result of the task or None if it was not completed
+        """
+        return self.results.get((node_id, fid), None)
+
+    def record(self, result):
+        """!
+        @brief Add the result of a task (only successful tasks with a file identifier are recorded)
+        @param result <tuple>: (success, node_id, fid, data, message) or (success, node_id, data, message)
+        """
+        if not result[0]:
+            self.failed = True
+            return
+        if len(result) != 5 or self.stream is None:
+            return
+        self.results[result[1], result[2]] = result
+        self._write(result)
+
+    def replay(self, func, args):
+        """!
+        @brief Split a task between the results completed in a previous run and the part still to run
+        @param func <function>: function of the task
+        @param args <tuple>: arguments of the task
+        @return <tuple>: replayed results (list) and the task still to run (None if all the results were replayed)
+        """
+        if func.__name__ == 'run_fused_sinks':
+            filename, language, tasks = args
+            replayed = [self.get(*sink_args[:2]) for _, sink_args in tasks]
+            remaining = [task for task, result in zip(tasks, replayed) if result is None]
+            replayed = [result for result in replayed if result is not None]
+            if not remaining:
+                return replayed, None
+            if len(remaining) == 1:
+                return replayed, remaining[0]
+            return replayed, (func, (filename, language, remaining))
+        if len(args) < 4:  # auxiliary inputs are not recorded
+            return [], (func, args)
+        result = self.get(*args[:2])
+        if result is None:
+            return [], (func, args)
+        return [result], None
+
+    def _write(self, item):
+        pickle.dump(item, self.stream, protocol=pickle.HIGHEST_PROTOCOL)
+        self.stream.flush()
+        os.fsync(self.stream.fileno())
+
+
+def open_journal(project_filename, inputs, auxiliary_filenames):
+    """!
+    @brief Open the journal of a project (resume the previous run if it was interrupted)
+    @param project_filename <str>: path to the project file
+    @param inputs <dict>: paths, file name and job identifiers for every Serafin input node
+    @param auxiliary_filenames <[str]>: paths to the auxiliary input files
+    @return <TaskJournal>: opened journal (None if disabled in the settings or if the project is not saved)
+    """
+    if not settings.MULTI_RESUME or not project_filename or not os.path.exists(project_filename):
+        return None
+    input_filenames = list(auxiliary_filenames)
+    for paths, name, _ in inputs.values():
+        input_filenames.extend(os.path.join(path, name) for path in paths)
+    journal = TaskJournal(project_filename + '.journal', project_signature(project_filename, input_filenames))
+    journal.open()
+    return journal
@@ -4,7 +4,8 @@ from time import time
 
 from pyteltools.conf import settings
 
-from .Node import Box, Link, Port
+from .mono_runner import MonoRunner
+from .Node import Box, Link, Node, Port
 from .nodes_calc import *
 from .nodes_io import *
 from .nodes_op import *
@@ -27,6 +28,7 @@ NODES = {'Input/Output': {'Load Serafin 2D': LoadSerafin2DNode, 'Load Serafin 3D
                               'Convert to Single Precision': ConvertToSinglePrecisionNode,
                               'Add Transformation': AddTransformationNode},
          'Operators': {'Max': ComputeMaxNode, 'Min': ComputeMinNode, 'Mean': ComputeMeanNode, 'SynchMax': SynchMaxNode,
+                       'Statistics': ComputeStatisticsNode,
                        'Project B on A': ProjectMeshNode, 'A Minus B': MinusNode, 'B Minus A': ReverseMinusNode,
                        'Max(A,B)': MaxBetweenNode, 'Min(A,B)': MinBetweenNode},
          'Calculations': {'Compute Arrival Duration': ArrivalDurationNode,
@@ -87,6 +89,8 @@ class MonoScene(QGraphicsScene):
         self.csv_separator = settings.CSV_SEPARATOR
         self.fmt_float = settings.FMT_FLOAT
 
+        ## Runner of the nodes in background threads (None if no node is running) <MonoRunner>
+        self.runner = None
         self._init_with_default_node()
 
         self.setSceneRect(QRectF(0, 0, settings.SCENE_SIZE[0], settings.SCENE_SIZE[1]))
@@ -94,6 +98,7 @@ class MonoScene(QGraphicsScene):
         self.selectionChanged.connect(self.selection_changed)
 
     def reinit(self):
+        self.cancel_run()
         self.clear()
         self._init_with_default_node()
         self.update()
@@ -132,6 +137,9 @@ class MonoScene(QGraphicsScene):
             self.current_line.setVisible(True)
 
     def mouseReleaseEvent(self, event):
+        if self.current_port is not None and self.runner is not None:
+            self.current_line.setVisible(False)
+            self.current_port = None
         if self.current_port is not None:
             target_item = self.itemAt(event.scenePos(), self.transform)
             if isinstance(target_item, Port):
@@ -142,6 +150,8 @@ class MonoScene(QGraphicsScene):
 
     def mouseDoubleClickEvent(self, event):
         super().mouseDoubleClickEvent(event)
+        if self.runner is not None:
+            return
         target_item = self.itemAt(event.scenePos(), self.transform)
         if isinstance(target_item, Link):
             self._handle_remove_link(target_item)
@@ -151,7 +161,7 @@ class MonoScene(QGraphicsScene):
             self.selection_changed()
 
     def keyPressEvent(self, event):
-        if event.key() == Qt.Key_Delete:
+        if event.key() == Qt.Key_Delete and self.runner is None:
             selected = self.selectedItems()
             if selected:
                 link = selected[0]
@@ -193,6 +203,7 @@ class MonoScene(QGraphicsScene):
 
     def load(self, filename):
         logger.debug('Loading project in MONO: %s' % filename)
+        self.cancel_run()
         self.project_path = filename
         self.clear()
         self._add_current_line()
@@ -233,10 +244,34 @@ class MonoScene(QGraphicsScene):
             return False
 
     def run_all(self):
-        roots = self._to_sources()
-
-        for root in roots:
-            self.nodes[root].run_downward()
+        """Run all the nodes ready to run in background threads"""
+        return self.run_nodes([node for node in self.nodes.values()
+                               if node.ready_to_run() and node.state != Node.SUCCESS])
+
+    def run_node(self, node):
+        """Run a node (and its ancestors which did not succeed yet) in background threads"""
+        return self.run_nodes(MonoRunner.with_ancestors(node))
+
+    def run_nodes(self, nodes):
+        """!
+        @brief Start running nodes in background threads
+        @param nodes <[Node]>: nodes to run
+        @return <MonoRunner>: runner of the nodes (None if another run is in progress)
+        """
+        if self.runner is not None:
+            return None
+        self.runner = MonoRunner(nodes)
+        self.runner.finished.connect(self._run_finished)
+        self.runner.start()
+        return self.runner
+
+    def cancel_run(self):
+        if self.runner is not None:
+            self.runner.cancel()
+
+    def _run_finished(self):
+        self.runner = None
+        self.update()
 
     def global_config(self):
         dlg = GlobalConfigDialog(self.language, self.csv_separator)
@@ -244,37 +279,6 @@ class MonoScene(QGraphicsScene):
         if value == QDialog.Accepted:
             self.language, self.csv_separator = dlg.new_options
 
-    def _to_sources(self):
-        roots = []
-        visited = {node: False for node in self.nodes}
-
-        def forward(node):
-            for port in node.ports:
-                if port.type == Port.OUTPUT:
-                    if port.has_children():
-                        for child in port.children:
-                            child_node = child.parentItem()
-                            if not visited[child_node.index()]:
-                                visited[child_node.index()] = False
-                                forward(child_node)
-
-        def backward(node_index):
-            if not visited[node_index]:
-                visited[node_index] = True
-                node = self.nodes[node_index]
-                if node.ports[0].type == Port.INPUT:
-                    backward(node.ports[0].parentItem().index())
-                    if len(node.ports) > 1 and node.ports[1].type == Port.INPUT:
-                        backward(node.ports[1].parentItem().index())
-                else:
-                    roots.append(node_index)
-                    forward(node)
-
-        for node in self.nodes:
-            backward(node)
-
-        return roots
-
     def _handle_add_link(self, target_item):
         port_index = target_item.index()
         node_index = target_item.parentItem().index()
@@ -438,7 +442,7 @@ class MonoView(QGraphicsView):
         self.centerOn(QPoint(400, 300))
 
     def dropEvent(self, event):
-        if event.mimeData().hasText():
+        if event.mimeData().hasText() and self.scene().runner is None:
             event.acceptProposedAction()
             try:
                 category, label = event.mimeData().text().split('|')
@@ -477,6 +481,7 @@ class MonoPanel(QWidget):
         self.node_label = QLineEdit()
         self.save_act = QAction('Save\n(Ctrl+S)', self, triggered=self.save, shortcut='Ctrl+S')
         self.run_all_act = QAction('Run all\n(F5)', self, triggered=self.run_all, shortcut='F5')
+        self.cancel_act = QAction('Cancel\n(Esc)', self, triggered=self.cancel_run, enabled=False, shortcut='Esc')
         self.configure_act = QAction('Configure\n(Ctrl+C)', self, triggered=self.configure_node,
                                      enabled=False, shortcut='Ctrl+C')
         self.delete_act = QAction('Delete\n(Del)', self, triggered=self.delete_node, enabled=False, shortcut='Del')
@@ -490,7 +495,7 @@ class MonoPanel(QWidget):
         self.setLayout(layout)
 
     def init_toolbar(self):
-        for act in [self.save_act, self.run_all_act]:
+        for act in [self.save_act, self.run_all_act, self.cancel_act]:
             button = QToolButton(self)
             button.setFixedWidth(100)
             button.setMinimumHeight(30)
@@ -520,10 +525,29 @@ class MonoPanel(QWidget):
 
     def run_all(self):
         logger.debug('Start running project')
+        self._started(self.view.scene().run_all())
+
+    def cancel_run(self):
+        logger.debug('Cancel running nodes')
+        self.view.scene().cancel_run()
+
+    def _started(self, runner):
+        if runner is None:
+            return
         start_time = time()
-        self.view.scene().run_all()
-        self.view.scene().update()
+        for act in [self.run_all_act, self.configure_act, self.delete_act, self.run_act]:
+            act.setEnabled(False)
+        self.cancel_act.setEnabled(True)
+        runner.finished.connect(lambda: self._finished(start_time))
+
+    def _finished(self, start_time):
         logger.debug('Execution time %f s' % (time() - start_time))
+        self.cancel_act.setEnabled(False)
+        self.run_all_act.setEnabled(True)
+        if self.view.current_node is None:
+            self.disable_toolbar()
+        else:
+            self.enable_toolbar()
 
     def configure_node(self):
         self.view.current_node.configure()
@@ -537,11 +561,12 @@ class MonoPanel(QWidget):
         self.view.scene().update()
 
     def run_node(self):
-        self.view.current_node.run()
-        self.view.scene().update()
+        self._started(self.view.scene().run_node(self.view.current_node))
 
     def enable_toolbar(self):
         self.node_label.setText(self.view.current_node.label)
+        if self.view.scene().runner is not None:
+            return
         for act in [self.configure_act, self.delete_act]:
             act.setEnabled(True)
         if self.view.current_node.ready_to_run():
@@ -613,8 +638,7 @@ class MonoWidget(QWidget):
 
         if project_path is not None:
             self.scene.load(project_path)
-            start_time = time()
-            self.scene.run_all()
+            mono.run_all()
 
 
 if __name__ == '__main__':
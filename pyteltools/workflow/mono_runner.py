@@ -0,0 +1,122 @@
+"""!
+Background execution of the nodes of the workflow mono view
+
+The nodes run in a pool of threads so that the interface stays responsive. A node is submitted as soon as all its
+parents succeeded, hence the independent branches of the graph run concurrently.
+The running nodes update their progress bar through signals handled in the GUI thread and stop at their next
+progress update when the run is canceled.
+Visualization nodes open windows, so they run in the GUI thread.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import QObject, pyqtSignal
+import threading
+
+from pyteltools.conf import settings
+
+from .Node import Node, NodeCancelled
+from .util import logger
+
+
+class MonoRunner(QObject):
+    """!
+    @brief Run a set of nodes in background threads, every node after its parents
+    """
+    ## Emitted by the thread running a node when it has finished
+    node_finished = pyqtSignal(object)
+    ## Emitted when all the nodes have finished (or the run is canceled)
+    finished = pyqtSignal()
+
+    def __init__(self, nodes, max_workers=settings.MONO_NB_THREADS):
+        """!
+        @param nodes <[Node]>: nodes to run (the parents which are not in the list have to be already run)
+        @param max_workers <int>: maximum number of nodes running at the same time
+        """
+        super().__init__()
+        self.pending = list(nodes)
+        self.running = []
+        self.cancel_event = threading.Event()
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+        self.is_finished = False
+        self.node_finished.connect(self._node_finished)
+
+    @staticmethod
+    def with_ancestors(node):
+        """!
+        @brief Node and all its ancestors which did not succeed yet
+        @param node <Node>: node to run
+        @return <[Node]>: nodes to run
+        """
+        nodes = [node]
+        for parent in node.parents():
+            if parent.state != Node.SUCCESS:
+                nodes.extend(ancestor for ancestor in MonoRunner.with_ancestors(parent) if ancestor not in nodes)
+        return nodes
+
+    def start(self):
+        self._schedule()
+
+    def cancel(self):
+        """!
+        @brief Cancel the pending nodes and stop the running ones
+        """
+        self.cancel_event.set()
+        self.pending = []
+        if not self.running:
+            self._finish()
+
+    def _schedule(self):
+        """!
+        @brief Submit the pending nodes whose parents have finished
+        """
+        submitted = True
+        while submitted:
+            submitted = False
+            for node in list(self.pending):
+                if node not in self.pending:  # already handled while processing events
+                    continue
+                parents = node.parents()
+                if any(parent in self.pending or parent in self.running for parent in parents):
+                    continue
+                self.pending.remove(node)
+                submitted = True
+                if any(parent.state != Node.SUCCESS for parent in parents):
+                    node.fail('input failed.')
+                    continue
+                self.running.append(node)
+                node.cancel_event = self.cancel_event
+                if node.run_in_gui_thread():
+                    self._run(node)
+                    self.running.remove(node)
+                else:
+                    self.executor.submit(self._run_in_thread, node)
+        if not self.pending and not self.running:
+            self._finish()
+
+    def _run(self, node):
+        try:
+            if self.cancel_event.is_set():
+                raise NodeCancelled
+            node.run()
+        except NodeCancelled:
+            node.fail('canceled.')
+        except Exception as e:
+            logger.exception(e)
+            node.fail('unexpected error: %s' % e)
+        finally:
+            node.cancel_event = None
+
+    def _run_in_thread(self, node):
+        self._run(node)
+        self.node_finished.emit(node)
+
+    def _node_finished(self, node):
+        self.running.remove(node)
+        self._schedule()
+
+    def _finish(self):
+        if self.is_finished:
+            return
+        self.is_finished = True
+        self.executor.shutdown(wait=False)
+        self.finished.emit()
@@ -1,9 +1,14 @@
+from collections import deque
+from concurrent.futures import BrokenExecutor
 from datetime import datetime
-from multiprocessing import Process, Queue
-import numpy as np
+import functools
+from multiprocessing import Array, Process, Queue
 import os
+import queue
 from shapefile import ShapefileException
 from shapely.geometry import Polygon
+import threading
+from time import time
 
 from pyteltools.conf import settings
 from pyteltools.geom import BlueKenue, Shapefile
@@ -12,51 +17,341 @@ from pyteltools.slf.flux import FluxCalculator, PossibleFluxComputation, Triangu
 from pyteltools.slf.interpolation import MeshInterpolator
 import pyteltools.slf.misc as operations
 from pyteltools.slf import Serafin
-from pyteltools.slf.variables import do_calculations_in_frame, get_available_variables, \
-    get_necessary_equations, new_variables_from_US
+from pyteltools.slf.streams import data_stream, STREAM_OPERATORS, write_frames
+from pyteltools.slf.variables import get_available_variables, get_necessary_equations, new_variables_from_US
 from pyteltools.slf.volume import TruncatedTriangularPrisms, VolumeCalculator
-
-from .nodes_op import VerticalAggregationNode  # use only class constants VERTICAL_OPERATIONS
-from .util import process_output_options, process_geom_output_options, process_vtk_output_options
+from pyteltools.slf.vtu import VtuCollection, write_pvd
+from pyteltools.utils.cli import new_logger
+
+from .broker import BrokerExecutor, parse_address
+from .cache import cache_key, RESULT_CACHE
+from .fusion import open_serafin, SharedFrameCache
+from .options import process_geom_output_options, process_output_options, process_vtk_output_options, \
+    VERTICAL_OPERATIONS
+from .profiling import task_ids
+from .scheduler import TaskScheduler
+
+
+logger = new_logger(__name__)
+
+
+class TaskTracker:
+    """!
+    @brief Tasks of a MULTI run from their submission to their results (whatever runs them)
+
+    The tasks completed by a previous (interrupted) run are replayed from the journal (if any) and the other ones are
+    started in the order decided by the scheduler. A task which failed (its process died, it raised an exception or
+    it exceeded the timeout) is run again after a delay (doubled at every attempt) until the maximum number of retries
+    is reached. The timeout only applies to the tasks which have started running.
+    """
+    def __init__(self, ncsize, profiler=None, journal=None):
+        """!
+        @param ncsize <int>: number of tasks running at the same time
+        @param profiler <profiling.WorkflowProfiler>: profiler measuring every task (optional)
+        @param journal <journal.TaskJournal>: journal of the completed tasks (optional)
+        """
+        self.scheduler = TaskScheduler(ncsize)
+        self.profiler = profiler
+        self.journal = journal
+        self.tasks = {}  # task and number of previous attempts of every queued or running ticket
+        self.running = {}  # submit time of every running ticket
+        self.start_times = {}  # time at which a running ticket was first seen started
+        self.delayed = []
+
+    def push(self, task, attempt=0):
+        """!
+        @brief Queue a task, or replay its results from the journal
+        @param task <tuple>: function and arguments of the task
+        @param attempt <int>: number of previous attempts
+        @return <[tuple]>: replayed results
+        """
+        replayed = []
+        if self.journal is not None:
+            replayed, task = self.journal.replay(*task)
+            if task is None:
+                return replayed
+        self.tasks[self.scheduler.push(task)] = task, attempt
+        return replayed
+
+    def pop_ready(self):
+        """!
+        @brief Tasks to start now (wrapped by the profiler if any)
+        @return <[tuple]>: ticket, function and arguments of every task
+        """
+        ready = []
+        for ticket, (func, args) in self.scheduler.pop_ready():
+            self.running[ticket] = time()
+            if self.profiler is not None:
+                func, args = self.profiler.wrap(func, args)
+            ready.append((ticket, func, args))
+        return ready
+
+    def is_running(self, ticket):
+        return ticket in self.running
+
+    def has_pending_tasks(self):
+        return bool(self.tasks or self.delayed)
+
+    def started(self, ticket, now):
+        """!
+        @brief Start the timeout of a running task (no effect if it was already started)
+        """
+        if ticket in self.running:
+            self.start_times.setdefault(ticket, now)
+
+    def timed_out(self, now):
+        """!
+        @brief Running tasks started for longer than the timeout
+        @return <[int]>: tickets
+        """
+        if settings.MULTI_TASK_TIMEOUT <= 0:
+            return []
+        return [ticket for ticket, start_time in self.start_times.items()
+                if now - start_time > settings.MULTI_TASK_TIMEOUT]
+
+    def complete(self, ticket, result):
+        """!
+        @brief Release a task which returned
+        @return <[tuple]>: its results (one per task for fused sinks)
+        """
+        (func, args), submit_time = self._release(ticket)
+        if self.profiler is not None:
+            result, record = result
+            self.profiler.add(func, args, submit_time, record)
+        return self._record(result if func is run_fused_sinks else [result])
+
+    def fail(self, ticket, reason):
+        """!
+        @brief Release a task which failed, to run it again later if it has retries left
+        @return <[tuple]>: its failed results (empty if it will run again)
+        """
+        attempt = self.tasks[ticket][1]
+        (func, args), _ = self._release(ticket)
+        if attempt < settings.MULTI_MAX_RETRIES:
+            delay = settings.MULTI_RETRY_DELAY * 2 ** attempt
+            logger.warning('Task %s failed (%s), retry in %.1f s' % (task_ids(func, args), reason, delay))
+            self.delayed.append((time() + delay, attempt + 1, (func, args)))
+            return []
+        return self._record(failed_results(func, args, reason))
+
+    def requeue(self, ticket):
+        """!
+        @brief Queue again a task which was interrupted without failing (e.g. its executor was replaced)
+        @return <[tuple]>: replayed results
+        """
+        attempt = self.tasks[ticket][1]
+        task, _ = self._release(ticket)
+        return self.push(task, attempt)
+
+    def push_due(self, now):
+        """!
+        @brief Queue again the failed tasks whose delay is over
+        @return <[tuple]>: replayed results
+        """
+        ready = [item for item in self.delayed if item[0] <= now]
+        self.delayed = [item for item in self.delayed if item[0] > now]
+        replayed = []
+        for _, attempt, task in ready:
+            replayed.extend(self.push(task, attempt))
+        return replayed
+
+    def _release(self, ticket):
+        self.scheduler.release(ticket)
+        self.start_times.pop(ticket, None)
+        return self.tasks.pop(ticket)[0], self.running.pop(ticket)
+
+    def _record(self, results):
+        if self.journal is not None:
+            for result in results:
+                self.journal.record(result)
+        return results
 
 
 class Workers:
-    def __init__(self, ncsize):
+    """!
+    @brief Run the tasks of the workflow multi-folder view in local processes or with an executor
+
+    The executor (created by `executor` when the workers are started) can be any `concurrent.futures.Executor`,
+    e.g. `broker.BrokerExecutor` to run the tasks on remote workers.
+
+    The local processes are monitored: a process which died (e.g. killed by the system when out of memory) is replaced
+    by a new one. The retries, the timeout and the journal are handled by a `TaskTracker`.
+    """
+    def __init__(self, ncsize, executor=None, profiler=None, journal=None):
+        """!
+        @param ncsize <int>: number of tasks running at the same time
+        @param executor <function>: function without argument returning an executor (default: local processes)
+        @param profiler <profiling.WorkflowProfiler>: profiler measuring every task (optional)
+        @param journal <journal.TaskJournal>: journal of the completed tasks (optional)
+        """
         self.nb_processes = ncsize
         self.started = False
         self.stopped = False
         self.task_queue = Queue()
         self.done_queue = Queue()
+        self.tracker = TaskTracker(ncsize, profiler, journal)
+        self.results = deque()
+        self.futures = {}
+        self.executor_factory = executor
+        self.executor = None
+        self.broken_executor = False
 
         self.processes = []
-        for i in range(self.nb_processes):
-            self.processes.append(Process(target=worker, args=(self.task_queue, self.done_queue)))
+        if executor is None:
+            self.current_tickets = Array('q', [-1] * ncsize)  # ticket of the task run by every process
+            for slot in range(self.nb_processes):
+                self.processes.append(self._new_process(slot))
 
     def add_tasks(self, tasks):
         for task in tasks:
-            self.task_queue.put(task)
+            self.results.extend(self.tracker.push(task))
+        self._dispatch()
 
     def start(self):
+        if self.executor_factory is not None:
+            self.executor = self.executor_factory()
         for p in self.processes:
             p.start()
         self.started = True
+        self._dispatch()
 
     def stop(self):
-        for i in range(self.nb_processes):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+        for i in range(len(self.processes)):
             self.task_queue.put('STOP')
         self.stopped = True
 
     def add_task(self, task):
-        self.task_queue.put(task)
+        self.add_tasks([task])
 
     def get_result(self):
-        return self.done_queue.get()
-
+        while not self.results:
+            try:
+                ticket, result, error = self.done_queue.get(timeout=settings.MULTI_HEALTH_CHECK_INTERVAL)
+            except queue.Empty:
+                self._check_health()
+                continue
+            if not self.tracker.is_running(ticket):  # late result of an abandoned task
+                continue
+            self.futures.pop(ticket, None)
+            if error is None:
+                self.results.extend(self.tracker.complete(ticket, result))
+            else:
+                self._fail(ticket, error)
+            self._dispatch()
+        return self.results.popleft()
+
+    def _new_process(self, slot):
+        return Process(target=worker, args=(slot, self.current_tickets, self.task_queue, self.done_queue))
+
+    def _dispatch(self):
+        # the scheduler decides which tasks are started (at most one per process)
+        if not self.started:
+            return
+        for ticket, func, args in self.tracker.pop_ready():
+            if self.executor is None:
+                self.task_queue.put((ticket, func, args))
+            else:
+                future = self.executor.submit(func, *args)
+                self.futures[ticket] = future
+                future.add_done_callback(functools.partial(self._receive, ticket))
 
-def worker(input_queue, output_queue):
-    for func, args in iter(input_queue.get, 'STOP'):
-        result = func(*args)
-        output_queue.put(result)
+    def _receive(self, ticket, future):
+        try:
+            self.done_queue.put((ticket, future.result(), None))
+        except Exception as e:
+            if isinstance(e, BrokenExecutor):
+                self.broken_executor = True
+            self.done_queue.put((ticket, None, 'unexpected error (%s)' % e))
+
+    def _fail(self, ticket, reason):
+        if self.broken_executor:
+            self.executor.shutdown(wait=False)
+            self.executor = self.executor_factory()
+            self.broken_executor = False
+        self.results.extend(self.tracker.fail(ticket, reason))
+
+    def _check_health(self):
+        for slot, p in enumerate(self.processes):
+            if not p.is_alive():
+                self._restart_process(slot, 'worker process died (exit code %s)' % p.exitcode)
+
+        # a task still waiting in the queue is not timed out (it would be run twice)
+        now = time()
+        if self.executor is None:
+            for ticket in self.current_tickets[:]:
+                self.tracker.started(ticket, now)
+        else:
+            for ticket, future in self.futures.items():
+                if future.running():
+                    self.tracker.started(ticket, now)
+        for ticket in self.tracker.timed_out(now):
+            if self.executor is None:
+                if ticket in self.current_tickets[:]:
+                    self._restart_process(self.current_tickets[:].index(ticket), 'timeout')
+            else:  # abandoned on a remote worker
+                self.futures.pop(ticket, None)
+                self._fail(ticket, 'timeout')
+
+        self.results.extend(self.tracker.push_due(now))
+        self._dispatch()
+
+    def _restart_process(self, slot, reason):
+        p = self.processes[slot]
+        if p.is_alive():
+            p.terminate()
+        p.join()
+        ticket = self.current_tickets[slot]
+        self.current_tickets[slot] = -1
+        self.processes[slot] = self._new_process(slot)
+        self.processes[slot].start()
+        if self.tracker.is_running(ticket):
+            self._fail(ticket, reason)
+
+
+def new_workers(ncsize, profiler=None):
+    """!
+    @brief Workers running the tasks on the remote workers of the broker set in the settings (if any)
+    @param ncsize <int>: number of tasks running at the same time
+    @param profiler <profiling.WorkflowProfiler>: profiler measuring every task (optional)
+    @return <Workers>: workers (not started)
+    """
+    if settings.MULTI_BROKER:
+        if not settings.MULTI_BROKER_AUTHKEY:
+            logger.error('The authentication key of the broker is not set (MULTI_BROKER_AUTHKEY), '
+                         'the tasks are run in local processes.')
+            return Workers(ncsize, profiler=profiler)
+        address = parse_address(settings.MULTI_BROKER)
+        return Workers(ncsize, lambda: BrokerExecutor(address), profiler)
+    return Workers(ncsize, profiler=profiler)
+
+
+def failed_results(func, args, reason):
+    """!
+    @brief Results of a task which raised an exception
+    @param func <function>: function of the task
+    @param args <tuple>: arguments of the task
+    @param reason <str>: failure reason
+    @return <[tuple]>: result of the task (one per task for fused sinks)
+    """
+    if func is run_fused_sinks:
+        return [failed_results(sink_func, sink_args, reason)[0] for sink_func, sink_args in args[2]]
+    node_name = next(name for name, node_func in FUNCTIONS.items() if node_func is func)
+    if func in (read_slf_reference, read_polygons, read_polylines, read_points):  # auxiliary inputs
+        return [(False, args[0], None, fail_message(reason, node_name, 'all'))]
+    job_id = args[2].job_id if isinstance(args[2], SerafinData) else ''
+    return [(False, args[0], args[1], None, fail_message(reason, node_name, job_id))]
+
+
+def worker(slot, current_tickets, input_queue, output_queue):
+    for ticket, func, args in iter(input_queue.get, 'STOP'):
+        current_tickets[slot] = ticket
+        try:
+            output_queue.put((ticket, func(*args), None))
+        except Exception as e:
+            output_queue.put((ticket, None, 'unexpected error (%s)' % e))
+        current_tickets[slot] = -1
 
 
 def success_message(node_name, job_id, info='', second_job_id=''):
@@ -334,7 +629,7 @@ def vertical_aggragation(node_id, fid, data, options):
         return False, node_id, fid, None, fail_message('the input file is not 3d', 'Select Single Layer', data.job_id)
 
     vertical_operation = options[0]
-    if vertical_operation not in VerticalAggregationNode.VERTICAL_OPERATIONS:
+    if vertical_operation not in VERTICAL_OPERATIONS:
         raise NotImplementedError('Vertical operation %s is not supported' % vertical_operation)
 
     new_data = data.copy()
@@ -344,7 +639,7 @@ def vertical_aggragation(node_id, fid, data, options):
 
 
 def compute_max(node_id, fid, data, options):
-    if not data.header.is_2d:
+    if not data.header.is_2d and data.operator not in (operations.SELECT_LAYER, operations.VERTICAL_AGGREGATION):
         return False, node_id, fid, None, fail_message('the input file is not 2d', 'Max', data.job_id)
     if len(data.selected_time_indices) == 1:
         return False, node_id, fid, None, fail_message('the input file has only one frame', 'Max', data.job_id)
@@ -355,7 +650,7 @@ def compute_max(node_id, fid, data, options):
 
 
 def compute_min(node_id, fid, data, options):
-    if not data.header.is_2d:
+    if not data.header.is_2d and data.operator not in (operations.SELECT_LAYER, operations.VERTICAL_AGGREGATION):
         return False, node_id, fid, None, fail_message('the input file is not 2d', 'Min', data.job_id)
     if len(data.selected_time_indices) == 1:
         return False, node_id, fid, None, fail_message('the input file has only one frame', 'Min', data.job_id)
@@ -366,7 +661,7 @@ def compute_min(node_id, fid, data, options):
 
 
 def compute_mean(node_id, fid, data, options):
-    if not data.header.is_2d:
+    if not data.header.is_2d and data.operator not in (operations.SELECT_LAYER, operations.VERTICAL_AGGREGATION):
         return False, node_id, fid, None, fail_message('the input file is not 2d', 'Mean', data.job_id)
     if len(data.selected_time_indices) == 1:
         return False, node_id, fid, None, fail_message('the input file has only one frame', 'Mean', data.job_id)
@@ -376,8 +671,20 @@ def compute_mean(node_id, fid, data, options):
     return True, node_id, fid, new_data, success_message('Mean', data.job_id)
 
 
-def synch_max(node_id, fid, data, options):
+def compute_statistics(node_id, fid, data, options):
     if not data.header.is_2d:
+        return False, node_id, fid, None, fail_message('the input file is not 2d', 'Statistics', data.job_id)
+    if len(data.selected_time_indices) == 1:
+        return False, node_id, fid, None, fail_message('the input file has only one frame', 'Statistics', data.job_id)
+
+    new_data = data.copy()
+    new_data.operator = operations.STATISTICS
+    new_data.metadata = {'statistics': options[0]}
+    return True, node_id, fid, new_data, success_message('Statistics', data.job_id)
+
+
+def synch_max(node_id, fid, data, options):
+    if not data.header.is_2d and data.operator not in (operations.SELECT_LAYER, operations.VERTICAL_AGGREGATION):
         return False, node_id, fid, None, fail_message('the input file is not 2d', 'SynchMax', data.job_id)
     if len(data.selected_time_indices) == 1:
         return False, node_id, fid, None, fail_message('the input file has only one frame', 'SynchMax', data.job_id)
@@ -388,7 +695,7 @@ def synch_max(node_id, fid, data, options):
         return False, node_id, fid, None, fail_message('variable not available', 'SynchMax', data.job_id)
     new_data = data.copy()
     new_data.operator = operations.SYNCH_MAX
-    new_data.metadata = {'var': var}
+    new_data.metadata = dict(data.metadata, var=var)
     return True, node_id, fid, new_data, success_message('SynchMax', data.job_id)
 
 
@@ -432,21 +739,26 @@ def write_slf(node_id, fid, data, options):
 
     filename = process_output_options(data.filename, data.job_id, os.path.splitext(data.filename)[1],
                                       suffix, in_source_folder, dir_path, double_name)
-    if not overwrite:
-        if os.path.exists(filename):
-            try:
-                with open(filename, 'r'):
-                    pass
-            except PermissionError:
-                return False, node_id, fid, None, fail_message('access denied when reloading existing file',
-                                                               'Write Serafin', data.job_id)
-            new_data = SerafinData(data.job_id, filename, data.language)
-            try:
-                new_data.read()
-                return True, node_id, fid, new_data,\
-                       success_message('Write Serafin', data.job_id, 'reload existing file')
-            except (Serafin.SerafinRequestError, Serafin.SerafinValidationError) as e:
-                return False, node_id, fid, new_data, fail_message(e.message, 'Write Serafin', data.job_id)
+    key = cache_key('Write Serafin', options, data)
+    if not overwrite and os.path.exists(filename):
+        info = 'reload existing file'
+    elif RESULT_CACHE.restore(key, [filename]):
+        info = 'cached result reused'
+    else:
+        info = None
+    if info is not None:
+        try:
+            with open(filename, 'r'):
+                pass
+        except PermissionError:
+            return False, node_id, fid, None, fail_message('access denied when reloading existing file',
+                                                           'Write Serafin', data.job_id)
+        new_data = SerafinData(data.job_id, filename, data.language)
+        try:
+            new_data.read()
+            return True, node_id, fid, new_data, success_message('Write Serafin', data.job_id, info)
+        except (Serafin.SerafinRequestError, Serafin.SerafinValidationError) as e:
+            return False, node_id, fid, new_data, fail_message(e.message, 'Write Serafin', data.job_id)
 
     try:
         with open(filename, 'w'):
@@ -459,25 +771,21 @@ def write_slf(node_id, fid, data, options):
         return False, node_id, fid, None, fail_message('access denied', 'Write Serafin', data.job_id)
 
     try:
-        if data.operator is None:
-            success, message = write_simple_slf(data, filename)
-        elif data.operator in (operations.MAX, operations.MIN, operations.MEAN):
-            success, message = write_max_min_mean(data, filename)
+        if data.operator in STREAM_OPERATORS:
+            success, message = write_slf_stream(data, filename)
         elif data.operator == operations.ARRIVAL_DURATION:
             success, message = write_arrival_duration(data, filename)
-        elif data.operator == operations.SYNCH_MAX:
-            success, message = write_synch_max(data, filename)
-        elif data.operator == operations.SELECT_LAYER:
-            success, message = write_slf_single_layer(data, filename)
-        elif data.operator == operations.VERTICAL_AGGREGATION:
-            success, message = write_slf_vertical_aggregation(data, filename)
-        elif data.operator == operations.PROJECT:
+        elif data.operator == operations.STATISTICS:
+            success, message = write_statistics(data, filename)
+        elif data.operator in (operations.PROJECT, operations.DIFF, operations.REV_DIFF,
+                               operations.MAX_BETWEEN, operations.MIN_BETWEEN):
             success, message = write_project_mesh(data, filename)
         else:
             raise NotImplementedError('Operator "%s" is not implemented in MULTI' % data.operator)
 
         new_data = None
         if success:
+            RESULT_CACHE.store(key, [filename])
             new_data = SerafinData(data.job_id, filename, data.language)
             new_data.read()
         else:
@@ -489,91 +797,41 @@ def write_slf(node_id, fid, data, options):
     except (Serafin.SerafinRequestError, Serafin.SerafinValidationError) as e:
         return False, node_id, fid, None, fail_message(e.message, 'Write Serafin', data.job_id)
 
-def write_simple_slf(input_data, filename):
-    output_header = input_data.default_output_header()
-    with Serafin.Read(input_data.filename, input_data.language) as input_stream:
+
+def write_slf_stream(input_data, filename):
+    with open_serafin(input_data.filename, input_data.language) as input_stream:
         input_stream.header = input_data.header
         input_stream.time = input_data.time
 
         with Serafin.Write(filename, input_data.language, True) as output_stream:
-            output_stream.write_header(output_header)
-            for time_index in input_data.selected_time_indices:
-                # FIXME Optimization: Do calculations only on target layer and avoid reshaping afterwards
-                values = do_calculations_in_frame(input_data.equations, input_stream, time_index,
-                                                  input_data.selected_vars, output_header.np_float_type,
-                                                  is_2d=output_header.is_2d, us_equation=input_data.us_equation,
-                                                  ori_values={})
-                output_stream.write_entire_frame(output_header, input_data.time[time_index], values)
+            write_frames(data_stream(input_data, input_stream), output_stream)
     return True, success_message('Write Serafin', input_data.job_id)
 
 
-def write_max_min_mean(input_data, filename):
+def write_statistics(input_data, filename):
     selected = [(var, input_data.selected_vars_names[var][0],
                       input_data.selected_vars_names[var][1]) for var in input_data.selected_vars]
     scalars, vectors, additional_equations = operations.scalars_vectors(input_data.header.var_IDs,
                                                                         selected,
                                                                         input_data.us_equation)
-    output_header = input_data.header.copy()
-    output_header.set_variables(scalars + vectors)
-    if input_data.to_single:
-        output_header.to_single_precision()
-
-    with Serafin.Read(input_data.filename, input_data.language) as input_stream:
-        input_stream.header = input_data.header
-        input_stream.time = input_data.time
-        has_scalar, has_vector = False, False
-        scalar_calculator, vector_calculator = None, None
-        if scalars:
-            has_scalar = True
-            scalar_calculator = operations.ScalarMaxMinMeanCalculator(input_data.operator, input_stream,
-                                                                      scalars, input_data.selected_time_indices,
-                                                                      additional_equations)
-        if vectors:
-            has_vector = True
-            vector_calculator = operations.VectorMaxMinMeanCalculator(input_data.operator, input_stream,
-                                                                      vectors, input_data.selected_time_indices,
-                                                                      additional_equations)
-        if has_scalar:
-            scalar_calculator.run()
-        if has_vector:
-            vector_calculator.run()
-
-        if has_scalar and not has_vector:
-            values = scalar_calculator.finishing_up()
-        elif not has_scalar and has_vector:
-            values = vector_calculator.finishing_up()
-        else:
-            values = np.vstack((scalar_calculator.finishing_up(), vector_calculator.finishing_up()))
-
-        with Serafin.Write(filename, input_data.language, True) as resout:
-            resout.write_header(output_header)
-            resout.write_entire_frame(output_header, input_data.time[0], values)
-
-    return True, success_message('Write Serafin', input_data.job_id)
-
-
-def write_synch_max(input_data, filename):
-    selected_vars = [var for var in input_data.selected_vars if var in input_data.header.var_IDs]
-    output_header = input_data.header.copy()
-    output_header.empty_variables()
-    for var_ID in selected_vars:
-        var_name, var_unit = input_data.selected_vars_names[var_ID]
-        output_header.add_variable(var_ID, var_name, var_unit)
-    if input_data.to_single:
-        output_header.to_single_precision()
-
-    with Serafin.Read(input_data.filename, input_data.language) as input_stream:
+    with open_serafin(input_data.filename, input_data.language) as input_stream:
         input_stream.header = input_data.header
         input_stream.time = input_data.time
 
-        calculator = operations.SynchMaxCalculator(input_stream, selected_vars, input_data.selected_time_indicies,
-                                                   input_data.metadata['var'])
+        calculator = operations.StatisticsCalculator(input_data.metadata['statistics'], input_stream,
+                                                     scalars, vectors, input_data.selected_time_indices,
+                                                     additional_equations)
         calculator.run()
         values = calculator.finishing_up()
 
-        with Serafin.Write(filename, input_data.language, True) as output_stream:
-            output_stream.write_header(output_header)
-            output_stream.write_entire_frame(output_header, input_data.time[0], values)
+        output_header = input_data.header.copy()
+        output_header.set_variables(calculator.output_variables())
+        if input_data.to_single:
+            output_header.to_single_precision()
+
+        with Serafin.Write(filename, input_data.language, True) as resout:
+            resout.write_header(output_header)
+            resout.write_entire_frame(output_header, input_data.time[0], values)
 
     return True, success_message('Write Serafin', input_data.job_id)
 
@@ -592,35 +850,34 @@ def write_arrival_duration(input_data, filename):
     if input_data.to_single:
         output_header.to_single_precision()
 
-    with Serafin.Read(input_data.filename, input_data.language) as input_stream:
-        input_stream.header = input_data.header
-        input_stream.time = input_data.time
-        calculators = []
-
-        for i, condition in enumerate(conditions):
-            calculators.append(operations.ArrivalDurationCalculator(input_stream, input_data.selected_time_indices,
-                                                                    condition))
-        for calculator in calculators:
+    # Split very large meshes by node ranges handled by separate processes
+    nb_processes = min(settings.NCSIZE, input_data.header.nb_nodes // settings.MIN_NODES_PER_PROCESS)
+    if nb_processes > 1:
+        values = operations.arrival_duration_in_parallel(input_data.filename, input_data.language,
+                                                         input_data.header, input_data.time,
+                                                         input_data.selected_time_indices, conditions, nb_processes)
+    else:
+        with open_serafin(input_data.filename, input_data.language) as input_stream:
+            input_stream.header = input_data.header
+            input_stream.time = input_data.time
+            calculator = operations.ArrivalDurationCalculator(input_stream, input_data.selected_time_indices,
+                                                              conditions)
             calculator.run()
-
-        values = np.empty((2*len(conditions), input_data.header.nb_nodes))
-        for i, calculator in enumerate(calculators):
-            values[2*i, :] = calculator.arrival
-            values[2*i+1, :] = calculator.duration
-
-        if time_unit == 'minute':
-            values /= 60
-        elif time_unit == 'hour':
-            values /= 3600
-        elif time_unit == 'day':
-            values /= 86400
-        elif time_unit == 'percentage':
-            values *= 100 / (input_data.time[input_data.selected_time_indices[-1]]
-                             - input_data.time[input_data.selected_time_indices[0]])
-
-        with Serafin.Write(filename, input_data.language, True) as resout:
-            resout.write_header(output_header)
-            resout.write_entire_frame(output_header, input_data.time[0], values)
+            values = calculator.finishing_up()
+
+    if time_unit == 'minute':
+        values /= 60
+    elif time_unit == 'hour':
+        values /= 3600
+    elif time_unit == 'day':
+        values /= 86400
+    elif time_unit == 'percentage':
+        values *= 100 / (input_data.time[input_data.selected_time_indices[-1]]
+                         - input_data.time[input_data.selected_time_indices[0]])
+
+    with Serafin.Write(filename, input_data.language, True) as resout:
+        resout.write_header(output_header)
+        resout.write_entire_frame(output_header, input_data.time[0], values)
 
     return True, success_message('Write Serafin', input_data.job_id)
 
@@ -665,7 +922,10 @@ def write_project_mesh(first_input, filename):
 
     # construct output header
     output_header = first_input.header.copy()
-    output_header.set_variables(common_vars)
+    output_header.empty_variables()
+    for var in common_vars:
+        name, unit = first_input.selected_vars_names[var]
+        output_header.add_variable(var, name, unit)
     if first_input.to_single:
         output_header.to_single_precision()
 
@@ -686,11 +946,11 @@ def write_project_mesh(first_input, filename):
     is_inside, point_interpolators = mesh.get_point_interpolators(list(zip(first_input.header.x,
                                                                            first_input.header.y)))
     # run the calculator
-    with Serafin.Read(first_input.filename, first_input.language) as first_in:
+    with open_serafin(first_input.filename, first_input.language) as first_in:
         first_in.header = first_input.header
         first_in.time = first_input.time
 
-        with Serafin.Read(second_input.filename, second_input.language) as second_in:
+        with open_serafin(second_input.filename, second_input.language) as second_in:
             second_in.header = second_input.header
             second_in.time = second_input.time
 
@@ -709,64 +969,6 @@ def write_project_mesh(first_input, filename):
     return True, message
 
 
-def write_slf_single_layer(input_data, filename):
-    output_header = input_data.header.copy_as_2d()
-    if input_data.to_single:
-        output_header.to_single_precision()
-    selected_variables = [(var, input_data.selected_vars_names[var][0],
-                                input_data.selected_vars_names[var][1]) for var in input_data.selected_vars]
-    output_header.set_variables(selected_variables)
-
-    with Serafin.Read(input_data.filename, input_data.language) as input_stream:
-        input_stream.header = input_data.header
-        input_stream.time = input_data.time
-
-        with Serafin.Write(filename, input_data.language, True) as output_stream:
-            output_stream.write_header(output_header)
-            for time_index in input_data.selected_time_indices:
-                values = do_calculations_in_frame(input_data.equations, input_stream, time_index,
-                                                  input_data.selected_vars, output_header.np_float_type,
-                                                  is_2d=output_header.is_2d, us_equation=input_data.us_equation)
-                new_shape = (values.shape[0], input_stream.header.nb_planes,
-                             values.shape[1] // input_stream.header.nb_planes)
-                values_at_layer = values.reshape(new_shape)[:, input_data.metadata['layer_selection'] - 1, :]
-                output_stream.write_entire_frame(output_header, input_data.time[time_index], values_at_layer)
-
-    return True, success_message('Write Serafin', input_data.job_id)
-
-
-def write_slf_vertical_aggregation(input_data, filename):
-    output_header = input_data.header.copy_as_2d()
-    if input_data.to_single:
-        output_header.to_single_precision()
-    selected_variables = [(var, input_data.selected_vars_names[var][0],
-                           input_data.selected_vars_names[var][1]) for var in input_data.selected_vars]
-
-    with Serafin.Read(input_data.filename, input_data.language) as input_stream:
-        input_stream.header = input_data.header
-        input_stream.time = input_data.time
-        if input_data.metadata['vertical_operator'] == 'Min':
-            operation = operations.MIN
-        elif input_data.metadata['vertical_operator'] == 'Max':
-            operation = operations.MAX
-        elif input_data.metadata['vertical_operator'] == 'Mean':
-            operation = operations.MEAN
-        else:
-            raise NotImplementedError('Vertical operator %s is unknown.' % input_data.metadata['vertical_operator'])
-
-        vertical_calculator = operations.VerticalMaxMinMeanCalculator(operation, input_stream, output_header,
-                                                                      selected_variables)
-        output_header.set_variables(vertical_calculator.get_variables())  # sort variables
-
-        with Serafin.Write(filename, input_data.language, True) as output_stream:
-            output_stream.write_header(output_header)
-            for time_index in input_data.selected_time_indices:
-                vars_2d = vertical_calculator.max_min_mean_in_frame(time_index)
-                output_stream.write_entire_frame(output_header, input_data.time[time_index], vars_2d)
-
-    return True, success_message('Write Serafin', input_data.job_id)
-
-
 def construct_mesh(mesh):
     for i, j, k in mesh.ikle:
         t = Polygon([mesh.points[i], mesh.points[j], mesh.points[k]])
@@ -800,6 +1002,9 @@ def compute_volume(node_id, fid, data, aux_data, options, csv_separator, fmt_flo
     if not overwrite:
         if os.path.exists(filename):
             return True, node_id, fid, None, success_message('Compute Volume', data.job_id, 'file already exists')
+    key = cache_key('Compute Volume', options, data, aux_data, csv_separator, fmt_float)
+    if RESULT_CACHE.restore(key, [filename]):
+        return True, node_id, fid, None, success_message('Compute Volume', data.job_id, 'cached result reused')
 
     try:
         with open(filename, 'w'):
@@ -823,7 +1028,7 @@ def compute_volume(node_id, fid, data, aux_data, options, csv_separator, fmt_flo
         data.triangles = mesh.triangles
 
     # run the calculator
-    with Serafin.Read(data.filename, data.language) as input_stream:
+    with open_serafin(data.filename, data.language) as input_stream:
         input_stream.header = data.header
         input_stream.time = data.time
 
@@ -840,6 +1045,7 @@ def compute_volume(node_id, fid, data, aux_data, options, csv_separator, fmt_flo
             csv_data.add_row(row)
 
     csv_data.write(filename, csv_separator)
+    RESULT_CACHE.store(key, [filename])
     return True, node_id, fid, None, success_message('Compute Volume', data.job_id)
 
 
@@ -865,6 +1071,9 @@ def compute_flux(node_id, fid, data, aux_data, options, csv_separator, fmt_float
     if not overwrite:
         if os.path.exists(filename):
             return True, node_id, fid, None, success_message('Compute Flux', data.job_id, 'file already exists')
+    key = cache_key('Compute Flux', options, data, aux_data, csv_separator, fmt_float)
+    if RESULT_CACHE.restore(key, [filename]):
+        return True, node_id, fid, None, success_message('Compute Flux', data.job_id, 'cached result reused')
     try:
         with open(filename, 'w'):
             pass
@@ -887,7 +1096,7 @@ def compute_flux(node_id, fid, data, aux_data, options, csv_separator, fmt_float
         data.triangles = mesh.triangles
 
    # run the calculator
-    with Serafin.Read(data.filename, data.language) as input_stream:
+    with open_serafin(data.filename, data.language) as input_stream:
         input_stream.header = data.header
         input_stream.time = data.time
 
@@ -903,6 +1112,7 @@ def compute_flux(node_id, fid, data, aux_data, options, csv_separator, fmt_float
             csv_data.add_row(row)
 
     csv_data.write(filename, csv_separator)
+    RESULT_CACHE.store(key, [filename])
     return True, node_id, fid, None, success_message('Compute Flux', data.job_id)
 
 
@@ -923,6 +1133,9 @@ def interpolate_points(node_id, fid, data, aux_data, options, csv_separator, fmt
         if os.path.exists(filename):
             return True, node_id, fid, None, success_message('Interpolate on Points', data.job_id,
                                                              'file already exists')
+    key = cache_key('Interpolate on Points', options, data, aux_data, csv_separator, fmt_float)
+    if RESULT_CACHE.restore(key, [filename]):
+        return True, node_id, fid, None, success_message('Interpolate on Points', data.job_id, 'cached result reused')
     try:
         with open(filename, 'w'):
             pass
@@ -969,7 +1182,7 @@ def interpolate_points(node_id, fid, data, aux_data, options, csv_separator, fmt
 
     nb_selected_vars = len(selected_vars)
 
-    with Serafin.Read(data.filename, data.language) as input_stream:
+    with open_serafin(data.filename, data.language) as input_stream:
         input_stream.header = data.header
         input_stream.time = data.time
 
@@ -986,6 +1199,7 @@ def interpolate_points(node_id, fid, data, aux_data, options, csv_separator, fmt
             csv_data.add_row(row)
 
     csv_data.write(filename, csv_separator)
+    RESULT_CACHE.store(key, [filename])
     return True, node_id, fid, None, \
                  success_message('Interpolate on Points', data.job_id,
                                  '%s point%s inside the mesh' % (nb_inside, 's are' if nb_inside > 1 else ' is'))
@@ -1007,6 +1221,9 @@ def interpolate_lines(node_id, fid, data, aux_data, options, csv_separator, fmt_
         if os.path.exists(filename):
             return True, node_id, fid, None, success_message('Interpolate along Lines', data.job_id,
                                                              'file already exists')
+    key = cache_key('Interpolate along Lines', options, data, aux_data, csv_separator, fmt_float)
+    if RESULT_CACHE.restore(key, [filename]):
+        return True, node_id, fid, None, success_message('Interpolate along Lines', data.job_id, 'cached result reused')
     try:
         with open(filename, 'w'):
             pass
@@ -1042,7 +1259,7 @@ def interpolate_lines(node_id, fid, data, aux_data, options, csv_separator, fmt_
     header = ['line', 'time', 'x', 'y', 'distance'] + selected_vars
     csv_data = CSVData(data.filename, header)
 
-    with Serafin.Read(data.filename, data.language) as input_stream:
+    with open_serafin(data.filename, data.language) as input_stream:
         input_stream.header = data.header
         input_stream.time = data.time
 
@@ -1052,6 +1269,7 @@ def interpolate_lines(node_id, fid, data, aux_data, options, csv_separator, fmt_
             csv_data.add_row(row)
 
     csv_data.write(filename, csv_separator)
+    RESULT_CACHE.store(key, [filename])
     return True, node_id, fid, None, \
            success_message('Interpolate along Lines', data.job_id,
                            '%s line%s the mesh continuously' % (nb_nonempty,
@@ -1082,6 +1300,9 @@ def project_lines(node_id, fid, data, aux_data, options, csv_separator, fmt_floa
     if not overwrite:
         if os.path.exists(filename):
             return True, node_id, fid, None, success_message('Project Lines', data.job_id, 'file already exists')
+    key = cache_key('Project Lines', options, data, aux_data, csv_separator, fmt_float)
+    if RESULT_CACHE.restore(key, [filename]):
+        return True, node_id, fid, None, success_message('Project Lines', data.job_id, 'cached result reused')
     try:
         with open(filename, 'w'):
             pass
@@ -1127,7 +1348,7 @@ def project_lines(node_id, fid, data, aux_data, options, csv_separator, fmt_floa
     header = ['line', 'x', 'y', 'distance'] + selected_vars
     csv_data = CSVData(data.filename, header)
 
-    with Serafin.Read(data.filename, data.language) as input_stream:
+    with open_serafin(data.filename, data.language) as input_stream:
         input_stream.header = data.header
         input_stream.time = data.time
 
@@ -1136,6 +1357,7 @@ def project_lines(node_id, fid, data, aux_data, options, csv_separator, fmt_floa
             csv_data.add_row(row)
 
     csv_data.write(filename, csv_separator)
+    RESULT_CACHE.store(key, [filename])
     return True, node_id, fid, csv_data, \
            success_message('Project Lines', data.job_id, '{} line{} the mesh continuously'.format(nb_nonempty,
                                                          's intersect' if nb_nonempty > 1 else ' intersects'))
@@ -1259,6 +1481,9 @@ def write_landxml(node_id, fid, data, options):
     if not overwrite:
         if os.path.exists(filename):
             return True, node_id, fid, None, success_message('Write LandXML', data.job_id, 'file already exists')
+    key = cache_key('Write LandXML', options, data)
+    if RESULT_CACHE.restore(key, [filename]):
+        return True, node_id, fid, None, success_message('Write LandXML', data.job_id, 'cached result reused')
     try:
         with open(filename, 'w'):
             pass
@@ -1269,8 +1494,9 @@ def write_landxml(node_id, fid, data, options):
             pass
         return False, node_id, fid, None, fail_message('access denied', 'Write LandXM', data.job_id)
 
-    operations.scalar_to_xml(data.filename, data.header, filename, selected_var, selected_frame)
+    operations.slf_to_xml(data.filename, data.header, filename, selected_var, selected_frame)
 
+    RESULT_CACHE.store(key, [filename])
     return True, node_id, fid, None, success_message('Write LandXML', data.job_id)
 
 
@@ -1294,6 +1520,10 @@ def write_shp(node_id, fid, data, options):
     if not overwrite:
         if os.path.exists(filename):
             return True, node_id, fid, None, success_message('Write shp', data.job_id, 'file already exists')
+    outputs = [os.path.splitext(filename)[0] + extension for extension in ('.shp', '.shx', '.dbf')]
+    key = cache_key('Write shp', options, data)
+    if RESULT_CACHE.restore(key, outputs):
+        return True, node_id, fid, None, success_message('Write shp', data.job_id, 'cached result reused')
     try:
         with open(filename, 'w'):
             pass
@@ -1306,6 +1536,7 @@ def write_shp(node_id, fid, data, options):
 
     operations.slf_to_shp(data.filename, data.header, filename, available_vars, selected_frame)
 
+    RESULT_CACHE.store(key, outputs)
     return True, node_id, fid, None, success_message('Write shp', data.job_id)
 
 
@@ -1318,11 +1549,13 @@ def write_vtk(node_id, fid, data, options):
         return False, node_id, fid, None, fail_message('no variable available', 'Write vtk', data.job_id)
 
     suffix, in_source_folder, dir_path, double_name, overwrite = options
+    is_vtu = settings.VTK_FORMAT == 'vtu'
+    extension = '.vtu' if is_vtu else '.vtk'
     filenames = []
     skip = []
     for time_index in data.selected_time_indices:
         filename = process_vtk_output_options(data.filename, data.job_id, time_index,
-                                              suffix, in_source_folder, dir_path, double_name)
+                                              suffix, in_source_folder, dir_path, double_name, extension)
         filenames.append(filename)
         if not overwrite:
             if os.path.exists(filename):
@@ -1340,25 +1573,76 @@ def write_vtk(node_id, fid, data, options):
                     pass
                 return False, node_id, fid, None, fail_message('access denied', 'Write vtk', data.job_id)
             skip.append(False)
-    if all(skip):
+    outputs = filenames[:]
+    if is_vtu:
+        pvd_name = process_vtk_output_options(data.filename, data.job_id, None,
+                                              suffix, in_source_folder, dir_path, double_name, '.pvd')
+        outputs.append(pvd_name)
+    if all(skip) and all(os.path.exists(filename) for filename in outputs):
         return True, node_id, fid, None, success_message('Write vtk', data.job_id, 'file already exists')
+    key = cache_key('Write vtk', options, data)
+    if RESULT_CACHE.restore(key, outputs):
+        return True, node_id, fid, None, success_message('Write vtk', data.job_id, 'cached result reused')
 
     scalars, vectors, vtk_var_names = operations.detect_vector_vtk(data.header.is_2d, available_vars,
                                                                    data.selected_vars_names, data.language)
-    for to_skip, filename, time_index in zip(skip, filenames, data.selected_time_indices):
-        if to_skip:
-            continue
-        operations.slf_to_vtk(data.header.is_2d, data.filename, data.header, filename,
-                              scalars, vectors, vtk_var_names, time_index)
-
-    return True, node_id, fid, None, success_message('Write shp', data.job_id)
+    with open_serafin(data.filename, data.language) as input_stream:
+        input_stream.header = data.header
+        if is_vtu:
+            to_write = [(time_index, filename) for to_skip, filename, time_index
+                        in zip(skip, filenames, data.selected_time_indices) if not to_skip]
+            if to_write:
+                time_indices, vtu_names = zip(*to_write)
+                collection = VtuCollection(data.header, scalars, vectors, vtk_var_names)
+                collection.write(input_stream, time_indices, vtu_names, settings.VTU_NB_THREADS)
+            write_pvd(pvd_name, [data.time[time_index] for time_index in data.selected_time_indices], filenames)
+        else:
+            for to_skip, filename, time_index in zip(skip, filenames, data.selected_time_indices):
+                if to_skip:
+                    continue
+                operations.slf_to_vtk(data.header.is_2d, data.filename, data.header, filename,
+                                      scalars, vectors, vtk_var_names, time_index, input_stream)
+
+    RESULT_CACHE.store(key, outputs)
+    return True, node_id, fid, None, success_message('Write vtk', data.job_id)
+
+
+def run_fused_sinks(filename, language, tasks):
+    """!
+    @brief Run sink tasks sharing the same Serafin input file in a single pass over its frames
+    @param filename <str>: path to the shared Serafin input file
+    @param language <str>: Serafin variable name language ('fr' or 'en')
+    @param tasks <[tuple]>: sink tasks (function and arguments)
+    @return <[tuple]>: results of the tasks (in the same order)
+    """
+    results = [None] * len(tasks)
+    node_names = {fun: name for name, fun in FUNCTIONS.items()}
+
+    def run_sink(cache, consumer, fun, args):
+        with cache.consumer(consumer):
+            try:
+                results[consumer] = fun(*args)
+            except Exception as e:
+                node_id, fid, data = args[:3]
+                results[consumer] = False, node_id, fid, None, fail_message('unexpected error (%s)' % e,
+                                                                           node_names[fun], data.job_id)
+
+    with SharedFrameCache(filename, language, range(len(tasks))) as cache:
+        threads = [threading.Thread(target=run_sink, args=(cache, consumer, fun, args))
+                   for consumer, (fun, args) in enumerate(tasks)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return results
 
 
 FUNCTIONS = {'Select Variables': select_variables, 'Add Rouse': add_rouse, 'Select Time': select_time,
              'Select Single Frame': select_single_frame,
              'Select First Frame': select_first_frame, 'Select Last Frame': select_last_frame,
              'Select Single Layer': select_single_layer, 'Vertical Aggregation': vertical_aggragation,
-             'Max': compute_max, 'Min': compute_min, 'Mean': compute_mean,
+             'Max': compute_max, 'Min': compute_min, 'Mean': compute_mean, 'Statistics': compute_statistics,
+             'SynchMax': synch_max,
              'Convert to Single Precision': convert_to_single, 'Compute Arrival Duration': arrival_duration,
              'Load 2D Polygons': read_polygons, 'Load 2D Open Polylines': read_polylines, 'Load 2D Points': read_points,
              'Write Serafin': write_slf, 'Compute Volume': compute_volume, 'Compute Flux': compute_flux,
@@ -1,4 +1,4 @@
-from copy import deepcopy
+from datetime import datetime
 import logging
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
@@ -10,7 +10,11 @@ from pyteltools.conf import settings
 
 from .MultiNode import Box, MultiLink
 from . import multi_func as worker
+from .journal import open_journal
 from .multi_nodes import *
+from .multi_project import assign_input_files, AUXILIARY_INPUTS, bifurcate, mark_inputs, missing_input_files, \
+    MultiRun, read_project, SERAFIN_INPUTS, topological_ordering
+from .profiling import new_profiler
 from .util import logger
 
 
@@ -33,7 +37,8 @@ NODES = {'Input/Output': {'Load Serafin 2D': MultiLoadSerafin2DNode, 'Load Seraf
          'Operators': {'Max': MultiComputeMaxNode, 'Min': MultiComputeMinNode, 'Mean': MultiComputeMeanNode,
                        'Project B on A': MultiProjectMeshNode, 'A Minus B': MultiMinusNode,
                        'B Minus A': MultiReverseMinusNode, 'Max(A,B)': MultiMaxBetweenNode,
-                       'Min(A,B)': MultiMinBetweenNode, 'SynchMax': MultiSynchMaxNode},
+                       'Min(A,B)': MultiMinBetweenNode, 'SynchMax': MultiSynchMaxNode,
+                       'Statistics': MultiComputeStatisticsNode},
          'Calculations': {'Compute Arrival Duration': MultiArrivalDurationNode,
                           'Compute Volume': MultiComputeVolumeNode, 'Compute Flux': MultiComputeFluxNode,
                           'Interpolate on Points': MultiInterpolateOnPointsNode,
@@ -41,51 +46,6 @@ NODES = {'Input/Output': {'Load Serafin 2D': MultiLoadSerafin2DNode, 'Load Seraf
                           'Project Lines': MultiProjectLinesNode}}
 
 
-def topological_ordering(graph):
-    """!
-    topological ordering of a DAG (adjacency list)
-    """
-    copy_graph = deepcopy(graph)
-    ordered = []
-    candidates = graph.keys()
-    remove_list = []
-    for k in graph.keys():
-        for c in candidates:
-            if c in graph[k]:
-                remove_list.append(c)
-    candidates = [c for c in candidates if c not in remove_list]
-    while len(candidates) != 0:
-        ordered.append(candidates.pop())
-        a = ordered[-1]
-        if a in copy_graph:
-            for t in copy_graph[a].copy():
-                copy_graph[a].remove(t)
-                is_candidate = True
-                for b in copy_graph:
-                    if t in copy_graph[b]:
-                        is_candidate = False
-                        break
-                if is_candidate:
-                    candidates.append(t)
-    return ordered
-
-
-def visit(graph, from_node):
-    """!
-    generates all reachable nodes in DFS pre-ordering
-    from a given node in a graph (adjacency list including orphan nodes)
-    """
-    stack = [from_node]
-    visited = {node: False for node in graph.keys()}
-    while stack:
-        u = stack.pop()
-        if not visited[u]:
-            visited[u] = True
-            yield u
-            for v in graph[u]:
-                stack.append(v)
-
-
 class MultiScene(QGraphicsScene):
     def __init__(self, table):
         super().__init__()
@@ -94,6 +54,7 @@ class MultiScene(QGraphicsScene):
         self.language = settings.LANG
         self.csv_separator = settings.CSV_SEPARATOR
         self.fmt_float = settings.FMT_FLOAT
+        self.project_path = ''
 
         self.setSceneRect(QRectF(0, 0, settings.SCENE_SIZE[0], settings.SCENE_SIZE[1]))
         self.transform = QTransform()
@@ -129,10 +90,9 @@ class MultiScene(QGraphicsScene):
         node.moveBy(x, y)
         self.adj_list[node.index()] = set()
         if node.category == 'Input/Output':
-            if node.name() in ('Load 2D Polygons', 'Load 2D Open Polylines',
-                               'Load 2D Points', 'Load Reference Serafin'):
+            if node.name() in AUXILIARY_INPUTS:
                 self.auxiliary_input_nodes.append(node.index())
-            elif node.name() in ('Load Serafin 2D', 'Load Serafin 3D'):
+            elif node.name() in SERAFIN_INPUTS:
                 self.inputs[node.index()] = []
                 self.ordered_input_indices.append(node.index())
 
@@ -141,7 +101,7 @@ class MultiScene(QGraphicsScene):
         target_item = self.itemAt(event.scenePos(), self.transform)
         if isinstance(target_item, Box):
             node = target_item.parentItem()
-            if node.category == 'Input/Output' and node.name() in ('Load Serafin 2D', 'Load Serafin 3D'):
+            if node.category == 'Input/Output' and node.name() in SERAFIN_INPUTS:
                 self._handle_add_input(node)
 
     def save(self):
@@ -156,6 +116,7 @@ class MultiScene(QGraphicsScene):
 
     def load(self, filename):
         logger.debug('Loading project in MULTI: %s' % filename)
+        self.project_path = filename
         self.clear()
         self.has_input = False
         self.inputs = {}
@@ -165,91 +126,52 @@ class MultiScene(QGraphicsScene):
         self.auxiliary_input_nodes = []
 
         try:
-            with open(filename, 'r') as f:
-                self.language, self.csv_separator = f.readline().rstrip().split('.')
-                nb_nodes, nb_links = map(int, f.readline().split())
-
-                # load nodes
-                for i in range(nb_nodes):
-                    line = f.readline().rstrip().split('|')
-                    category, name, index, x, y = line[:5]
-                    if category == 'Visualization':  # ignore all visualization nodes
-                        continue
-                    index = int(index)
-                    node = NODES[category][name](index)
-                    node.load(line[5:])
-                    self.add_node(node, float(x), float(y))
-
-                # load edges
-                for i in range(nb_links):
-                    from_node_index, from_port_index, \
-                                     to_node_index, to_port_index = map(int, f.readline().rstrip().split('|'))
-
-                    if to_node_index not in self.nodes:  # visualization nodes
-                        continue
-                    from_node = self.nodes[from_node_index]
-                    to_node = self.nodes[to_node_index]
-                    from_port = from_node.ports[from_port_index]
-                    to_port = to_node.ports[to_port_index]
-
-                    from_port.connect(to_port)
-                    to_port.connect(from_port)
-                    link = MultiLink(from_port, to_port)
-                    link.setZValue(-1)
-                    self.addItem(link)
-                    self.adj_list[from_node_index].add(to_node_index)
-
-                # mark nodes with input
-                for input_index in self.inputs:
-                    downstream_nodes = visit(self.adj_list, input_index)
-                    for u in downstream_nodes:
-                        self.nodes[u].mark(input_index)
-
-                # remove orphan auxiliary nodes
-                to_remove = []
-                for u in self.auxiliary_input_nodes:
-                    if not self.adj_list[u]:
-                        to_remove.append(u)
-                        del self.adj_list[u]
-                        self.removeItem(self.nodes[u])
-                        del self.nodes[u]
-                self.auxiliary_input_nodes = [u for u in self.auxiliary_input_nodes if u not in to_remove]
-                self.update()
-
-                # update status table
-                ordered_nodes = topological_ordering(self.adj_list)
-                self.table.update_rows(self.nodes, [u for u in ordered_nodes if u not in self.auxiliary_input_nodes])
-                QApplication.processEvents()
+            self.language, self.csv_separator, nodes, links, inputs = read_project(filename)
+            for category, name, index, x, y, options in nodes:
+                node = NODES[category][name](index)
+                node.load(options)
+                self.add_node(node, x, y)
+
+            for from_node_index, from_port_index, to_node_index, to_port_index in links:
+                from_port = self.nodes[from_node_index].ports[from_port_index]
+                to_port = self.nodes[to_node_index].ports[to_port_index]
+                from_port.connect(to_port)
+                to_port.connect(from_port)
+                link = MultiLink(from_port, to_port)
+                link.setZValue(-1)
+                self.addItem(link)
+                self.adj_list[from_node_index].add(to_node_index)
+
+            # mark nodes with input and remove orphan auxiliary nodes
+            to_remove = mark_inputs(self.nodes, self.adj_list, self.inputs, self.auxiliary_input_nodes)
+            for u in to_remove:
+                del self.adj_list[u]
+                self.removeItem(self.nodes[u])
+                del self.nodes[u]
+            self.auxiliary_input_nodes = [u for u in self.auxiliary_input_nodes if u not in to_remove]
+            self.update()
+
+            # update status table
+            ordered_nodes = topological_ordering(self.adj_list)
+            self.table.update_rows(self.nodes, [u for u in ordered_nodes if u not in self.auxiliary_input_nodes])
+            QApplication.processEvents()
 
-                # load input information
-                next_line = f.readline()
-                if next_line:
-                    nb_inputs = int(next_line)
-                    for i in range(nb_inputs):
-                        line = f.readline()
-                        split_line = line.rstrip().split('|')
-                        node_index = int(split_line[0])
-                        nb_files = int(split_line[1])
-                        slf_name = split_line[2]
-                        paths = split_line[3:3+nb_files]
-                        job_ids = split_line[3+nb_files:]
-
-                        # check if file exists:
-                        for path in paths:
-                            if not os.path.exists(os.path.join(path, slf_name)):
-                                for node_index in self.inputs:
-                                    self.inputs[node_index] = []
-                                self.has_input = False
-                                self.update()
-                                QApplication.processEvents()
-                                return True
-
-                        self.inputs[node_index] = [paths, slf_name, job_ids]
-                        self._handle_load_input(node_index)
+            # load input information
+            for node_index, paths, slf_name, job_ids in inputs:
+                if missing_input_files(paths, slf_name):
+                    for input_index in self.inputs:
+                        self.inputs[input_index] = []
+                    self.has_input = False
                     self.update()
-                    self.has_input = True
                     QApplication.processEvents()
+                    return True
 
+                self.inputs[node_index] = [paths, slf_name, job_ids]
+                self._handle_load_input(node_index)
+            if inputs:
+                self.update()
+                self.has_input = True
+                QApplication.processEvents()
             return True
         except (IndexError, ValueError, KeyError) as e:
             logger.exception(e)
@@ -258,26 +180,6 @@ class MultiScene(QGraphicsScene):
             self.table.reinit()
             return False
 
-    def _bifurcate(self, nodes):
-        for i in range(len(nodes)-1):
-            u_parent, u = nodes[i], nodes[i+1]
-            # catch the first two-in-one-out operator node u
-            if not self.nodes[u].two_in_one_out:
-                continue
-            # do no bifurcate if the first parent is reference
-            if self.nodes[u].first_in_port.mother.parentItem().index() in self.auxiliary_input_nodes:
-                return -2, -1, []
-            # do not bifurcate if the two parents are the same
-            if len(self.nodes[u].input_index) == 1:
-                return 2, u, []
-            # only bifurcate if the parent is the second-input of u
-            if self.nodes[u].first_in_port.mother.parentItem().index() == u_parent:
-                return 1, u, []
-            # visit from u
-            downstream_nodes = [v for v in visit(self.adj_list, u)]
-            return 0, u, downstream_nodes
-        return -2, -1, []
-
     def _handle_add_input(self, node):
         success, options = node.configure(self.inputs[node.index()])
         if not success:
@@ -287,71 +189,35 @@ class MultiScene(QGraphicsScene):
         old_options = self.inputs[node.index()]
         self.inputs[node.index()] = options
         job_ids = options[2]
-        downstream_nodes = [u for u in visit(self.adj_list, node.index())]
 
         # if the current input node is second-input to a two-in-one-out operator node
         # all downstream nodes from that operator node do not receive input
-        bifurcation_type, bifurcation_point, nodes_to_ignore = self._bifurcate(downstream_nodes)
+        bifurcation_type, bifurcation_point, downstream_nodes = bifurcate(self.nodes, self.adj_list,
+                                                                          self.auxiliary_input_nodes, node.index())
         if bifurcation_type == 0:
             if self.nodes[bifurcation_point].expected_input[0] == 0:
-                QMessageBox.critical(None, 'Error', 'Configure the first input node first!', QMessageBox.Ok)
-                self.inputs[node.index()] = old_options
-                node.state = MultiNode.NOT_CONFIGURED
-                node.update()
-                return
-            if self.nodes[bifurcation_point].expected_input[0] != len(job_ids):
-                QMessageBox.critical(None, 'Error', 'The numbers of input files are not equal!', QMessageBox.Ok)
-                self.inputs[node.index()] = old_options
-                node.state = MultiNode.NOT_CONFIGURED
-                node.update()
-                return
-
-            # the actual downstream nodes are the one-in-one-out node between the input and the operator
-            downstream_nodes = [u for u in downstream_nodes if u not in nodes_to_ignore]
-
-            if node.index() not in self.table.input_columns:
-                self.table.add_files(node.index(), job_ids, downstream_nodes)
-            else:
-                self.table.update_files(node.index(), job_ids)
-            QApplication.processEvents()
-
-            self.nodes[bifurcation_point].second_ids = self.table.input_columns[node.index()]
-
-        elif bifurcation_type == 1:
-            if self.nodes[bifurcation_point].expected_input[1] != 0:
-                if len(job_ids) != self.nodes[bifurcation_point].expected_input[1]:
-                    QMessageBox.critical(None, 'Error', 'The numbers of input files are not equal!', QMessageBox.Ok)
-                    self.inputs[node.index()] = old_options
-                    node.state = MultiNode.NOT_CONFIGURED
-                    node.update()
-                    return
-
-            if node.index() not in self.table.input_columns:
-                self.table.add_files(node.index(), job_ids, downstream_nodes)
-            else:
-                self.table.update_files(node.index(), job_ids)
-            QApplication.processEvents()
-
-            self.nodes[bifurcation_point].first_ids = self.table.input_columns[node.index()]
-
-        elif bifurcation_type == 2:
-            u = self.nodes[bifurcation_point]
-            self.nodes[u.second_in_port.mother.parentItem().index()].second_parent = True
-
-            if node.index() not in self.table.input_columns:
-                self.table.add_files(node.index(), job_ids, downstream_nodes)
+                message = 'Configure the first input node first!'
+            elif self.nodes[bifurcation_point].expected_input[0] != len(job_ids):
+                message = 'The numbers of input files are not equal!'
             else:
-                self.table.update_files(node.index(), job_ids)
-            QApplication.processEvents()
-            u.first_ids = self.table.input_columns[node.index()]
-            u.second_ids = list(map(lambda x: x+1000, self.table.input_columns[node.index()]))
+                message = ''
+        elif bifurcation_type == 1 and self.nodes[bifurcation_point].expected_input[1] not in (0, len(job_ids)):
+            message = 'The numbers of input files are not equal!'
+        else:
+            message = ''
+        if message:
+            QMessageBox.critical(None, 'Error', message, QMessageBox.Ok)
+            self.inputs[node.index()] = old_options
+            node.state = MultiNode.NOT_CONFIGURED
+            node.update()
+            return
 
+        if node.index() not in self.table.input_columns:
+            self.table.add_files(node.index(), job_ids, downstream_nodes)
         else:
-            if node.index() not in self.table.input_columns:
-                self.table.add_files(node.index(), job_ids, downstream_nodes)
-            else:
-                self.table.update_files(node.index(), job_ids)
-            QApplication.processEvents()
+            self.table.update_files(node.index(), job_ids)
+        QApplication.processEvents()
+        assign_input_files(self.nodes, bifurcation_type, bifurcation_point, self.table.input_columns[node.index()])
 
         for u in downstream_nodes:
             self.nodes[u].update_input(len(job_ids))
@@ -361,30 +227,12 @@ class MultiScene(QGraphicsScene):
             self.prepare_to_run()
 
     def _handle_load_input(self, node_index):
-        options = self.inputs[node_index]
-        job_ids = options[2]
-        downstream_nodes = [u for u in visit(self.adj_list, node_index)]
-
-        bifurcation_type, bifurcation_point, nodes_to_ignore = self._bifurcate(downstream_nodes)
-        if bifurcation_type == 0:
-            downstream_nodes = [u for u in downstream_nodes if u not in nodes_to_ignore]
-            self.table.add_files(node_index, job_ids, downstream_nodes)
-            self.nodes[bifurcation_point].second_ids = self.table.input_columns[node_index]
-
-        elif bifurcation_type == 1:
-            self.table.add_files(node_index, job_ids, downstream_nodes)
-            self.nodes[bifurcation_point].first_ids = self.table.input_columns[node_index]
-
-        elif bifurcation_type == 2:
-            u = self.nodes[bifurcation_point]
-            self.nodes[u.second_in_port.mother.parentItem().index()].second_parent = True
-            self.table.add_files(node_index, job_ids, downstream_nodes)
-            u.first_ids = self.table.input_columns[node_index]
-            u.second_ids = list(map(lambda x: x+1000, self.table.input_columns[node_index]))
-
-        else:
-            self.table.add_files(node_index, job_ids, downstream_nodes)
+        job_ids = self.inputs[node_index][2]
+        bifurcation_type, bifurcation_point, downstream_nodes = bifurcate(self.nodes, self.adj_list,
+                                                                          self.auxiliary_input_nodes, node_index)
+        self.table.add_files(node_index, job_ids, downstream_nodes)
         QApplication.processEvents()
+        assign_input_files(self.nodes, bifurcation_type, bifurcation_point, self.table.input_columns[node_index])
 
         for u in downstream_nodes:
             self.nodes[u].update_input(len(job_ids))
@@ -588,7 +436,8 @@ class MultiWidget(QWidget):
         self.setLayout(mainLayout)
 
         self.ncsize = ncsize
-        self.worker = worker.Workers(self.ncsize)
+        self.worker = worker.new_workers(self.ncsize)
+        self.multi_run = None
 
         if project_path is not None:
             self.scene.load(project_path)
@@ -620,44 +469,68 @@ class MultiWidget(QWidget):
             return
 
         self.scene.prepare_to_run()
+        profiler, profile_folder = self._new_profiler()
+        self.multi_run = MultiRun(self.scene, self.table.input_columns)
         if self.parent: self.parent.save()
+        journal = self._open_journal()
         self.setEnabled(False)
-        csv_separator = self.scene.csv_separator
-        fmt_float = settings.FMT_FLOAT
 
         # first get auxiliary tasks done
         success = self._prepare_auxiliary_tasks()
         if not success:
             self.worker.stop()
+            if journal is not None:
+                journal.close()
             self.message_box.appendPlainText('Done!')
             self.setEnabled(True)
-            self.worker = worker.Workers(self.ncsize)
+            self.worker = worker.new_workers(self.ncsize)
             return
 
         # prepare slf input tasks
-        nb_tasks = self._prepare_input_tasks()
+        self.worker.add_tasks(self.multi_run.input_tasks())
+        if not self.worker.started:
+            self.worker.start()
 
         while not self.worker.stopped:
-            nb_tasks = self._listen(nb_tasks, csv_separator, fmt_float)
-            if nb_tasks == 0:
+            self._listen()
+            if self.multi_run.nb_pending == 0:
                 self.worker.stop()
+        if journal is not None:
+            journal.close(completed=True)
 
         self.message_box.appendPlainText('Done!')
         self.setEnabled(True)
-        self.worker = worker.Workers(self.ncsize)
+        self.worker = worker.new_workers(self.ncsize)
+        if profiler is not None:
+            profiler.write(profile_folder)
+            self.message_box.appendPlainText('Profiling results written to %s' % profile_folder)
 
         logger.debug('Execution time %f s' % (time() - start_time))
 
+    def _new_profiler(self):
+        if not settings.MULTI_PROFILE_FOLDER:
+            return None, ''
+        job_ids = {}
+        for node_id in self.scene.ordered_input_indices:
+            job_ids.update(zip(self.table.input_columns[node_id], self.scene.inputs[node_id][2]))
+        folder = os.path.join(settings.MULTI_PROFILE_FOLDER, datetime.now().strftime('run_%Y%m%d_%H%M%S'))
+        profiler = new_profiler(folder, {node_index: node.name() for node_index, node in self.scene.nodes.items()},
+                                job_ids, settings.MULTI_PROFILE_CPROFILE)
+        self.worker.tracker.profiler = profiler
+        return profiler, folder
+
+    def _open_journal(self):
+        project_filename = self.parent.filename if self.parent else self.scene.project_path
+        auxiliary_filenames = [self.scene.nodes[node_id].options[0] for node_id in self.scene.auxiliary_input_nodes]
+        journal = open_journal(project_filename, self.scene.inputs, auxiliary_filenames)
+        if journal is not None and journal.results:
+            self.message_box.appendPlainText('Resuming previous run: %i tasks already done.' % len(journal.results))
+        self.worker.tracker.journal = journal
+        return journal
+
     def _prepare_auxiliary_tasks(self):
         # auxiliary input tasks for N-1 type of double input nodes
-        aux_tasks = []
-        for node_id in self.scene.auxiliary_input_nodes:
-            fun = worker.FUNCTIONS[self.scene.nodes[node_id].name()]
-            if self.scene.nodes[node_id].name() == 'Load Reference Serafin':
-                aux_tasks.append((fun, (node_id, self.scene.nodes[node_id].options[0], self.scene.language)))
-            else:
-                aux_tasks.append((fun, (node_id, self.scene.nodes[node_id].options[0])))
-
+        aux_tasks = self.multi_run.auxiliary_tasks()
         all_success = True
         if aux_tasks:
             self.worker.add_tasks(aux_tasks)
@@ -665,104 +538,21 @@ class MultiWidget(QWidget):
             for i in range(len(aux_tasks)):
                 success, node_id, data, message = self.worker.get_result()
                 self.message_box.appendPlainText(message)
-
-                if not success:
-                    self.scene.nodes[node_id].state = MultiNode.FAIL
+                if not self.multi_run.handle_auxiliary_result(success, node_id, data):
                     all_success = False
-                    continue
-
-                self.scene.nodes[node_id].state = MultiNode.SUCCESS
-                # using the fact that auxiliary input nodes are always directly connected to double input nodes
-                next_nodes = self.scene.adj_list[node_id]
-                for next_node_id in next_nodes:
-                    next_node = self.scene.nodes[next_node_id]
-                    next_node.set_auxiliary_data(data)
-
         return all_success
 
-    def _prepare_input_tasks(self):
-        slf_tasks = []
-        for node_id in self.scene.ordered_input_indices:
-            fun = worker.FUNCTIONS[self.scene.nodes[node_id].name()]
-            paths, name, job_ids = self.view.scene().inputs[node_id]
-            for path, job_id, fid in zip(paths, job_ids, self.table.input_columns[node_id]):
-                slf_tasks.append((fun, (node_id, fid, os.path.join(path, name),
-                                        self.scene.language, job_id)))
-        self.worker.add_tasks(slf_tasks)
-        if not self.worker.started:
-            self.worker.start()
-        return len(slf_tasks)
-
-    def _get_double_input_task(self, fun, node, node_id, fid, data):
-        if node.has_auxiliary:
-            self.worker.add_task((fun, (node_id, fid, node.auxiliary_data, data, True)))
-            return True
-        if fid in node.first_ids:
-            pair_index = node.first_ids.index(fid)
-            second_id = node.second_ids[pair_index]
-            if second_id in node.pending_data:
-                self.worker.add_task((fun, (node_id, fid,
-                                      data, node.pending_data[second_id], False)))
-                return True
-            else:
-                node.pending_data[fid] = data
-                return False
-        else:
-            pair_index = node.second_ids.index(fid)
-            first_id = node.first_ids[pair_index]
-            if first_id in node.pending_data:
-                self.worker.add_task((fun, (node_id, first_id,
-                                            node.pending_data[first_id], data, False)))
-                return True
-            else:
-                node.pending_data[fid] = data
-                return False
-
-    def _listen(self, nb_tasks, csv_separator, fmt_float):
-        # get one task result
+    def _listen(self):
+        # get one task result and enqueue the tasks from child nodes
         success, node_id, fid, data, message = self.worker.get_result()
-        nb_tasks -= 1
         self.message_box.appendPlainText(message)
-        current_node = self.scene.nodes[node_id]
         self.table.receive_result(success, node_id, fid)
-
-        # enqueue tasks from child nodes
-        if success:
-            current_node.nb_success += 1
-            next_nodes = self.scene.adj_list[node_id]
-            for next_node_id in next_nodes:
-                next_node = self.scene.nodes[next_node_id]
-                fun = worker.FUNCTIONS[next_node.name()]
-                if next_node.double_input:
-                    self.worker.add_task((fun, (next_node_id, fid, data, next_node.auxiliary_data,
-                                                next_node.options, csv_separator, fmt_float)))
-                    nb_tasks += 1
-                elif next_node.two_in_one_out:
-                    if current_node.second_parent:
-                        new_task_available = self._get_double_input_task(fun, next_node, next_node_id, 1000+fid, data)
-                    else:
-                        new_task_available = self._get_double_input_task(fun, next_node, next_node_id, fid, data)
-                    if new_task_available:
-                        nb_tasks += 1
-                else:
-                    self.worker.add_task((fun, (next_node_id, fid, data, next_node.options)))
-                    nb_tasks += 1
-        else:
-            current_node.nb_fail += 1
+        self.worker.add_tasks(self.multi_run.handle_result(success, node_id, fid, data))
 
         # change box color
-        if current_node.nb_success + current_node.nb_fail == current_node.nb_files():
-            if current_node.nb_fail == 0:
-                current_node.state = MultiNode.SUCCESS
-            elif current_node.nb_success == 0:
-                current_node.state = MultiNode.FAIL
-            else:
-                current_node.state = MultiNode.PARTIAL_FAIL
-            current_node.update()
+        self.scene.nodes[node_id].update()
         QApplication.processEvents()
 
-        return nb_tasks
-
 
 if __name__ == '__main__':
     import argparse
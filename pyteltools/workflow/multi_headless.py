@@ -0,0 +1,420 @@
+"""!
+Headless execution of MULTI workflow projects (without any Qt dependency)
+
+Project files saved by the workflow interface are loaded with the same rules as the Multi tab (see `multi_project`).
+The tasks (one per node and per input file) are run by a pool of processes and scheduled by an asyncio event loop:
+the tasks of the child nodes are queued as soon as a result is received and started largest first under a memory
+budget (see `scheduler`).
+The retries, the timeout and the journal are handled by a `multi_func.TaskTracker` as in the Multi tab: a task which
+exceeded the timeout or broke the process pool is run again in a new process pool.
+"""
+
+import asyncio
+from collections import deque
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor
+from time import time
+
+from pyteltools.conf import settings
+from pyteltools.utils.cli import new_logger
+
+from .journal import open_journal
+from .multi_func import TaskTracker
+from .multi_project import assign_input_files, AUXILIARY_INPUTS, bifurcate, mark_inputs, missing_input_files, \
+    MultiRun, read_project, SERAFIN_INPUTS
+from .options import load_multi_options
+
+
+logger = new_logger(__name__)
+
+# Node types (defined by their input and output ports)
+SINGLE_OUTPUT, SINGLE_INPUT, ONE_IN_ONE_OUT, TWO_IN_ONE_OUT, DOUBLE_INPUT = range(5)
+
+# Nodes indexed by category and name (as written in project files): node name (key of `multi_func.FUNCTIONS`) and type
+NODES = {'Input/Output': {'Load Serafin 2D': ('Load Serafin 2D', SINGLE_OUTPUT),
+                          'Load Serafin 3D': ('Load Serafin 3D', SINGLE_OUTPUT),
+                          'Write Serafin': ('Write Serafin', ONE_IN_ONE_OUT),
+                          'Write LandXML': ('Write LandXML', SINGLE_INPUT),
+                          'Load 2D Polygons': ('Load 2D Polygons', SINGLE_OUTPUT),
+                          'Write shp': ('Write shp', SINGLE_INPUT), 'Write vtk': ('Write vtk', SINGLE_INPUT),
+                          'Load 2D Open Polylines': ('Load 2D Open Polylines', SINGLE_OUTPUT),
+                          'Load 2D Points': ('Load 2D Points', SINGLE_OUTPUT),
+                          'Load Reference Serafin': ('Load Reference Serafin', SINGLE_OUTPUT)},
+         'Basic operations': {'Select Variables': ('Select Variables', ONE_IN_ONE_OUT),
+                              'Add Rouse Numbers': ('Add Rouse', ONE_IN_ONE_OUT),
+                              'Convert to Single Precision': ('Convert to Single Precision', ONE_IN_ONE_OUT),
+                              'Select Time': ('Select Time', ONE_IN_ONE_OUT),
+                              'Select Single Frame': ('Select Single Frame', ONE_IN_ONE_OUT),
+                              'Select First Frame': ('Select First Frame', ONE_IN_ONE_OUT),
+                              'Select Last Frame': ('Select Last Frame', ONE_IN_ONE_OUT),
+                              'Select Single Layer': ('Select Single Layer', ONE_IN_ONE_OUT),
+                              'Vertical Aggregation': ('Vertical Aggregation', ONE_IN_ONE_OUT),
+                              'Add Transformation': ('Add Transformation', ONE_IN_ONE_OUT)},
+         'Operators': {'Max': ('Max', ONE_IN_ONE_OUT), 'Min': ('Min', ONE_IN_ONE_OUT), 'Mean': ('Mean', ONE_IN_ONE_OUT),
+                       'Project B on A': ('Project B on A', TWO_IN_ONE_OUT),
+                       'A Minus B': ('A Minus B', TWO_IN_ONE_OUT), 'B Minus A': ('B Minus A', TWO_IN_ONE_OUT),
+                       'Max(A,B)': ('Max(A,B)', TWO_IN_ONE_OUT), 'Min(A,B)': ('Min(A,B)', TWO_IN_ONE_OUT),
+                       'SynchMax': ('SynchMax', ONE_IN_ONE_OUT), 'Statistics': ('Statistics', ONE_IN_ONE_OUT)},
+         'Calculations': {'Compute Arrival Duration': ('Compute Arrival Duration', ONE_IN_ONE_OUT),
+                          'Compute Volume': ('Compute Volume', DOUBLE_INPUT),
+                          'Compute Flux': ('Compute Flux', DOUBLE_INPUT),
+                          'Interpolate on Points': ('Interpolate on Points', DOUBLE_INPUT),
+                          'Interpolate along Lines': ('Interpolate along Lines', DOUBLE_INPUT),
+                          'Project Lines': ('Project Lines', DOUBLE_INPUT)}}
+
+
+class HeadlessNode:
+    """!
+    Node of a MULTI project without graphical representation
+    """
+    NOT_CONFIGURED, READY, SUCCESS, PARTIAL_FAIL, FAIL = 'Not configured', 'Ready', 'Success', 'Partial success', 'Fail'
+
+    def __init__(self, index, name, node_type):
+        self._index = index
+        self._name = name
+        self.type = node_type
+        self.state = HeadlessNode.NOT_CONFIGURED if name in SERAFIN_INPUTS else HeadlessNode.READY
+        self.options = tuple()
+
+        self.parents = {}  # parent node index for every connected input port index
+        self.input_index = set()
+        self.expected_input = (0, 0) if node_type == TWO_IN_ONE_OUT else (0,)
+        self.nb_success = 0
+        self.nb_fail = 0
+        self.double_input = node_type == DOUBLE_INPUT
+        self.two_in_one_out = node_type == TWO_IN_ONE_OUT
+        self.second_parent = False  # special properties for pre-bifurcation nodes
+
+        # information about coupled multi-input streams (for two-in-one-out nodes)
+        self.first_ids = []
+        self.second_ids = []
+        self.pending_data = {}
+        self.has_auxiliary = False
+        self.auxiliary_data = None
+
+    def index(self):
+        return self._index
+
+    def name(self):
+        return self._name
+
+    def load(self, options):
+        success, self.options = load_multi_options(self._name, options)
+        if not success:
+            self.state = HeadlessNode.NOT_CONFIGURED
+
+    def mark(self, node_index):
+        self.input_index.add(node_index)
+
+    def parent_index(self, port_index):
+        return self.parents[port_index]
+
+    def set_auxiliary_data(self, data):
+        self.has_auxiliary = True
+        self.auxiliary_data = data
+
+    def update_input(self, nb_input):
+        if self.two_in_one_out:
+            self.expected_input = (nb_input, nb_input)
+        else:
+            self.expected_input = (nb_input,)
+
+    def nb_files(self):
+        return max(self.expected_input)
+
+
+class HeadlessMultiProject:
+    """!
+    MULTI project (nodes, links and input files) loaded from a workflow project file
+    """
+    def __init__(self):
+        self.language = settings.LANG
+        self.csv_separator = settings.CSV_SEPARATOR
+
+        self.nodes = {}
+        self.adj_list = {}
+        self.inputs = {}
+        self.ordered_input_indices = []
+        self.auxiliary_input_nodes = []
+        self.input_columns = {}
+        self.job_ids = {}
+        self.has_input = False
+
+    def add_node(self, node):
+        self.nodes[node.index()] = node
+        self.adj_list[node.index()] = set()
+        if node.name() in AUXILIARY_INPUTS:
+            self.auxiliary_input_nodes.append(node.index())
+        elif node.name() in SERAFIN_INPUTS:
+            self.inputs[node.index()] = []
+            self.ordered_input_indices.append(node.index())
+
+    def load(self, filename):
+        """!
+        @brief Load a project file (visualization nodes are ignored)
+        @param filename <str>: path to the project file
+        @return <bool>: True if the project is loaded and all its inputs exist
+        """
+        logger.debug('Loading project in MULTI: %s' % filename)
+        try:
+            self.language, self.csv_separator, nodes, links, inputs = read_project(filename)
+            for category, name, index, _, _, options in nodes:
+                node_name, node_type = NODES[category][name]
+                node = HeadlessNode(index, node_name, node_type)
+                node.load(options)
+                self.add_node(node)
+
+            for from_node_index, from_port_index, to_node_index, to_port_index in links:
+                self.nodes[to_node_index].parents[to_port_index] = from_node_index
+                self.adj_list[from_node_index].add(to_node_index)
+
+            # mark nodes with input and remove orphan auxiliary nodes
+            to_remove = mark_inputs(self.nodes, self.adj_list, self.inputs, self.auxiliary_input_nodes)
+            for u in to_remove:
+                del self.adj_list[u]
+                del self.nodes[u]
+            self.auxiliary_input_nodes = [u for u in self.auxiliary_input_nodes if u not in to_remove]
+
+            # load input information
+            if not inputs:
+                logger.error('The project has no input file.')
+                return False
+            for node_index, paths, slf_name, job_ids in inputs:
+                missing_files = missing_input_files(paths, slf_name)
+                if missing_files:
+                    logger.error('Input file not found: %s' % missing_files[0])
+                    return False
+                self.inputs[node_index] = [paths, slf_name, job_ids]
+                self._handle_load_input(node_index)
+            self.has_input = True
+            return True
+        except (IndexError, ValueError, KeyError) as e:
+            logger.exception(e)
+            logger.error('An exception occured while loading project in MULTI.')
+            return False
+
+    def _add_files(self, node_index, job_ids):
+        """!
+        @brief Assign file identifiers (columns of the status table in the Multi tab) to the files of an input node
+        """
+        offset = sum(map(len, self.input_columns.values()))
+        self.input_columns[node_index] = list(range(offset, offset + len(job_ids)))
+        for fid, job_id in zip(self.input_columns[node_index], job_ids):
+            self.job_ids[fid] = job_id
+
+    def _handle_load_input(self, node_index):
+        job_ids = self.inputs[node_index][2]
+        bifurcation_type, bifurcation_point, downstream_nodes = bifurcate(self.nodes, self.adj_list,
+                                                                          self.auxiliary_input_nodes, node_index)
+        self._add_files(node_index, job_ids)
+        assign_input_files(self.nodes, bifurcation_type, bifurcation_point, self.input_columns[node_index])
+
+        for u in downstream_nodes:
+            self.nodes[u].update_input(len(job_ids))
+        self.nodes[node_index].state = HeadlessNode.READY
+
+    def all_configured(self):
+        return all(node.state != HeadlessNode.NOT_CONFIGURED for node in self.nodes.values())
+
+    def prepare_to_run(self):
+        for node in self.nodes.values():
+            node.state = HeadlessNode.READY
+            node.nb_success = 0
+            node.nb_fail = 0
+            if node.two_in_one_out:
+                node.pending_data = {}
+
+    def auxiliary_filenames(self):
+        return [self.nodes[node_index].options[0] for node_index in self.auxiliary_input_nodes]
+
+    def nb_expected_tasks(self):
+        return sum(node.nb_files() for node_index, node in self.nodes.items()
+                   if node_index not in self.auxiliary_input_nodes)
+
+
+class HeadlessMultiRunner:
+    """!
+    Run all the nodes of a MULTI project with a process pool scheduled by an asyncio event loop
+    """
+    def __init__(self, project, ncsize=settings.NCSIZE, callback=None, executor=None, profiler=None, journal=None):
+        """!
+        @param project <HeadlessMultiProject>: loaded project
+        @param ncsize <int>: number of tasks running at the same time
+        @param callback <function>: called with (success, node_id, fid, message) for every result
+            (default: log message with progress)
+        @param executor <function>: function without argument returning a `concurrent.futures.Executor`
+            (default: pool of `ncsize` local processes)
+        @param profiler <profiling.WorkflowProfiler>: profiler measuring every task (optional)
+        @param journal <journal.TaskJournal>: journal of the completed tasks (optional)
+        """
+        self.project = project
+        self.ncsize = ncsize
+        self.callback = self._log_result if callback is None else callback
+        self.executor_factory = (lambda: ProcessPoolExecutor(max_workers=ncsize)) if executor is None else executor
+        self.profiler = profiler
+        self.journal = journal
+
+        self.executor = None
+        self.multi_run = None
+        self.tracker = None
+        self.results = deque()
+        self.pending = set()
+        self.tickets = {}
+        self.futures = {}
+        self.nb_done = 0
+        self.nb_expected = 0
+
+    def _log_result(self, success, node_id, fid, message):
+        logger.info('[%i/%i] %s' % (self.nb_done, self.nb_expected, message))
+
+    def run(self):
+        """!
+        @brief Run the project
+        @return <bool>: True if all the tasks were successful
+        """
+        return asyncio.run(self.run_async())
+
+    async def run_async(self):
+        logger.debug('Start running project')
+        start_time = time()
+        if not self.project.has_input or not self.project.all_configured():
+            logger.error('Configure all nodes and inputs first!')
+            return False
+
+        self.project.prepare_to_run()
+        self.multi_run = MultiRun(self.project, self.project.input_columns)
+        self.tracker = TaskTracker(self.ncsize, self.profiler, self.journal)
+        self.results = deque()
+        self.pending = set()
+        self.nb_done = 0
+        self.nb_expected = self.project.nb_expected_tasks()
+
+        self.executor = self.executor_factory()
+        try:
+            # first get auxiliary tasks done
+            aux_tasks = self.multi_run.auxiliary_tasks()
+            self._add_tasks(aux_tasks)
+            all_success = True
+            for i in range(len(aux_tasks)):
+                success, node_id, data, message = await self._get_result()
+                self.callback(success, node_id, -1, message)
+                if not self.multi_run.handle_auxiliary_result(success, node_id, data):
+                    all_success = False
+            if not all_success:
+                return False
+
+            self._add_tasks(self.multi_run.input_tasks())
+            while self.multi_run.nb_pending > 0:
+                success, node_id, fid, data, message = await self._get_result()
+                self.nb_done += 1
+                self.callback(success, node_id, fid, message)
+                self._add_tasks(self.multi_run.handle_result(success, node_id, fid, data))
+        finally:
+            self.executor.shutdown()
+
+        logger.debug('Execution time %f s' % (time() - start_time))
+        return all(node.state == HeadlessNode.SUCCESS for node_index, node in self.project.nodes.items()
+                   if node.nb_files() > 0 or node_index in self.project.auxiliary_input_nodes)
+
+    def _add_tasks(self, tasks):
+        for task in tasks:
+            self.results.extend(self.tracker.push(task))
+        self._dispatch()
+
+    async def _get_result(self):
+        while not self.results:
+            if self.pending:
+                done, self.pending = await asyncio.wait(self.pending, timeout=settings.MULTI_HEALTH_CHECK_INTERVAL,
+                                                        return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    self._receive(future)
+            else:
+                await asyncio.sleep(settings.MULTI_HEALTH_CHECK_INTERVAL)
+            self._check_health()
+        return self.results.popleft()
+
+    def _dispatch(self):
+        # the scheduler decides which tasks are started (at most one per process)
+        for ticket, fun, args in self.tracker.pop_ready():
+            try:
+                future = self.executor.submit(fun, *args)
+            except BrokenExecutor:
+                self._renew_executor()
+                self.results.extend(self.tracker.fail(ticket, 'broken process pool'))
+                continue
+            pending_future = asyncio.wrap_future(future)
+            self.futures[ticket] = future, pending_future
+            self.tickets[pending_future] = ticket
+            self.pending.add(pending_future)
+
+    def _receive(self, pending_future):
+        ticket = self.tickets.pop(pending_future, None)
+        if ticket is None:  # abandoned task
+            return
+        del self.futures[ticket]
+        try:
+            result = pending_future.result()
+        except Exception as e:
+            if isinstance(e, BrokenExecutor):
+                self._renew_executor()
+            self.results.extend(self.tracker.fail(ticket, 'unexpected error (%s)' % e))
+        else:
+            self.results.extend(self.tracker.complete(ticket, result))
+        self._dispatch()
+
+    def _abandon(self, ticket):
+        future, pending_future = self.futures.pop(ticket)
+        del self.tickets[pending_future]
+        self.pending.discard(pending_future)
+        future.cancel()
+        if pending_future.done() and not pending_future.cancelled():
+            pending_future.exception()  # already finished, its result is ignored
+        else:
+            pending_future.cancel()
+
+    def _renew_executor(self):
+        # a new executor replaces the broken one, the other tasks it was running are started again
+        old_executor = self.executor
+        self.executor = self.executor_factory()
+        processes = getattr(old_executor, '_processes', None) or {}
+        for process in list(processes.values()):
+            process.terminate()
+        old_executor.shutdown(wait=False)
+        for ticket in list(self.futures):
+            self._abandon(ticket)
+            self.results.extend(self.tracker.requeue(ticket))
+
+    def _check_health(self):
+        # a task still waiting in the queue of the executor is not timed out (it would be run twice)
+        now = time()
+        for ticket, (future, _) in self.futures.items():
+            if future.running():
+                self.tracker.started(ticket, now)
+        for ticket in self.tracker.timed_out(now):
+            if ticket not in self.futures:  # renewed executor
+                continue
+            self._abandon(ticket)
+            self.results.extend(self.tracker.fail(ticket, 'timeout'))
+            if isinstance(self.executor, ProcessPoolExecutor):  # the process is still running the task
+                self._renew_executor()
+
+        self.results.extend(self.tracker.push_due(now))
+        self._dispatch()
+
+
+def run_project(filename, ncsize=settings.NCSIZE, callback=None, executor=None):
+    """!
+    @brief Load and run a MULTI project without graphical interface (resumed if it was interrupted)
+    @param filename <str>: path to the project file
+    @param ncsize <int>: number of tasks running at the same time
+    @param callback <function>: called with (success, node_id, fid, message) for every result
+    @param executor <function>: function without argument returning a `concurrent.futures.Executor`
+    @return <bool>: True if the project was loaded and all its tasks were successful
+    """
+    project = HeadlessMultiProject()
+    if not project.load(filename):
+        return False
+    journal = open_journal(filename, project.inputs, project.auxiliary_filenames())
+    success = HeadlessMultiRunner(project, ncsize, callback, executor, journal=journal).run()
+    if journal is not None:
+        journal.close(completed=success)
+    return success
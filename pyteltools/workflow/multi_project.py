@@ -0,0 +1,307 @@
+"""!
+Logic of MULTI projects shared by the Multi tab (multi_gui) and the headless runner (multi_headless)
+
+The project (nodes, links and input files) is read and its input files are assigned to the two-in-one-out nodes in the
+same way by both, and `MultiRun` derives the tasks of the child nodes from every result.
+The nodes only need the attributes and methods common to `MultiNode.MultiNode` and `multi_headless.HeadlessNode`.
+"""
+
+from copy import deepcopy
+import os
+
+from pyteltools.conf import settings
+
+from . import multi_func as worker
+from .fusion import fused_sink_groups, FusedSinkScheduler
+
+
+SERAFIN_INPUTS = ('Load Serafin 2D', 'Load Serafin 3D')
+AUXILIARY_INPUTS = ('Load 2D Polygons', 'Load 2D Open Polylines', 'Load 2D Points', 'Load Reference Serafin')
+
+
+def topological_ordering(graph):
+    """!
+    topological ordering of a DAG (adjacency list)
+    """
+    copy_graph = deepcopy(graph)
+    ordered = []
+    candidates = graph.keys()
+    remove_list = []
+    for k in graph.keys():
+        for c in candidates:
+            if c in graph[k]:
+                remove_list.append(c)
+    candidates = [c for c in candidates if c not in remove_list]
+    while len(candidates) != 0:
+        ordered.append(candidates.pop())
+        a = ordered[-1]
+        if a in copy_graph:
+            for t in copy_graph[a].copy():
+                copy_graph[a].remove(t)
+                is_candidate = True
+                for b in copy_graph:
+                    if t in copy_graph[b]:
+                        is_candidate = False
+                        break
+                if is_candidate:
+                    candidates.append(t)
+    return ordered
+
+
+def visit(graph, from_node):
+    """!
+    generates all reachable nodes in DFS pre-ordering
+    from a given node in a graph (adjacency list including orphan nodes)
+    """
+    stack = [from_node]
+    visited = {node: False for node in graph.keys()}
+    while stack:
+        u = stack.pop()
+        if not visited[u]:
+            visited[u] = True
+            yield u
+            for v in graph[u]:
+                stack.append(v)
+
+
+def read_project(filename):
+    """!
+    @brief Read a project file (visualization nodes and their links are skipped)
+    @param filename <str>: path to the project file
+    @return <tuple>: language, CSV separator, nodes (category, name, index, x, y and options),
+        links (from node index, from port index, to node index and to port index)
+        and inputs (node index, paths, Serafin file name and job ids)
+    """
+    with open(filename, 'r') as f:
+        language, csv_separator = f.readline().rstrip().split('.')
+        nb_nodes, nb_links = map(int, f.readline().split())
+
+        nodes = []
+        for i in range(nb_nodes):
+            line = f.readline().rstrip().split('|')
+            category, name, index, x, y = line[:5]
+            if category == 'Visualization':  # ignore all visualization nodes
+                continue
+            nodes.append((category, name, int(index), float(x), float(y), line[5:]))
+        node_indices = set(node[2] for node in nodes)
+
+        links = []
+        for i in range(nb_links):
+            link = tuple(map(int, f.readline().rstrip().split('|')))
+            if link[2] in node_indices:  # links to visualization nodes are skipped
+                links.append(link)
+
+        inputs = []
+        next_line = f.readline()
+        if next_line:
+            for i in range(int(next_line)):
+                split_line = f.readline().rstrip().split('|')
+                nb_files = int(split_line[1])
+                inputs.append((int(split_line[0]), split_line[3:3+nb_files], split_line[2], split_line[3+nb_files:]))
+    return language, csv_separator, nodes, links, inputs
+
+
+def missing_input_files(paths, slf_name):
+    """!
+    @brief Input files which do not exist
+    @param paths <[str]>: folders of the input files
+    @param slf_name <str>: name of the input files
+    @return <[str]>: paths to the missing files
+    """
+    return [os.path.join(path, slf_name) for path in paths if not os.path.exists(os.path.join(path, slf_name))]
+
+
+def mark_inputs(nodes, adj_list, input_indices, auxiliary_input_nodes):
+    """!
+    @brief Mark every node with the input nodes upstream of it
+    @param nodes <dict>: nodes by index
+    @param adj_list <dict>: child node indices of every node index
+    @param input_indices <[int]>: indices of the Serafin input nodes
+    @param auxiliary_input_nodes <[int]>: indices of the auxiliary input nodes
+    @return <[int]>: indices of the auxiliary input nodes without child (to be removed)
+    """
+    for input_index in input_indices:
+        for u in visit(adj_list, input_index):
+            nodes[u].mark(input_index)
+    return [u for u in auxiliary_input_nodes if not adj_list[u]]
+
+
+def bifurcate(nodes, adj_list, auxiliary_input_nodes, input_index):
+    """!
+    @brief Find the first two-in-one-out node downstream of an input node and the nodes receiving its files
+    @param nodes <dict>: nodes by index
+    @param adj_list <dict>: child node indices of every node index
+    @param auxiliary_input_nodes <[int]>: indices of the auxiliary input nodes
+    @param input_index <int>: index of the input node
+    @return <tuple>: bifurcation type (0: second input, 1: first input, 2: both inputs, -2: none), index of the
+        two-in-one-out node (-1 if none) and indices of the nodes receiving the input files
+    """
+    downstream_nodes = [u for u in visit(adj_list, input_index)]
+    for i in range(len(downstream_nodes)-1):
+        u_parent, u = downstream_nodes[i], downstream_nodes[i+1]
+        # catch the first two-in-one-out operator node u
+        if not nodes[u].two_in_one_out:
+            continue
+        # do no bifurcate if the first parent is reference
+        if nodes[u].parent_index(0) in auxiliary_input_nodes:
+            break
+        # do not bifurcate if the two parents are the same
+        if len(nodes[u].input_index) == 1:
+            return 2, u, downstream_nodes
+        # only bifurcate if the parent is the second-input of u
+        if nodes[u].parent_index(0) == u_parent:
+            return 1, u, downstream_nodes
+        # the files only reach the one-in-one-out nodes between the input and the operator
+        nodes_to_ignore = [v for v in visit(adj_list, u)]
+        return 0, u, [v for v in downstream_nodes if v not in nodes_to_ignore]
+    return -2, -1, downstream_nodes
+
+
+def assign_input_files(nodes, bifurcation_type, bifurcation_point, columns):
+    """!
+    @brief Pair the file identifiers of an input node with the other input of its two-in-one-out node (if any)
+    @param nodes <dict>: nodes by index
+    @param bifurcation_type <int>: bifurcation type (see `bifurcate`)
+    @param bifurcation_point <int>: index of the two-in-one-out node
+    @param columns <[int]>: file identifiers of the input node
+    """
+    if bifurcation_type == 0:
+        nodes[bifurcation_point].second_ids = columns
+    elif bifurcation_type == 1:
+        nodes[bifurcation_point].first_ids = columns
+    elif bifurcation_type == 2:
+        u = nodes[bifurcation_point]
+        nodes[u.parent_index(1)].second_parent = True
+        u.first_ids = columns
+        u.second_ids = list(map(lambda x: x+1000, columns))
+
+
+class MultiRun:
+    """!
+    @brief Tasks of a run of a MULTI project, derived from the results of their parent tasks
+
+    The project is either a `multi_gui.MultiScene` or a `multi_headless.HeadlessMultiProject`.
+    Sinks sharing the same input are held until they can be run together (see `fusion`).
+    """
+    def __init__(self, project, input_columns):
+        """!
+        @param project <MultiScene or HeadlessMultiProject>: project ready to run
+        @param input_columns <dict>: file identifiers of every Serafin input node
+        """
+        self.project = project
+        self.input_columns = input_columns
+        self.fusion = FusedSinkScheduler(fused_sink_groups({node_index: node.name() for node_index, node
+                                                            in project.nodes.items()}, project.adj_list))
+        self.nb_pending = 0  # number of results expected from the Serafin input and the downstream tasks
+
+    def auxiliary_tasks(self):
+        """!
+        @brief Tasks of the auxiliary input nodes (to run before all other tasks)
+        @return <[tuple]>: function and arguments of every task
+        """
+        tasks = []
+        for node_id in self.project.auxiliary_input_nodes:
+            node = self.project.nodes[node_id]
+            fun = worker.FUNCTIONS[node.name()]
+            if node.name() == 'Load Reference Serafin':
+                tasks.append((fun, (node_id, node.options[0], self.project.language)))
+            else:
+                tasks.append((fun, (node_id, node.options[0])))
+        return tasks
+
+    def handle_auxiliary_result(self, success, node_id, data):
+        """!
+        @brief Update an auxiliary input node with its result
+        @return <bool>: True if the task was successful
+        """
+        node = self.project.nodes[node_id]
+        if not success:
+            node.state = node.FAIL
+            return False
+        node.state = node.SUCCESS
+        # using the fact that auxiliary input nodes are always directly connected to double input nodes
+        for next_node_id in self.project.adj_list[node_id]:
+            self.project.nodes[next_node_id].set_auxiliary_data(data)
+        return True
+
+    def input_tasks(self):
+        """!
+        @brief Tasks of the Serafin input nodes (one per input file)
+        @return <[tuple]>: function and arguments of every task
+        """
+        tasks = []
+        for node_id in self.project.ordered_input_indices:
+            fun = worker.FUNCTIONS[self.project.nodes[node_id].name()]
+            paths, name, job_ids = self.project.inputs[node_id]
+            for path, job_id, fid in zip(paths, job_ids, self.input_columns[node_id]):
+                tasks.append((fun, (node_id, fid, os.path.join(path, name), self.project.language, job_id)))
+        self.nb_pending += len(tasks)
+        return tasks
+
+    def handle_result(self, success, node_id, fid, data):
+        """!
+        @brief Update a node with the result of one of its tasks
+        @return <[tuple]>: tasks of the child nodes which are ready to run
+        """
+        self.nb_pending -= 1
+        current_node = self.project.nodes[node_id]
+        task_groups = []
+        if success:
+            current_node.nb_success += 1
+            csv_separator, fmt_float = self.project.csv_separator, settings.FMT_FLOAT
+            for next_node_id in self.project.adj_list[node_id]:
+                next_node = self.project.nodes[next_node_id]
+                fun = worker.FUNCTIONS[next_node.name()]
+                if next_node.double_input:
+                    task_groups.extend(self.fusion.add(next_node_id, fid, (fun, (
+                        next_node_id, fid, data, next_node.auxiliary_data, next_node.options, csv_separator,
+                        fmt_float))))
+                elif next_node.two_in_one_out:
+                    next_fid = 1000 + fid if current_node.second_parent else fid
+                    task = self._double_input_task(fun, next_node, next_node_id, next_fid, data)
+                    if task is not None:
+                        task_groups.append([task])
+                else:
+                    task_groups.extend(self.fusion.add(next_node_id, fid,
+                                                       (fun, (next_node_id, fid, data, next_node.options))))
+        else:
+            current_node.nb_fail += 1
+            task_groups.extend(self.fusion.drop(node_id, fid))
+
+        if current_node.nb_success + current_node.nb_fail == current_node.nb_files():
+            if current_node.nb_fail == 0:
+                current_node.state = current_node.SUCCESS
+            elif current_node.nb_success == 0:
+                current_node.state = current_node.FAIL
+            else:
+                current_node.state = current_node.PARTIAL_FAIL
+
+        self.nb_pending += sum(map(len, task_groups))
+        return [fused_task(tasks) for tasks in task_groups]
+
+    @staticmethod
+    def _double_input_task(fun, node, node_id, fid, data):
+        if node.has_auxiliary:
+            return fun, (node_id, fid, node.auxiliary_data, data, True)
+        if fid in node.first_ids:
+            second_id = node.second_ids[node.first_ids.index(fid)]
+            if second_id in node.pending_data:
+                return fun, (node_id, fid, data, node.pending_data.pop(second_id), False)
+        else:
+            first_id = node.first_ids[node.second_ids.index(fid)]
+            if first_id in node.pending_data:
+                return fun, (node_id, first_id, node.pending_data.pop(first_id), data, False)
+        node.pending_data[fid] = data
+        return None
+
+
+def fused_task(tasks):
+    """!
+    @brief Single task running sinks which share the same input (read once by `multi_func.run_fused_sinks`)
+    @param tasks <[tuple]>: function and arguments of every sink task
+    @return <tuple>: function and arguments of the task
+    """
+    if len(tasks) == 1:
+        return tasks[0]
+    data = tasks[0][1][2]
+    return worker.run_fused_sinks, (data.filename, data.language, tasks)
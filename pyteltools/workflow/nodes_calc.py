@@ -11,7 +11,8 @@ import pyteltools.slf.misc as operations
 from pyteltools.slf import Serafin
 from pyteltools.slf.volume import TruncatedTriangularPrisms, VolumeCalculator
 
-from .Node import DoubleInputNode, Node, OneInOneOutNode, TwoInOneOutNode
+from .cache import cache_key, RESULT_CACHE
+from .Node import DoubleInputNode, Node, NodeCancelled, OneInOneOutNode, TwoInOneOutNode
 from .util import OutputOptionPanel, process_output_options, validate_output_options
 
 
@@ -502,7 +503,7 @@ class ComputeVolumeNode(TwoInOneOutNode):
             volume_type = VolumeCalculator.NET
 
         # prepare the mesh
-        self.progress_bar.setVisible(True)
+        self.show_progress()
         mesh = TruncatedTriangularPrisms(self.in_data.header, False)
 
         if self.in_data.triangles:
@@ -542,8 +543,7 @@ class ComputeVolumeNode(TwoInOneOutNode):
                         i_result.append(fmt_float.format(volume))
                 self.data.add_row(i_result)
 
-                self.progress_bar.setValue(100 * (i+1) / len(calculator.time_indices))
-                QApplication.processEvents()
+                self.set_progress(100 * (i+1) / len(calculator.time_indices))
 
     def is_valid_csv(self):
         if not self.data.table:
@@ -568,22 +568,30 @@ class ComputeVolumeNode(TwoInOneOutNode):
         self.in_data = self.first_in_port.mother.parentItem().data
         filename = process_output_options(self.in_data.filename, self.in_data.job_id, '.csv',
                                           self.suffix, self.in_source_folder, self.dir_path, self.double_name)
-        if not self.overwrite:
-            if os.path.exists(filename):
-                try:
-                    with open(filename, 'r'):
-                        pass
-                except PermissionError:
-                    self.fail('Access denied when reloading existing file.')
-                self.data = CSVData(self.in_data.filename, None, filename, self.scene().csv_separator)
-                if not self.is_valid_csv():
-                    self.data = None
-                    self.fail('The existing file is not valid.')
-                    return 
-                self.data.metadata = {'var': self.first_var, 'second var': self.second_var,
-                                      'start time': self.in_data.start_time, 'language': self.in_data.language}
-                self.success('Reload existing file.')
-                return
+        key = cache_key(self.name(), self.save().split('|')[5:], self.in_data,
+                        self.second_in_port.mother.parentItem().data, self.scene().csv_separator,
+                        self.scene().fmt_float)
+        if not self.overwrite and os.path.exists(filename):
+            message = 'Reload existing file.'
+        elif RESULT_CACHE.restore(key, [filename]):
+            message = 'Cached result reused.'
+        else:
+            message = None
+        if message is not None:
+            try:
+                with open(filename, 'r'):
+                    pass
+            except PermissionError:
+                self.fail('Access denied when reloading existing file.')
+            self.data = CSVData(self.in_data.filename, None, filename, self.scene().csv_separator)
+            if not self.is_valid_csv():
+                self.data = None
+                self.fail('The existing file is not valid.')
+                return 
+            self.data.metadata = {'var': self.first_var, 'second var': self.second_var,
+                                  'start time': self.in_data.start_time, 'language': self.in_data.language}
+            self.success(message)
+            return
         try:
             with open(filename, 'w'):
                 pass
@@ -591,8 +599,13 @@ class ComputeVolumeNode(TwoInOneOutNode):
             self.fail('Access denied.')
             return
 
-        self._run_volume()
+        try:
+            self._run_volume()
+        except NodeCancelled:
+            self.discard_output(filename)
+            raise
         self.data.write(filename, self.scene().csv_separator)
+        RESULT_CACHE.store(key, [filename])
         self.success('Output saved to %s' % filename)
 
 
@@ -770,7 +783,7 @@ class ComputeFluxNode(TwoInOneOutNode):
         flux_type = PossibleFluxComputation.get_flux_type(var_IDs)
 
         # prepare the mesh
-        self.progress_bar.setVisible(True)
+        self.show_progress()
         mesh = TriangularVectorField(self.in_data.header, False)
 
         if self.in_data.triangles:
@@ -808,8 +821,7 @@ class ComputeFluxNode(TwoInOneOutNode):
                     i_result.append(fmt_float.format(flux))
                 self.data.add_row(i_result)
 
-                self.progress_bar.setValue(100 * (i+1) / len(calculator.time_indices))
-                QApplication.processEvents()
+                self.set_progress(100 * (i+1) / len(calculator.time_indices))
     
     def is_valid_csv(self):
         if not self.data.table:
@@ -830,23 +842,31 @@ class ComputeFluxNode(TwoInOneOutNode):
         self.in_data = self.first_in_port.mother.parentItem().data
         filename = process_output_options(self.in_data.filename, self.in_data.job_id, '.csv',
                                           self.suffix, self.in_source_folder, self.dir_path, self.double_name)
-        if not self.overwrite:
-            if os.path.exists(filename):
-                try:
-                    with open(filename, 'r'):
-                        pass
-                except PermissionError:
-                    self.fail('Access denied when reloading existing file.')
-                self.data = CSVData(self.in_data.filename, None, filename, self.scene().csv_separator)
-                if not self.is_valid_csv():
-                    self.data = None
-                    self.fail('The existing file is not valid.')
-                    return 
-                self.data.metadata = {'flux title': self.flux_options,
-                                      'language': self.in_data.language, 'start time': self.in_data.start_time,
-                                      'var IDs': PossibleFluxComputation.get_variables(self.flux_options)}
-                self.success('Reload existing file.')
-                return
+        key = cache_key(self.name(), self.save().split('|')[5:], self.in_data,
+                        self.second_in_port.mother.parentItem().data, self.scene().csv_separator,
+                        self.scene().fmt_float)
+        if not self.overwrite and os.path.exists(filename):
+            message = 'Reload existing file.'
+        elif RESULT_CACHE.restore(key, [filename]):
+            message = 'Cached result reused.'
+        else:
+            message = None
+        if message is not None:
+            try:
+                with open(filename, 'r'):
+                    pass
+            except PermissionError:
+                self.fail('Access denied when reloading existing file.')
+            self.data = CSVData(self.in_data.filename, None, filename, self.scene().csv_separator)
+            if not self.is_valid_csv():
+                self.data = None
+                self.fail('The existing file is not valid.')
+                return 
+            self.data.metadata = {'flux title': self.flux_options,
+                                  'language': self.in_data.language, 'start time': self.in_data.start_time,
+                                  'var IDs': PossibleFluxComputation.get_variables(self.flux_options)}
+            self.success(message)
+            return
 
         try:
             self._run_flux()
@@ -862,6 +882,7 @@ class ComputeFluxNode(TwoInOneOutNode):
             return
 
         self.data.write(filename, self.scene().csv_separator)
+        RESULT_CACHE.store(key, [filename])
         self.success('Output saved to %s' % filename)
 
 
@@ -913,7 +934,7 @@ class InterpolateOnPointsNode(TwoInOneOutNode):
                 suffix, in_source_folder, dir_path, double_name, overwrite
 
     def _prepare_points(self):
-        self.progress_bar.setVisible(True)
+        self.show_progress()
         points = self.second_in_port.mother.parentItem().data.points
 
         mesh = MeshInterpolator(self.in_data.header, False)
@@ -964,8 +985,7 @@ class InterpolateOnPointsNode(TwoInOneOutNode):
                         row.append(fmt_float.format(interpolator.dot(var_values[index_var][[i, j, k]])))
 
                 self.data.add_row(row)
-                self.progress_bar.setValue(100 * (index+1) / nb_frames)
-                QApplication.processEvents()
+                self.set_progress(100 * (index+1) / nb_frames)
 
     def is_valid_csv(self, points, selected_vars):
         if not self.data.table:
@@ -1007,24 +1027,31 @@ class InterpolateOnPointsNode(TwoInOneOutNode):
         filename = process_output_options(self.in_data.filename, self.in_data.job_id, '.csv',
                                           self.suffix, self.in_source_folder, self.dir_path, self.double_name)
 
-        if not self.overwrite:
-            if os.path.exists(filename):
-                try:
-                    with open(filename, 'r'):
-                        pass
-                except PermissionError:
-                    self.fail('Access denied when reloading existing file.')
-
-                self.data = CSVData(self.in_data.filename, None, filename, self.scene().csv_separator)
-                points = self.second_in_port.mother.parentItem().data
-                if not self.is_valid_csv(points.points, selected_vars):
-                    self.data = None
-                    self.fail('The existing file is not valid.')
-                    return 
-                self.data.metadata = {'start time': self.in_data.start_time, 'var IDs': selected_vars,
-                                      'language': self.in_data.language, 'points': points}
-                self.success('Reload existing file.')
-                return
+        points = self.second_in_port.mother.parentItem().data
+        key = cache_key(self.name(), self.save().split('|')[5:], self.in_data, points,
+                        self.scene().csv_separator, self.scene().fmt_float)
+        if not self.overwrite and os.path.exists(filename):
+            message = 'Reload existing file.'
+        elif RESULT_CACHE.restore(key, [filename]):
+            message = 'Cached result reused.'
+        else:
+            message = None
+        if message is not None:
+            try:
+                with open(filename, 'r'):
+                    pass
+            except PermissionError:
+                self.fail('Access denied when reloading existing file.')
+
+            self.data = CSVData(self.in_data.filename, None, filename, self.scene().csv_separator)
+            if not self.is_valid_csv(points.points, selected_vars):
+                self.data = None
+                self.fail('The existing file is not valid.')
+                return 
+            self.data.metadata = {'start time': self.in_data.start_time, 'var IDs': selected_vars,
+                                  'language': self.in_data.language, 'points': points}
+            self.success(message)
+            return
 
         points, point_interpolators, indices_inside, nb_inside = self._prepare_points()
         if nb_inside == 0:
@@ -1037,8 +1064,13 @@ class InterpolateOnPointsNode(TwoInOneOutNode):
             self.fail('Access denied.')
             return
 
-        self._run_interpolate(points, point_interpolators, indices_inside, selected_vars)
+        try:
+            self._run_interpolate(points, point_interpolators, indices_inside, selected_vars)
+        except NodeCancelled:
+            self.discard_output(filename)
+            raise
         self.data.write(filename, self.scene().csv_separator)
+        RESULT_CACHE.store(key, [filename])
         self.success('Output saved to {}\n{} point{} inside the mesh.'.format(filename, nb_inside,
                                                                               's are' if nb_inside > 1 else ' is'))
 
@@ -1087,7 +1119,7 @@ class InterpolateAlongLinesNode(DoubleInputNode):
 
     def _run_interpolate(self, selected_vars):
         fmt_float = self.scene().fmt_float
-        self.progress_bar.setVisible(True)
+        self.show_progress()
         mesh = MeshInterpolator(self.in_data.header, False)
 
         if self.in_data.triangles:
@@ -1118,8 +1150,7 @@ class InterpolateAlongLinesNode(DoubleInputNode):
                                                                       indices_nonempty,
                                                                       line_interpolators, fmt_float):
                 self.data.add_row(row)
-                self.progress_bar.setValue(100 * (v+1+u*nb_frames) * inv_steps)
-                QApplication.processEvents()
+                self.set_progress(100 * (v+1+u*nb_frames) * inv_steps)
         return True, '%s line%s the mesh continuously.' % (nb_nonempty, 's intersect'
                                                            if nb_nonempty > 1 else ' intersects')
 
@@ -1152,7 +1183,11 @@ class InterpolateAlongLinesNode(DoubleInputNode):
             self.fail('Access denied.')
             return
 
-        success, message = self._run_interpolate(selected_vars)
+        try:
+            success, message = self._run_interpolate(selected_vars)
+        except NodeCancelled:
+            self.discard_output(filename)
+            raise
         if success:
             self.data.write(filename, self.scene().csv_separator)
             self.success('Output saved to %s\n' % filename + message)
@@ -1310,7 +1345,7 @@ class ProjectLinesNode(DoubleInputNode):
             self.fail('Access denied.')
             return
 
-        self.progress_bar.setVisible(True)
+        self.show_progress()
 
         lines = self.second_in_port.mother.parentItem().data.lines
         mesh = MeshInterpolator(input_data.header, False)
@@ -1319,7 +1354,11 @@ class ProjectLinesNode(DoubleInputNode):
             mesh.index = input_data.index
             mesh.triangles = input_data.triangles
         else:
-            self.construct_mesh(mesh)
+            try:
+                self.construct_mesh(mesh)
+            except NodeCancelled:
+                self.discard_output(filename)
+                raise
             input_data.index = mesh.index
             input_data.triangles = mesh.triangles
 
@@ -1351,11 +1390,15 @@ class ProjectLinesNode(DoubleInputNode):
             input_stream.header = input_data.header
             input_stream.time = input_data.time
 
-            for u, row in MeshInterpolator.project_lines(input_stream, selected_vars, time_index, indices_nonempty,
-                                                         max_distance, reference, line_interpolators, fmt_float):
-                self.data.add_row(row)
-                self.progress_bar.setValue(100 * (u+1) / nb_lines)
-                QApplication.processEvents()
+            try:
+                for u, row in MeshInterpolator.project_lines(input_stream, selected_vars, time_index,
+                                                             indices_nonempty, max_distance, reference,
+                                                             line_interpolators, fmt_float):
+                    self.data.add_row(row)
+                    self.set_progress(100 * (u+1) / nb_lines)
+            except NodeCancelled:
+                self.discard_output(filename)
+                raise
 
         self.data.write(filename, self.scene().csv_separator)
         self.success('Output saved to %s\n{} line{} the mesh continuously.'.format(filename, nb_nonempty,
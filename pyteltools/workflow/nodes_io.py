@@ -1,4 +1,3 @@
-import numpy as np
 import os
 from PyQt5.QtCore import *
 from PyQt5.QtWidgets import *
@@ -10,9 +9,11 @@ from pyteltools.slf.datatypes import PointData, PolylineData, SerafinData
 from pyteltools.slf.interpolation import MeshInterpolator
 import pyteltools.slf.misc as operations
 from pyteltools.slf import Serafin
-from pyteltools.slf.variables import do_calculations_in_frame
+from pyteltools.slf.streams import data_stream, monitor, STREAM_OPERATORS, write_frames
+from pyteltools.slf.vtu import VtuCollection, write_pvd
 
-from .Node import Node, SingleInputNode, SingleOutputNode, OneInOneOutNode
+from .cache import cache_key, RESULT_CACHE
+from .Node import Node, NodeCancelled, SingleInputNode, SingleOutputNode, OneInOneOutNode
 from .util import GeomOutputOptionPanel, LoadSerafinDialog, logger, OutputOptionPanel, \
     process_geom_output_options, process_output_options, process_vtk_output_options, \
     validate_input_options, validate_output_options, VtkOutputOptionPanel
@@ -126,32 +127,27 @@ class WriteSerafinNode(OneInOneOutNode):
             self.suffix, self.in_source_folder, self.dir_path, self.double_name, self.overwrite = \
                 suffix, in_source_folder, dir_path, double_name, overwrite
 
-    def _run_simple(self, input_data):
+    def _run_stream(self, input_data):
         """!
-        @brief Write Serafin without any operator
+        @brief Write Serafin by streaming the frames through the operators (if any)
         @param input_data <slf.datatypes.SerafinData>: input SerafinData stream
         """
-        output_header = input_data.default_output_header()
+        nb_frames = len(input_data.selected_time_indices)
+
+        def update_progress(nb_done):
+            self.set_progress(100 * nb_done / nb_frames)
+
         with Serafin.Read(input_data.filename, input_data.language) as input_stream:
             input_stream.header = input_data.header
             input_stream.time = input_data.time
             with Serafin.Write(self.filename, input_data.language, True) as output_stream:
-                output_stream.write_header(output_header)
-                for i, time_index in enumerate(input_data.selected_time_indices):
-                    values = do_calculations_in_frame(input_data.equations, input_stream, time_index,
-                                                      input_data.selected_vars, output_header.np_float_type,
-                                                      is_2d=output_header.is_2d, us_equation=input_data.us_equation,
-                                                      ori_values={})
-                    output_stream.write_entire_frame(output_header, input_data.time[time_index], values)
-
-                    self.progress_bar.setValue(100 * (i+1) / len(input_data.selected_time_indices))
-                    QApplication.processEvents()
+                write_frames(data_stream(input_data, input_stream, [monitor(update_progress)]), output_stream)
         self.success('Output saved to {}.'.format(self.filename))
         return True
 
-    def _run_max_min_mean(self, input_data):
+    def _run_statistics(self, input_data):
         """!
-        @brief Write Serafin with `Temporal Min/Max/Mean` operator
+        @brief Write Serafin with `Statistics` operator
         @param input_data <slf.datatypes.SerafinData>: input SerafinData stream
         """
         selected = [(var, input_data.selected_vars_names[var][0],
@@ -159,78 +155,23 @@ class WriteSerafinNode(OneInOneOutNode):
         scalars, vectors, additional_equations = operations.scalars_vectors(input_data.header.var_IDs,
                                                                             selected,
                                                                             input_data.us_equation)
-        output_header = input_data.header.copy()
-        output_header.set_variables(scalars + vectors)
-        if input_data.to_single:
-            output_header.to_single_precision()
-
         with Serafin.Read(input_data.filename, input_data.language) as input_stream:
             input_stream.header = input_data.header
             input_stream.time = input_data.time
-            has_scalar, has_vector = False, False
-            scalar_calculator, vector_calculator = None, None
-            if scalars:
-                has_scalar = True
-                scalar_calculator = operations.ScalarMaxMinMeanCalculator(input_data.operator, input_stream,
-                                                                          scalars, input_data.selected_time_indices,
-                                                                          additional_equations)
-            if vectors:
-                has_vector = True
-                vector_calculator = operations.VectorMaxMinMeanCalculator(input_data.operator, input_stream,
-                                                                          vectors, input_data.selected_time_indices,
-                                                                          additional_equations)
+            calculator = operations.StatisticsCalculator(input_data.metadata['statistics'], input_stream,
+                                                         scalars, vectors, input_data.selected_time_indices,
+                                                         additional_equations)
             for i, time_index in enumerate(input_data.selected_time_indices):
+                calculator.statistics_in_frame(time_index)
 
-                if has_scalar:
-                    scalar_calculator.max_min_mean_in_frame(time_index)
-                if has_vector:
-                    vector_calculator.max_min_mean_in_frame(time_index)
-
-                self.progress_bar.setValue(100 * (i+1) / len(input_data.selected_time_indices))
-                QApplication.processEvents()
-
-            if has_scalar and not has_vector:
-                values = scalar_calculator.finishing_up()
-            elif not has_scalar and has_vector:
-                values = vector_calculator.finishing_up()
-            else:
-                values = np.vstack((scalar_calculator.finishing_up(), vector_calculator.finishing_up()))
-
-            with Serafin.Write(self.filename, input_data.language, True) as output_stream:
-                output_stream.write_header(output_header)
-                output_stream.write_entire_frame(output_header, input_data.time[0], values)
-        self.success('Output saved to {}.'.format(self.filename))
-        return True
-
-    def _run_synch_max(self, input_data):
-        """!
-        @brief Write Serafin with `SynchMax` operator
-        @param input_data <slf.datatypes.SerafinData>: input SerafinData stream
-        """
-        selected_vars = [var for var in input_data.selected_vars if var in input_data.header.var_IDs]
-        output_header = input_data.header.copy()
-        output_header.empty_variables()
-        for var_ID in selected_vars:
-            var_name, var_unit = input_data.selected_vars_names[var_ID]
-            output_header.add_variable(var_ID, var_name, var_unit)
-        if input_data.to_single:
-            output_header.to_single_precision()
-
-        nb_frames = len(input_data.selected_time_indicies)
-        with Serafin.Read(input_data.filename, input_data.language) as input_stream:
-            input_stream.header = input_data.header
-            input_stream.time = input_data.time
-
-            calculator = operations.SynchMaxCalculator(input_stream, selected_vars, input_data.selected_time_indicies,
-                                                       input_data.metadata['var'])
-
-            for i, time_index in enumerate(input_data.selected_time_indicies[1:]):
-                calculator.synch_max_in_frame(time_index)
+                self.set_progress(100 * (i+1) / len(input_data.selected_time_indices))
+            values = calculator.finishing_up()
 
-                self.progress_bar.setValue(100 * (i+1) / nb_frames)
-                QApplication.processEvents()
+            output_header = input_data.header.copy()
+            output_header.set_variables(calculator.output_variables())
+            if input_data.to_single:
+                output_header.to_single_precision()
 
-            values = calculator.finishing_up()
             with Serafin.Write(self.filename, input_data.language, True) as output_stream:
                 output_stream.write_header(output_header)
                 output_stream.write_entire_frame(output_header, input_data.time[0], values)
@@ -258,22 +199,14 @@ class WriteSerafinNode(OneInOneOutNode):
         with Serafin.Read(input_data.filename, input_data.language) as input_stream:
             input_stream.header = input_data.header
             input_stream.time = input_data.time
-            calculators = []
-
-            for i, condition in enumerate(conditions):
-                calculators.append(operations.ArrivalDurationCalculator(input_stream, input_data.selected_time_indices,
-                                                                        condition))
+            calculator = operations.ArrivalDurationCalculator(input_stream, input_data.selected_time_indices,
+                                                              conditions)
             for i, index in enumerate(input_data.selected_time_indices[1:]):
-                for calculator in calculators:
-                    calculator.arrival_duration_in_frame(index)
+                calculator.arrival_duration_in_frame(index)
 
-                self.progress_bar.setValue(100 * (i+1) / len(input_data.selected_time_indices))
-                QApplication.processEvents()
+                self.set_progress(100 * (i+1) / len(input_data.selected_time_indices))
 
-            values = np.empty((2*len(conditions), input_data.header.nb_nodes))
-            for i, calculator in enumerate(calculators):
-                values[2*i, :] = calculator.arrival
-                values[2*i+1, :] = calculator.duration
+            values = calculator.finishing_up()
 
             if time_unit == 'minute':
                 values /= 60
@@ -371,8 +304,7 @@ class WriteSerafinNode(OneInOneOutNode):
                         out_stream.write_entire_frame(output_header,
                                                       calculator.first_in.time[first_time_index], values)
 
-                        self.progress_bar.setValue(100 * (i+1) / len(common_frames))
-                        QApplication.processEvents()
+                        self.set_progress(100 * (i+1) / len(common_frames))
 
         self.success('Output saved to {}.\nThe two files has {} common variables and {} common frames.\n'
                      'The mesh A has {} / {} nodes inside the mesh B.'.format(self.filename,
@@ -381,66 +313,6 @@ class WriteSerafinNode(OneInOneOutNode):
                                                                               first_input.header.nb_nodes))
         return True
 
-    def _run_layer_selection(self, input_data):
-        """!
-        @brief Write Serafin with `Select Single Layer` operator
-        @param input_data <slf.datatypes.SerafinData>: input SerafinData stream
-        """
-        output_header = input_data.build_2d_output_header()
-        with Serafin.Read(input_data.filename, input_data.language) as input_stream:
-            input_stream.header = input_data.header
-            input_stream.time = input_data.time
-            with Serafin.Write(self.filename, input_data.language, True) as output_stream:
-                output_stream.write_header(output_header)
-                for i, time_index in enumerate(input_data.selected_time_indices):
-                    # FIXME Optimization: Do calculations only on target layer and avoid reshaping afterwards
-                    values = do_calculations_in_frame(input_data.equations, input_stream, time_index,
-                                                      input_data.selected_vars, output_header.np_float_type,
-                                                      is_2d=output_header.is_2d, us_equation=input_data.us_equation,
-                                                      ori_values={})
-                    new_shape = (values.shape[0], input_stream.header.nb_planes,
-                                 values.shape[1] // input_stream.header.nb_planes)
-                    values_at_layer = values.reshape(new_shape)[:,input_data.metadata['layer_selection'] - 1,:]
-                    output_stream.write_entire_frame(output_header, input_data.time[time_index], values_at_layer)
-                    self.progress_bar.setValue(100 * (i+1) / len(input_data.selected_time_indices))
-                    QApplication.processEvents()
-        self.success('Output saved to {}.'.format(self.filename))
-        return True
-
-    def _run_vertical_aggregation(self, input_data):
-        """!
-        @brief Write Serafin with `Vertical Aggregation` operator
-        @param input_data <slf.datatypes.SerafinData>: input SerafinData stream
-        """
-        output_header = input_data.build_2d_output_header()
-        if input_data.metadata['vertical_operator'] == 'Min':
-            operation_type = operations.MIN
-        elif input_data.metadata['vertical_operator'] == 'Max':
-            operation_type = operations.MAX
-        elif input_data.metadata['vertical_operator'] == 'Mean':
-            operation_type = operations.MEAN
-        else:
-            raise NotImplementedError('Vertical operator %s is unknown.' % input_data.metadata['vertical_operator'])
-        selected_variables = []
-        for var in input_data.selected_vars:
-            name, unit = input_data.selected_vars_names[var]
-            selected_variables.append((var, name, unit))
-        with Serafin.Read(input_data.filename, input_data.language) as input_stream:
-            input_stream.header = input_data.header
-            input_stream.time = input_data.time
-            vertical_calculator = operations.VerticalMaxMinMeanCalculator(operation_type, input_stream, output_header,
-                                                                          selected_variables)
-            output_header.set_variables(vertical_calculator.get_variables())  # sort variables
-            with Serafin.Write(self.filename, input_data.language, True) as output_stream:
-                output_stream.write_header(output_header)
-                for i, time_index in enumerate(input_data.selected_time_indices):
-                    vars_2d = vertical_calculator.max_min_mean_in_frame(time_index)
-                    output_stream.write_entire_frame(output_header, input_data.time[time_index], vars_2d)
-                    self.progress_bar.setValue(100 * (i+1) / len(input_data.selected_time_indices))
-                    QApplication.processEvents()
-        self.success('Output saved to {}.'.format(self.filename))
-        return True
-
     def run(self):
         success = super().run_upward()
         if not success:
@@ -451,23 +323,29 @@ class WriteSerafinNode(OneInOneOutNode):
         self.filename = process_output_options(input_data.filename, input_data.job_id,
                                                os.path.splitext(input_data.filename)[1],
                                                self.suffix, self.in_source_folder, self.dir_path, self.double_name)
-        if not self.overwrite:
-            if os.path.exists(self.filename):
-                try:
-                    with open(self.filename, 'r'):
-                        pass
-                except PermissionError:
-                    self.fail('Access denied when reloading existing file.')
-                    return
+        key = cache_key(self.name(), self.save().split('|')[5:], input_data)
+        if not self.overwrite and os.path.exists(self.filename):
+            message = 'Reload existing file.'
+        elif RESULT_CACHE.restore(key, [self.filename]):
+            message = 'Cached result reused.'
+        else:
+            message = None
+        if message is not None:
+            try:
+                with open(self.filename, 'r'):
+                    pass
+            except PermissionError:
+                self.fail('Access denied when reloading existing file.')
+                return
 
-                try:
-                    self.data = SerafinData(input_data.job_id, self.filename, input_data.language)
-                    self.data.read()
-                except (Serafin.SerafinRequestError, Serafin.SerafinValidationError) as e:
-                    self.fail(e.message)
-                    return
-                self.success('Reload existing file.')
+            try:
+                self.data = SerafinData(input_data.job_id, self.filename, input_data.language)
+                self.data.read()
+            except (Serafin.SerafinRequestError, Serafin.SerafinValidationError) as e:
+                self.fail(e.message)
                 return
+            self.success(message)
+            return
 
         try:
             with open(self.filename, 'w'):
@@ -476,31 +354,29 @@ class WriteSerafinNode(OneInOneOutNode):
             self.fail('Access denied.')
             return
 
-        self.progress_bar.setVisible(True)
+        self.show_progress()
 
         try:
             # do the actual calculation
-            if input_data.operator is None:
-                success = self._run_simple(input_data)
-            elif input_data.operator in (operations.MAX, operations.MIN, operations.MEAN):
-                success = self._run_max_min_mean(input_data)
+            if input_data.operator in STREAM_OPERATORS:
+                success = self._run_stream(input_data)
             elif input_data.operator in (operations.PROJECT, operations.DIFF, operations.REV_DIFF,
                                          operations.MAX_BETWEEN, operations.MIN_BETWEEN):
                 success = self._run_project_mesh(input_data)
-            elif input_data.operator == operations.SYNCH_MAX:
-                success = self._run_synch_max(input_data)
+            elif input_data.operator == operations.STATISTICS:
+                success = self._run_statistics(input_data)
             elif input_data.operator == operations.ARRIVAL_DURATION:
                 success = self._run_arrival_duration(input_data)
-            elif input_data.operator == operations.SELECT_LAYER:
-                success = self._run_layer_selection(input_data)
-            elif input_data.operator == operations.VERTICAL_AGGREGATION:
-                success = self._run_vertical_aggregation(input_data)
             else:
                 raise NotImplementedError('Operator "%s" is not implemented in MONO' % input_data.operator)
 
             if success:  # reload the output file
+                RESULT_CACHE.store(key, [self.filename])
                 self.data = SerafinData(input_data.job_id, self.filename, input_data.language)
                 self.data.read()
+        except NodeCancelled:
+            self.discard_output(self.filename)
+            raise
         except (Serafin.SerafinRequestError, Serafin.SerafinValidationError) as e:
             self.fail(e.message)
             return
@@ -977,6 +853,10 @@ class WriteLandXMLNode(SingleInputNode):
             if os.path.exists(filename):
                 self.success('File already exists.')
                 return
+        key = cache_key(self.name(), self.save().split('|')[5:], input_data)
+        if RESULT_CACHE.restore(key, [filename]):
+            self.success('Cached result reused.')
+            return
         try:
             with open(filename, 'w'):
                 pass
@@ -990,6 +870,7 @@ class WriteLandXMLNode(SingleInputNode):
 
         operations.slf_to_xml(input_data.filename, input_data.header, filename, selected_var, selected_frame)
 
+        RESULT_CACHE.store(key, [filename])
         self.success()
 
 
@@ -1057,6 +938,11 @@ class WriteShpNode(SingleInputNode):
             if os.path.exists(filename):
                 self.success('File already exists.')
                 return
+        outputs = [os.path.splitext(filename)[0] + extension for extension in ('.shp', '.shx', '.dbf')]
+        key = cache_key(self.name(), self.save().split('|')[5:], input_data)
+        if RESULT_CACHE.restore(key, outputs):
+            self.success('Cached result reused.')
+            return
         try:
             with open(filename, 'w'):
                 pass
@@ -1070,6 +956,7 @@ class WriteShpNode(SingleInputNode):
 
         operations.slf_to_shp(input_data.filename, input_data.header, filename, available_vars, selected_frame)
 
+        RESULT_CACHE.store(key, outputs)
         self.success()
 
 
@@ -1129,11 +1016,14 @@ class WriteVtkNode(SingleInputNode):
             return
 
         # construct vtk filenames
+        is_vtu = settings.VTK_FORMAT == 'vtu'
+        extension = '.vtu' if is_vtu else '.vtk'
         filenames = []
         skip = []
         for time_index in input_data.selected_time_indices:
             filename = process_vtk_output_options(input_data.filename, input_data.job_id, time_index,
-                                                   self.suffix, self.in_source_folder, self.dir_path, self.double_name)
+                                                   self.suffix, self.in_source_folder, self.dir_path, self.double_name,
+                                                   extension)
             filenames.append(filename)
             if not self.overwrite:
                 if os.path.exists(filename):
@@ -1152,9 +1042,18 @@ class WriteVtkNode(SingleInputNode):
                     self.fail('Access denied.')
                     return
                 skip.append(False)
-        if all(skip):
+        outputs = filenames[:]
+        if is_vtu:
+            pvd_name = process_vtk_output_options(input_data.filename, input_data.job_id, None, self.suffix,
+                                                  self.in_source_folder, self.dir_path, self.double_name, '.pvd')
+            outputs.append(pvd_name)
+        if all(skip) and all(os.path.exists(filename) for filename in outputs):
             self.success('File already exists.')
             return
+        key = cache_key(self.name(), self.save().split('|')[5:], input_data)
+        if RESULT_CACHE.restore(key, outputs):
+            self.success('Cached result reused.')
+            return
 
         # separate vectors from scalars
         scalars, vectors, vtk_var_names = operations.detect_vector_vtk(input_data.header.is_2d, available_vars,
@@ -1162,11 +1061,30 @@ class WriteVtkNode(SingleInputNode):
                                                                        input_data.language)
 
         # write vtk
-        for to_skip, filename, time_index in zip(skip, filenames, input_data.selected_time_indices):
-            if to_skip:
-                continue
-            operations.slf_to_vtk(input_data.header.is_2d, input_data.filename, input_data.header, filename,
-                                  scalars, vectors, vtk_var_names, time_index)
-
+        to_write = [(time_index, filename) for to_skip, filename, time_index
+                    in zip(skip, filenames, input_data.selected_time_indices) if not to_skip]
+        self.show_progress()
+        try:
+            with Serafin.Read(input_data.filename, input_data.language) as input_stream:
+                input_stream.header = input_data.header
+                if not is_vtu:
+                    for i, (time_index, filename) in enumerate(to_write):
+                        operations.slf_to_vtk(input_data.header.is_2d, input_data.filename, input_data.header,
+                                              filename, scalars, vectors, vtk_var_names, time_index, input_stream)
+                        self.set_progress(100 * (i+1) / len(to_write))
+                elif to_write:
+                    time_indices, vtu_names = zip(*to_write)
+                    collection = VtuCollection(input_data.header, scalars, vectors, vtk_var_names)
+                    collection.write(input_stream, time_indices, vtu_names, settings.VTU_NB_THREADS,
+                                     lambda nb_done: self.set_progress(100 * nb_done / len(to_write)))
+            if is_vtu:
+                write_pvd(pvd_name, [input_data.time[time_index] for time_index in input_data.selected_time_indices],
+                          filenames)
+        except NodeCancelled:
+            for _, filename in to_write:
+                self.discard_output(filename)
+            raise
+
+        RESULT_CACHE.store(key, outputs)
         self.success()
 
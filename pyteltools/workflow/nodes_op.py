@@ -13,6 +13,7 @@ from pyteltools.slf.variables import get_available_variables, get_necessary_equa
     new_variables_from_US
 
 from .Node import Node, OneInOneOutNode, TwoInOneOutNode
+from .options import VERTICAL_OPERATIONS
 from .util import logger
 
 
@@ -938,7 +939,7 @@ class SelectSingleLayerNode(OneInOneOutNode):
 
 
 class VerticalAggregationNode(OneInOneOutNode):
-    VERTICAL_OPERATIONS = ('Mean', 'Min', 'Max')
+    VERTICAL_OPERATIONS = VERTICAL_OPERATIONS
     DEFAULT_OPERATOR = 0  # `Mean`
 
     def __init__(self, index):
@@ -1403,6 +1404,94 @@ class ComputeMeanNode(UnaryOperatorNode):
         self.success()
 
 
+class ComputeStatisticsNode(OneInOneOutNode):
+    def __init__(self, index):
+        super().__init__(index)
+        self.category = 'Operators'
+        self.label = 'Statistics'
+        self.out_port.data_type = ('slf out',)
+        self.in_port.data_type = ('slf',)
+        self.data = None
+
+        self.statistics = []
+        self.statistic_boxes = {}
+        self.percentile_box = None
+        self.new_options = []
+
+    def get_option_panel(self):
+        option_panel = QWidget()
+        vlayout = QVBoxLayout()
+        vlayout.addWidget(QLabel('Temporal statistics (computed in a single pass)'))
+        self.statistic_boxes = {}
+        for statistic in operations.TEMPORAL_STATISTICS:
+            box = QCheckBox(statistic)
+            box.setChecked(statistic in self.statistics)
+            self.statistic_boxes[statistic] = box
+            vlayout.addWidget(box)
+        percentages = [statistic[1:] for statistic in self.statistics
+                       if statistic not in operations.TEMPORAL_STATISTICS]
+        self.percentile_box = QLineEdit(' '.join(percentages))
+        self.percentile_box.setToolTip('Approximate percentiles separated by spaces (e.g. <b>10 50 90</b>)')
+        hlayout = QHBoxLayout()
+        hlayout.addWidget(QLabel('Percentiles (%)'))
+        hlayout.addWidget(self.percentile_box)
+        vlayout.addLayout(hlayout)
+        option_panel.setLayout(vlayout)
+        return option_panel
+
+    def _check(self):
+        statistics = [statistic for statistic in operations.TEMPORAL_STATISTICS
+                      if self.statistic_boxes[statistic].isChecked()]
+        try:
+            statistics.extend(operations.parse_percentiles(self.percentile_box.text()))
+        except ValueError:
+            QMessageBox.critical(None, 'Error', 'Percentiles have to be numbers strictly between 0 and 100.',
+                                 QMessageBox.Ok)
+            return 1
+        if not statistics:
+            QMessageBox.critical(None, 'Error', 'Select at least one statistic.', QMessageBox.Ok)
+            return 1
+        self.new_options = statistics
+        return 2
+
+    def reconfigure(self):
+        super().reconfigure()
+        self.reconfigure_downward()
+
+    def configure(self, check=None):
+        if super().configure(self._check):
+            self.statistics = self.new_options
+            self.reconfigure_downward()
+
+    def save(self):
+        return '|'.join([self.category, self.name(), str(self.index()),
+                         str(self.pos().x()), str(self.pos().y()), ','.join(self.statistics)])
+
+    def load(self, options):
+        statistics = options[0].split(',') if options[0] else []
+        if statistics and all(operations.is_valid_statistic(statistic) for statistic in statistics):
+            self.statistics = statistics
+            self.state = Node.READY
+
+    def run(self):
+        success = super().run_upward()
+        if not success:
+            self.fail('input failed.')
+            return
+        input_data = self.in_port.mother.parentItem().data
+        if not input_data.header.is_2d:
+            self.fail('the input file is not 2D')
+            return
+        if len(input_data.selected_time_indices) == 1:
+            self.fail('the input data must have more than one frame')
+            return
+
+        self.data = input_data.copy()
+        self.data.operator = operations.STATISTICS
+        self.data.metadata = {'statistics': self.statistics}
+        self.success()
+
+
 class MinusNode(BinaryOperatorNode):
     def __init__(self, index):
         super().__init__(index, operations.DIFF)
@@ -1,9 +1,5 @@
 from itertools import cycle, islice
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib import cm
-import matplotlib.tri as mtri
-from mpl_toolkits.axes_grid1 import make_axes_locatable
 from PyQt5.QtWidgets import *
 
 from pyteltools.conf import settings
@@ -14,6 +10,7 @@ from pyteltools.slf.mesh2D import Mesh2D
 from pyteltools.slf.misc import detect_vector_couples
 
 from .Node import DoubleInputNode, Node, SingleInputNode
+from .batch_render import FigureTask
 from .util import build_levels_from_minmax, MultiFigureSaveDialog, MultiLoadSerafinDialog, \
     MultiSaveProjectLinesDialog, MultiSaveMultiFrameLinePlotDialog, MultiSaveMultiVarLinePlotDialog, \
     MultiSaveVerticalCrossSectionDialog, MultiSaveVerticalProfileDialog, \
@@ -503,7 +500,7 @@ class MultiVarLinePlotNode(DoubleInputNode):
             mesh.index = input_data.index
             mesh.triangles = input_data.triangles
         else:
-            self.progress_bar.setVisible(True)
+            self.show_progress()
             self.construct_mesh(mesh)
             input_data.index = mesh.index
             input_data.triangles = mesh.triangles
@@ -537,8 +534,8 @@ class MultiVarLinePlotNode(DoubleInputNode):
         self.plot_viewer.showMaximized()
 
     def plot(self, values, distances, values_internal, distances_internal, current_vars, png_name):
-        fig, axes = plt.subplots(1)
-        fig.set_size_inches(settings.FIG_SIZE[0], settings.FIG_SIZE[1])
+        task = FigureTask(png_name)
+        axes = task.axes
         if self.plot_viewer.control.addInternal.isChecked():
             if self.plot_viewer.control.intersection.isChecked():
                 for i, var in enumerate(current_vars):
@@ -566,8 +563,7 @@ class MultiVarLinePlotNode(DoubleInputNode):
         axes.set_xlabel(self.plot_viewer.plotViewer.current_xlabel)
         axes.set_ylabel(self.plot_viewer.plotViewer.current_ylabel)
         axes.set_title(self.plot_viewer.plotViewer.current_title)
-        fig.canvas.draw()
-        fig.savefig(png_name, dpi=settings.FIG_OUT_DPI)
+        return task
 
     def multi_save(self):
         current_vars = self.plot_viewer.getSelection()
@@ -666,7 +662,7 @@ class MultiFrameLinePlotNode(DoubleInputNode):
             mesh.index = input_data.index
             mesh.triangles = input_data.triangles
         else:
-            self.progress_bar.setVisible(True)
+            self.show_progress()
             self.construct_mesh(mesh)
             input_data.index = mesh.index
             input_data.triangles = mesh.triangles
@@ -700,8 +696,8 @@ class MultiFrameLinePlotNode(DoubleInputNode):
         self.plot_viewer.showMaximized()
 
     def plot(self, values, distances, values_internal, distances_internal, time_indices, png_name):
-        fig, axes = plt.subplots(1)
-        fig.set_size_inches(settings.FIG_SIZE[0], settings.FIG_SIZE[1])
+        task = FigureTask(png_name)
+        axes = task.axes
         if self.plot_viewer.control.addInternal.isChecked():
             if self.plot_viewer.control.intersection.isChecked():
                 for i, index in enumerate(time_indices):
@@ -730,8 +726,7 @@ class MultiFrameLinePlotNode(DoubleInputNode):
         axes.set_xlabel(self.plot_viewer.plotViewer.current_xlabel)
         axes.set_ylabel(self.plot_viewer.plotViewer.current_ylabel)
         axes.set_title(self.plot_viewer.plotViewer.current_title)
-        fig.canvas.draw()
-        fig.savefig(png_name, dpi=settings.FIG_OUT_DPI)
+        return task
 
     def multi_save(self):
         time_indices = self.plot_viewer.getTime()
@@ -826,7 +821,7 @@ class ProjectLinesPlotNode(DoubleInputNode):
             mesh.index = input_data.index
             mesh.triangles = input_data.triangles
         else:
-            self.progress_bar.setVisible(True)
+            self.show_progress()
             self.construct_mesh(mesh)
             input_data.index = mesh.index
             input_data.triangles = mesh.triangles
@@ -860,8 +855,8 @@ class ProjectLinesPlotNode(DoubleInputNode):
         self.plot_viewer.showMaximized()
 
     def plot(self, values, distances, values_internal, distances_internal, current_vars, png_name):
-        fig, axes = plt.subplots(1)
-        fig.set_size_inches(settings.FIG_SIZE[0], settings.FIG_SIZE[1])
+        task = FigureTask(png_name)
+        axes = task.axes
         if self.plot_viewer.control.addInternal.isChecked():
             if self.plot_viewer.control.intersection.isChecked():
                 for line_id, variables in current_vars.items():
@@ -902,8 +897,7 @@ class ProjectLinesPlotNode(DoubleInputNode):
         axes.set_xlabel(self.plot_viewer.plotViewer.current_xlabel)
         axes.set_ylabel(self.plot_viewer.plotViewer.current_ylabel)
         axes.set_title(self.plot_viewer.plotViewer.current_title)
-        fig.canvas.draw()
-        fig.savefig(png_name, dpi=settings.FIG_OUT_DPI)
+        return task
 
     def multi_save(self):
         current_vars = self.plot_viewer.getSelection()
@@ -1005,23 +999,18 @@ class VerticalCrossSectionNode(DoubleInputNode):
             mesh.index = input_data.index
             mesh.triangles = input_data.triangles
         else:
-            self.progress_bar.setVisible(True)
+            self.show_progress()
             self.construct_mesh(mesh)
             input_data.index = mesh.index
             input_data.triangles = mesh.triangles
 
         sections = self.second_in_port.mother.parentItem().data.lines
 
-        line_interpolators, distances, line_interpolators_internal, distances_internal = \
-            mesh.get_line_interpolators(sections)
-
-        is_inside = [True if dist[0] else False for dist in distances_internal]
-        nb_inside = sum(map(int, is_inside))
-        section_indices = [i for i in range(len(sections)) if is_inside[i]]
-        if nb_inside == 0:
+        nb_nonempty, section_indices, line_interpolators, _ = mesh.get_line_interpolators(sections)
+        if nb_nonempty == 0:
             return False
         self.success()
-        self.plot_viewer.get_data(input_data, sections, line_interpolators_internal, section_indices)
+        self.plot_viewer.get_data(input_data, sections, line_interpolators, section_indices)
         return True
 
     def run(self):
@@ -1046,31 +1035,26 @@ class VerticalCrossSectionNode(DoubleInputNode):
         self.plot_viewer.showMaximized()
 
     def plot(self, triang, point_values, png_name):
-        fig, axes = plt.subplots(1)
-        fig.set_size_inches(settings.FIG_SIZE[0], settings.FIG_SIZE[1])
+        task = FigureTask(png_name)
+        axes = task.axes
 
         if self.plot_viewer.color_limits is not None:
             levels = np.linspace(self.plot_viewer.color_limits[0], self.plot_viewer.color_limits[1],
                                  settings.NB_COLOR_LEVELS)
-            axes.tricontourf(triang, point_values, cmap=self.plot_viewer.current_style, levels = levels,
-                            vmin=self.plot_viewer.color_limits[0], vmax=self.plot_viewer.color_limits[1])
+            axes.tricontourf(triang.x, triang.y, triang.triangles, point_values, cmap=self.plot_viewer.current_style,
+                             levels=levels, vmin=self.plot_viewer.color_limits[0],
+                             vmax=self.plot_viewer.color_limits[1])
         else:
             levels = build_levels_from_minmax(np.nanmin(point_values), np.nanmax(point_values))
-            axes.tricontourf(triang, point_values, cmap=self.plot_viewer.current_style, levels=levels)
-
-        divider = make_axes_locatable(axes)
-        cax = divider.append_axes('right', size='5%', pad=0.2)
-        cax.set(self.plot_viewer.current_var)
-        cmap = cm.ScalarMappable(cmap=self.plot_viewer.current_style)
-        cmap.set_array(levels)
-        fig.colorbar(cmap, cax=cax)
+            axes.tricontourf(triang.x, triang.y, triang.triangles, point_values, cmap=self.plot_viewer.current_style,
+                             levels=levels)
+        task.add_colorbar(self.plot_viewer.current_style, levels[0], levels[-1], self.plot_viewer.current_var)
 
         axes.set_xlabel(self.plot_viewer.current_xlabel)
         axes.set_ylabel(self.plot_viewer.current_ylabel)
         axes.set_title(self.plot_viewer.current_title)
 
-        fig.canvas.draw()
-        fig.savefig(png_name, dpi=settings.FIG_OUT_DPI)
+        return task
 
     def multi_save(self):
         dlg = MultiLoadSerafinDialog([])
@@ -1165,7 +1149,7 @@ class VerticalTemporalProfileNode(DoubleInputNode):
             mesh.index = input_data.index
             mesh.triangles = input_data.triangles
         else:
-            self.progress_bar.setVisible(True)
+            self.show_progress()
             self.construct_mesh(mesh)
             input_data.index = mesh.index
             input_data.triangles = mesh.triangles
@@ -1203,24 +1187,19 @@ class VerticalTemporalProfileNode(DoubleInputNode):
         self.plot_viewer.showMaximized()
 
     def plot(self, time, y, z, triangles, str_datetime, str_datetime_bis, png_name):
-        fig, axes = plt.subplots(1)
-        fig.set_size_inches(settings.FIG_SIZE[0], settings.FIG_SIZE[1])
+        task = FigureTask(png_name)
+        axes = task.axes
 
-        triang = mtri.Triangulation(time[self.timeFormat], y, triangles)
+        x = time[self.plot_viewer.timeFormat]
         if self.plot_viewer.color_limits is not None:
             levels = np.linspace(self.plot_viewer.color_limits[0], self.plot_viewer.color_limits[1],
                                  settings.NB_COLOR_LEVELS)
-            axes.tricontourf(triang, z, cmap=self.plot_viewer.current_style, levels = levels,
+            axes.tricontourf(x, y, triangles, z, cmap=self.plot_viewer.current_style, levels=levels,
                              vmin=self.plot_viewer.color_limits[0], vmax=self.plot_viewer.color_limits[1])
         else:
             levels = build_levels_from_minmax(np.nanmin(z), np.nanmax(z))
-            axes.tricontourf(triang, z, cmap=self.plot_viewer.current_style, levels=levels)
-
-        divider = make_axes_locatable(axes)
-        cax = divider.append_axes('right', size='5%', pad=0.2)
-        cmap = cm.ScalarMappable(cmap=self.plot_viewer.current_style)
-        cmap.set_array(levels)
-        fig.colorbar(cmap, cax=cax)
+            axes.tricontourf(x, y, triangles, z, cmap=self.plot_viewer.current_style, levels=levels)
+        task.add_colorbar(self.plot_viewer.current_style, levels[0], levels[-1])
 
         axes.set_xlabel(self.plot_viewer.current_xlabel)
         axes.set_ylabel(self.plot_viewer.current_ylabel)
@@ -1228,11 +1207,8 @@ class VerticalTemporalProfileNode(DoubleInputNode):
         if self.plot_viewer.timeFormat in [1, 2]:
             axes.set_xticklabels(str_datetime if self.plot_viewer.timeFormat == 1
                                  else str_datetime_bis)
-            for label in axes.get_xticklabels():
-                label.set_rotation(45)
-                label.set_fontsize(8)
-        fig.canvas.draw()
-        fig.savefig(png_name, dpi=settings.FIG_OUT_DPI)
+            axes.tick_params(axis='x', labelrotation=45, labelsize=8)
+        return task
 
     def multi_save(self):
         dlg = MultiLoadSerafinDialog([])
@@ -0,0 +1,277 @@
+"""!
+Qt-independent handling of workflow node options (output file names, option validation and MULTI options loading)
+"""
+
+from datetime import datetime
+import os
+
+from pyteltools.geom.transformation import load_transformation_map
+import pyteltools.slf.misc as operations
+from pyteltools.slf.Serafin import SLF_EIT
+from pyteltools.slf.variables import get_US_equation
+
+
+VERTICAL_OPERATIONS = ('Mean', 'Min', 'Max')
+
+
+def process_output_options(input_file, job_id, extension, suffix, in_source_folder, dir_path, double_name):
+    input_path, input_name = os.path.split(input_file)
+    input_rootname = os.path.splitext(input_name)[0]
+    if double_name:
+        output_name = input_rootname + '_' + job_id + suffix + extension
+    else:
+        output_name = input_rootname + suffix + extension
+    if in_source_folder:
+        filename = os.path.join(input_path, output_name)
+    else:
+        filename = os.path.join(dir_path, output_name)
+    return filename
+
+
+def process_geom_output_options(input_file, job_id, extension, suffix, in_source_folder, dir_path, double_name):
+    input_path, input_name = os.path.split(input_file)
+    input_rootname = os.path.splitext(input_name)[0]
+    if double_name:
+        output_name = input_rootname + '_' + job_id + suffix + extension
+    else:
+        output_name = input_rootname + suffix + extension
+    if in_source_folder:
+        path = os.path.join(input_path, 'gis')
+        if not os.path.exists(path):
+            os.mkdir(path)
+        filename = os.path.join(path, output_name)
+    else:
+        filename = os.path.join(dir_path, output_name)
+    return filename
+
+
+def process_vtk_output_options(input_file, job_id, time_index, suffix, in_source_folder, dir_path, double_name,
+                               extension='.vtk'):
+    """!
+    @brief Output filename of a frame (or of the collection of frames if `time_index` is None) in the vtk folder
+    """
+    input_path, input_name = os.path.split(input_file)
+    input_rootname = os.path.splitext(input_name)[0]
+    frame = '' if time_index is None else '_' + str(time_index)
+    if double_name:
+        output_name = input_rootname + '_' + job_id + suffix + frame + extension
+    else:
+        output_name = input_rootname + suffix + frame + extension
+    if in_source_folder:
+        path = os.path.join(input_path, 'vtk')
+        if not os.path.exists(path):
+            os.mkdir(path)
+        filename = os.path.join(path, output_name)
+    else:
+        filename = os.path.join(dir_path, output_name)
+    return filename
+
+
+def validate_output_options(options):
+    suffix = options[0]
+    in_source_folder = bool(int(options[1]))
+    dir_path = options[2]
+    double_name = bool(int(options[3]))
+    overwrite = bool(int(options[4]))
+    if not in_source_folder:
+        if not os.path.exists(dir_path):
+            return False, ('', True, '', False, True)
+    return True, (suffix, in_source_folder, dir_path, double_name, overwrite)
+
+
+def validate_input_options(options):
+    filename = options[0]
+    if not filename:
+        return False, ''
+    try:
+        with open(filename) as f:
+            pass
+    except FileNotFoundError:
+        return False, ''
+    return True, filename
+
+
+def _load_input_file(options):
+    success, filename = validate_input_options(options)
+    return success, (filename,)
+
+
+def _load_add_transformation(options):
+    filename, from_index, to_index = options
+    if not filename:
+        return True, tuple()
+    try:
+        with open(filename) as f:
+            pass
+    except FileNotFoundError:
+        return False, tuple()
+    success, transformation = load_transformation_map(filename)
+    if not success:
+        return False, tuple()
+    from_index, to_index = int(from_index), int(to_index)
+    if from_index not in transformation.nodes or to_index not in transformation.nodes:
+        return False, tuple()
+    trans = transformation.get_transformation(from_index, to_index)
+    return True, (trans,)
+
+
+def _load_arrival_duration(options):
+    table = []
+    conditions = []
+    str_conditions, str_table, time_unit = options
+    str_table = str_table.split(',')
+    for i in range(int(len(str_table)/3)):
+        line = []
+        for j in range(3):
+            line.append(str_table[3*i+j])
+        table.append(line)
+    if not table:
+        return False, tuple()
+    str_conditions = str_conditions.split(',')
+    for i, condition in zip(range(len(table)), str_conditions):
+        literal = table[i][0]
+        condition = condition.split()
+        expression = condition[:-2]
+        comparator = condition[-2]
+        threshold = float(condition[-1])
+        conditions.append(operations.Condition(expression, literal, comparator, threshold))
+    return True, (table, conditions, time_unit)
+
+
+def _load_compute_volume(options):
+    first, second, sup = options[0:3]
+    if first:
+        first_var = first
+    else:
+        return False, tuple()
+    if second:
+        second_var = second
+    else:
+        second_var = None
+    sup_volume = bool(int(sup))
+    success, (suffix, in_source_folder, dir_path, double_name, overwrite) = validate_output_options(options[3:])
+    if not success:
+        return False, tuple()
+    return True, (first_var, second_var, sup_volume, suffix, in_source_folder, dir_path, double_name, overwrite)
+
+
+def _load_compute_flux(options):
+    flux_options = options[0]
+    if not flux_options:
+        return False, tuple()
+    success, (suffix, in_source_folder, dir_path, double_name, overwrite) = validate_output_options(options[1:])
+    if not success:
+        return False, tuple()
+    return True, (flux_options, suffix, in_source_folder, dir_path, double_name, overwrite)
+
+
+def _load_project_lines(options):
+    success, (suffix, in_source_folder, dir_path, double_name, overwrite) = validate_output_options(options[:5])
+    if not success:
+        return False, tuple()
+    reference_index = int(options[5])
+    if reference_index == -1:
+        return False, tuple()
+    return True, (suffix, in_source_folder, dir_path, double_name, overwrite, reference_index)
+
+
+def _load_synch_max(options):
+    return True, (options[0],)
+
+
+def _load_statistics(options):
+    statistics = options[0].split(',') if options[0] else []
+    if not statistics or not all(operations.is_valid_statistic(statistic) for statistic in statistics):
+        return False, tuple()
+    return True, (statistics,)
+
+
+def _load_select_time(options):
+    str_start_date, str_end_date = options[0:2]
+    if not str_start_date:
+        return False, tuple()
+    start_date = datetime.strptime(str_start_date, '%Y/%m/%d %H:%M:%S')
+    end_date = datetime.strptime(str_end_date, '%Y/%m/%d %H:%M:%S')
+    sampling_frequency = int(options[2])
+    return True, (start_date, end_date, sampling_frequency)
+
+
+def _load_select_single_frame(options):
+    str_date = options[0]
+    if not str_date:
+        return False, tuple()
+    return True, (datetime.strptime(str_date, '%Y/%m/%d %H:%M:%S'),)
+
+
+def _load_select_single_layer(options):
+    layer_selection = int(options[0])
+    if layer_selection <= 0:
+        return False, tuple()
+    return True, (layer_selection,)
+
+
+def _load_vertical_aggregation(options):
+    vertical_operation = options[0]
+    if vertical_operation not in VERTICAL_OPERATIONS:
+        return False, tuple()
+    return True, (vertical_operation,)
+
+
+def _load_select_variables(options):
+    friction_law, vars, names, units = options
+    friction_law = int(friction_law)
+    if friction_law > -1:
+        us_equation = get_US_equation(friction_law)
+    else:
+        us_equation = None
+
+    if not vars:
+        return False, tuple()
+
+    selected_vars = []
+    selected_vars_names = {}
+    for var, name, unit in zip(vars.split(','), names.split(','), units.split(',')):
+        selected_vars.append(var)
+        selected_vars_names[var] = (bytes(name, SLF_EIT).ljust(16), bytes(unit, SLF_EIT).ljust(16))
+    return True, (us_equation, selected_vars, selected_vars_names)
+
+
+def _load_add_rouse(options):
+    values, str_table = options
+    str_table = str_table.split(',')
+    table = []
+    if not values:
+        return False, tuple()
+    for i in range(0, len(str_table), 3):
+        table.append([str_table[i], str_table[i+1], str_table[i+2]])
+    return True, (table,)
+
+
+# Option loaders of MULTI nodes (indexed by node name), other nodes do not have any option
+MULTI_OPTIONS_LOADERS = {'Write Serafin': validate_output_options, 'Write LandXML': validate_output_options,
+                         'Write shp': validate_output_options, 'Write vtk': validate_output_options,
+                         'Load 2D Polygons': _load_input_file, 'Load 2D Open Polylines': _load_input_file,
+                         'Load 2D Points': _load_input_file, 'Load Reference Serafin': _load_input_file,
+                         'Add Transformation': _load_add_transformation,
+                         'Compute Arrival Duration': _load_arrival_duration,
+                         'Compute Volume': _load_compute_volume, 'Compute Flux': _load_compute_flux,
+                         'Interpolate on Points': validate_output_options,
+                         'Interpolate along Lines': validate_output_options,
+                         'Project Lines': _load_project_lines, 'SynchMax': _load_synch_max,
+                         'Statistics': _load_statistics, 'Select Time': _load_select_time,
+                         'Select Single Frame': _load_select_single_frame,
+                         'Select Single Layer': _load_select_single_layer,
+                         'Vertical Aggregation': _load_vertical_aggregation,
+                         'Select Variables': _load_select_variables, 'Add Rouse': _load_add_rouse}
+
+
+def load_multi_options(node_name, options):
+    """!
+    @brief Parse the options of a MULTI node saved in a project file
+    @param node_name <str>: name of the node
+    @param options <[str]>: saved options
+    @return <bool, tuple>: success and parsed options
+    """
+    if node_name not in MULTI_OPTIONS_LOADERS:
+        return True, tuple()
+    return MULTI_OPTIONS_LOADERS[node_name](options)
@@ -0,0 +1,100 @@
+"""!
+Frames of a Serafin file read in a background thread for the interactive viewers
+
+The frames requested by a viewer are kept in a small LRU cache and their neighbors are read in advance,
+so that moving the time slider step by step does not wait for the file.
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from pyteltools.conf import settings
+from pyteltools.slf import Serafin
+
+
+class PrefetchFrameCache:
+    """!
+    @brief LRU cache of the values of some variables in the frames of a Serafin file, filled by a reading thread
+    """
+    def __init__(self, filename, language, header, variables, nb_frames, capacity=settings.MAP_FRAME_CACHE_SIZE,
+                 nb_neighbors=settings.MAP_PREFETCH_FRAMES):
+        """!
+        @param filename <str>: path to the Serafin file
+        @param language <str>: Serafin variable name language ('fr' or 'en')
+        @param header <slf.Serafin.SerafinHeader>: header of the Serafin file
+        @param variables <[str]>: variables to read in every frame
+        @param nb_frames <int>: number of frames
+        @param capacity <int>: maximum number of frames kept in the cache
+        @param nb_neighbors <int>: number of frames read in advance before and after the requested frame
+        """
+        self.filename = filename
+        self.language = language
+        self.header = header
+        self.variables = variables
+        self.nb_frames = nb_frames
+        self.capacity = max(capacity, 2 * nb_neighbors + 1)
+        self.nb_neighbors = nb_neighbors
+        self.input_stream = None  # only used by the reading thread
+        self.frames = OrderedDict()  # future values for every frame index
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def _read(self, time_index):
+        if self.input_stream is None:
+            self.input_stream = Serafin.Read(self.filename, self.language)
+            self.input_stream.__enter__()
+            self.input_stream.header = self.header
+        return [self.input_stream.read_var_in_frame(time_index, var) for var in self.variables]
+
+    def _close(self):
+        if self.input_stream is not None:
+            self.input_stream.__exit__(None, None, None)
+            self.input_stream = None
+
+    def _submit(self, time_index):
+        if time_index in self.frames:
+            self.frames.move_to_end(time_index)
+        else:
+            self.frames[time_index] = self.executor.submit(self._read, time_index)
+            while len(self.frames) > self.capacity:
+                _, future = self.frames.popitem(last=False)
+                future.cancel()
+
+    def neighbors(self, time_index):
+        """!
+        @param time_index <int>: index of a frame
+        @return <[int]>: indices of the frames to read in advance, the closest first
+        """
+        indices = []
+        for offset in range(1, self.nb_neighbors + 1):
+            indices.extend(index for index in (time_index + offset, time_index - offset)
+                           if 0 <= index < self.nb_frames)
+        return indices
+
+    def get(self, time_index):
+        """!
+        @brief Values of a frame (the neighboring frames are then read in the background)
+        @param time_index <int>: the index of the frame (0-based)
+        @return <[numpy.1D-array]>: values of every variable
+        """
+        wanted = [time_index] + self.neighbors(time_index)
+
+        # pending reads of frames which are not wanted anymore are dropped
+        for index in [index for index, future in self.frames.items() if index not in wanted and future.cancel()]:
+            del self.frames[index]
+
+        self._submit(time_index)
+        future = self.frames[time_index]
+        for index in wanted[1:]:
+            self._submit(index)
+        self.frames.move_to_end(time_index)
+        return future.result()
+
+    def close(self):
+        """!
+        @brief Stop the reading thread and close the file
+        """
+        for future in self.frames.values():
+            future.cancel()
+        self.frames.clear()
+        self.executor.submit(self._close)
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,260 @@
+"""!
+Profiling of the tasks of the workflow multi-folder view
+
+Every task is run through `profiled_call` (in the worker process) which measures its run time, the bytes read and
+written by the worker process, its peak resident memory and optionally dumps its cProfile statistics.
+The `WorkflowProfiler` (in the main process) adds the queue wait of every task and exports:
+- a Chrome trace (JSON, to open with chrome://tracing or https://ui.perfetto.dev): one track per worker process,
+- a CSV file with one row per task (slowest first),
+- a CSV file with one row per node (total and maximum run times, bytes read and written, peak memory),
+- the cProfile statistics merged per node (if enabled).
+
+The I/O counters and the per-task peak memory are read from `/proc` (Linux only), otherwise the peak memory is the
+peak of the worker process since it started (0 on Windows) and the I/O counters are not available.
+Only the main thread of the fused sinks tasks is seen by cProfile (the sinks run in other threads).
+"""
+
+import cProfile
+import csv
+import json
+import os
+import pstats
+import socket
+import sys
+from time import perf_counter, time
+
+from pyteltools.conf import settings
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def _io_counters():
+    try:
+        with open('/proc/self/io') as f:
+            counters = dict(line.split(':') for line in f)
+        return int(counters['rchar']), int(counters['wchar'])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _reset_peak_memory():
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')  # reset the peak resident set size
+        return True
+    except OSError:
+        return False
+
+
+def _peak_memory(reset):
+    if reset:
+        try:
+            with open('/proc/self/status') as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        return int(line.split()[1]) * 1024
+        except (OSError, ValueError):
+            pass
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def task_ids(func, args):
+    """!
+    @brief Node index and file identifier of every node run by a task
+    @param func <function>: function of the task
+    @param args <tuple>: arguments of the task
+    @return <[(int, int)]>: node index and file identifier (-1 for auxiliary inputs)
+    """
+    if func.__name__ == 'run_fused_sinks':
+        return [sink_args[:2] for _, sink_args in args[2]]
+    if len(args) < 4:  # auxiliary input
+        return [(args[0], -1)]
+    return [tuple(args[:2])]
+
+
+def profiled_call(func, args, cprofile_folder=''):
+    """!
+    @brief Run a task and measure it
+    @param func <function>: function of the task
+    @param args <tuple>: arguments of the task
+    @param cprofile_folder <str>: folder to dump the cProfile statistics of the task (empty to disable)
+    @return <tuple>: result of the task and its measures (dict)
+    """
+    reset = _reset_peak_memory()
+    io_before = _io_counters()
+    start = time()
+    start_counter = perf_counter()
+    if cprofile_folder:
+        profile = cProfile.Profile()
+        result = profile.runcall(func, *args)
+        node_id, fid = task_ids(func, args)[0]
+        profile.dump_stats(os.path.join(cprofile_folder, 'task_%i_%i_%i.prof' % (node_id, fid, os.getpid())))
+    else:
+        result = func(*args)
+    run_time = perf_counter() - start_counter
+    io_after = _io_counters()
+
+    record = {'host': socket.gethostname(), 'pid': os.getpid(), 'start': start, 'run time': run_time,
+              'peak memory': _peak_memory(reset)}
+    if io_before is not None and io_after is not None:
+        record['bytes read'] = io_after[0] - io_before[0]
+        record['bytes written'] = io_after[1] - io_before[1]
+    return result, record
+
+
+class WorkflowProfiler:
+    """!
+    @brief Measures of all the tasks of a run
+    """
+    def __init__(self, node_names, job_ids, cprofile_folder=''):
+        """!
+        @param node_names <dict>: node name for every node index
+        @param job_ids <dict>: job identifier for every file identifier
+        @param cprofile_folder <str>: folder where the tasks dump their cProfile statistics (empty to disable)
+        """
+        self.node_names = node_names
+        self.job_ids = job_ids
+        self.cprofile_folder = cprofile_folder
+        self.origin = time()
+        self.records = []
+
+    def wrap(self, func, args):
+        """!
+        @brief Task measuring the given task
+        """
+        return profiled_call, (func, args, self.cprofile_folder)
+
+    def add(self, func, args, submit_time, record):
+        """!
+        @brief Add the measures of a finished task
+        @param func <function>: function of the task
+        @param args <tuple>: arguments of the task
+        @param submit_time <float>: time when the task was submitted (seconds since the epoch)
+        @param record <dict>: measures of the task (from `profiled_call`)
+        """
+        record = dict(record)
+        record['ids'] = task_ids(func, args)
+        record['queue wait'] = max(0.0, record['start'] - submit_time)
+        self.records.append(record)
+
+    def _label(self, ids):
+        names = ' + '.join(self.node_names.get(node_id, str(node_id)) for node_id, _ in ids)
+        fid = ids[0][1]
+        job = 'all' if fid < 0 else self.job_ids.get(fid % 1000, str(fid))
+        return names, job
+
+    def write_trace(self, filename):
+        """!
+        @brief Write the timeline of the run in the Chrome trace format
+        """
+        events = []
+        workers = {}
+        for record in self.records:
+            worker = (record['host'], record['pid'])
+            if worker not in workers:
+                workers[worker] = len(workers) + 1
+                events.append({'name': 'process_name', 'ph': 'M', 'pid': workers[worker], 'tid': 0,
+                               'args': {'name': 'worker %i@%s' % (record['pid'], record['host'])}})
+            names, job = self._label(record['ids'])
+            args = {'nodes': [node_id for node_id, _ in record['ids']], 'fid': record['ids'][0][1],
+                    'queue wait (s)': record['queue wait'], 'peak memory (bytes)': record['peak memory']}
+            for key in ('bytes read', 'bytes written'):
+                if key in record:
+                    args[key] = record[key]
+            events.append({'name': '%s (%s)' % (names, job), 'cat': 'task', 'ph': 'X',
+                           'ts': (record['start'] - self.origin) * 1e6, 'dur': record['run time'] * 1e6,
+                           'pid': workers[worker], 'tid': 0, 'args': args})
+        with open(filename, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    def write_tasks(self, filename):
+        """!
+        @brief Write the measures of every task (slowest first) in a CSV file
+        """
+        with open(filename, 'w', newline='') as f:
+            writer = csv.writer(f, delimiter=settings.CSV_SEPARATOR)
+            writer.writerow(['node', 'node index', 'job', 'host', 'pid', 'start (s)', 'queue wait (s)',
+                             'run time (s)', 'bytes read', 'bytes written', 'peak memory (bytes)'])
+            for record in sorted(self.records, key=lambda r: -r['run time']):
+                names, job = self._label(record['ids'])
+                writer.writerow([names, ' '.join(str(node_id) for node_id, _ in record['ids']), job,
+                                 record['host'], record['pid'], '%.6f' % (record['start'] - self.origin),
+                                 '%.6f' % record['queue wait'], '%.6f' % record['run time'],
+                                 record.get('bytes read', ''), record.get('bytes written', ''),
+                                 record['peak memory']])
+
+    def write_nodes(self, filename):
+        """!
+        @brief Write the measures aggregated by node in a CSV file (the tasks of fused sinks are counted for every
+            sink they run)
+        """
+        nodes = {}
+        for record in self.records:
+            for node_id, _ in record['ids']:
+                node = nodes.setdefault(node_id, {'tasks': 0, 'total': 0.0, 'max': 0.0, 'slowest': '',
+                                                  'wait': 0.0, 'read': 0, 'written': 0, 'memory': 0})
+                node['tasks'] += 1
+                node['total'] += record['run time']
+                node['wait'] += record['queue wait']
+                node['read'] += record.get('bytes read', 0)
+                node['written'] += record.get('bytes written', 0)
+                node['memory'] = max(node['memory'], record['peak memory'])
+                if record['run time'] >= node['max']:
+                    node['max'] = record['run time']
+                    node['slowest'] = self._label(record['ids'])[1]
+        with open(filename, 'w', newline='') as f:
+            writer = csv.writer(f, delimiter=settings.CSV_SEPARATOR)
+            writer.writerow(['node', 'node index', 'tasks', 'total run time (s)', 'max run time (s)', 'slowest job',
+                             'total queue wait (s)', 'bytes read', 'bytes written', 'peak memory (bytes)'])
+            for node_id, node in sorted(nodes.items(), key=lambda item: -item[1]['total']):
+                writer.writerow([self.node_names.get(node_id, str(node_id)), node_id, node['tasks'],
+                                 '%.6f' % node['total'], '%.6f' % node['max'], node['slowest'],
+                                 '%.6f' % node['wait'], node['read'], node['written'], node['memory']])
+
+    def merge_cprofiles(self):
+        """!
+        @brief Merge the cProfile statistics of the tasks by node (files `node_<index>.prof`)
+        """
+        if not self.cprofile_folder:
+            return
+        task_files = {}
+        for name in os.listdir(self.cprofile_folder):
+            if name.startswith('task_') and name.endswith('.prof'):
+                task_files.setdefault(int(name.split('_')[1]), []).append(os.path.join(self.cprofile_folder, name))
+        for node_id, filenames in task_files.items():
+            stats = pstats.Stats(*filenames)
+            stats.dump_stats(os.path.join(self.cprofile_folder, 'node_%i.prof' % node_id))
+            for filename in filenames:
+                os.remove(filename)
+
+    def write(self, folder):
+        """!
+        @brief Write all the outputs in a folder (trace.json, tasks.csv, nodes.csv and merged cProfile statistics)
+        """
+        os.makedirs(folder, exist_ok=True)
+        self.write_trace(os.path.join(folder, 'trace.json'))
+        self.write_tasks(os.path.join(folder, 'tasks.csv'))
+        self.write_nodes(os.path.join(folder, 'nodes.csv'))
+        self.merge_cprofiles()
+
+
+def new_profiler(folder, node_names, job_ids, cprofile=False):
+    """!
+    @brief Profiler writing its outputs in a folder
+    @param folder <str>: output folder (created if needed)
+    @param node_names <dict>: node name for every node index
+    @param job_ids <dict>: job identifier for every file identifier
+    @param cprofile <bool>: dump the cProfile statistics of the tasks (in the subfolder `cprofile`)
+    @return <WorkflowProfiler>: profiler (to write with `profiler.write(folder)` at the end of the run)
+    """
+    cprofile_folder = ''
+    if cprofile:
+        cprofile_folder = os.path.join(folder, 'cprofile')
+        os.makedirs(cprofile_folder, exist_ok=True)
+    return WorkflowProfiler(node_names, job_ids, cprofile_folder)
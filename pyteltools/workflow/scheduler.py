@@ -0,0 +1,219 @@
+"""!
+Memory- and size-aware scheduling of the tasks of the workflow multi-folder view
+
+The cost (amount of values read) and the peak memory of every task are estimated from the header of its input
+Serafin data (number of nodes, variables and frames). Ready tasks are started largest first, as long as:
+- the sum of the estimated peak memories of the running tasks does not exceed a global memory budget
+  (a task is always started if no other task is running),
+- the number of running tasks of each resource class does not exceed its cap (tasks building a mesh index are
+  `HEAVY`, the others are `LIGHT`).
+"""
+
+from collections import namedtuple
+import heapq
+import itertools
+import os
+
+from pyteltools.conf import settings
+import pyteltools.slf.misc as operations
+from pyteltools.slf.datatypes import SerafinData
+
+
+LIGHT, HEAVY = 0, 1
+
+# Estimated memory (in bytes) of the mesh index per element (triangle polygon and R-tree entry)
+MESH_INDEX_BYTES_PER_ELEMENT = 1200
+
+# Estimated memory (in bytes) of a task which does not read any frame
+BASE_MEMORY = 16 * 1024 ** 2
+
+# Functions (of `multi_func`) reading frames and building a mesh index
+MESH_FUNCTIONS = ('compute_volume', 'compute_flux', 'interpolate_points', 'interpolate_lines', 'project_lines')
+
+# Functions (of `multi_func`) reading frames without building a mesh index
+STREAMING_FUNCTIONS = ('write_slf', 'write_landxml', 'write_shp', 'write_vtk')
+
+# Functions (of `multi_func`) loading an input file
+LOAD_FUNCTIONS = ('read_slf_2d', 'read_slf_3d', 'read_slf_reference', 'read_polygons', 'read_polylines',
+                  'read_points')
+
+# Operators requiring a mesh index when their result is written
+MESH_OPERATORS = (operations.PROJECT, operations.DIFF, operations.REV_DIFF, operations.MAX_BETWEEN,
+                  operations.MIN_BETWEEN)
+
+
+TaskProfile = namedtuple('TaskProfile', ['cost', 'memory', 'resource'])
+
+
+def physical_memory():
+    """!
+    @brief Total physical memory (in bytes), None if it is not available on this platform
+    """
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def default_memory_budget():
+    """!
+    @brief Memory budget from the settings (half of the physical memory if it is not set)
+    @return <int>: memory budget in bytes (0 for no limit)
+    """
+    if settings.MULTI_MEMORY_BUDGET:
+        return settings.MULTI_MEMORY_BUDGET
+    total = physical_memory()
+    return total // 2 if total else 0
+
+
+def default_max_heavy_tasks(nb_processes):
+    """!
+    @brief Maximum number of running heavy tasks from the settings (half of the processes if it is not set)
+    """
+    if settings.MULTI_MAX_HEAVY_TASKS:
+        return settings.MULTI_MAX_HEAVY_TASKS
+    return max(1, nb_processes // 2)
+
+
+def _frame_memory(data):
+    return data.header.nb_nodes * data.header.nb_var * 8
+
+
+def _nb_frames(data):
+    return len(data.selected_time_indices) if data.selected_time_indices else max(len(data.time), 1)
+
+
+def _frame_copies(data):
+    """!
+    @brief Number of frames held in memory when writing the data (depends on its operator)
+    """
+    if data.operator is None or data.operator in (operations.SELECT_LAYER, operations.VERTICAL_AGGREGATION):
+        return 2
+    if data.operator == operations.STATISTICS:
+        return 4 + 10 * len(data.metadata['statistics'])
+    if data.operator in MESH_OPERATORS:
+        return 4
+    return 3
+
+
+def _mesh_memory(data):
+    return data.header.nb_elements * MESH_INDEX_BYTES_PER_ELEMENT
+
+
+def task_profile(func, args):
+    """!
+    @brief Estimate the cost, the peak memory and the resource class of a task
+    @param func <function>: function of the task (from `multi_func`)
+    @param args <tuple>: arguments of the task
+    @return <TaskProfile>: estimated number of values read, peak memory (in bytes) and resource class
+    """
+    name = func.__name__
+    if name == 'run_fused_sinks':
+        profiles = [task_profile(*task) for task in args[2]]
+        return TaskProfile(max(profile.cost for profile in profiles),
+                           sum(profile.memory for profile in profiles) +
+                           settings.FUSED_SINKS_WINDOW * _frame_memory(args[2][0][1][2]),
+                           max(profile.resource for profile in profiles))
+    if name in LOAD_FUNCTIONS:
+        filename = args[2] if name in ('read_slf_2d', 'read_slf_3d') else args[1]
+        try:
+            size = os.path.getsize(filename)
+        except OSError:
+            size = 0
+        return TaskProfile(size // 8, BASE_MEMORY, LIGHT)
+
+    data = args[2] if len(args) > 2 and isinstance(args[2], SerafinData) else None
+    if data is None or (name not in MESH_FUNCTIONS and name not in STREAMING_FUNCTIONS):
+        return TaskProfile(0, BASE_MEMORY, LIGHT)  # annotation of the input data
+
+    cost = data.header.nb_nodes * data.header.nb_var * _nb_frames(data)
+    if name in MESH_FUNCTIONS:
+        return TaskProfile(cost, BASE_MEMORY + 2 * _frame_memory(data) + _mesh_memory(data), HEAVY)
+    memory = BASE_MEMORY + _frame_copies(data) * _frame_memory(data)
+    if name == 'write_slf' and data.operator in MESH_OPERATORS:
+        operand = data.metadata['operand']
+        cost += operand.header.nb_nodes * operand.header.nb_var * _nb_frames(operand)
+        return TaskProfile(cost, memory + _frame_memory(operand) + _mesh_memory(operand), HEAVY)
+    return TaskProfile(cost, memory, LIGHT)
+
+
+class TaskScheduler:
+    """!
+    @brief Ready tasks ordered largest first and started under a memory budget and per resource class caps
+    """
+    def __init__(self, nb_slots, memory_budget=None, max_heavy=None, profile=task_profile):
+        """!
+        @param nb_slots <int>: maximum number of running tasks
+        @param memory_budget <int>: maximum sum of the peak memories of the running tasks (in bytes, 0 for no limit,
+            default from the settings)
+        @param max_heavy <int>: maximum number of running heavy tasks (default from the settings)
+        @param profile <function>: estimate the profile of a task from its function and arguments
+        """
+        self.nb_slots = nb_slots
+        self.memory_budget = default_memory_budget() if memory_budget is None else memory_budget
+        self.caps = {LIGHT: nb_slots,
+                     HEAVY: default_max_heavy_tasks(nb_slots) if max_heavy is None else max_heavy}
+        self.profile = profile
+
+        self.queue = []  # heap of (-cost, ticket)
+        self.tasks = {}
+        self.running = {}
+        self.memory_in_use = 0
+        self.running_per_class = {LIGHT: 0, HEAVY: 0}
+        self._tickets = itertools.count()
+
+    def __len__(self):
+        return len(self.queue)
+
+    def push(self, task):
+        """!
+        @brief Add a ready task
+        @param task <tuple>: function and arguments
+        @return <int>: ticket of the task
+        """
+        ticket = next(self._tickets)
+        profile = self.profile(*task)
+        self.tasks[ticket] = (task, profile)
+        heapq.heappush(self.queue, (-profile.cost, ticket))
+        return ticket
+
+    def pop_ready(self):
+        """!
+        @brief Remove from the queue the tasks which can be started now
+        @return <[(int, tuple)]>: ticket and task of every task to start (largest first)
+        """
+        ready = []
+        postponed = []
+        while self.queue and len(self.running) < self.nb_slots:
+            item = heapq.heappop(self.queue)
+            task, profile = self.tasks[item[1]]
+            if self._fits(profile):
+                del self.tasks[item[1]]
+                self._start(item[1], profile)
+                ready.append((item[1], task))
+            else:
+                postponed.append(item)
+        for item in postponed:
+            heapq.heappush(self.queue, item)
+        return ready
+
+    def release(self, ticket):
+        """!
+        @brief Notify that a task is finished
+        @param ticket <int>: ticket of the task
+        """
+        profile = self.running.pop(ticket)
+        self.memory_in_use -= profile.memory
+        self.running_per_class[profile.resource] -= 1
+
+    def _fits(self, profile):
+        if not self.running:
+            return True
+        if self.running_per_class[profile.resource] >= self.caps[profile.resource]:
+            return False
+        return not self.memory_budget or self.memory_in_use + profile.memory <= self.memory_budget
+
+    def _start(self, ticket, profile):
+        self.running[ticket] = profile
+        self.memory_in_use += profile.memory
+        self.running_per_class[profile.resource] += 1
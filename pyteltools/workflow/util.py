@@ -1,4 +1,5 @@
 import datetime
+import hashlib
 import numpy as np
 import os
 from PyQt5.QtCore import *
@@ -7,6 +8,7 @@ from PyQt5.QtWidgets import *
 
 from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT
 from matplotlib import cm
+from matplotlib.colors import Normalize
 from mpl_toolkits.axes_grid1 import make_axes_locatable
 import matplotlib.pyplot as plt
 import matplotlib.tri as mtri
@@ -14,13 +16,19 @@ import warnings
 warnings.filterwarnings('ignore', category=RuntimeWarning, module='matplotlib')
 
 from pyteltools.conf import settings
+from pyteltools.gui.lod import FieldLayer, get_renderer
 from pyteltools.gui.util import FluxPlotViewer, MapCanvas, PointLabelEditor, PointPlotViewer, PlotViewer, \
     read_csv, SimpleTimeDateSelection, TemporalPlotViewer, VolumePlotViewer
 from pyteltools.slf.datatypes import SerafinData
-from pyteltools.slf.interpolation import MeshInterpolator
+from pyteltools.slf.interpolation import MeshInterpolator, VerticalCrossSection, VerticalTemporalProfiles
 from pyteltools.slf import Serafin
 from pyteltools.utils.cli import new_logger
 
+from .batch_render import BatchRenderer
+from .options import process_geom_output_options, process_output_options, process_vtk_output_options, \
+    validate_input_options, validate_output_options
+from .prefetch import PrefetchFrameCache
+
 
 EPS_VALUE = 0.001  # Relative tolerance (of 0.1%) above which min and max are modified to avoid a crash of colormap [#2]
 
@@ -43,76 +51,16 @@ def build_levels_from_minmax(min_input, max_input):
     return np.linspace(min_value, max_value, settings.NB_COLOR_LEVELS)
 
 
-def process_output_options(input_file, job_id, extension, suffix, in_source_folder, dir_path, double_name):
-    input_path, input_name = os.path.split(input_file)
-    input_rootname = os.path.splitext(input_name)[0]
-    if double_name:
-        output_name = input_rootname + '_' + job_id + suffix + extension
-    else:
-        output_name = input_rootname + suffix + extension
-    if in_source_folder:
-        filename = os.path.join(input_path, output_name)
-    else:
-        filename = os.path.join(dir_path, output_name)
-    return filename
-
-
-def process_geom_output_options(input_file, job_id, extension, suffix, in_source_folder, dir_path, double_name):
-    input_path, input_name = os.path.split(input_file)
-    input_rootname = os.path.splitext(input_name)[0]
-    if double_name:
-        output_name = input_rootname + '_' + job_id + suffix + extension
-    else:
-        output_name = input_rootname + suffix + extension
-    if in_source_folder:
-        path = os.path.join(input_path, 'gis')
-        if not os.path.exists(path):
-            os.mkdir(path)
-        filename = os.path.join(path, output_name)
-    else:
-        filename = os.path.join(dir_path, output_name)
-    return filename
-
-
-def process_vtk_output_options(input_file, job_id, time_index, suffix, in_source_folder, dir_path, double_name):
-    input_path, input_name = os.path.split(input_file)
-    input_rootname = os.path.splitext(input_name)[0]
-    if double_name:
-        output_name = input_rootname + '_' + job_id + suffix + '_' + str(time_index) + '.vtk'
-    else:
-        output_name = input_rootname + suffix + '_' + str(time_index) + '.vtk'
-    if in_source_folder:
-        path = os.path.join(input_path, 'vtk')
-        if not os.path.exists(path):
-            os.mkdir(path)
-        filename = os.path.join(path, output_name)
-    else:
-        filename = os.path.join(dir_path, output_name)
-    return filename
-
-
-def validate_output_options(options):
-    suffix = options[0]
-    in_source_folder = bool(int(options[1]))
-    dir_path = options[2]
-    double_name = bool(int(options[3]))
-    overwrite = bool(int(options[4]))
-    if not in_source_folder:
-        if not os.path.exists(dir_path):
-            return False, ('', True, '', False, True)
-    return True, (suffix, in_source_folder, dir_path, double_name, overwrite)
-
-
-def validate_input_options(options):
-    filename = options[0]
-    if not filename:
-        return False, ''
-    try:
-        with open(filename) as f:
-            pass
-    except FileNotFoundError:
-        return False, ''
-    return True, filename
+def mesh_key(header):
+    """!
+    @brief Fingerprint of the mesh of a Serafin file (files with the same key share the same mesh)
+    @param header <slf.Serafin.SerafinHeader>: input Serafin header
+    @return <tuple>: numbers of nodes and elements, and a digest of the coordinates and of the connectivity table
+    """
+    digest = hashlib.sha1()
+    for array in (header.x, header.y, header.ikle):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return header.nb_nodes, header.nb_elements, digest.hexdigest()
 
 
 class ConfigureDialog(QDialog):
@@ -965,6 +913,7 @@ class VerticalCrossSectionPlotViewer(PlotViewer):
         self.section_names = []
         self.sections = []
         self.line_interpolators = []
+        self.cross_sections = {}
         self.triang, self.values = None, None
         self.nplan = -1
 
@@ -1121,34 +1070,31 @@ class VerticalCrossSectionPlotViewer(PlotViewer):
             self.time_index = index
             self.replot(compute=True)
 
+    def cross_section(self):
+        """!
+        @brief Interpolation engine of the current section (built once per section)
+        @return <slf.interpolation.VerticalCrossSection>: the current section
+        """
+        section_id = int(self.current_section.split()[1]) - 1
+        if section_id not in self.cross_sections:
+            line_interpolator, distances = self.line_interpolators[section_id]
+            self.cross_sections[section_id] = VerticalCrossSection(line_interpolator, distances,
+                                                                   self.data.header.nb_nodes_2d, self.nplan)
+        return self.cross_sections[section_id]
+
     def compute(self):
         """!
         Compute current cross section
         """
-        line_interpolator, distances = self.line_interpolators[int(self.current_section.split()[1]) - 1]
-        npt = len(distances)
-        point_x = np.array([[distances[i]] * self.nplan for i in range(npt)])
-        point_y = np.empty((npt, self.nplan))
-        point_values = np.empty((npt, self.nplan))
-
+        section = self.cross_section()
         with Serafin.Read(self.data.filename, self.data.language) as input_stream:
             input_stream.header = self.data.header
             input_stream.time = self.data.time
 
-            z = input_stream.read_var_in_frame_as_3d(self.time_index, 'Z').T
-            values = input_stream.read_var_in_frame_as_3d(self.time_index, self.current_var).T
-
-        for i_pt, ((x, y, (i, j, k), interpolator), distance) in enumerate(zip(line_interpolator, distances)):
-            point_y[i_pt] = interpolator.dot(z[[i, j, k]])
-            point_values[i_pt] = interpolator.dot(values[[i, j, k]])
+            z = section.interpolate(input_stream.read_var_in_frame_as_3d(self.time_index, 'Z'))
+            values = section.interpolate(input_stream.read_var_in_frame_as_3d(self.time_index, self.current_var))
 
-        triangles = [((ipt - 1) * self.nplan + iplan - 1, (ipt - 1) * self.nplan + iplan, ipt * self.nplan + iplan - 1)
-                     for ipt in range(1, npt) for iplan in range(1, self.nplan)] + \
-                    [((ipt - 1) * self.nplan + iplan, ipt * self.nplan + iplan - 1, ipt * self.nplan + iplan)
-                     for ipt in range(1, npt) for iplan in range(1, self.nplan)]
-        triang = mtri.Triangulation(point_x.flatten(), point_y.flatten(), triangles)
-
-        return triang, point_values.flatten()
+        return mtri.Triangulation(section.x, z, section.triangles), values
 
     def replot(self, compute=True):
         if compute:
@@ -1183,6 +1129,7 @@ class VerticalCrossSectionPlotViewer(PlotViewer):
         self.data = data
         self.sections = sections
         self.line_interpolators = line_interpolators
+        self.cross_sections = {}
         self.section_indices = section_indices
 
         self.current_var = [var for var in self.data.header.var_IDs if var != 'Z'][0]
@@ -1209,6 +1156,8 @@ class VerticalProfilePlotViewer(TemporalPlotViewer):
         self.points = []
         self.point_interpolators = []
         self.indices = []
+        self.profiles = None
+        self.profile_values = {}  # profiles of every point for each variable
         self.y, self.z = [], []
         self.triangles = []
         self.n, self.k, self.m = -1, -1, -1
@@ -1323,25 +1272,17 @@ class VerticalProfilePlotViewer(TemporalPlotViewer):
         self.replot(False)
 
     def compute(self):
-        (a, b, c), interpolator = self.point_interpolators[int(self.current_columns[0].split()[1])-1]
-
-        with Serafin.Read(self.data.filename, self.data.language) as input_stream:
-            input_stream.header = self.data.header
-            input_stream.time = self.data.time
-
-            point_y = np.empty((self.n, self.k))
-            point_values = np.empty((self.n, self.k))
-
-            for i in range(self.n):
-                z = input_stream.read_var_in_frame_as_3d(i, 'Z')
-                values = input_stream.read_var_in_frame_as_3d(i, self.current_var)
-
-                for j in range(self.k):
-                    point_y[i, j] = z[j, [a, b, c]].dot(interpolator)
-                    point_values[i, j] = values[j, [a, b, c]].dot(interpolator)
-
-        y = point_y.flatten()
-        z = point_values.flatten()
+        position = self.indices.index(int(self.current_columns[0].split()[1]) - 1)
+        missing_vars = [var for var in ('Z', self.current_var) if var not in self.profile_values]
+        if missing_vars:
+            with Serafin.Read(self.data.filename, self.data.language) as input_stream:
+                input_stream.header = self.data.header
+                input_stream.time = self.data.time
+                for var in missing_vars:
+                    self.profile_values[var] = self.profiles.read(input_stream, var)
+
+        y = self.profile_values['Z'][position].flatten()
+        z = self.profile_values[self.current_var][position].flatten()
         return y, z
 
     def replot(self, compute=True):
@@ -1404,16 +1345,15 @@ class VerticalProfilePlotViewer(TemporalPlotViewer):
         self.current_title = self._defaultTitle()
 
         self.n, self.k, self.m = len(self.data.time), self.data.header.nb_planes, self.data.header.nb_nodes_2d
-        point_x = np.array([[self.data.time[i]] * self.k for i in range(self.n)])
-        point_x = point_x.flatten()
+        point_x = np.repeat(np.array(self.data.time, dtype=np.float64), self.k)
         self.time_seconds = np.array(self.data.time)
         self.time = [point_x, point_x, point_x,
                      point_x / 60, point_x / 3600, point_x / 86400]
 
-        self.triangles = [(i*self.k+j, i*self.k+j+1, i*self.k+j+1-self.k)
-                          for i in range(1, self.n) for j in range(self.k-1)] + \
-                         [(i*self.k+j, i*self.k+j-self.k, i*self.k+j+1-self.k)
-                          for i in range(1, self.n) for j in range(self.k-1)]
+        self.profiles = VerticalTemporalProfiles([self.point_interpolators[i] for i in self.indices],
+                                                 self.m, self.k)
+        self.profile_values = {}
+        self.triangles = self.profiles.triangles(self.n)
         self.replot()
 
 
@@ -1685,6 +1625,9 @@ class MultiInterpolationPlotDialog(QDialog):
         self.parent = parent
         self.compute_options = compute_options
         self.lines = []
+        self.interpolations = {}  # interpolation results for every mesh
+        self.renderer = None
+        self.pending_figures = []
 
         self.table = QTableWidget()
         self.table.setRowCount(len(input_options[0]))
@@ -1765,6 +1708,32 @@ class MultiInterpolationPlotDialog(QDialog):
             return False, None, None
         return True, line_interpolators, line_interpolators_internal
 
+    def interpolate_mesh(self, row, input_data):
+        """!
+        @brief Interpolation results (see `interpolate`) computed once for all the input files sharing the same mesh
+        @param row <int>: row of the input file
+        @param input_data <slf.datatypes.SerafinData>: input data
+        @return <tuple>: the interpolation results (success first)
+        """
+        key = mesh_key(input_data.header)
+        if key not in self.interpolations:
+            self.interpolations[key] = self.interpolate(row, self.build_mesh(input_data))
+        elif self.interpolations[key][0]:
+            self.success(row, 2)
+        else:
+            self.fail(row, 2)
+        return self.interpolations[key]
+
+    def export(self, row, task):
+        """!
+        @brief Save a figure in the background (the processes are started with the first figure)
+        @param row <int>: row of the input file
+        @param task <workflow.batch_render.FigureTask>: figure description
+        """
+        if self.renderer is None:
+            self.renderer = BatchRenderer()
+        self.pending_figures.append((row, self.renderer.submit(task)))
+
     def check_interpolate(self, row, line_interpolators, line_interpolators_internal):
         line_interpolator, distances = line_interpolators[self.line_id]
         if not line_interpolator:
@@ -1790,7 +1759,19 @@ class MultiInterpolationPlotDialog(QDialog):
             successful_input_data.append(input_data)
         return successful_rows, successful_input_data
 
-    def finishing_up(self, nb_successes):
+    def finishing_up(self):
+        nb_successes = 0
+        for row, future in self.pending_figures:
+            try:
+                future.result()
+            except Exception as e:
+                logger.error('Failed to save the figure %s: %s' % (self.png_names[row], e))
+                self.fail(row, 3)
+                continue
+            self.success(row, 3)
+            nb_successes += 1
+        if self.renderer is not None:
+            self.renderer.close()
         if nb_successes == len(self.dir_paths):
             QMessageBox.information(None, 'Success', 'Figures saved successfully',
                                     QMessageBox.Ok)
@@ -1844,11 +1825,9 @@ class MultiSaveMultiVarLinePlotDialog(MultiInterpolationPlotDialog):
         # load serafin
         successful_rows, successful_input_data = self.first_step()
 
-        nb_successes = 0
         for row, input_data in zip(successful_rows, successful_input_data):
             # interpolation
-            mesh = self.build_mesh(input_data)
-            success, line_interpolators, line_interpolators_internal = self.interpolate(row, mesh)
+            success, line_interpolators, line_interpolators_internal = self.interpolate_mesh(row, input_data)
             if not success:
                 continue
 
@@ -1860,12 +1839,10 @@ class MultiSaveMultiVarLinePlotDialog(MultiInterpolationPlotDialog):
 
             # export PNG
             values, values_internal = self.compute(input_data, line_interpolator, line_interpolator_internal)
-            self.parent.plot(values, distances, values_internal, distances_internal,
-                             self.current_vars, self.png_names[row])
-            self.success(row, 3)
-            nb_successes += 1
+            self.export(row, self.parent.plot(values, distances, values_internal, distances_internal,
+                                              self.current_vars, self.png_names[row]))
 
-        self.finishing_up(nb_successes)
+        self.finishing_up()
 
 
 class MultiSaveMultiFrameLinePlotDialog(MultiInterpolationPlotDialog):
@@ -1911,11 +1888,9 @@ class MultiSaveMultiFrameLinePlotDialog(MultiInterpolationPlotDialog):
         # load serafin
         successful_rows, successful_input_data = self.first_step()
 
-        nb_successes = 0
         for row, input_data in zip(successful_rows, successful_input_data):
             # interpolation
-            mesh = self.build_mesh(input_data)
-            success, line_interpolators, line_interpolators_internal = self.interpolate(row, mesh)
+            success, line_interpolators, line_interpolators_internal = self.interpolate_mesh(row, input_data)
             if not success:
                 continue
 
@@ -1927,12 +1902,10 @@ class MultiSaveMultiFrameLinePlotDialog(MultiInterpolationPlotDialog):
 
             # Export PNG
             values, values_internal = self.compute(input_data, line_interpolator, line_interpolator_internal)
-            self.parent.plot(values, distances, values_internal, distances_internal,
-                             self.time_indices, self.png_names[row])
-            self.success(row, 3)
-            nb_successes += 1
+            self.export(row, self.parent.plot(values, distances, values_internal, distances_internal,
+                                              self.time_indices, self.png_names[row]))
 
-        self.finishing_up(nb_successes)
+        self.finishing_up()
 
 
 class MultiSaveProjectLinesDialog(MultiInterpolationPlotDialog):
@@ -2020,11 +1993,9 @@ class MultiSaveProjectLinesDialog(MultiInterpolationPlotDialog):
         # load serafin
         successful_rows, successful_input_data = self.first_step()
 
-        nb_successes = 0
         for row, input_data in zip(successful_rows, successful_input_data):
             # interpolation
-            mesh = self.build_mesh(input_data)
-            success, all_line_interpolators, all_line_interpolators_internal = self.interpolate(row, mesh)
+            success, all_line_interpolators, all_line_interpolators_internal = self.interpolate_mesh(row, input_data)
             if not success:
                 continue
 
@@ -2037,12 +2008,10 @@ class MultiSaveProjectLinesDialog(MultiInterpolationPlotDialog):
             # export PNG
             distances, values, distances_internal, values_internal = self.compute(input_data, line_interpolators,
                                                                                   line_interpolators_internal)
-            self.parent.plot(values, distances, values_internal, distances_internal,
-                             self.current_vars, self.png_names[row])
-            self.success(row, 3)
-            nb_successes += 1
+            self.export(row, self.parent.plot(values, distances, values_internal, distances_internal,
+                                              self.current_vars, self.png_names[row]))
 
-        self.finishing_up(nb_successes)
+        self.finishing_up()
 
 
 class MultiSaveVerticalProfileDialog(MultiInterpolationPlotDialog):
@@ -2083,57 +2052,40 @@ class MultiSaveVerticalProfileDialog(MultiInterpolationPlotDialog):
 
     def compute(self, input_data, point_interpolator):
         n, k, m = len(input_data.time), input_data.header.nb_planes, input_data.header.nb_nodes_2d
-        point_x = np.array([[input_data.time[i]] * k for i in range(n)])
-        x = point_x.flatten()
-
-        (a, b, c), interpolator = point_interpolator
+        x = np.repeat(np.array(input_data.time, dtype=np.float64), k)
 
+        profiles = VerticalTemporalProfiles([point_interpolator], m, k)
         with Serafin.Read(input_data.filename, input_data.language) as input_stream:
             input_stream.header = input_data.header
             input_stream.time = input_data.time
 
-            point_y = np.empty((n, k))
-            point_values = np.empty((n, k))
-
-            for i in range(n):
-                z = input_stream.read_var_in_frame_as_3d(i, 'Z')
-                values = input_stream.read_var_in_frame_as_3d(i, self.current_var)
-
-                for j in range(k):
-                    point_y[i, j] = z[j, [a, b, c]].dot(interpolator)
-                    point_values[i, j] = values[j, [a, b, c]].dot(interpolator)
-
-        y = point_y.flatten()
-        z = point_values.flatten()
+            y = profiles.read(input_stream, 'Z')[0].flatten()
+            z = profiles.read(input_stream, self.current_var)[0].flatten()
 
         start_time = input_data.start_time
         dates = list(map(lambda x: start_time + datetime.timedelta(seconds=x), input_data.time))
         str_datetime = list(map(lambda x: x.strftime('%Y/%m/%d\n%H:%M'), dates))
         str_datetime_bis = list(map(lambda x: x.strftime('%d/%m/%y\n%H:%M'), dates))
         time = [x, x, x, x / 60, x / 3600, x / 86400]
-        triangles = [(i*k+j, i*k+j+1, i*k+j+1-k) for i in range(1, n) for j in range(k-1)] + \
-                    [(i*k+j, i*k+j-k, i*k+j+1-k) for i in range(1, n) for j in range(k-1)]
+        triangles = profiles.triangles(n)
         return time, y, z, triangles, str_datetime, str_datetime_bis
 
     def run(self):
         # load serafin
         successful_rows, successful_input_data = self.first_step()
 
-        nb_successes = 0
         for row, input_data in zip(successful_rows, successful_input_data):
             # interpolation
-            mesh = self.build_mesh(input_data)
-            success, point_interpolator = self.interpolate(row, mesh)
+            success, point_interpolator = self.interpolate_mesh(row, input_data)
             if not success:
                 continue
 
             # export PNG
             time, y, z, triangles, str_datetime, str_datetime_bis = self.compute(input_data, point_interpolator)
-            self.parent.plot(time, y, z, triangles, str_datetime, str_datetime_bis, self.png_names[row])
-            self.success(row, 3)
-            nb_successes += 1
+            self.export(row, self.parent.plot(time, y, z, triangles, str_datetime, str_datetime_bis,
+                                              self.png_names[row]))
 
-        self.finishing_up(nb_successes)
+        self.finishing_up()
 
 
 class MultiSaveVerticalCrossSectionDialog(MultiInterpolationPlotDialog):
@@ -2164,85 +2116,76 @@ class MultiSaveVerticalCrossSectionDialog(MultiInterpolationPlotDialog):
         return True
 
     def interpolate(self, row, input_mesh):
-        line_interpolators, distances, line_interpolators_internal, distances_internal = \
-            input_mesh.get_line_interpolators([self.line])
-        is_inside = True if distances_internal else False
-
-        if not is_inside:
+        nb_nonempty, _, line_interpolators, _ = input_mesh.get_line_interpolators([self.line])
+        if nb_nonempty == 0:
             self.fail(row, 2)
-            return False, None
+            return False, None, None
         self.success(row, 2)
-        return True, distances_internal[0], line_interpolators_internal[0]
-
-    def compute(self, input_data, line_interp):
-        line_interpolator, distances = line_interp
-        npt = len(distances)
-        nplan = input_data.header.nb_planes
-        point_x = np.array([[distances[i]] * nplan for i in range(npt)])
-        point_y = np.empty((npt, nplan))
-        point_values = np.empty((npt, nplan))
+        line_interpolator, distances = line_interpolators[0]
+        return True, line_interpolator, distances
 
+    def compute(self, input_data, section):
         with Serafin.Read(input_data.filename, self.language) as input_stream:
             input_stream.header = input_data.header
             input_stream.time = input_data.time
 
             time_index = self.parent.plot_viewer.time_index
-            z = input_stream.read_var_in_frame_as_3d(time_index, 'Z').T
-            values = input_stream.read_var_in_frame_as_3d(time_index, self.current_var).T
-
-        for i_pt, ((x, y, (i, j, k), interpolator), distance) in enumerate(zip(line_interpolator, distances)):
-            point_y[i_pt] = interpolator.dot(z[[i, j, k]])
-            point_values[i_pt] = interpolator.dot(values[[i, j, k]])
-
-        triangles = [((ipt - 1) * nplan + iplan - 1, (ipt - 1) * nplan + iplan, ipt * nplan + iplan - 1)
-                     for ipt in range(1, npt) for iplan in range(1, nplan)] + \
-                    [((ipt - 1) * nplan + iplan, ipt * nplan + iplan - 1, ipt * nplan + iplan)
-                     for ipt in range(1, npt) for iplan in range(1, nplan)]
-        triang = mtri.Triangulation(point_x.flatten(), point_y.flatten(), triangles)
+            z = section.interpolate(input_stream.read_var_in_frame_as_3d(time_index, 'Z'))
+            values = section.interpolate(input_stream.read_var_in_frame_as_3d(time_index, self.current_var))
 
-        return triang, point_values.flatten()
+        return mtri.Triangulation(section.x, z, section.triangles), values
 
     def run(self):
         # load serafin
         successful_rows, successful_input_data = self.first_step()
 
-        nb_successes = 0
         for row, input_data in zip(successful_rows, successful_input_data):
             # interpolation
-            mesh = self.build_mesh(input_data)
-            success, distances, line_interp = self.interpolate(row, mesh)
+            success, line_interpolator, distances = self.interpolate_mesh(row, input_data)
             if not success:
                 continue
+            section = VerticalCrossSection(line_interpolator, distances, input_data.header.nb_nodes_2d,
+                                           input_data.header.nb_planes)
 
             # export PNG
-            triang, point_values = self.compute(input_data, line_interp)
-            self.parent.plot(triang, point_values, self.png_names[row])
-            self.success(row, 3)
-            nb_successes += 1
+            triang, point_values = self.compute(input_data, section)
+            self.export(row, self.parent.plot(triang, point_values, self.png_names[row]))
 
-        self.finishing_up(nb_successes)
+        self.finishing_up()
 
 
 class ScalarMapCanvas(MapCanvas):
     def __init__(self):
         super().__init__()
         self.cmap = None
+        self.mesh = None
+        self.layer = None
+        self.plot_key = None
 
     def replot(self, mesh, values, color_style, limits, variable_label):
+        if limits is not None:
+            levels = np.linspace(limits[0], limits[1], settings.NB_COLOR_LEVELS)
+        else:
+            levels = build_levels_from_minmax(np.nanmin(values), np.nanmax(values))
+
+        plot_key = (color_style, limits, variable_label)
+        if self.layer is not None and mesh is self.mesh and plot_key == self.plot_key:
+            # another frame: only the colors are updated
+            self.layer.set_values(values)
+            self.layer.set_clim(levels[0], levels[-1])
+            self.cmap.set_clim(levels[0], levels[-1])
+            self.draw_idle()
+            return
+
         self.fig.clear()   # remove the old color bar
         self.axes = self.fig.add_subplot(111)
         self.axes.set_xlabel(settings.X_AXIS_LABEL)
         self.axes.set_ylabel(settings.Y_AXIS_LABEL)
         self.axes.set_aspect('equal', adjustable='box')
 
-        triang = mtri.Triangulation(mesh.x, mesh.y, mesh.ikle)
-        if limits is not None:
-            levels = np.linspace(limits[0], limits[1], settings.NB_COLOR_LEVELS)
-            self.axes.tricontourf(triang, values, cmap=color_style, levels=levels, extend='both',
-                                  vmin=limits[0], vmax=limits[1])
-        else:
-            levels = build_levels_from_minmax(np.nanmin(values), np.nanmax(values))
-            self.axes.tricontourf(triang, values, cmap=color_style, levels=levels, extend='both')
+        self.layer = FieldLayer(self.axes, get_renderer(mesh), values, color_style, Normalize(levels[0], levels[-1]))
+        self.mesh = mesh
+        self.plot_key = plot_key
 
         # add colorbar
         divider = make_axes_locatable(self.axes)
@@ -2262,6 +2205,7 @@ class ScalarMapViewer(QWidget):
         self.time_index = -1
         self.mesh = None
         self.values = []
+        self.frames = None
 
         self.color_limits = None
         self.cmap = None
@@ -2373,6 +2317,7 @@ class ScalarMapViewer(QWidget):
             self.replot(compute=True)
 
     def get_data(self, input_data, input_mesh):
+        self.close_frames()
         self.data = input_data
         self.mesh = input_mesh
 
@@ -2385,11 +2330,17 @@ class ScalarMapViewer(QWidget):
         self.slider.initTime(self.data.time, list(map(lambda x: x + self.data.start_time, self.data.time_second)))
         self.replot(True)
 
+    def close_frames(self):
+        if self.frames is not None:
+            self.frames.close()
+            self.frames = None
+
     def compute(self):
-        with Serafin.Read(self.data.filename, self.data.language) as input_stream:
-            input_stream.header = self.data.header
-            values = input_stream.read_var_in_frame(self.time_index, self.current_var)
-        return values
+        if self.frames is None or self.frames.variables != [self.current_var]:
+            self.close_frames()
+            self.frames = PrefetchFrameCache(self.data.filename, self.data.language, self.data.header,
+                                             [self.current_var], len(self.data.time))
+        return self.frames.get(self.time_index)[0]
 
     def replot(self, compute):
         if compute:
@@ -2401,10 +2352,19 @@ class VectorMapCanvas(MapCanvas):
     def __init__(self):
         super().__init__()
         self.cmap = None
+        self.mesh = None
+        self.quiver = None
 
     def replot(self, mesh, values):
+        if self.quiver is not None and mesh is self.mesh:
+            # another frame: only the arrows are updated (their scale is computed again)
+            self.quiver.scale = None
+            self.quiver.set_UVC(values[0], values[1])
+            self.draw_idle()
+            return
         self.initFigure(mesh)
-        self.axes.quiver(mesh.x, mesh.y, values[0], values[1], color='Teal')
+        self.mesh = mesh
+        self.quiver = self.axes.quiver(mesh.x, mesh.y, values[0], values[1], color='Teal')
         self.draw()
 
 
@@ -2417,6 +2377,7 @@ class VectorMapViewer(QWidget):
         self.couples = []
         self.mesh = None
         self.values = ([], [])
+        self.frames = None
 
         self.canvas = VectorMapCanvas()
         self.slider = SimpleTimeDateSelection()
@@ -2487,6 +2448,7 @@ class VectorMapViewer(QWidget):
             self.replot(compute=True)
 
     def get_data(self, input_data, input_mesh, couples):
+        self.close_frames()
         self.data = input_data
         self.mesh = input_mesh
         self.couples = couples
@@ -2494,12 +2456,17 @@ class VectorMapViewer(QWidget):
         self.slider.initTime(self.data.time, list(map(lambda x: x + self.data.start_time, self.data.time_second)))
         self.replot(True)
 
+    def close_frames(self):
+        if self.frames is not None:
+            self.frames.close()
+            self.frames = None
+
     def compute(self):
-        with Serafin.Read(self.data.filename, self.data.language) as input_stream:
-            input_stream.header = self.data.header
-            values = (input_stream.read_var_in_frame(self.time_index, self.current_couple[0]),
-                      input_stream.read_var_in_frame(self.time_index, self.current_couple[1]))
-        return values
+        if self.frames is None or self.frames.variables != list(self.current_couple):
+            self.close_frames()
+            self.frames = PrefetchFrameCache(self.data.filename, self.data.language, self.data.header,
+                                             list(self.current_couple), len(self.data.time))
+        return tuple(self.frames.get(self.time_index))
 
     def replot(self, compute):
         if compute: